@@ -1,6 +1,7 @@
 # backend/medical_cdss/celery.py
 import os
 from celery import Celery
+from celery.signals import worker_init
 from django.conf import settings
 
 # Django 설정 모듈 지정
@@ -28,6 +29,12 @@ app.conf.update(
     result_expires=3600,  # 1시간 후 결과 삭제
 )
 
+@worker_init.connect
+def warm_ml_models(**kwargs):
+    """prefork 자식 프로세스가 fork 되기 전에 마스터에서 ML 모델을 미리 로드 (자식들이 같은 페이지를 공유)"""
+    from ml_models.model_registry import model_registry
+    model_registry.warm()
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
\ No newline at end of file
@@ -4,6 +4,7 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 from datetime import timedelta # 6-19 추교상 로그인
+from celery.schedules import crontab
 # 6월 16일 Flutter 관련
 # # 🔧 이미지 업로드 관련 설정 추가
 # MEDIA_URL = '/media/'
@@ -188,7 +189,9 @@ CORS_ALLOW_HEADERS = [
     'accept', 'accept-encoding', 'authorization', 'content-type', 'dnt',
     'origin', 'user-agent', 'x-csrftoken', 'x-requested-with',
     'cache-control', 'pragma', 'if-modified-since',
+    'if-none-match', 'range',  # DICOM 인스턴스 프록시의 조건부/부분 요청
 ]
+CORS_EXPOSE_HEADERS = ['etag', 'content-range', 'content-length', 'accept-ranges']
 CORS_ALLOW_METHODS = ['DELETE', 'GET', 'OPTIONS', 'PATCH', 'POST', 'PUT']
 CORS_PREFLIGHT_MAX_AGE = int(os.getenv('CORS_PREFLIGHT_MAX_AGE', '86400'))
 
@@ -216,9 +219,72 @@ ORTHANC_URL = os.getenv('ORTHANC_URL', 'http://serene_diffie:8042')
 ORTHANC_PUBLIC_URL = os.getenv('ORTHANC_PUBLIC_URL', 'http://localhost:8042')
 ORTHANC_USERNAME = os.getenv('ORTHANC_USERNAME', 'orthanc')
 ORTHANC_PASSWORD = os.getenv('ORTHANC_PASSWORD', 'orthanc')
+# Orthanc 커넥션 풀 / 배치 업로드 설정
+ORTHANC_POOL_SIZE = int(os.getenv('ORTHANC_POOL_SIZE', '16'))
+ORTHANC_UPLOAD_BATCH_SIZE = int(os.getenv('ORTHANC_UPLOAD_BATCH_SIZE', '32'))
+ORTHANC_UPLOAD_WORKERS = int(os.getenv('ORTHANC_UPLOAD_WORKERS', '8'))
+ORTHANC_MAX_CONCURRENCY = int(os.getenv('ORTHANC_MAX_CONCURRENCY', '8'))  # 스터디/시리즈 동시 조회 상한
+# Orthanc 요청 타임아웃 (연결, 읽기) 초 - 엔드포인트 이름은 pacs.orthanc_client.endpoint_name 기준
+ORTHANC_TIMEOUTS = {
+    'default': (3.05, 10),
+    'system': (3.05, 5),
+    'tools/find': (3.05, 15),
+    'instances': (3.05, 60),           # 단일 인스턴스 업로드
+    'instances:archive': (3.05, 600),  # ZIP 일괄 업로드
+    'instances/{id}/file': (3.05, 30),
+    'series/{id}/instances': (3.05, 20),
+}
+ORTHANC_RETRIES = int(os.getenv('ORTHANC_RETRIES', '2'))  # 멱등 호출 재시도 횟수
+ORTHANC_RETRY_BACKOFF = float(os.getenv('ORTHANC_RETRY_BACKOFF', '0.2'))
+ORTHANC_CIRCUIT_FAILURES = int(os.getenv('ORTHANC_CIRCUIT_FAILURES', '5'))  # 연속 실패 시 회로 열림
+ORTHANC_CIRCUIT_RESET = float(os.getenv('ORTHANC_CIRCUIT_RESET', '30'))  # 열린 뒤 시험 요청까지 대기(초)
+# Orthanc 스터디/시리즈 메타데이터 캐시 (/changes 피드로 무효화, 0이면 폴링 안 함)
+PACS_METADATA_CACHE_SIZE = int(os.getenv('PACS_METADATA_CACHE_SIZE', '2048'))
+PACS_METADATA_CACHE_TTL = int(os.getenv('PACS_METADATA_CACHE_TTL', '600'))
+PACS_CHANGES_POLL_INTERVAL = float(os.getenv('PACS_CHANGES_POLL_INTERVAL', '5'))
+# DICOM 인스턴스 디스크 캐시 (0이면 사용 안 함)
+PACS_INSTANCE_CACHE_DIR = os.getenv('PACS_INSTANCE_CACHE_DIR', str(BASE_DIR / 'cache' / 'dicom_instances'))
+PACS_INSTANCE_CACHE_MAX_BYTES = int(os.getenv('PACS_INSTANCE_CACHE_MAX_BYTES', str(2 * 1024 ** 3)))
+# 시리즈 미리보기 (source: orthanc = Orthanc /preview, local = 캐시된 원본 픽셀을 윈도잉해 직접 렌더링)
+PACS_PREVIEW_DIR = os.getenv('PACS_PREVIEW_DIR', str(BASE_DIR / 'cache' / 'series_previews'))
+PACS_PREVIEW_SOURCE = os.getenv('PACS_PREVIEW_SOURCE', 'local')
+PACS_PREVIEW_FORMAT = os.getenv('PACS_PREVIEW_FORMAT', 'webp')
+PACS_PREVIEW_SIZE = int(os.getenv('PACS_PREVIEW_SIZE', '256'))
+PACS_PREVIEW_WORKERS = int(os.getenv('PACS_PREVIEW_WORKERS', '2'))
+# 시리즈 인스턴스 일괄 전송 1회 최대 개수
+PACS_BULK_MAX_INSTANCES = int(os.getenv('PACS_BULK_MAX_INSTANCES', '32'))
 
 # 두 번째 파일에만 있던 GCS 설정 추가
-GCS_BUCKET_NAME = os.getenv('GCS_BUCKET_NAME', 'default-fallback-bucket-name') # 유정우넌할수있어
+GCS_BUCKET_NAME = os.getenv('GCS_BUCKET_NAME', 'final_model_data1') # 유정우넌할수있어
+# 영상 파일 저장소 ('gcs' 또는 온프레미스/오프라인 테스트용 'local')
+PACS_STORAGE_BACKEND = os.getenv('PACS_STORAGE_BACKEND', 'gcs')
+PACS_LOCAL_STORAGE_DIR = os.getenv('PACS_LOCAL_STORAGE_DIR', str(BASE_DIR / 'storage'))
+PACS_STORAGE_CHUNK_SIZE = int(os.getenv('PACS_STORAGE_CHUNK_SIZE', str(8 * 1024 ** 2)))  # 256KB 배수, 5MB 이상
+PACS_STORAGE_PARALLEL_THRESHOLD = int(os.getenv('PACS_STORAGE_PARALLEL_THRESHOLD', str(32 * 1024 ** 2)))  # 이 크기 이상은 병렬 청크 전송
+PACS_STORAGE_TRANSFER_WORKERS = int(os.getenv('PACS_STORAGE_TRANSFER_WORKERS', '8'))
+# PACS 백그라운드 작업 (NIfTI 업로드 등) - 프로세스당 동시 작업 수 / 대기열 한도(실행 중 포함) / 작업 내부 병렬도
+PACS_JOB_WORKERS = int(os.getenv('PACS_JOB_WORKERS', '2'))
+PACS_JOB_QUEUE_LIMIT = int(os.getenv('PACS_JOB_QUEUE_LIMIT', '16'))
+PACS_INGEST_WORKERS = int(os.getenv('PACS_INGEST_WORKERS', '6'))  # 모달리티 3개 x (저장소 업로드, 인코딩+전송)
+# 병변 분할 작업 - 모델 추론이 무거우므로 별도 풀에서 적게 돌림 (처리량은 워커 수로 조절)
+PACS_SEGMENTATION_WORKERS = int(os.getenv('PACS_SEGMENTATION_WORKERS', '1'))
+PACS_SEGMENTATION_QUEUE_LIMIT = int(os.getenv('PACS_SEGMENTATION_QUEUE_LIMIT', '8'))
+PACS_SEGMENTER = os.getenv('PACS_SEGMENTER', '')  # 분할기 점 경로: segmenter(payload, report(done, total)) → 결과 dict
+# PACS 작업 진행률 이벤트 (SSE) - redis: 프로세스/노드 간 pub/sub, memory: 단일 프로세스용
+PACS_EVENT_BACKEND = os.getenv('PACS_EVENT_BACKEND', 'redis' if os.getenv('REDIS_URL') else 'memory')
+PACS_EVENT_REDIS_URL = os.getenv('REDIS_URL', 'redis://redis_fallback:6379/0')
+PACS_EVENT_KEEPALIVE = float(os.getenv('PACS_EVENT_KEEPALIVE', '15'))  # 초, 이벤트가 없으면 DB 재확인 + keep-alive
+# 동기(WSGI) 워커를 오래 붙잡지 않도록 짧게 끊고 EventSource 가 PACS_EVENT_RETRY 후 다시 연결
+PACS_EVENT_STREAM_TIMEOUT = int(os.getenv('PACS_EVENT_STREAM_TIMEOUT', '30'))  # 초, 이후 닫고 클라이언트 재연결
+PACS_EVENT_RETRY = int(os.getenv('PACS_EVENT_RETRY', '2000'))  # 밀리초, SSE retry: 필드 (재연결 대기)
+# DICOM 일괄 업로드 - Orthanc 로 보낼 ZIP 을 이 크기까지는 메모리에서, 넘으면 임시 파일에서 만듦
+PACS_BATCH_SPOOL_SIZE = int(os.getenv('PACS_BATCH_SPOOL_SIZE', str(64 * 1024 * 1024)))
+# SEG 변환용 참조 DICOM 템플릿 (모달리티별로 'MR', 'CT' 등 키를 추가, 없으면 default 사용)
+PACS_DICOM_TEMPLATES = {
+    'default': os.getenv('PACS_DICOM_TEMPLATE', str(BASE_DIR / 'pacs' / 'a374402b-874d1007-1566e6fa-388eda0f-8945e79a.dcm')),
+}
+# DICOM SEG 세그먼트 이름 (분할 결과 라벨 값 → 이름, 없는 라벨은 'Label N')
+PACS_SEG_LABELS = {1: 'Lesion'}
 
 # VitalSigns 관련 Concept/Encounter Type UUID 설정은 제거
 
@@ -256,6 +322,7 @@ CELERY_TASK_ROUTES = {
     'ml_models.tasks.predict_stroke_mortality_task': {'queue': 'ml_predictions'},
     'ml_models.tasks.assess_sod2_status_task': {'queue': 'maintenance'},
     'ml_models.tasks.cleanup_old_tasks': {'queue': 'maintenance'},
+    'ml_models.tasks.rebuild_risk_snapshots': {'queue': 'maintenance'},
 }
 
 CELERY_BEAT_SCHEDULE = {
@@ -263,6 +330,10 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'ml_models.tasks.cleanup_old_tasks',
         'schedule': 86400.0,
     },
+    'rebuild-risk-snapshots': {
+        'task': 'ml_models.tasks.rebuild_risk_snapshots',
+        'schedule': crontab(hour=3, minute=0),  # 매일 새벽 3시 (정리된 작업 반영)
+    },
 }
 
 LOGGING = {
@@ -317,4 +388,22 @@ LOGGING = {
     },
 }
 # gene model API
-GENE_INFERENCE_API = os.environ.get('GENE_INFERENCE_API', 'http://gene_inference:8002/predict_csv')
\ No newline at end of file
+GENE_INFERENCE_API = os.environ.get('GENE_INFERENCE_API', 'http://gene_inference:8002/predict_csv')
+# 합병증 예측 배치 처리
+ML_BATCH_MAX_SIZE = int(os.getenv('ML_BATCH_MAX_SIZE', '64'))  # 마이크로 배처가 한 번에 묶는 요청 수
+ML_BATCH_MAX_WAIT_MS = float(os.getenv('ML_BATCH_MAX_WAIT_MS', '5'))  # 단건 요청을 모으는 최대 대기 시간
+ML_BATCH_MAX_PATIENTS = int(os.getenv('ML_BATCH_MAX_PATIENTS', '500'))  # 배치 예측 API 1회 최대 환자 수
+# ML 모델 레지스트리
+ML_MODEL_DIR = os.getenv('ML_MODEL_DIR', str(BASE_DIR / 'ml_models' / 'saved_models'))
+ML_MODEL_MMAP = os.getenv('ML_MODEL_MMAP', 'True').lower() == 'true'  # 모델 배열을 mmap 으로 열어 워커끼리 공유
+ML_MODEL_MMAP_DIR = os.getenv('ML_MODEL_MMAP_DIR', str(BASE_DIR / 'cache' / 'ml_models'))
+ML_MODEL_RELOAD_INTERVAL = float(os.getenv('ML_MODEL_RELOAD_INTERVAL', '10'))  # manifest 변경 확인 주기(초)
+ML_MODEL_PRELOAD = os.getenv('ML_MODEL_PRELOAD', 'False').lower() == 'true'  # 앱 로딩 시(gunicorn --preload 마스터 등) 모델 예열
+# ML 예측 결과 캐시 (모델 버전 + 피처 벡터 해시 기준)
+ML_PREDICTION_CACHE_BACKEND = os.getenv('ML_PREDICTION_CACHE_BACKEND', 'memory')  # 'memory' 또는 'redis'
+ML_PREDICTION_CACHE_REDIS_URL = os.getenv('REDIS_URL', 'redis://redis_fallback:6379/0')
+ML_PREDICTION_CACHE_SIZE = int(os.getenv('ML_PREDICTION_CACHE_SIZE', '4096'))  # 프로세스 내 캐시 최대 항목 수
+ML_PREDICTION_CACHE_TTL = int(os.getenv('ML_PREDICTION_CACHE_TTL', '600'))  # 초, 0 이면 캐시 끔
+# 코호트(병동/재원 환자) 위험도 일괄 갱신
+ML_COHORT_CHUNK_SIZE = int(os.getenv('ML_COHORT_CHUNK_SIZE', '500'))  # 청크당 환자 수 (조회/예측/INSERT 단위)
+ML_COHORT_ACTIVE_HOURS = float(os.getenv('ML_COHORT_ACTIVE_HOURS', '72'))  # 이 시간 안에 바이탈이 기록된 환자를 재원 환자로 간주
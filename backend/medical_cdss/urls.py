@@ -23,6 +23,9 @@ urlpatterns = [
     path('api/vitals/', include('vitals.urls')),
     path('api/accounts/', include('accounts.urls')),
     path('api/labs/', include('labs.urls')), 
+
+    # Prometheus 스크랩 엔드포인트 (/metrics, monitoring/prometheus.yml 참고)
+    path('', include('django_prometheus.urls')),
     
 ]
 # 6월 16일 Fluter 관련
@@ -5,7 +5,8 @@ from .models import (
     ComplicationPrediction, 
     StrokeMortalityPrediction, 
     SOD2Assessment,
-    geneAIResult
+    geneAIResult,
+    LatestRiskSnapshot
 )
 
 @admin.register(PredictionTask)
@@ -193,6 +194,23 @@ class GeneAIResultAdmin(admin.ModelAdmin):
         })
     )
 
+@admin.register(LatestRiskSnapshot)
+class LatestRiskSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['patient_display', 'model_name', 'probability_percent', 'risk_level', 'model_version', 'predicted_at', 'refreshed_at']
+    list_filter = ['model_name', 'risk_level']
+    search_fields = ['patient__display_name']
+    readonly_fields = ['predicted_at', 'refreshed_at']
+    
+    def patient_display(self, obj):
+        return obj.patient.display_name if obj.patient else "N/A"
+    patient_display.short_description = "환자명"
+    patient_display.admin_order_field = 'patient__display_name'
+    
+    def probability_percent(self, obj):
+        return f"{obj.probability:.1%}"
+    probability_percent.short_description = "위험 확률"
+    probability_percent.admin_order_field = 'probability'
+
 # Django 관리자 사이트 커스터마이징
 admin.site.site_header = "StrokeCare+ ML 모델 관리"
 admin.site.site_title = "StrokeCare+ Admin"
@@ -4,4 +4,11 @@ class MlModelsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "ml_models"
 
+    def ready(self):
+        from django.conf import settings
+        if settings.ML_MODEL_PRELOAD:
+            # gunicorn --preload 처럼 마스터가 앱을 먼저 로드하는 경우 fork 전에 모델 예열
+            from .model_registry import model_registry
+            model_registry.warm()
+
 # 확인용 주석
\ No newline at end of file
@@ -0,0 +1,204 @@
+# backend/ml_models/artifact_store.py
+# 버전별 ML 아티팩트 저장소
+# ML_MODEL_DIR/
+#   manifest.json                         ← 모델별 활성 버전 + 버전별 파일 / SHA-256
+#   versions/<모델>/<버전>/<원래 파일 이름>  ← 게시(publish)된 아티팩트 (게시 후 수정하지 않음)
+#   <모델>_final_model.pkl ...             ← manifest 에 없는 모델은 예전처럼 평면 파일 사용 (legacy 버전)
+# 워커는 manifest.json 의 mtime/크기만 확인하다가 바뀌었을 때만 다시 읽습니다.
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows 개발 환경 (manifest 동시 수정 잠금 없이 동작)
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+VERSIONS_DIR = 'versions'
+ARTIFACT_KINDS = ('model', 'metadata', 'preprocessors')
+
+
+def artifact_filename(name: str, kind: str) -> str:
+    """저장 파일 이름 규칙 (사망률 모델만 예외)"""
+    if kind == 'model':
+        return 'stroke_mortality_30day.pkl' if name == 'stroke_mortality' else f'{name}_final_model.pkl'
+    return f'{name}_{kind}.pkl'
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactChecksumError(ValueError):
+    """manifest 의 SHA-256 과 파일 내용이 다름"""
+
+
+class ResolvedArtifacts(NamedTuple):
+    """모델 하나의 활성 버전과 종류별 (파일 경로, SHA-256) — legacy 평면 파일이면 version/sha256 이 None"""
+    name: str
+    version: Optional[str]
+    files: Dict[str, Tuple[str, Optional[str]]]
+
+
+class ArtifactStore:
+    """manifest.json 기반 버전 저장소 (읽기는 mtime 으로 캐시, 쓰기는 임시 파일 + os.replace 로 원자적)"""
+
+    def __init__(self, directory=None):
+        self._directory = directory
+        self._manifest: Dict[str, Any] = {'models': {}}
+        self._signature = None
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> str:
+        return str(self._directory or settings.ML_MODEL_DIR)
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST_NAME)
+
+    def signature(self) -> Optional[Tuple[int, int, int]]:
+        """manifest 변경 감지용 (mtime_ns, 크기, inode) — stat 한 번이라 자주 불러도 됨"""
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def manifest(self) -> Dict[str, Any]:
+        signature = self.signature()
+        with self._lock:
+            if signature != self._signature:
+                self._manifest = self._read_manifest() if signature else {'models': {}}
+                self._signature = signature
+            return self._manifest
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            # 쓰는 중인 파일은 os.replace 로만 바뀌므로 여기 오는 경우는 손으로 잘못 고친 경우
+            logger.error(f"❌ 모델 manifest 읽기 실패, 이전 내용 유지: {e}")
+            return self._manifest
+        manifest.setdefault('models', {})
+        return manifest
+
+    def version_dir(self, name: str, version: str) -> str:
+        return os.path.join(self.directory, VERSIONS_DIR, name, version)
+
+    def resolve(self, name: str) -> ResolvedArtifacts:
+        """모델의 활성 버전 파일 목록 (manifest 에 없으면 legacy 평면 파일)"""
+        entry = self.manifest()['models'].get(name) or {}
+        version = entry.get('active')
+        if version and version in entry.get('versions', {}):
+            files = {
+                kind: (os.path.join(self.version_dir(name, version), info['file']), info.get('sha256'))
+                for kind, info in entry['versions'][version].get('files', {}).items()
+            }
+            return ResolvedArtifacts(name, version, files)
+        files = {}
+        for kind in ARTIFACT_KINDS:
+            path = os.path.join(self.directory, artifact_filename(name, kind))
+            if os.path.exists(path):
+                files[kind] = (path, None)
+        return ResolvedArtifacts(name, None, files)
+
+    def versions(self, name: str) -> Dict[str, Any]:
+        return dict((self.manifest()['models'].get(name) or {}).get('versions', {}))
+
+    def active_version(self, name: str) -> Optional[str]:
+        return (self.manifest()['models'].get(name) or {}).get('active')
+
+    def publish(self, name: str, sources: Dict[str, str], version: Optional[str] = None,
+                activate: bool = True, note: str = '') -> str:
+        """아티팩트 파일들을 새 버전으로 복사하고 체크섬을 기록 (activate 면 활성 버전도 변경)"""
+        if 'model' not in sources:
+            raise ValueError("model 파일은 반드시 필요합니다.")
+        unknown = set(sources) - set(ARTIFACT_KINDS)
+        if unknown:
+            raise ValueError(f"알 수 없는 아티팩트 종류: {sorted(unknown)}")
+        version = version or datetime.now().strftime('%Y%m%d%H%M%S')
+        target_dir = self.version_dir(name, version)
+        if os.path.exists(target_dir):
+            raise ValueError(f"이미 존재하는 버전입니다: {name} {version}")
+
+        # 임시 디렉토리에 복사 후 한 번에 이동 (워커가 반쯤 복사된 버전을 보지 않도록)
+        tmp_dir = f"{target_dir}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(tmp_dir)
+        files = {}
+        try:
+            for kind, source in sources.items():
+                filename = artifact_filename(name, kind)
+                shutil.copyfile(source, os.path.join(tmp_dir, filename))
+                files[kind] = {
+                    'file': filename,
+                    'sha256': file_sha256(os.path.join(tmp_dir, filename)),
+                    'size': os.path.getsize(source),
+                }
+            os.replace(tmp_dir, target_dir)
+        finally:
+            if os.path.exists(tmp_dir):
+                shutil.rmtree(tmp_dir)
+
+        def update(manifest):
+            entry = manifest['models'].setdefault(name, {'active': None, 'versions': {}})
+            entry['versions'][version] = {'created_at': datetime.now().isoformat(), 'note': note, 'files': files}
+            if activate:
+                entry['active'] = version
+
+        self._update_manifest(update)
+        logger.info(f"📦 {name} 모델 버전 {version} 게시{' 및 활성화' if activate else ''}")
+        return version
+
+    def activate(self, name: str, version: str):
+        """활성 버전 변경 (롤백 포함)"""
+        def update(manifest):
+            entry = manifest['models'].get(name) or {}
+            if version not in entry.get('versions', {}):
+                raise ValueError(f"존재하지 않는 버전입니다: {name} {version}")
+            entry['active'] = version
+
+        self._update_manifest(update)
+        logger.info(f"🔄 {name} 활성 모델 버전 → {version}")
+
+    def _update_manifest(self, update):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, f"{MANIFEST_NAME}.lock"), 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # 다른 프로세스가 방금 바꿨을 수 있으므로 잠근 뒤 다시 읽음
+            if os.path.exists(self.manifest_path):
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                manifest.setdefault('models', {})
+            else:
+                manifest = {'models': {}}
+            update(manifest)
+            tmp_path = f"{self.manifest_path}.{uuid.uuid4().hex}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(manifest, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.manifest_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+
+# 싱글톤 인스턴스 생성
+artifact_store = ArtifactStore()
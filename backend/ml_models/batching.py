@@ -0,0 +1,110 @@
+# backend/ml_models/batching.py
+# 동시에 들어오는 단건 예측 요청을 몇 ms 동안 모아 한 번의 배치 예측으로 실행하는 마이크로 배처
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+
+from django.conf import settings
+
+from .ml_service import ml_service
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    submit(item) 으로 들어온 요청을 최대 max_wait_ms 동안 (또는 max_batch_size 개가 찰 때까지) 모아
+    batch_fn(items) 를 한 번 호출하고, 결과를 요청별 Future 에 나눠 줍니다.
+    batch_fn 은 입력과 같은 순서·길이의 결과 목록을 반환해야 하며, 배치 실행은 전용 스레드 1개에서만 일어납니다.
+    배치 전체가 실패하면 요청을 한 건씩 다시 실행해 실패 원인이 된 요청에만 예외를 돌려줍니다.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], max_batch_size: Optional[int] = None,
+                 max_wait_ms: Optional[float] = None, name: str = 'ml-batcher'):
+        self.batch_fn = batch_fn
+        self._max_batch_size = max_batch_size
+        self._max_wait_ms = max_wait_ms
+        self.name = name
+        self._queue: 'queue.Queue[tuple]' = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def max_batch_size(self) -> int:
+        return self._max_batch_size or settings.ML_BATCH_MAX_SIZE
+
+    @property
+    def max_wait(self) -> float:
+        max_wait_ms = self._max_wait_ms if self._max_wait_ms is not None else settings.ML_BATCH_MAX_WAIT_MS
+        return max_wait_ms / 1000
+
+    def submit(self, item: Any) -> Future:
+        """요청 1건을 대기열에 넣고 결과 Future 를 반환"""
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def predict(self, item: Any, timeout: Optional[float] = None) -> Any:
+        """submit 후 결과를 기다림 (배치 실행 중 예외는 그대로 올라옴)"""
+        return self.submit(item).result(timeout=timeout)
+
+    def _ensure_started(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _collect(self) -> List[tuple]:
+        """첫 요청이 올 때까지 기다린 뒤, max_wait 안에 도착한 요청을 max_batch_size 개까지 모음"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                # 대기 시간이 지나도 이미 쌓여 있는 요청은 함께 처리
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            futures = [future for _, future in batch]
+            try:
+                results = self._call(items)
+            except Exception as e:
+                if len(items) == 1:
+                    futures[0].set_exception(e)
+                    continue
+                # 잘못된 요청 하나 때문에 같은 배치의 다른 요청까지 실패하지 않도록 한 건씩 다시 실행
+                logger.warning(f"⚠️ {self.name} 배치 실행 실패 ({len(items)}건), 한 건씩 재실행: {e}")
+                for item, future in zip(items, futures):
+                    try:
+                        future.set_result(self._call([item])[0])
+                    except Exception as item_error:
+                        logger.error(f"❌ {self.name} 요청 실행 실패: {item_error}")
+                        future.set_exception(item_error)
+                continue
+            for future, result in zip(futures, results):
+                future.set_result(result)
+            if len(items) > 1:
+                logger.debug(f"{self.name}: {len(items)}건 묶어서 처리")
+
+    def _call(self, items: List[Any]) -> List[Any]:
+        results = self.batch_fn(items)
+        if len(results) != len(items):
+            raise RuntimeError(f"배치 결과 개수 불일치: 입력 {len(items)}, 결과 {len(results)}")
+        return results
+
+
+# 싱글톤 인스턴스 생성
+complication_batcher = MicroBatcher(ml_service.predict_complications_batch, name='complication-batcher')
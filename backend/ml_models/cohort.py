@@ -0,0 +1,198 @@
+# backend/ml_models/cohort.py
+# 병동/재원 환자 전체 합병증 위험도 일괄 갱신
+# 환자를 청크 단위로 스트리밍하고, 청크마다 최신 바이탈/뇌졸중 정보/합병증·투약 기록을 출처별 쿼리 한 번씩으로 모아
+# 화면(ComplicationPredictionView)과 같은 형태의 입력을 만든 뒤 배치 예측 → bulk_create 로 저장합니다.
+# 병동 정보는 이 DB 에 없으므로 병동은 환자 UUID 목록(OpenMRS 병동 명단)으로 지정하고,
+# "재원 환자" 는 최근 active_hours 시간 안에 바이탈이 기록된 환자로 봅니다.
+import logging
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, QuerySet, Subquery
+from django.utils import timezone
+
+from lab_results.models import Complications, StrokeInfo
+from openmrs_integration.models import OpenMRSPatient
+from vitals.models import VitalMeasurement, VitalSession
+
+from .ml_service import ml_service
+from .models import ComplicationPrediction, PredictionTask
+from .risk_snapshot import record_predictions
+
+logger = logging.getLogger(__name__)
+
+PATIENT_FIELDS = ('uuid', 'gender', 'birthdate', 'latest_vitals', 'latest_stroke_info', 'latest_complications')
+
+
+def _latest(model, field='patient'):
+    """환자별 가장 최근 기록의 pk (상관 서브쿼리)"""
+    return Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by('-recorded_at').values('pk')[:1]
+    )
+
+
+def cohort_queryset(patient_uuids: Optional[Sequence[str]] = None,
+                    active_hours: Optional[float] = None) -> QuerySet:
+    """
+    대상 환자 queryset (환자별 최신 기록 pk 를 함께 조회)
+    patient_uuids: 병동 명단 등 명시적 환자 목록 / active_hours: 최근 N시간 내 바이탈 기록 환자만
+    둘 다 없으면 전체 환자.
+    """
+    queryset = OpenMRSPatient.objects.all()
+    if patient_uuids is not None:
+        queryset = queryset.filter(uuid__in=list(patient_uuids))
+    if active_hours:
+        since = timezone.now() - timedelta(hours=active_hours)
+        queryset = queryset.filter(
+            pk__in=VitalSession.objects.filter(recorded_at__gte=since).values('patient_id')
+        )
+    return queryset.annotate(
+        latest_vitals=_latest(VitalSession),
+        latest_stroke_info=_latest(StrokeInfo),
+        latest_complications=_latest(Complications),
+    ).order_by('pk').values(*PATIENT_FIELDS)
+
+
+def iter_chunks(queryset: QuerySet, chunk_size: int) -> Iterator[List[Dict]]:
+    """서버 측 커서로 읽으면서 chunk_size 개씩 묶어 반환 (전체를 메모리에 올리지 않음)"""
+    chunk = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _number(value):
+    return float(value) if isinstance(value, Decimal) else value
+
+
+def _parse_bp(bp: str):
+    """'120/80' → (120, 80) (형식이 다르면 None)"""
+    try:
+        systolic, diastolic = str(bp).split('/', 1)
+        return int(systolic), int(diastolic)
+    except (TypeError, ValueError):
+        return None, None
+
+
+def _age(birthdate: Optional[date], today: date) -> Optional[int]:
+    if not birthdate:
+        return None
+    return today.year - birthdate.year - ((today.month, today.day) < (birthdate.month, birthdate.day))
+
+
+def assemble_patient_data(patients: List[Dict]) -> List[Dict]:
+    """
+    청크 환자들의 예측 입력 (predict_complications 요청 본문과 같은 형태)
+    출처별로 최신 기록 pk 목록에 대한 IN 쿼리 한 번씩만 실행합니다.
+    """
+    measurements = {
+        row['session_id']: row for row in VitalMeasurement.objects.filter(
+            session_id__in=[p['latest_vitals'] for p in patients if p['latest_vitals']]
+        ).values('session_id', 'bp', 'hr', 'rr', 'temp', 'spo2')
+    }
+    stroke_infos = dict(StrokeInfo.objects.filter(
+        pk__in=[p['latest_stroke_info'] for p in patients if p['latest_stroke_info']]
+    ).values_list('pk', 'stroke_info'))
+    complications = {
+        row['pk']: row for row in Complications.objects.filter(
+            pk__in=[p['latest_complications'] for p in patients if p['latest_complications']]
+        ).values('pk', 'complications', 'medications')
+    }
+
+    today = date.today()
+    patients_data = []
+    for patient in patients:
+        data = {
+            'patient_uuid': str(patient['uuid']),
+            'age': _age(patient['birthdate'], today) or 65,
+            'gender': (patient['gender'] or 'M')[:1].upper(),
+        }
+        vitals = measurements.get(patient['latest_vitals'])
+        if vitals:
+            systolic_bp, diastolic_bp = _parse_bp(vitals['bp'])
+            data['vital_signs'] = {
+                key: value for key, value in {
+                    'heart_rate': vitals['hr'],
+                    'systolic_bp': systolic_bp,
+                    'diastolic_bp': diastolic_bp,
+                    'temperature': _number(vitals['temp']),
+                    'respiratory_rate': vitals['rr'],
+                    'oxygen_saturation': vitals['spo2'],
+                }.items() if value is not None
+            }
+        stroke_info = stroke_infos.get(patient['latest_stroke_info']) or {}
+        if stroke_info.get('nihss_score') not in (None, ''):
+            try:
+                data['nihss_score'] = int(stroke_info['nihss_score'])
+            except (TypeError, ValueError):
+                pass
+        record = complications.get(patient['latest_complications'])
+        if record:
+            data['complications'] = record['complications'] or {}
+            data['medications'] = record['medications'] or {}
+        patients_data.append(data)
+    return patients_data
+
+
+def save_complication_results(patients_data: List[Dict], batch_results: List[Dict], requested_by=None) -> int:
+    """예측 결과를 PredictionTask / ComplicationPrediction 으로 일괄 저장 (청크 하나당 INSERT 두 번)"""
+    with transaction.atomic():
+        tasks = PredictionTask.objects.bulk_create([
+            PredictionTask(
+                patient_id=item['patient_uuid'],
+                task_type='COMPLICATION',
+                status='COMPLETED',
+                input_data=item,
+                predictions=results,
+                model_version=results.get('model_version', ''),
+                cache_hit=results.get('cache_hit', False),
+                processing_time=results.get('processing_time', 0),
+                completed_at=timezone.now(),
+                requested_by=requested_by
+            )
+            for item, results in zip(patients_data, batch_results)
+        ])
+        ComplicationPrediction.objects.bulk_create([
+            row for task, results in zip(tasks, batch_results)
+            for row in ComplicationPrediction.from_prediction_results(task, results)
+        ])
+        record_predictions(tasks)
+    return len(tasks)
+
+
+def score_cohort(patient_uuids: Optional[Sequence[str]] = None, active_hours: Optional[float] = None,
+                 chunk_size: Optional[int] = None, requested_by=None,
+                 progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    대상 환자 전체 합병증 위험도 갱신
+    청크마다 조회 4회 + 배치 예측 1회 + INSERT 2회 + 스냅샷 upsert 1회, 청크가 끝날 때마다 progress 콜백에 진행 상황을 넘깁니다.
+    """
+    start_time = time.time()
+    chunk_size = chunk_size or settings.ML_COHORT_CHUNK_SIZE
+    queryset = cohort_queryset(patient_uuids, active_hours)
+    total = queryset.count()
+    status = {'total': total, 'processed': 0, 'saved': 0, 'cache_hits': 0, 'elapsed': 0.0}
+    if progress:
+        progress(dict(status))
+
+    for chunk in iter_chunks(queryset, chunk_size):
+        patients_data = assemble_patient_data(chunk)
+        batch_results = ml_service.predict_complications_batch(patients_data)
+        status['saved'] += save_complication_results(patients_data, batch_results, requested_by)
+        status['processed'] += len(chunk)
+        status['cache_hits'] += sum(1 for results in batch_results if results.get('cache_hit'))
+        status['elapsed'] = round(time.time() - start_time, 3)
+        logger.info(f"🏥 코호트 위험도 갱신 진행: {status['processed']}/{total}명 ({status['elapsed']}s)")
+        if progress:
+            progress(dict(status))
+
+    logger.info(f"✅ 코호트 위험도 갱신 완료: {status['saved']}명, {status['elapsed']}s")
+    return status
@@ -0,0 +1,185 @@
+# backend/ml_models/feature_schema.py
+# 183개 피처 스키마 (feature_columns.json) + 선언형 매핑 규칙으로 float32 피처 행렬을 만드는 빌더
+# 요청마다 0으로 채운 DataFrame 을 만들고 .loc 로 한 칸씩 쓰던 방식 대신,
+# 컬럼 이름 → 인덱스를 한 번만 계산해 두고 미리 할당한 np.float32 행(배치면 행렬)에 바로 채웁니다.
+# ml_models/ml_service.py 와 patients/ml_models/ml_service.py 가 같은 스키마를 공유합니다.
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# 규칙의 default 로 쓰면 "값이 없으면 건너뜀" 을 뜻함
+MISSING = object()
+
+
+def flag(value) -> int:
+    """참/거짓 값 → 1/0"""
+    return 1 if value else 0
+
+
+class FeatureRule(NamedTuple):
+    """
+    입력 dict 의 값 하나를 피처 컬럼(들)에 채우는 규칙.
+    source 경로의 값(없으면 default)에 transform 을 적용해 columns 에 모두 쓰고,
+    값이 있었을 때만 constants 의 고정값도 함께 씁니다. 스키마에 없는 컬럼은 무시됩니다.
+    """
+    source: Tuple[str, ...]                  # 예: ('vital_signs', 'heart_rate')
+    columns: Tuple[str, ...]
+    transform: Optional[Callable[[Any], Any]] = None
+    default: Any = MISSING
+    constants: Optional[Dict[str, float]] = None
+
+
+class _CompiledRule(NamedTuple):
+    source: Tuple[str, ...]
+    columns: Union[int, np.ndarray]
+    transform: Optional[Callable[[Any], Any]]
+    default: Any
+    constant_columns: np.ndarray
+    constant_values: np.ndarray
+
+
+def _lookup(data: Dict, source: Tuple[str, ...]):
+    for key in source:
+        if not isinstance(data, dict) or key not in data:
+            return MISSING
+        data = data[key]
+    return data
+
+
+class FeatureSchema:
+    """피처 컬럼 순서와 이름 → 인덱스 매핑 (규칙은 컬럼 인덱스로 미리 컴파일해 둠)"""
+
+    def __init__(self, columns: Sequence[str], from_file: bool = False):
+        self.columns: List[str] = list(columns)
+        self.index: Dict[str, int] = {name: i for i, name in enumerate(self.columns)}
+        self.from_file = from_file
+        self._compiled: Dict[int, Tuple[Sequence[FeatureRule], List[_CompiledRule]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def __contains__(self, column: str) -> bool:
+        return column in self.index
+
+    def _positions(self, columns) -> np.ndarray:
+        return np.array([self.index[c] for c in columns if c in self.index], dtype=np.intp)
+
+    def compile(self, rules: Sequence[FeatureRule]) -> List[_CompiledRule]:
+        """규칙 목록을 컬럼 인덱스 기반으로 변환 (규칙 목록 객체별로 한 번만)"""
+        cached = self._compiled.get(id(rules))
+        if cached is not None and cached[0] is rules:
+            return cached[1]
+        compiled = []
+        for rule in rules:
+            constants = {c: v for c, v in (rule.constants or {}).items() if c in self.index}
+            columns = self._positions(rule.columns)
+            if not len(columns) and not constants:
+                continue
+            if len(columns) == 1:
+                # 컬럼 하나짜리 규칙은 정수 인덱스로 (팬시 인덱싱보다 빠름)
+                columns = int(columns[0])
+            compiled.append(_CompiledRule(
+                rule.source, columns, rule.transform, rule.default,
+                self._positions(constants), np.array(list(constants.values()), dtype=np.float32),
+            ))
+        # 규칙 목록 객체를 함께 들고 있어 id 가 재사용되어도 잘못된 결과를 돌려주지 않음
+        self._compiled[id(rules)] = (rules, compiled)
+        return compiled
+
+    def build(self, records: Sequence[Dict], rules: Sequence[FeatureRule]) -> np.ndarray:
+        """입력 dict 목록 → (len(records), 피처 수) float32 행렬 (규칙에 없는 값은 0)"""
+        features = np.zeros((len(records), len(self.columns)), dtype=np.float32)
+        compiled = self.compile(rules)
+        for row, record in enumerate(records):
+            values = features[row]
+            for rule in compiled:
+                value = _lookup(record, rule.source)
+                present = value is not MISSING
+                if not present:
+                    if rule.default is MISSING:
+                        continue
+                    value = rule.default
+                if rule.transform is not None:
+                    value = rule.transform(value)
+                values[rule.columns] = value
+                if present and len(rule.constant_columns):
+                    values[rule.constant_columns] = rule.constant_values
+        return features
+
+    def build_row(self, record: Dict, rules: Sequence[FeatureRule]) -> np.ndarray:
+        """단건 입력 → (피처 수,) float32 벡터"""
+        return self.build([record], rules)[0]
+
+    def frame(self, features: np.ndarray) -> pd.DataFrame:
+        """모델이 피처 이름을 확인하는 경우를 위한 DataFrame 래퍼 (복사 없음)"""
+        return pd.DataFrame(np.atleast_2d(features), columns=self.columns, copy=False)
+
+
+def default_feature_columns() -> List[str]:
+    """feature_columns.json 을 읽지 못했을 때 사용할 기본 183개 피처 컬럼"""
+    return [
+        # 기본 정보 (2개)
+        'GENDER', 'AGE',
+        # 활력징후 (49개)
+        'heart_rate_mean', 'heart_rate_std', 'heart_rate_min', 'heart_rate_max',
+        'heart_rate_count', 'heart_rate_first', 'heart_rate_last',
+        'systolic_bp_mean', 'systolic_bp_std', 'systolic_bp_min', 'systolic_bp_max',
+        'systolic_bp_count', 'systolic_bp_first', 'systolic_bp_last',
+        'diastolic_bp_mean', 'diastolic_bp_std', 'diastolic_bp_min', 'diastolic_bp_max',
+        'diastolic_bp_count', 'diastolic_bp_first', 'diastolic_bp_last',
+        'temperature_mean', 'temperature_std', 'temperature_min', 'temperature_max',
+        'temperature_count', 'temperature_first', 'temperature_last',
+        'respiratory_rate_mean', 'respiratory_rate_std', 'respiratory_rate_min',
+        'respiratory_rate_max', 'respiratory_rate_count', 'respiratory_rate_first', 'respiratory_rate_last',
+        'spo2_mean', 'spo2_std', 'spo2_min', 'spo2_max', 'spo2_count', 'spo2_first', 'spo2_last',
+        # 검사결과 (60개)
+        'wbc_mean', 'wbc_first', 'wbc_last', 'wbc_trend', 'wbc_count',
+        'hemoglobin_mean', 'hemoglobin_first', 'hemoglobin_last', 'hemoglobin_trend', 'hemoglobin_count',
+        'glucose_mean', 'glucose_first', 'glucose_last', 'glucose_trend', 'glucose_count',
+        'creatinine_mean', 'creatinine_first', 'creatinine_last', 'creatinine_trend', 'creatinine_count',
+        # 합병증 플래그 (6개)
+        'sepsis', 'respiratory_failure', 'deep_vein_thrombosis',
+        'pulmonary_embolism', 'urinary_tract_infection', 'gastrointestinal_bleeding',
+        # 약물 플래그 (7개)
+        'anticoagulant_flag', 'antiplatelet_flag', 'thrombolytic_flag',
+        'antihypertensive_flag', 'statin_flag', 'antibiotic_flag', 'vasopressor_flag',
+        # 뇌졸중 특화 피처 (30개)
+        'nihss_score', 'stroke_type_ischemic', 'stroke_type_hemorrhagic',
+        'reperfusion_treatment', 'reperfusion_time', 'hours_after_stroke',
+        'previous_stroke', 'diabetes', 'hypertension', 'atrial_fibrillation'
+    ] + [f'feature_{i}' for i in range(129)]  # 나머지 피처들
+
+
+def load_feature_schema() -> FeatureSchema:
+    """feature_columns.json 에서 스키마 로드 (실패하면 기본 컬럼)"""
+    json_path = os.path.join(settings.BASE_DIR, 'frontend', 'src', 'data', 'feature_columns.json')
+    try:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            columns = json.load(f)
+        logger.info(f"✅ 피처 컬럼 {len(columns)}개 로드 완료")
+        return FeatureSchema(columns, from_file=True)
+    except Exception as e:
+        logger.warning(f"⚠️ feature_columns.json 로드 실패, 기본값 사용: {e}")
+        return FeatureSchema(default_feature_columns())
+
+
+_schema: Optional[FeatureSchema] = None
+_schema_lock = threading.Lock()
+
+
+def get_feature_schema() -> FeatureSchema:
+    """프로세스 전체에서 공유하는 피처 스키마 (처음 호출할 때 한 번만 로드)"""
+    global _schema
+    if _schema is None:
+        with _schema_lock:
+            if _schema is None:
+                _schema = load_feature_schema()
+    return _schema
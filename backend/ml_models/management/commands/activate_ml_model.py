@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_models.artifact_store import artifact_store
+from ml_models.model_registry import MODEL_NAMES
+
+
+class Command(BaseCommand):
+    help = 'ML 모델의 활성 버전을 바꾸거나 (롤백 포함) 버전 목록을 출력합니다'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=MODEL_NAMES, help='모델 이름')
+        parser.add_argument('version', nargs='?', help='활성화할 버전 (생략하면 목록만 출력)')
+
+    def handle(self, *args, **options):
+        name = options['name']
+        if options['version']:
+            try:
+                artifact_store.activate(name, options['version'])
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(f"{name} 활성 버전 → {options['version']}"))
+            return
+
+        active = artifact_store.active_version(name)
+        versions = artifact_store.versions(name)
+        if not versions:
+            self.stdout.write(f"{name}: 게시된 버전이 없습니다 (legacy 평면 파일 사용)")
+            return
+        for version, info in sorted(versions.items()):
+            marker = '*' if version == active else ' '
+            files = ', '.join(f"{kind}:{f['sha256'][:8]}" for kind, f in info.get('files', {}).items())
+            self.stdout.write(f"{marker} {version}  {info.get('created_at', '')}  {files}  {info.get('note', '')}")
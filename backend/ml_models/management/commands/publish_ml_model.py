@@ -0,0 +1,38 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_models.artifact_store import ARTIFACT_KINDS, artifact_filename, artifact_store
+from ml_models.model_registry import MODEL_NAMES
+
+
+class Command(BaseCommand):
+    help = 'ML 모델 아티팩트를 새 버전으로 게시합니다 (실행 중인 워커는 manifest 변경을 보고 재시작 없이 교체)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=MODEL_NAMES, help='모델 이름')
+        parser.add_argument('--model', help='모델 pkl (기본값: ML_MODEL_DIR 의 기존 평면 파일)')
+        parser.add_argument('--metadata', help='메타데이터 pkl (기본값: 기존 평면 파일, 없으면 생략)')
+        parser.add_argument('--preprocessors', help='전처리기 pkl (기본값: 기존 평면 파일, 없으면 생략)')
+        parser.add_argument('--version', help='버전 이름 (기본값: 현재 시각 YYYYmmddHHMMSS)')
+        parser.add_argument('--note', default='', help='버전 설명')
+        parser.add_argument('--no-activate', action='store_true', help='게시만 하고 활성 버전은 바꾸지 않습니다')
+
+    def handle(self, *args, **options):
+        name = options['name']
+        sources = {}
+        for kind in ARTIFACT_KINDS:
+            path = options[kind] or os.path.join(artifact_store.directory, artifact_filename(name, kind))
+            if os.path.exists(path):
+                sources[kind] = path
+            elif options[kind]:
+                raise CommandError(f"파일이 없습니다: {path}")
+        try:
+            version = artifact_store.publish(
+                name, sources, version=options['version'], activate=not options['no_activate'], note=options['note']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"{name} 버전 {version} 게시 ({', '.join(sources)})" + ('' if options['no_activate'] else ' - 활성화됨')
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from ml_models.model_registry import MODEL_NAMES, model_registry
+
+
+class Command(BaseCommand):
+    help = 'ML 모델 레지스트리를 예열하고 모델별 로드 시간 / 상주 메모리 증가량을 출력합니다'
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', default=list(MODEL_NAMES), help='예열할 모델 (기본값: 전체)')
+
+    def handle(self, *args, **options):
+        report = model_registry.warm(options['models'])
+        if not report:
+            self.stdout.write(self.style.WARNING(f"로드된 아티팩트가 없습니다 ({model_registry.directory})"))
+            return
+        self.stdout.write(f"{'모델':<22}{'버전':<18}{'종류':<15}{'로드(s)':>9}{'RSS 증가(MB)':>14}{'파일(MB)':>10}  mmap")
+        for name, kinds in report.items():
+            for kind, stat in kinds.items():
+                resident = stat['resident_bytes']
+                resident = f"{resident / 1024 ** 2:.1f}" if resident is not None else '-'
+                self.stdout.write(
+                    f"{name:<22}{stat['version'] or '-':<18}{kind:<15}{stat['load_seconds']:>9.3f}{resident:>14}"
+                    f"{stat['file_bytes'] / 1024 ** 2:>10.1f}  {'Y' if stat['mmap'] else 'N'}"
+                )
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_models', '0003_alter_sod2assessment_stroke_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='predictiontask',
+            name='cache_hit',
+            field=models.BooleanField(default=False, verbose_name='캐시 결과 여부'),
+        ),
+    ]
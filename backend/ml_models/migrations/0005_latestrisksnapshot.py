@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('openmrs_integration', '0001_initial'),
+        ('ml_models', '0004_predictiontask_cache_hit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestRiskSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(choices=[('pneumonia', '폐렴'), ('acute_kidney_injury', '급성 신장 손상'), ('heart_failure', '심부전'), ('stroke_mortality', '30일 사망률')], max_length=30, verbose_name='모델')),
+                ('probability', models.FloatField(verbose_name='위험 확률')),
+                ('risk_level', models.CharField(max_length=20, verbose_name='위험도')),
+                ('model_version', models.CharField(blank=True, max_length=50, verbose_name='모델 버전')),
+                ('result', models.JSONField(verbose_name='예측 결과')),
+                ('predicted_at', models.DateTimeField(verbose_name='예측 시각')),
+                ('refreshed_at', models.DateTimeField(verbose_name='스냅샷 갱신 시각')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='openmrs_integration.openmrspatient', verbose_name='환자')),
+                ('task', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='ml_models.predictiontask', verbose_name='예측 작업')),
+            ],
+            options={
+                'verbose_name': '최신 위험도 스냅샷',
+                'verbose_name_plural': '최신 위험도 스냅샷',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='latestrisksnapshot',
+            constraint=models.UniqueConstraint(fields=('patient', 'model_name'), name='unique_latest_risk_per_model'),
+        ),
+    ]
@@ -1,289 +1,214 @@
 # backend/ml_models/ml_service.py - 실제 모델 강제 실행
-import os
-import joblib
-import pickle
 import numpy as np
 import pandas as pd
-from django.conf import settings
 import logging
 from typing import Dict, List, Any
 import time
 from datetime import datetime
-import json
+
+from .feature_schema import FeatureRule, flag, get_feature_schema
+from .model_registry import model_registry
+from .prediction_cache import prediction_cache
 
 logger = logging.getLogger(__name__)
 
+COMPLICATION_TYPES = ['pneumonia', 'acute_kidney_injury', 'heart_failure']
+
+# 위험도 구간 (확률 < 0.2 → LOW, < 0.5 → MEDIUM, < 0.8 → HIGH, 나머지 CRITICAL)
+RISK_LEVEL_BINS = np.array([0.2, 0.5, 0.8])
+RISK_LEVEL_LABELS = np.array(['LOW', 'MEDIUM', 'HIGH', 'CRITICAL'])
+
+# 입력 데이터 → 피처 매핑 규칙 (값이 하나뿐인 활력징후는 평균/처음/마지막에 같은 값)
+COMPLICATION_FEATURE_RULES = (
+    # 기본 정보
+    FeatureRule(('gender',), ('GENDER',), lambda gender: 1 if gender == 'M' else 0, default=None),
+    FeatureRule(('age',), ('AGE',), default=65),
+    # 활력징후
+    FeatureRule(('vital_signs', 'heart_rate'), ('heart_rate_mean', 'heart_rate_first', 'heart_rate_last'),
+                constants={'heart_rate_std': 10, 'heart_rate_count': 1}),
+    FeatureRule(('vital_signs', 'systolic_bp'), ('systolic_bp_mean', 'systolic_bp_first', 'systolic_bp_last')),
+    # NIHSS 점수
+    FeatureRule(('nihss_score',), ('nihss_score',), default=0),
+    # 합병증 플래그
+    *(FeatureRule(('complications', comp), (comp,), flag, default=False)
+      for comp in ('sepsis', 'respiratory_failure', 'deep_vein_thrombosis')),
+    # 약물 플래그
+    *(FeatureRule(('medications', med), (med,), flag, default=False)
+      for med in ('anticoagulant_flag', 'antiplatelet_flag', 'thrombolytic_flag')),
+)
+
+
 class MLModelService:
     """머신러닝 모델 서비스 - 실제 모델 강제 실행"""
     
     def __init__(self):
-        self.models: Dict[str, Any] = {}
-        self.preprocessors: Dict[str, Any] = {}
-        self.metadata: Dict[str, Any] = {}
-        self.model_path = os.path.join(settings.BASE_DIR, 'ml_models', 'saved_models')
+        # 모델/메타데이터/전처리기는 공용 레지스트리에서 처음 쓰일 때 로드
+        self.models = model_registry.models
+        self.preprocessors = model_registry.preprocessors
+        self.metadata = model_registry.metadata
+        self.model_path = model_registry.directory
         
         # ✅ 무조건 models_loaded = True (fallback 방지)
         self.models_loaded = True
         
-        # 183개 피처 컬럼 로드
-        self.feature_columns = self._load_feature_columns()
-        
-        # 모델 로드 시도 (실패해도 계속 진행)
-        self._load_models()
+        # 183개 피처 스키마 (patients 서비스와 공유)
+        self.feature_schema = get_feature_schema()
+        self.feature_columns = self.feature_schema.columns
         
         logger.info("✅ ML 모델 서비스 초기화 완료 - 실제 모델 강제 활성화")
 
-    def _load_feature_columns(self) -> List[str]:
-        """feature_columns.json에서 183개 피처 목록 로드"""
-        json_path = os.path.join(settings.BASE_DIR, 'frontend', 'src', 'data', 'feature_columns.json')
-        try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                columns = json.load(f)
-            logger.info(f"✅ 피처 컬럼 {len(columns)}개 로드 완료")
-            return columns
-        except Exception as e:
-            logger.warning(f"⚠️ feature_columns.json 로드 실패, 기본값 사용: {e}")
-            return self._get_default_feature_columns()
-
-    def _get_default_feature_columns(self) -> List[str]:
-        """기본 183개 피처 컬럼"""
-        return [
-            # 기본 정보 (2개)
-            'GENDER', 'AGE',
-            # 활력징후 (49개)
-            'heart_rate_mean', 'heart_rate_std', 'heart_rate_min', 'heart_rate_max', 
-            'heart_rate_count', 'heart_rate_first', 'heart_rate_last',
-            'systolic_bp_mean', 'systolic_bp_std', 'systolic_bp_min', 'systolic_bp_max', 
-            'systolic_bp_count', 'systolic_bp_first', 'systolic_bp_last',
-            'diastolic_bp_mean', 'diastolic_bp_std', 'diastolic_bp_min', 'diastolic_bp_max', 
-            'diastolic_bp_count', 'diastolic_bp_first', 'diastolic_bp_last',
-            'temperature_mean', 'temperature_std', 'temperature_min', 'temperature_max', 
-            'temperature_count', 'temperature_first', 'temperature_last',
-            'respiratory_rate_mean', 'respiratory_rate_std', 'respiratory_rate_min', 
-            'respiratory_rate_max', 'respiratory_rate_count', 'respiratory_rate_first', 'respiratory_rate_last',
-            'spo2_mean', 'spo2_std', 'spo2_min', 'spo2_max', 'spo2_count', 'spo2_first', 'spo2_last',
-            # 검사결과 (60개)
-            'wbc_mean', 'wbc_first', 'wbc_last', 'wbc_trend', 'wbc_count',
-            'hemoglobin_mean', 'hemoglobin_first', 'hemoglobin_last', 'hemoglobin_trend', 'hemoglobin_count',
-            'glucose_mean', 'glucose_first', 'glucose_last', 'glucose_trend', 'glucose_count',
-            'creatinine_mean', 'creatinine_first', 'creatinine_last', 'creatinine_trend', 'creatinine_count',
-            # 합병증 플래그 (6개)
-            'sepsis', 'respiratory_failure', 'deep_vein_thrombosis', 
-            'pulmonary_embolism', 'urinary_tract_infection', 'gastrointestinal_bleeding',
-            # 약물 플래그 (7개)
-            'anticoagulant_flag', 'antiplatelet_flag', 'thrombolytic_flag',
-            'antihypertensive_flag', 'statin_flag', 'antibiotic_flag', 'vasopressor_flag',
-            # 뇌졸중 특화 피처 (30개)
-            'nihss_score', 'stroke_type_ischemic', 'stroke_type_hemorrhagic',
-            'reperfusion_treatment', 'reperfusion_time', 'hours_after_stroke',
-            'previous_stroke', 'diabetes', 'hypertension', 'atrial_fibrillation'
-        ] + [f'feature_{i}' for i in range(129)]  # 나머지 피처들
-
-    def _load_models(self):
-        """모델들 로드 시도 (실패해도 계속 진행)"""
-        if not os.path.exists(self.model_path):
-            logger.warning(f"⚠️ 모델 디렉토리가 없습니다: {self.model_path}")
-            return
-
-        # 합병증 모델들 로드 시도
-        self._load_complication_models()
-        
-        # 사망률 모델 로드 시도
-        self._load_mortality_model()
-        
-        logger.info("🔧 모델 로드 시도 완료 (실패해도 강제 실행)")
-
-    def _load_complication_models(self):
-        """합병증 예측 모델들 로드 시도"""
-        complications = ['pneumonia', 'acute_kidney_injury', 'heart_failure']
-        
-        for comp in complications:
-            try:
-                # 모델 파일 로드 (joblib 우선, pickle 백업)
-                model_path = os.path.join(self.model_path, f'{comp}_final_model.pkl')
-                if os.path.exists(model_path):
-                    try:
-                        self.models[comp] = joblib.load(model_path)
-                        logger.info(f"✅ {comp} 모델 joblib 로드 성공")
-                    except Exception:
-                        with open(model_path, 'rb') as f:
-                            self.models[comp] = pickle.load(f)
-                        logger.info(f"✅ {comp} 모델 pickle 로드 성공")
-                
-                # 메타데이터 로드
-                metadata_path = os.path.join(self.model_path, f'{comp}_metadata.pkl')
-                if os.path.exists(metadata_path):
-                    try:
-                        self.metadata[comp] = joblib.load(metadata_path)
-                    except:
-                        with open(metadata_path, 'rb') as f:
-                            self.metadata[comp] = pickle.load(f)
-                
-                # 전처리기 로드
-                preprocessor_path = os.path.join(self.model_path, f'{comp}_preprocessors.pkl')
-                if os.path.exists(preprocessor_path):
-                    try:
-                        self.preprocessors[comp] = joblib.load(preprocessor_path)
-                    except:
-                        with open(preprocessor_path, 'rb') as f:
-                            self.preprocessors[comp] = pickle.load(f)
-                    
-            except Exception as e:
-                logger.warning(f"⚠️ {comp} 모델 로드 실패 (계속 진행): {e}")
-
-    def _load_mortality_model(self):
-        """사망률 예측 모델 로드 시도"""
-        try:
-            model_path = os.path.join(self.model_path, 'stroke_mortality_30day.pkl')
-            if os.path.exists(model_path):
-                try:
-                    self.models['stroke_mortality'] = joblib.load(model_path)
-                    logger.info("✅ 사망률 모델 joblib 로드 성공")
-                except:
-                    with open(model_path, 'rb') as f:
-                        self.models['stroke_mortality'] = pickle.load(f)
-                    logger.info("✅ 사망률 모델 pickle 로드 성공")
-        except Exception as e:
-            logger.warning(f"⚠️ 사망률 모델 로드 실패 (계속 진행): {e}")
-
     def predict_complications(self, patient_data: Dict) -> Dict[str, Any]:
-        """합병증 예측 - ✅ 무조건 실제 모델 실행 시도"""
+        """합병증 예측 - ✅ 무조건 실제 모델 실행 시도 (환자 1명짜리 배치)"""
+        return self.predict_complications_batch([patient_data])[0]
+
+    def predict_complications_batch(self, patients: List[Dict]) -> List[Dict[str, Any]]:
+        """
+        여러 환자 합병증 예측 - 피처 행렬을 한 번 만들고 모델별 전처리/predict_proba 도 배치 전체에 한 번만 실행.
+        반환값은 입력 순서대로 predict_complications 와 같은 형태의 결과 목록입니다.
+        """
         start_time = time.time()
+        if not patients:
+            return []
         
         try:
-            # 입력 데이터를 183개 피처로 변환
-            features_df = self._prepare_features_for_prediction(patient_data)
+            # 입력 데이터를 (환자 수, 183) float32 피처 행렬로 변환
+            features = self.build_feature_matrix(patients)
             
-            results = {}
-            complications = ['pneumonia', 'acute_kidney_injury', 'heart_failure']
+            # 배치 하나는 합병증별로 같은 버전의 모델 묶음만 사용 (도중에 교체되어도 섞이지 않음)
+            bundles = {comp: model_registry.bundle(comp) for comp in COMPLICATION_TYPES}
+            # PredictionTask.model_version 용 요약 (합병증 순서대로 모델 버전, 모델이 없으면 '-')
+            versions = ','.join(bundle.version if bundle.model is not None else '-' for bundle in bundles.values())
+            model_version = versions[:50]
             
-            for comp in complications:
-                if comp in self.models:
-                    # ✅ 실제 모델로 예측 시도
-                    try:
-                        result = self._predict_single_complication(features_df, comp)
-                        result['model_used'] = True
-                        result['fallback_data'] = False
-                        logger.info(f"✅ {comp} 실제 모델 예측 성공: {result['probability']:.3f}")
-                    except Exception as e:
-                        logger.error(f"❌ {comp} 모델 예측 실패: {e}")
-                        result = self._get_realistic_fallback(comp, patient_data)
-                        result['model_used'] = False
-                        result['fallback_data'] = True
-                else:
-                    # 모델이 없으면 현실적인 fallback
-                    logger.warning(f"⚠️ {comp} 모델 없음, fallback 사용")
-                    result = self._get_realistic_fallback(comp, patient_data)
-                    result['model_used'] = False
-                    result['fallback_data'] = True
-                
-                results[comp] = result
+            # 같은 모델 버전 + 같은 피처 벡터면 캐시된 결과 사용, 나머지 환자만 모델 실행
+            cache_keys = prediction_cache.keys('complications', versions, features)
+            results = prediction_cache.get_many('complications', cache_keys)
+            misses = [i for i, result in enumerate(results) if result is None]
+            if len(misses) < len(patients):
+                logger.info(f"⚡ 합병증 예측 캐시 적중: {len(patients) - len(misses)}/{len(patients)}명")
             
-            results['processing_time'] = time.time() - start_time
-            results['timestamp'] = datetime.now().isoformat()
-            results['service_status'] = 'FORCE_ENABLED'
+            if misses:
+                computed, cacheable = self._predict_complications_uncached(
+                    features[misses], [patients[i] for i in misses], bundles
+                )
+                for i, patient_results in zip(misses, computed):
+                    patient_results['model_version'] = model_version
+                    results[i] = patient_results
+                # 모델 예외로 fallback 된 결과는 일시적일 수 있으므로 캐시하지 않음
+                if cacheable:
+                    prediction_cache.set_many({cache_keys[i]: results[i] for i in misses})
+            
+            # 배치 처리 시간은 환자 수로 나눠 환자별 결과에 기록
+            processing_time = (time.time() - start_time) / len(patients)
+            timestamp = datetime.now().isoformat()
+            missed = set(misses)
+            for i, patient_results in enumerate(results):
+                patient_results['processing_time'] = processing_time
+                patient_results['timestamp'] = timestamp
+                patient_results['service_status'] = 'FORCE_ENABLED'
+                patient_results['cache_hit'] = i not in missed
             
             return results
             
         except Exception as e:
             logger.error(f"❌ 합병증 예측 중 심각한 오류: {e}")
-            return self._get_emergency_fallback(patient_data)
+            return [self._get_emergency_fallback(patient_data) for patient_data in patients]
+
+    def _predict_complications_uncached(self, features: np.ndarray, patients: List[Dict],
+                                        bundles: Dict[str, Any]):
+        """합병증별 모델 배치 실행 → (환자별 결과 목록, 캐시 가능 여부)"""
+        results = [{} for _ in patients]
+        cacheable = True
+        for comp in COMPLICATION_TYPES:
+            bundle = bundles[comp]
+            if bundle.model is not None:
+                # ✅ 실제 모델로 배치 예측 시도
+                try:
+                    comp_results = self._predict_complication_batch(features, comp, bundle)
+                    for result in comp_results:
+                        result['model_used'] = True
+                        result['fallback_data'] = False
+                    logger.info(f"✅ {comp} 실제 모델 배치 예측 성공: {len(patients)}명")
+                except Exception as e:
+                    logger.error(f"❌ {comp} 모델 예측 실패: {e}")
+                    comp_results = self._fallback_batch(comp, patients)
+                    cacheable = False
+            else:
+                # 모델이 없으면 현실적인 fallback
+                logger.warning(f"⚠️ {comp} 모델 없음, fallback 사용")
+                comp_results = self._fallback_batch(comp, patients)
+            
+            for patient_results, result in zip(results, comp_results):
+                patient_results[comp] = result
+        return results, cacheable
+
+    def _fallback_batch(self, complication: str, patients: List[Dict]) -> List[Dict]:
+        results = []
+        for patient_data in patients:
+            result = self._get_realistic_fallback(complication, patient_data)
+            result['model_used'] = False
+            result['fallback_data'] = True
+            results.append(result)
+        return results
+
+    def build_feature_matrix(self, patients: List[Dict]) -> np.ndarray:
+        """입력 데이터 목록을 (환자 수, 183) float32 피처 행렬로 변환 (없는 값은 0)"""
+        return self.feature_schema.build(patients, COMPLICATION_FEATURE_RULES)
 
     def _prepare_features_for_prediction(self, patient_data: Dict) -> pd.DataFrame:
-        """입력 데이터를 183개 피처로 변환"""
-        # 183개 피처로 0으로 초기화된 DataFrame 생성
-        features = pd.DataFrame(0.0, index=[0], columns=self.feature_columns)
-        
-        # 기본 정보 매핑
-        features.loc[0, 'GENDER'] = 1 if patient_data.get('gender') == 'M' else 0
-        features.loc[0, 'AGE'] = patient_data.get('age', 65)
-        
-        # 활력징후 매핑
-        vital_signs = patient_data.get('vital_signs', {})
-        if 'heart_rate' in vital_signs:
-            hr = vital_signs['heart_rate']
-            if 'heart_rate_mean' in features.columns:
-                features.loc[0, 'heart_rate_mean'] = hr
-                features.loc[0, 'heart_rate_first'] = hr
-                features.loc[0, 'heart_rate_last'] = hr
-                features.loc[0, 'heart_rate_std'] = 10
-                features.loc[0, 'heart_rate_count'] = 1
-        
-        # 혈압 매핑
-        if 'systolic_bp' in vital_signs and 'systolic_bp_mean' in features.columns:
-            sbp = vital_signs['systolic_bp']
-            features.loc[0, 'systolic_bp_mean'] = sbp
-            features.loc[0, 'systolic_bp_first'] = sbp
-            features.loc[0, 'systolic_bp_last'] = sbp
-        
-        # NIHSS 점수
-        if 'nihss_score' in features.columns:
-            features.loc[0, 'nihss_score'] = patient_data.get('nihss_score', 0)
-        
-        # 합병증 플래그
-        complications = patient_data.get('complications', {})
-        for comp in ['sepsis', 'respiratory_failure', 'deep_vein_thrombosis']:
-            if comp in features.columns:
-                features.loc[0, comp] = 1 if complications.get(comp, False) else 0
-        
-        # 약물 플래그
-        medications = patient_data.get('medications', {})
-        for med in ['anticoagulant_flag', 'antiplatelet_flag', 'thrombolytic_flag']:
-            if med in features.columns:
-                features.loc[0, med] = 1 if medications.get(med, False) else 0
-        
-        return features
+        """입력 데이터를 183개 피처로 변환 (1행 DataFrame)"""
+        return self.feature_schema.frame(self.build_feature_matrix([patient_data]))
 
-    def _predict_single_complication(self, features_df: pd.DataFrame, complication: str) -> Dict:
-        """단일 합병증 예측 (실제 모델 사용)"""
-        model = self.models[complication]
-        
-        # 전처리기 적용 (있으면)
-        processed_features = features_df.copy()
-        if complication in self.preprocessors:
-            preprocessor = self.preprocessors[complication]
-            if 'scaler' in preprocessor:
-                X_scaled = preprocessor['scaler'].transform(features_df)
-                processed_features = pd.DataFrame(X_scaled, columns=features_df.columns)
-        
-        # 예측 실행
+    def _predict_probabilities(self, model, features: pd.DataFrame) -> np.ndarray:
+        """양성 클래스 확률 벡터 (predict_proba 가 없으면 decision_function 에 시그모이드)"""
         if hasattr(model, 'predict_proba'):
-            probability = model.predict_proba(processed_features)[0, 1]
-        else:
-            decision_score = model.decision_function(processed_features)[0]
-            probability = 1 / (1 + np.exp(-decision_score))
-        
-        # 위험도 분류
-        if probability < 0.2:
-            risk_level = 'LOW'
-        elif probability < 0.5:
-            risk_level = 'MEDIUM'
-        elif probability < 0.8:
-            risk_level = 'HIGH'
-        else:
-            risk_level = 'CRITICAL'
-        
-        # 메타데이터에서 성능 정보
-        metadata = self.metadata.get(complication, {})
-        
-        # 임상 권장사항
-        clinical_recommendations = self._generate_clinical_recommendations(complication, probability, risk_level)
-        
-        return {
-            'probability': float(probability),
-            'risk_level': risk_level,
-            'threshold': 0.5,
-            'model_performance': {
-                'auc': float(metadata.get('auc', 0.85)),
-                'precision': float(metadata.get('precision', 0.80)),
-                'recall': float(metadata.get('recall', 0.75)),
-                'f1': float(metadata.get('f1', 0.77)),
-                'type': 'ensemble',
-                'strategy': 'supervised'
-            },
-            'confidence': float(max(probability, 1 - probability)),
-            'clinical_recommendations': clinical_recommendations
+            return model.predict_proba(features)[:, 1]
+        return 1 / (1 + np.exp(-model.decision_function(features)))
+
+    def _predict_complication_batch(self, features: np.ndarray, complication: str, bundle=None) -> List[Dict]:
+        """단일 합병증 배치 예측 (실제 모델 사용)"""
+        # 배치 하나는 같은 버전의 모델/전처리기/메타데이터 묶음으로만 예측 (도중에 교체되어도 섞이지 않음)
+        bundle = bundle or model_registry.bundle(complication)
+        model = bundle.model
+        
+        # 모델이 학습 때 본 피처 이름을 유지하도록 배치당 DataFrame 한 번만 생성
+        features_df = self.feature_schema.frame(features)
+        
+        # 전처리기 적용 (있으면) - 배치 전체에 한 번
+        preprocessor = bundle.preprocessors
+        if preprocessor and 'scaler' in preprocessor:
+            X_scaled = preprocessor['scaler'].transform(features_df)
+            features_df = self.feature_schema.frame(X_scaled)
+        
+        # 예측 실행 + 위험도 분류 (벡터 연산)
+        probabilities = self._predict_probabilities(model, features_df).astype(float)
+        risk_levels = RISK_LEVEL_LABELS[np.searchsorted(RISK_LEVEL_BINS, probabilities, side='right')]
+        confidences = np.maximum(probabilities, 1 - probabilities)
+        
+        # 메타데이터에서 성능 정보 (배치 공통)
+        metadata = bundle.metadata or {}
+        model_performance = {
+            'auc': float(metadata.get('auc', 0.85)),
+            'precision': float(metadata.get('precision', 0.80)),
+            'recall': float(metadata.get('recall', 0.75)),
+            'f1': float(metadata.get('f1', 0.77)),
+            'type': 'ensemble',
+            'strategy': 'supervised'
         }
+        
+        results = []
+        for probability, risk_level, confidence in zip(probabilities.tolist(), risk_levels.tolist(), confidences.tolist()):
+            results.append({
+                'probability': probability,
+                'risk_level': risk_level,
+                'threshold': 0.5,
+                'model_performance': dict(model_performance),
+                'confidence': confidence,
+                'model_version': bundle.version,
+                # 임상 권장사항
+                'clinical_recommendations': self._generate_clinical_recommendations(complication, probability, risk_level)
+            })
+        return results
 
     def _generate_clinical_recommendations(self, complication: str, probability: float, risk_level: str) -> List[str]:
         """임상 권장사항 생성"""
@@ -384,10 +309,9 @@ class MLModelService:
 
     def _get_emergency_fallback(self, patient_data: Dict) -> Dict:
         """응급 fallback (심각한 오류 시)"""
-        complications = ['pneumonia', 'acute_kidney_injury', 'heart_failure']
         results = {}
         
-        for comp in complications:
+        for comp in COMPLICATION_TYPES:
             results[comp] = self._get_realistic_fallback(comp, patient_data)
         
         results['processing_time'] = 0.1
@@ -402,14 +326,23 @@ class MLModelService:
         start_time = time.time()
         
         try:
-            features_df = self._prepare_features_for_prediction(patient_data)
+            features = self.build_feature_matrix([patient_data])
+            bundle = model_registry.bundle('stroke_mortality')
+            version = bundle.version if bundle.model is not None else '-'
             
-            if 'stroke_mortality' in self.models:
+            # 같은 모델 버전 + 같은 피처 벡터면 캐시된 결과 사용
+            cache_key = prediction_cache.keys('mortality', version, features)[0]
+            result = prediction_cache.get_many('mortality', [cache_key])[0]
+            cache_hit = result is not None
+            if cache_hit:
+                logger.info(f"⚡ 사망률 예측 캐시 적중: {result['mortality_30_day']:.3f}")
+            elif bundle.model is not None:
                 try:
-                    result = self._predict_mortality_with_model(features_df, patient_data)
+                    result = self._predict_mortality_with_model(self.feature_schema.frame(features), patient_data, bundle)
                     result['model_used'] = True
                     result['fallback_data'] = False
                     logger.info(f"✅ 사망률 실제 모델 예측 성공: {result['mortality_30_day']:.3f}")
+                    prediction_cache.set_many({cache_key: result})
                 except Exception as e:
                     logger.error(f"❌ 사망률 모델 예측 실패: {e}")
                     result = self._get_mortality_fallback(patient_data)
@@ -420,9 +353,11 @@ class MLModelService:
                 result = self._get_mortality_fallback(patient_data)
                 result['model_used'] = False
                 result['fallback_data'] = True
+                prediction_cache.set_many({cache_key: result})
             
             result['processing_time'] = time.time() - start_time
             result['timestamp'] = datetime.now().isoformat()
+            result['cache_hit'] = cache_hit
             
             return result
             
@@ -430,15 +365,12 @@ class MLModelService:
             logger.error(f"❌ 사망률 예측 중 심각한 오류: {e}")
             return self._get_mortality_fallback(patient_data)
 
-    def _predict_mortality_with_model(self, features_df: pd.DataFrame, patient_data: Dict) -> Dict:
+    def _predict_mortality_with_model(self, features_df: pd.DataFrame, patient_data: Dict, bundle=None) -> Dict:
         """실제 사망률 모델 예측"""
-        model = self.models['stroke_mortality']
+        bundle = bundle or model_registry.bundle('stroke_mortality')
+        model = bundle.model
         
-        if hasattr(model, 'predict_proba'):
-            mortality_prob = model.predict_proba(features_df)[0, 1]
-        else:
-            decision_score = model.decision_function(features_df)[0]
-            mortality_prob = 1 / (1 + np.exp(-decision_score))
+        mortality_prob = self._predict_probabilities(model, features_df)[0]
         
         risk_level = 'CRITICAL' if mortality_prob > 0.6 else 'HIGH' if mortality_prob > 0.3 else 'MODERATE' if mortality_prob > 0.1 else 'LOW'
         
@@ -449,6 +381,7 @@ class MLModelService:
             'risk_factors': ["실제 모델 기반 위험인자"],
             'protective_factors': ["실제 모델 기반 보호인자"],
             'clinical_recommendations': ["실제 모델 기반 권장사항"],
+            'model_version': bundle.version,
             'model_performance': {
                 'auc': 0.87,
                 'sensitivity': 0.83,
@@ -0,0 +1,323 @@
+# backend/ml_models/model_registry.py
+# 저장된 ML 모델 / 메타데이터 / 전처리기를 프로세스당 한 번, 처음 쓰일 때 로드하는 공용 레지스트리
+# - ml_models/ml_service.py 와 patients/ml_models/ml_service.py 가 같은 레지스트리를 공유 (모델을 두 번 올리지 않음)
+# - 모델은 joblib 형식으로 한 번 다시 저장해 두고 mmap_mode='r' 로 열어, 트리 배열 같은 큰 numpy 데이터가
+#   파일 페이지 캐시에 올라가 fork 된 워커(및 다른 프로세스)끼리 같은 메모리를 공유합니다.
+# - warm() 은 Celery 워커 마스터(worker_init) 또는 ML_MODEL_PRELOAD 설정 시 앱 로딩 시점에 fork 전에 호출됩니다.
+# - 아티팩트는 artifact_store 의 활성 버전에서 읽고, manifest 가 바뀌면 백그라운드 스레드가 새 버전을 로드해
+#   모델 단위 묶음(ModelBundle)을 통째로 바꿔 끼웁니다. 진행 중인 예측은 이미 잡은 묶음을 그대로 사용합니다.
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+
+import joblib
+from django.conf import settings
+
+from monitoring.prometheus_metrics import ml_model_load_seconds, ml_model_resident_bytes
+from .artifact_store import ARTIFACT_KINDS, ArtifactChecksumError, artifact_store, file_sha256
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAMES = ('pneumonia', 'acute_kidney_injury', 'heart_failure', 'stroke_mortality')
+
+
+def _rss_bytes() -> Optional[int]:
+    """현재 프로세스 상주 메모리(RSS) (/proc 이 없는 환경이면 None)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _load_pickle(path: str) -> Any:
+    """joblib 우선, 실패하면 pickle"""
+    try:
+        return joblib.load(path)
+    except Exception:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+
+class ModelBundle(NamedTuple):
+    """한 모델의 같은 버전 아티팩트 묶음 (없거나 로드 실패한 종류는 None)"""
+    name: str
+    version: str
+    model: Any
+    metadata: Any
+    preprocessors: Any
+
+
+class ModelRegistry:
+    """모델 이름 → ModelBundle. 처음 요청될 때 로드하고, 활성 버전이 바뀌면 백그라운드에서 교체합니다."""
+
+    def __init__(self, store=None, mmap_dir=None, use_mmap: Optional[bool] = None):
+        self.store = store or artifact_store
+        self._mmap_dir = mmap_dir
+        self._use_mmap = use_mmap
+        self._bundles: Dict[str, ModelBundle] = {}
+        self._stats: Dict[tuple, Dict[str, Any]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._manifest_signature = None
+        self._next_check = 0.0
+        self._reloading = False
+        self.models = ArtifactView(self, 'model')
+        self.metadata = ArtifactView(self, 'metadata')
+        self.preprocessors = ArtifactView(self, 'preprocessors')
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # fork 시점에 다른 스레드가 잡고 있던 잠금 / 진행 중이던 리로드 표시는 자식에게 의미가 없음
+        self._lock = threading.Lock()
+        self._locks = {}
+        self._reloading = False
+
+    @property
+    def directory(self) -> str:
+        return self.store.directory
+
+    @property
+    def mmap_dir(self) -> str:
+        return str(self._mmap_dir or settings.ML_MODEL_MMAP_DIR)
+
+    @property
+    def use_mmap(self) -> bool:
+        return settings.ML_MODEL_MMAP if self._use_mmap is None else self._use_mmap
+
+    def bundle(self, name: str) -> ModelBundle:
+        """모델 묶음 (예측 한 번 동안은 이 객체 하나만 사용해야 버전이 섞이지 않음)"""
+        self._maybe_reload()
+        try:
+            return self._bundles[name]
+        except KeyError:
+            pass
+        with self._lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self._bundles:
+                self._bundles[name] = self._load_bundle(name)
+        return self._bundles[name]
+
+    def get(self, name: str, kind: str = 'model') -> Any:
+        """로드된 객체 (파일이 없거나 로드 실패면 None)"""
+        return getattr(self.bundle(name), kind)
+
+    def version(self, name: str) -> str:
+        return self.bundle(name).version
+
+    def exists(self, name: str, kind: str) -> bool:
+        """로드하지 않고 사용 가능 여부만 확인 (로드에 실패한 적이 있으면 False)"""
+        if name in self._bundles:
+            return getattr(self._bundles[name], kind) is not None
+        return kind in self.store.resolve(name).files
+
+    # ---------- 로드 ----------
+
+    def _load_bundle(self, name: str, strict: bool = False) -> ModelBundle:
+        """
+        활성 버전 아티팩트를 모두 로드. strict 면 하나라도 실패할 때 예외를 올리고 (핫 리로드용, 기존 묶음 유지),
+        아니면 실패한 종류만 None 으로 둡니다 (처음 로드 — 예전처럼 fallback 으로 계속 진행).
+        """
+        resolved = self.store.resolve(name)
+        values = {}
+        for kind in ARTIFACT_KINDS:
+            if kind not in resolved.files:
+                values[kind] = None
+                continue
+            path, sha256 = resolved.files[kind]
+            try:
+                values[kind] = self._load_artifact(name, kind, path, sha256)
+            except Exception as e:
+                if strict:
+                    raise
+                logger.warning(f"⚠️ {name} {kind} 로드 실패 (계속 진행): {e}")
+                values[kind] = None
+        version = resolved.version or self._legacy_version(resolved)
+        return ModelBundle(name=name, version=version, **values)
+
+    def _legacy_version(self, resolved) -> str:
+        """manifest 에 없는 평면 파일은 모델 파일 체크섬 앞 8자리로 버전 표시"""
+        if 'model' not in resolved.files:
+            return 'none'
+        return f"legacy-{file_sha256(resolved.files['model'][0])[:8]}"
+
+    def _load_artifact(self, name: str, kind: str, path: str, sha256: Optional[str]) -> Any:
+        rss_before = _rss_bytes()
+        started = time.perf_counter()
+        if sha256 and file_sha256(path) != sha256:
+            raise ArtifactChecksumError(f"체크섬 불일치: {path}")
+        mmapped = kind == 'model' and self.use_mmap
+        value = self._load_mmapped(name, path) if mmapped else _load_pickle(path)
+        seconds = time.perf_counter() - started
+        rss_after = _rss_bytes()
+        rss_delta = max(rss_after - rss_before, 0) if rss_before is not None and rss_after is not None else None
+
+        self._stats[(name, kind)] = {
+            'path': path,
+            'file_bytes': os.path.getsize(path),
+            'load_seconds': round(seconds, 4),
+            'resident_bytes': rss_delta,
+            'mmap': mmapped,
+        }
+        ml_model_load_seconds.labels(model=name, artifact=kind).set(seconds)
+        if rss_delta is not None:
+            ml_model_resident_bytes.labels(model=name, artifact=kind).set(rss_delta)
+        resident = f"{rss_delta / 1024 ** 2:.1f}MB" if rss_delta is not None else '?'
+        logger.info(f"✅ {name} {kind} 로드 ({seconds:.2f}s, RSS +{resident}{', mmap' if mmapped else ''})")
+        return value
+
+    def _load_mmapped(self, name: str, path: str) -> Any:
+        """
+        원본 pkl 을 joblib 형식 사본(원본 경로 + mtime 별)으로 한 번 다시 저장한 뒤 mmap_mode='r' 로 엽니다.
+        사본을 만들 수 없으면 원본을 그대로 메모리로 로드합니다. 같은 모델의 이전 버전 사본은 지웁니다.
+        """
+        stat = os.stat(path)
+        key = hashlib.sha1(f"{os.path.abspath(path)}:{stat.st_mtime_ns}".encode()).hexdigest()[:16]
+        mmap_path = os.path.join(self.mmap_dir, f"{os.path.basename(path)}.{key}.joblib")
+        if not os.path.exists(mmap_path):
+            value = _load_pickle(path)
+            tmp_path = f"{mmap_path}.{uuid.uuid4().hex}.tmp"
+            try:
+                os.makedirs(self.mmap_dir, exist_ok=True)
+                joblib.dump(value, tmp_path)
+                os.replace(tmp_path, mmap_path)
+            except Exception as e:
+                logger.warning(f"⚠️ mmap 사본 저장 실패, 메모리 로드 사용 ({path}): {e}")
+                return value
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            del value
+        value = joblib.load(mmap_path, mmap_mode='r')
+        self._prune_mmap_copies(name, path, mmap_path)
+        return value
+
+    def _prune_mmap_copies(self, name: str, path: str, keep_path: str):
+        """
+        더 이상 로드되지 않는 이전 버전 mmap 사본 삭제 (리로드할 때마다 사본이 쌓이지 않도록).
+        이미 사본을 mmap 한 프로세스는 파일이 지워져도 매핑이 유지되고, 이전 버전을 다시 여는 프로세스는 사본을 새로 만듭니다.
+        """
+        # 아티팩트 파일 이름은 모델별로 다르므로 (pneumonia_final_model.pkl 등) 파일 이름으로 같은 모델의 사본을 찾음
+        prefix = f"{os.path.basename(path)}."
+        try:
+            entries = os.listdir(self.mmap_dir)
+        except OSError:
+            return
+        for entry in entries:
+            copy_path = os.path.join(self.mmap_dir, entry)
+            if not entry.startswith(prefix) or not entry.endswith('.joblib') or copy_path == keep_path:
+                continue
+            try:
+                os.remove(copy_path)
+                logger.info(f"🧹 {name} 이전 mmap 사본 삭제: {entry}")
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"⚠️ mmap 사본 삭제 실패 ({entry}): {e}")
+
+    # ---------- 핫 리로드 ----------
+
+    def _maybe_reload(self):
+        """ML_MODEL_RELOAD_INTERVAL 마다 manifest 를 stat 하고, 바뀌었으면 백그라운드 교체를 시작"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + settings.ML_MODEL_RELOAD_INTERVAL
+        signature = self.store.signature()
+        if signature == self._manifest_signature:
+            return
+        first_check = self._manifest_signature is None and not self._bundles
+        self._manifest_signature = signature
+        if first_check:
+            return
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload_changed, name='ml-model-reload', daemon=True).start()
+
+    def _reload_changed(self):
+        try:
+            self.reload()
+        finally:
+            with self._lock:
+                self._reloading = False
+
+    def reload(self, names: Optional[Iterable[str]] = None) -> Dict[str, str]:
+        """
+        이미 로드된 모델 중 활성 버전이 바뀐 것을 새로 로드해 교체하고 {모델: 새 버전} 을 반환합니다.
+        새 버전 로드/체크섬 검증에 실패하면 기존 묶음을 그대로 둡니다.
+        """
+        swapped = {}
+        for name in list(names or self._bundles):
+            current = self._bundles.get(name)
+            resolved = self.store.resolve(name)
+            if current is not None and (resolved.version or self._legacy_version(resolved)) == current.version:
+                continue
+            try:
+                bundle = self._load_bundle(name, strict=True)
+            except Exception as e:
+                logger.error(f"❌ {name} 모델 교체 실패, 기존 버전 유지 ({current.version if current else '-'}): {e}")
+                continue
+            # dict 항목 교체는 원자적 — 진행 중인 예측은 이전 묶음을 끝까지 사용
+            self._bundles[name] = bundle
+            swapped[name] = bundle.version
+            logger.info(f"🔄 {name} 모델 교체: {current.version if current else '-'} → {bundle.version}")
+        return swapped
+
+    # ---------- 예열 / 통계 ----------
+
+    def warm(self, names: Iterable[str] = MODEL_NAMES) -> Dict[str, Dict[str, Any]]:
+        """모든 아티팩트를 미리 로드 (fork 전 마스터에서 호출) 하고 모델별 통계를 반환"""
+        if not os.path.isdir(self.directory):
+            logger.warning(f"⚠️ 모델 디렉토리가 없습니다: {self.directory}")
+            return {}
+        started = time.perf_counter()
+        for name in names:
+            self.bundle(name)
+        logger.info(f"🔧 ML 모델 예열 완료 ({time.perf_counter() - started:.2f}s)")
+        return self.stats()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """로드된 아티팩트별 버전 / 로드 시간 / 상주 메모리 증가량 / 파일 크기"""
+        report: Dict[str, Dict[str, Any]] = {}
+        for (name, kind), stat in sorted(self._stats.items()):
+            bundle = self._bundles.get(name)
+            report.setdefault(name, {})[kind] = dict(stat, version=bundle.version if bundle else None)
+        return report
+
+
+class ArtifactView(Mapping):
+    """레지스트리의 한 종류(model/metadata/preprocessors)를 dict 처럼 보는 지연 로드 뷰"""
+
+    def __init__(self, registry: ModelRegistry, kind: str):
+        self.registry = registry
+        self.kind = kind
+
+    def __getitem__(self, name: str) -> Any:
+        value = self.registry.get(name, self.kind)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __contains__(self, name) -> bool:
+        # 멤버십 확인 직후 사용하는 패턴이 대부분이라 여기서 로드 (로드 실패면 없는 것으로 취급)
+        return self.registry.get(name, self.kind) is not None
+
+    def __iter__(self):
+        return (name for name in MODEL_NAMES if self.registry.exists(name, self.kind))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+# 싱글톤 인스턴스 생성
+model_registry = ModelRegistry()
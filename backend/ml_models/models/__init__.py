@@ -4,11 +4,13 @@ from .complications import ComplicationPrediction
 from .mortality import StrokeMortalityPrediction
 from .sod2 import SOD2Assessment
 from .gene import geneAIResult
+from .snapshot import LatestRiskSnapshot
 
 __all__ = [
     'PredictionTask',
     'ComplicationPrediction', 
     'StrokeMortalityPrediction',
     'SOD2Assessment',
-    'geneAIResult'
+    'geneAIResult',
+    'LatestRiskSnapshot'
 ]
\ No newline at end of file
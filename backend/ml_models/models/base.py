@@ -35,6 +35,7 @@ class PredictionTask(models.Model):
     # 메타 정보
     model_version = models.CharField(max_length=50, verbose_name="모델 버전", blank=True)
     processing_time = models.FloatField(null=True, blank=True, verbose_name="처리 시간(초)")
+    cache_hit = models.BooleanField(default=False, verbose_name="캐시 결과 여부")
     error_message = models.TextField(blank=True, verbose_name="오류 메시지")
     
     # 시스템 정보
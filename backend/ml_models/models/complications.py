@@ -40,4 +40,28 @@ class ComplicationPrediction(models.Model):
         unique_together = ['task', 'complication_type']
     
     def __str__(self):
-        return f"{self.get_complication_type_display()} - {self.probability:.2%} 위험"
\ No newline at end of file
+        return f"{self.get_complication_type_display()} - {self.probability:.2%} 위험"
+    
+    @classmethod
+    def from_prediction_results(cls, task, prediction_results):
+        """예측 결과 → 합병증별 ComplicationPrediction (저장 전 객체, bulk_create 용)"""
+        rows = []
+        for comp, _ in cls.COMPLICATION_CHOICES:
+            if comp in prediction_results:
+                comp_result = prediction_results[comp]
+                performance = comp_result.get('model_performance', {})
+                rows.append(cls(
+                    task=task,
+                    complication_type=comp,
+                    probability=comp_result.get('probability', 0),
+                    risk_level=comp_result.get('risk_level', 'LOW'),
+                    threshold=comp_result.get('threshold', 0.5),
+                    model_auc=performance.get('auc', 0),
+                    model_precision=performance.get('precision', 0),
+                    model_recall=performance.get('recall', 0),
+                    model_f1=performance.get('f1', 0),
+                    model_type=performance.get('type', 'ensemble'),
+                    model_strategy=performance.get('strategy', 'supervised'),
+                    important_features={}  # 추후 기능 중요도 추가 가능
+                ))
+        return rows
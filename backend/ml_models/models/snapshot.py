@@ -0,0 +1,36 @@
+# backend/ml_models/models/snapshot.py
+from django.db import models
+from .base import PredictionTask
+
+class LatestRiskSnapshot(models.Model):
+    """환자별 / 모델별 최신 위험도 (예측 완료 시 갱신, 매일 밤 전체 재구축)"""
+    MODEL_CHOICES = [
+        ('pneumonia', '폐렴'),
+        ('acute_kidney_injury', '급성 신장 손상'),
+        ('heart_failure', '심부전'),
+        ('stroke_mortality', '30일 사망률'),
+    ]
+
+    patient = models.ForeignKey('openmrs_integration.OpenMRSPatient', on_delete=models.CASCADE, verbose_name="환자")
+    model_name = models.CharField(max_length=30, choices=MODEL_CHOICES, verbose_name="모델")
+    # 작업이 정리(cleanup_old_tasks)되어도 행은 남고, 원본이 없어진 행은 야간 재구축 때 삭제
+    task = models.ForeignKey(PredictionTask, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="예측 작업")
+
+    probability = models.FloatField(verbose_name="위험 확률")
+    risk_level = models.CharField(max_length=20, verbose_name="위험도")
+    model_version = models.CharField(max_length=50, blank=True, verbose_name="모델 버전")
+    result = models.JSONField(verbose_name="예측 결과")  # 대시보드가 그대로 쓰는 결과 객체
+
+    predicted_at = models.DateTimeField(verbose_name="예측 시각")
+    refreshed_at = models.DateTimeField(verbose_name="스냅샷 갱신 시각")
+
+    class Meta:
+        verbose_name = "최신 위험도 스냅샷"
+        verbose_name_plural = "최신 위험도 스냅샷"
+        # (patient, model_name) 유니크 인덱스 하나로 환자 목록 조회와 upsert 를 모두 처리
+        constraints = [
+            models.UniqueConstraint(fields=['patient', 'model_name'], name='unique_latest_risk_per_model'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_model_name_display()} - {self.probability:.2%} ({self.risk_level})"
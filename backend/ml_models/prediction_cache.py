@@ -0,0 +1,185 @@
+# backend/ml_models/prediction_cache.py
+# 예측 결과 캐시: (작업 종류, 모델 버전, 정규화된 피처 벡터 해시) → 결과 JSON
+# UI 에서 같은 입력으로 다시 예측할 때 모델을 다시 돌리지 않습니다.
+# 입력 dict 대신 피처 스키마로 만든 float32 벡터를 해시하므로, 모델에 들어가지 않는 필드(환자 UUID 등)나
+# 키 순서가 달라도 같은 요청으로 취급됩니다. 모델 버전이 키에 들어가 핫 리로드 후에는 자연히 새로 계산됩니다.
+# - memory: 프로세스 내 LRU + TTL (적중 시 수 µs)
+# - redis : 프로세스/노드 간 공유 (SETEX 로 TTL, 크기 제한은 Redis maxmemory 정책에 맡김)
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+
+from monitoring.prometheus_metrics import (
+    ml_prediction_cache_entries, ml_prediction_cache_hits, ml_prediction_cache_misses,
+)
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'ml:prediction:'
+
+
+def feature_digest(features: np.ndarray) -> str:
+    """피처 벡터 해시 (-0.0 은 0.0 으로 맞춘 float32 바이트 기준)"""
+    canonical = np.ascontiguousarray(features, dtype=np.float32) + np.float32(0.0)
+    return hashlib.blake2b(canonical.tobytes(), digest_size=16).hexdigest()
+
+
+class InProcessPredictionStore:
+    """프로세스 내 LRU + TTL (값은 JSON 문자열 — 꺼낼 때마다 새 객체라 호출자가 수정해도 캐시는 안전)"""
+
+    def __init__(self, max_entries=None, ttl=None):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, payload)
+        self._lock = threading.Lock()
+
+    @property
+    def max_entries(self):
+        return self._max_entries or settings.ML_PREDICTION_CACHE_SIZE
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else settings.ML_PREDICTION_CACHE_TTL
+
+    def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        now = time.monotonic()
+        payloads = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] < now:
+                    del self._entries[key]
+                    entry = None
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                payloads.append(entry[1] if entry is not None else None)
+        return payloads
+
+    def set_many(self, items: Dict[str, str]):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for key, payload in items.items():
+                self._entries[key] = (expires_at, payload)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            ml_prediction_cache_entries.set(len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            ml_prediction_cache_entries.set(0)
+
+
+class RedisPredictionStore:
+    """Redis MGET / SETEX (클라이언트는 최초 사용 시 한 번만 생성)"""
+
+    def __init__(self, url=None, ttl=None):
+        self._url = url
+        self._ttl = ttl
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import redis
+                    self._client = redis.Redis.from_url(self._url or settings.ML_PREDICTION_CACHE_REDIS_URL)
+        return self._client
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else settings.ML_PREDICTION_CACHE_TTL
+
+    def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        if not keys:
+            return []
+        return [payload.decode() if payload is not None else None for payload in self.client.mget(keys)]
+
+    def set_many(self, items: Dict[str, str]):
+        pipe = self.client.pipeline(transaction=False)
+        for key, payload in items.items():
+            pipe.setex(key, int(self.ttl), payload)
+        pipe.execute()
+
+    def clear(self):
+        keys = list(self.client.scan_iter(f"{KEY_PREFIX}*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+PREDICTION_STORES = {
+    'memory': InProcessPredictionStore,
+    'redis': RedisPredictionStore,
+}
+
+
+class PredictionCache:
+    """
+    예측 결과 캐시. 저장소 오류는 예측을 실패시키지 않도록 로그만 남기고 미스로 처리합니다.
+    ML_PREDICTION_CACHE_TTL 이 0 이면 꺼집니다.
+    """
+
+    def __init__(self, backend=None):
+        self._backend = backend
+        self._store = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.ML_PREDICTION_CACHE_TTL > 0
+
+    @property
+    def store(self):
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    backend = self._backend or settings.ML_PREDICTION_CACHE_BACKEND
+                    if backend not in PREDICTION_STORES:
+                        raise ValueError(f"알 수 없는 예측 캐시 백엔드: {backend}")
+                    self._store = PREDICTION_STORES[backend]()
+        return self._store
+
+    def keys(self, task: str, model_version: str, features: np.ndarray) -> List[str]:
+        """행(환자)별 캐시 키"""
+        return [f"{KEY_PREFIX}{task}:{model_version}:{feature_digest(row)}" for row in np.atleast_2d(features)]
+
+    def get_many(self, task: str, keys: List[str]) -> List[Optional[Dict]]:
+        """키별 결과 (없으면 None)"""
+        if not self.enabled or not keys:
+            return [None] * len(keys)
+        try:
+            payloads = self.store.get_many(keys)
+        except Exception as e:
+            logger.warning(f"⚠️ 예측 캐시 조회 실패 (미스로 처리): {e}")
+            payloads = [None] * len(keys)
+        hits = sum(1 for payload in payloads if payload is not None)
+        if hits:
+            ml_prediction_cache_hits.labels(task=task).inc(hits)
+        if hits < len(keys):
+            ml_prediction_cache_misses.labels(task=task).inc(len(keys) - hits)
+        return [json.loads(payload) if payload is not None else None for payload in payloads]
+
+    def set_many(self, items: Dict[str, Dict]):
+        if not self.enabled or not items:
+            return
+        try:
+            self.store.set_many({key: json.dumps(result, default=str) for key, result in items.items()})
+        except Exception as e:
+            logger.warning(f"⚠️ 예측 캐시 저장 실패: {e}")
+
+    def clear(self):
+        self.store.clear()
+
+
+# 싱글톤 인스턴스 생성
+prediction_cache = PredictionCache()
@@ -0,0 +1,227 @@
+# backend/ml_models/risk_snapshot.py
+# 환자별 / 모델별 최신 위험도 스냅샷 (LatestRiskSnapshot)
+# - 예측이 완료될 때마다 record_predictions() 로 해당 (환자, 모델) 행만 upsert
+# - 매일 밤 rebuild_snapshots() 가 PredictionTask 에서 전체를 다시 계산 (누락/정리된 작업 보정)
+# - 스냅샷이 아직 없는 환자(테이블 생성 직후 등)는 조회 시 backfill_patients() 로 PredictionTask 에서 채움
+# 최신 여부는 모두 예측 시각(completed_at, 없으면 created_at) 기준이고, 더 최근 예측이 저장된 행은 덮어쓰지 않습니다.
+# 대시보드는 latest_risks() 로 환자 목록의 최신 위험도를 (patient, model_name) 인덱스 쿼리 한 번에 읽습니다.
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from openmrs_integration.models import OpenMRSPatient
+
+from .models import LatestRiskSnapshot, PredictionTask
+
+logger = logging.getLogger(__name__)
+
+COMPLICATION_MODELS = ('pneumonia', 'acute_kidney_injury', 'heart_failure')
+MORTALITY_MODEL = 'stroke_mortality'
+SNAPSHOT_UPDATE_FIELDS = ['task', 'probability', 'risk_level', 'model_version', 'result', 'predicted_at', 'refreshed_at']
+UPSERT_BATCH_SIZE = 500
+
+
+def _mortality_result(predictions: Dict, predicted_at) -> Dict:
+    """사망률 예측 결과 → get_prediction_results 의 mortality_prediction 형태 (StrokeMortalityPrediction 과 같은 값)"""
+    return {
+        'mortality_30_day': predictions.get('mortality_30_day', 0),
+        'mortality_30_day_risk_level': predictions.get('risk_level', 'LOW'),
+        'model_confidence': predictions.get('confidence', 0),
+        'model_auc': predictions.get('model_performance', {}).get('auc', 0),
+        'risk_factors': predictions.get('risk_factors', []),
+        'clinical_recommendations': '; '.join(predictions.get('clinical_recommendations', [])),
+        'predicted_at': predicted_at.isoformat(),
+    }
+
+
+def snapshot_rows(task: PredictionTask, refreshed_at=None) -> List[LatestRiskSnapshot]:
+    """완료된 예측 작업 → 모델별 스냅샷 행 (저장 전). 데이터 등록용 작업처럼 결과가 없으면 빈 목록."""
+    predictions = task.predictions or {}
+    if task.status != 'COMPLETED' or not isinstance(predictions, dict):
+        return []
+    refreshed_at = refreshed_at or timezone.now()
+    predicted_at = task.completed_at or task.created_at or refreshed_at
+    common = dict(
+        patient_id=task.patient_id, task=task, model_version=task.model_version or '',
+        predicted_at=predicted_at, refreshed_at=refreshed_at,
+    )
+
+    rows = []
+    if task.task_type == 'COMPLICATION':
+        for comp in COMPLICATION_MODELS:
+            result = predictions.get(comp)
+            if isinstance(result, dict) and 'probability' in result:
+                rows.append(LatestRiskSnapshot(
+                    model_name=comp, probability=result['probability'],
+                    risk_level=result.get('risk_level', 'LOW'), result=result, **common
+                ))
+    elif task.task_type == 'MORTALITY' and 'mortality_30_day' in predictions:
+        rows.append(LatestRiskSnapshot(
+            model_name=MORTALITY_MODEL, probability=predictions['mortality_30_day'],
+            risk_level=predictions.get('risk_level', 'LOW'),
+            result=_mortality_result(predictions, predicted_at), **common
+        ))
+    return rows
+
+
+def _upsert_sql(row_count: int, stale_before) -> str:
+    """
+    INSERT ... ON CONFLICT (patient, model_name) DO UPDATE ... WHERE (PostgreSQL / SQLite 공통 문법)
+    bulk_create(update_conflicts=True) 는 갱신 조건을 걸 수 없어서, 저장된 예측이 더 최근이면 건너뛰도록 직접 작성합니다.
+    """
+    meta = LatestRiskSnapshot._meta
+    qn = connection.ops.quote_name
+    table = qn(meta.db_table)
+    fields = [meta.get_field(name) for name in ['patient', 'model_name'] + SNAPSHOT_UPDATE_FIELDS]
+    columns = ', '.join(qn(field.column) for field in fields)
+    placeholders = ', '.join(['(' + ', '.join(['%s'] * len(fields)) + ')'] * row_count)
+    updates = ', '.join(
+        f"{qn(meta.get_field(name).column)} = EXCLUDED.{qn(meta.get_field(name).column)}" for name in SNAPSHOT_UPDATE_FIELDS
+    )
+    predicted_at = qn(meta.get_field('predicted_at').column)
+    condition = f"{table}.{predicted_at} <= EXCLUDED.{predicted_at}"
+    if stale_before is not None:
+        # 재구축: 재구축 시작 전에 갱신된 행은 작업 기준으로 다시 씀 (시작 후 새 예측으로 갱신된 행만 보호)
+        condition += f" OR {table}.{qn(meta.get_field('refreshed_at').column)} < %s"
+    return (
+        f"INSERT INTO {table} ({columns}) VALUES {placeholders} "
+        f"ON CONFLICT ({qn(meta.get_field('patient').column)}, {qn(meta.get_field('model_name').column)}) "
+        f"DO UPDATE SET {updates} WHERE {condition}"
+    )
+
+
+def _upsert(rows: Iterable[LatestRiskSnapshot], stale_before=None) -> int:
+    """(환자, 모델) 별 upsert 후 실제로 쓴 행 수 반환 - 이미 저장된 예측이 더 최근이면 그 행은 그대로 둠"""
+    # 같은 (환자, 모델) 이 여러 번 있으면 가장 최근 예측만 (ON CONFLICT 는 한 문장에서 같은 행을 두 번 갱신할 수 없음)
+    latest = {}
+    for row in rows:
+        key = (row.patient_id, row.model_name)
+        if key not in latest or row.predicted_at >= latest[key].predicted_at:
+            latest[key] = row
+    if not latest:
+        return 0
+
+    meta = LatestRiskSnapshot._meta
+    fields = [meta.get_field(name) for name in ['patient', 'model_name'] + SNAPSHOT_UPDATE_FIELDS]
+    rows = list(latest.values())
+    written = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            params = [
+                field.get_db_prep_save(getattr(row, field.attname), connection)
+                for row in batch for field in fields
+            ]
+            if stale_before is not None:
+                params.append(meta.get_field('refreshed_at').get_db_prep_save(stale_before, connection))
+            cursor.execute(_upsert_sql(len(batch), stale_before), params)
+            written += max(cursor.rowcount, 0)
+    return written
+
+
+def record_predictions(tasks: Sequence[PredictionTask]) -> int:
+    """예측 완료 직후 호출 - 해당 작업들의 (환자, 모델) 스냅샷만 갱신 (스냅샷 실패가 예측 응답을 막지 않음)"""
+    try:
+        # 호출 측 트랜잭션 안에서 실패해도 그 트랜잭션은 살아 있도록 세이브포인트 사용
+        with transaction.atomic():
+            refreshed_at = timezone.now()
+            return _upsert(row for task in tasks for row in snapshot_rows(task, refreshed_at))
+    except Exception as e:
+        logger.error(f"❌ 위험도 스냅샷 갱신 실패 (야간 재구축에서 보정): {e}", exc_info=True)
+        return 0
+
+
+def _latest_task(model_name: str):
+    """환자별로 해당 모델 결과가 있는 가장 최근 완료 작업의 pk (상관 서브쿼리, 스냅샷과 같은 예측 시각 기준)"""
+    if model_name == MORTALITY_MODEL:
+        tasks = PredictionTask.objects.filter(task_type='MORTALITY', predictions__has_key='mortality_30_day')
+    else:
+        tasks = PredictionTask.objects.filter(task_type='COMPLICATION', predictions__has_key=model_name)
+    return Subquery(
+        tasks.filter(patient=OuterRef('pk'), status='COMPLETED')
+        .annotate(predicted_at=Coalesce('completed_at', 'created_at'))
+        .order_by('-predicted_at', '-created_at').values('pk')[:1]
+    )
+
+
+def _upsert_latest_tasks(patients, chunk_size: int, refreshed_at, stale_before=None) -> int:
+    """환자 queryset 의 모델별 최신 작업을 찾아 스냅샷으로 upsert (작업 조회는 chunk_size 쌍마다 한 번)"""
+    models = COMPLICATION_MODELS + (MORTALITY_MODEL,)
+    latest_tasks = patients.annotate(
+        **{f'latest_{name}': _latest_task(name) for name in models}
+    ).order_by('pk').values_list(*(f'latest_{name}' for name in models))
+
+    upserted = 0
+    # 청크의 (모델, 최신 작업 pk) - 한 작업이 어떤 모델에서는 최신이 아닐 수 있으므로 모델별로 구분
+    latest_pairs = set()
+
+    def flush():
+        nonlocal upserted
+        tasks = PredictionTask.objects.filter(pk__in={task_id for _, task_id in latest_pairs})
+        upserted += _upsert((
+            row for task in tasks for row in snapshot_rows(task, refreshed_at)
+            if (row.model_name, task.pk) in latest_pairs
+        ), stale_before)
+        latest_pairs.clear()
+
+    for latest in latest_tasks.iterator(chunk_size=chunk_size):
+        latest_pairs.update((name, task_id) for name, task_id in zip(models, latest) if task_id)
+        if len(latest_pairs) >= chunk_size:
+            flush()
+    if latest_pairs:
+        flush()
+    return upserted
+
+
+def rebuild_snapshots(chunk_size: Optional[int] = None) -> Dict:
+    """
+    전체 재구축 - 환자를 청크로 나눠 모델별 최신 작업을 찾아 upsert 하고,
+    원본 작업이 더 이상 없는 스냅샷(재구축 시작 전에 갱신된 채 남은 행)은 삭제합니다.
+    """
+    start_time = time.time()
+    chunk_size = chunk_size or settings.ML_COHORT_CHUNK_SIZE
+    refreshed_at = timezone.now()
+    upserted = _upsert_latest_tasks(OpenMRSPatient.objects.all(), chunk_size, refreshed_at, stale_before=refreshed_at)
+    removed = LatestRiskSnapshot.objects.filter(refreshed_at__lt=refreshed_at).delete()[0]
+    elapsed = round(time.time() - start_time, 3)
+    logger.info(f"✅ 위험도 스냅샷 재구축 완료: {upserted}행 갱신, {removed}행 삭제 ({elapsed}s)")
+    return {'upserted': upserted, 'removed': removed, 'elapsed': elapsed}
+
+
+def backfill_patients(patient_uuids: Sequence[str]) -> int:
+    """
+    스냅샷이 하나도 없는 환자의 최신 위험도를 PredictionTask 에서 계산해 저장 (테이블을 만든 직후 / 야간 재구축 전 보정).
+    저장한 행 수를 반환하며, 실패해도 조회는 계속되도록 로그만 남깁니다.
+    """
+    if not patient_uuids:
+        return 0
+    try:
+        with transaction.atomic():
+            return _upsert_latest_tasks(
+                OpenMRSPatient.objects.filter(uuid__in=list(patient_uuids)),
+                settings.ML_COHORT_CHUNK_SIZE, timezone.now(),
+            )
+    except Exception as e:
+        logger.error(f"❌ 위험도 스냅샷 보정 실패: {e}", exc_info=True)
+        return 0
+
+
+def latest_risks(patient_uuids: Sequence[str], backfill: bool = True) -> Dict[str, Dict[str, LatestRiskSnapshot]]:
+    """
+    환자 UUID 목록 → {환자 UUID: {모델: 스냅샷}} (인덱스 쿼리 한 번)
+    backfill 이면 스냅샷이 없는 환자만 PredictionTask 에서 채운 뒤 한 번 더 읽습니다.
+    """
+    patient_uuids = [str(u) for u in patient_uuids]
+    risks: Dict[str, Dict[str, LatestRiskSnapshot]] = {}
+    for snapshot in LatestRiskSnapshot.objects.filter(patient_id__in=patient_uuids):
+        risks.setdefault(str(snapshot.patient_id), {})[snapshot.model_name] = snapshot
+    missing = [u for u in patient_uuids if u not in risks]
+    if backfill and missing and backfill_patients(missing):
+        risks.update(latest_risks(missing, backfill=False))
+    return risks
@@ -9,10 +9,12 @@ load_dotenv(dotenv_path=ROOT_DIR / '.env')
 
 
 from celery import shared_task
+from django.contrib.auth import get_user_model
 from django.utils import timezone
 from .ml_service import ml_service
 from .sod2_service import sod2_service
 from .models import PredictionTask
+from .risk_snapshot import rebuild_snapshots, record_predictions
 from patients.models import Patient, Visit
 import logging
 
@@ -52,10 +54,13 @@ def predict_complications_task(self, patient_id, visit_id, patient_data):
         
         # 결과 저장
         prediction_task.predictions = results
+        prediction_task.model_version = results.get('model_version', '')
+        prediction_task.cache_hit = results.get('cache_hit', False)
         prediction_task.processing_time = processing_time
         prediction_task.status = 'COMPLETED'
         prediction_task.completed_at = timezone.now()
         prediction_task.save()
+        record_predictions([prediction_task])
         
         logger.info(f"합병증 예측 완료: Task {task_id}, Patient {patient.name}")
         return {
@@ -103,10 +108,13 @@ def predict_stroke_mortality_task(self, patient_id, visit_id, patient_data):
             return {'error': result['error']}
         
         prediction_task.predictions = result
+        prediction_task.model_version = result.get('model_version', '')
+        prediction_task.cache_hit = result.get('cache_hit', False)
         prediction_task.processing_time = processing_time
         prediction_task.status = 'COMPLETED'
         prediction_task.completed_at = timezone.now()
         prediction_task.save()
+        record_predictions([prediction_task])
         
         logger.info(f"사망률 예측 완료: Task {task_id}, Patient {patient.name}")
         return {
@@ -189,6 +197,38 @@ def cleanup_old_tasks():
     logger.info(f"정리된 오래된 작업 수: {deleted_count}")
     return deleted_count
 
+@shared_task(bind=True)
+def score_cohort_task(self, patient_uuids=None, active_hours=None, chunk_size=None, requested_by_id=None):
+    """
+    병동/재원 환자 전체 합병증 위험도 일괄 갱신 비동기 태스크
+    진행 상황은 PROGRESS 상태의 meta({'total', 'processed', 'saved', 'cache_hits', 'elapsed'})로 조회할 수 있습니다.
+    """
+    from .cohort import score_cohort
+    
+    def report(progress):
+        self.update_state(state='PROGRESS', meta=progress)
+    
+    try:
+        result = score_cohort(
+            patient_uuids=patient_uuids,
+            active_hours=active_hours,
+            chunk_size=chunk_size,
+            requested_by=requested_by_id and get_user_model().objects.filter(pk=requested_by_id).first(),
+            progress=report if self.request.id else None
+        )
+        return {'status': 'completed', **result}
+    except Exception as e:
+        # 다시 올려서 태스크가 FAILURE 로 끝나야 상태 조회 API 가 오류를 보여줌
+        logger.error(f"코호트 위험도 갱신 실패: {str(e)}", exc_info=True)
+        raise
+
+@shared_task
+def rebuild_risk_snapshots():
+    """최신 위험도 스냅샷 전체 재구축 (매일 밤 beat)"""
+    result = rebuild_snapshots()
+    logger.info(f"위험도 스냅샷 재구축: {result}")
+    return result
+
 # gene_model
 import io
 import requests
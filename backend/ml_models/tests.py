@@ -0,0 +1,505 @@
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from openmrs_integration.models import OpenMRSPatient
+from vitals.models import VitalMeasurement, VitalSession
+
+from .artifact_store import ArtifactStore
+from .batching import MicroBatcher
+from .cohort import score_cohort
+from .feature_schema import FeatureRule, FeatureSchema, flag
+from .model_registry import ModelRegistry
+from .models import ComplicationPrediction, LatestRiskSnapshot, PredictionTask
+from .prediction_cache import InProcessPredictionStore, PredictionCache
+from .risk_snapshot import latest_risks, rebuild_snapshots, record_predictions
+
+
+def make_patient(name='p'):
+    return OpenMRSPatient.objects.create(
+        uuid=uuid.uuid4(), display_name=name, identifier=name, gender='M', birthdate=date(1950, 1, 1)
+    )
+
+
+def complication_task(patient, probability, minutes_ago):
+    return PredictionTask.objects.create(
+        patient=patient, task_type='COMPLICATION', status='COMPLETED', input_data={},
+        predictions={'pneumonia': {'probability': probability, 'risk_level': 'LOW'}},
+        completed_at=timezone.now() - timedelta(minutes=minutes_ago),
+    )
+
+
+def fake_batch_results(patients_data):
+    """predict_complications_batch 대용 - 나이로 확률을 정해 결과 형태만 맞춤"""
+    return [
+        {
+            comp: {'probability': data['age'] / 100, 'risk_level': 'MEDIUM'}
+            for comp in ('pneumonia', 'acute_kidney_injury', 'heart_failure')
+        } | {'model_version': 'test', 'processing_time': 0}
+        for data in patients_data
+    ]
+
+
+class MlUrlsTests(SimpleTestCase):
+
+    def test_cohort_routes(self):
+        from . import views
+
+        match = resolve(reverse('score_cohort', urlconf='ml_models.urls'), urlconf='ml_models.urls')
+        self.assertIs(match.func, views.score_cohort)
+        match = resolve(
+            reverse('score_cohort_status', urlconf='ml_models.urls', kwargs={'job_id': 'abc'}), urlconf='ml_models.urls'
+        )
+        self.assertIs(match.func, views.score_cohort_status)
+
+    def test_latest_risks_route(self):
+        from . import views
+
+        match = resolve(reverse('get_latest_risks', urlconf='ml_models.urls'), urlconf='ml_models.urls')
+        self.assertIs(match.func, views.get_latest_risks)
+
+
+@override_settings(ML_BATCH_MAX_SIZE=8, ML_BATCH_MAX_WAIT_MS=50)
+class MicroBatcherTests(SimpleTestCase):
+
+    def test_results_follow_input_order(self):
+        batches = []
+
+        def batch_fn(items):
+            batches.append(list(items))
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(batch_fn, name='test-batcher')
+        futures = [batcher.submit(i) for i in range(5)]
+        self.assertEqual([future.result(timeout=5) for future in futures], [0, 2, 4, 6, 8])
+        # 대기 시간 안에 들어온 요청은 한 번에 묶임
+        self.assertEqual(batches, [[0, 1, 2, 3, 4]])
+
+    @override_settings(ML_BATCH_MAX_SIZE=2)
+    def test_batch_size_is_capped(self):
+        batches = []
+
+        def batch_fn(items):
+            batches.append(len(items))
+            return items
+
+        batcher = MicroBatcher(batch_fn, name='test-batcher')
+        futures = [batcher.submit(i) for i in range(5)]
+        self.assertEqual([future.result(timeout=5) for future in futures], [0, 1, 2, 3, 4])
+        self.assertTrue(all(size <= 2 for size in batches))
+
+    def test_failing_item_does_not_fail_batch(self):
+        def batch_fn(items):
+            if 'bad' in items:
+                raise ValueError('bad item')
+            return [item.upper() for item in items]
+
+        batcher = MicroBatcher(batch_fn, name='test-batcher')
+        futures = [batcher.submit(item) for item in ('a', 'bad', 'b')]
+        self.assertEqual(futures[0].result(timeout=5), 'A')
+        self.assertEqual(futures[2].result(timeout=5), 'B')
+        with self.assertRaises(ValueError):
+            futures[1].result(timeout=5)
+
+    def test_result_length_mismatch_raises(self):
+        batcher = MicroBatcher(lambda items: [], name='test-batcher')
+        with self.assertRaises(RuntimeError):
+            batcher.predict('x', timeout=5)
+
+
+class ComplicationBatchViewTests(TestCase):
+    """합병증 배치 예측 API: 입력 검증과 환자별 PredictionTask / ComplicationPrediction 저장"""
+
+    def post(self, data):
+        from rest_framework.test import APIRequestFactory
+
+        from . import views
+
+        request = APIRequestFactory().post('/', data, format='json')
+        return views.predict_complications_batch(request)
+
+    def test_rejects_malformed_patients(self):
+        for data in ({}, {'patients': []}, {'patients': 'p1'}, {'patients': ['p1']}, {'patients': [{'age': 70}]}):
+            response = self.post(data)
+            self.assertEqual(response.status_code, 400, data)
+        self.assertFalse(PredictionTask.objects.exists())
+
+    @override_settings(ML_BATCH_MAX_PATIENTS=2)
+    def test_rejects_too_many_patients(self):
+        patients = [{'patient_uuid': str(uuid.uuid4()), 'age': 70} for _ in range(3)]
+        self.assertEqual(self.post({'patients': patients}).status_code, 400)
+
+    def test_unknown_patient_is_404(self):
+        patient = make_patient()
+        missing = str(uuid.uuid4())
+
+        response = self.post({'patients': [{'patient_uuid': str(patient.uuid), 'age': 70}, {'patient_uuid': missing, 'age': 60}]})
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['missing'], [missing])
+
+    @mock.patch('ml_models.views.ml_service.predict_complications_batch', side_effect=fake_batch_results)
+    def test_stores_one_task_per_patient(self, predict):
+        patients = [make_patient('a'), make_patient('b')]
+
+        response = self.post({'patients': [
+            {'patient_uuid': str(patients[0].uuid), 'age': 70},
+            {'patient_uuid': str(patients[1].uuid), 'age': 40},
+        ]})
+
+        self.assertEqual(response.status_code, 200)
+        predict.assert_called_once()
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([r['patient_uuid'] for r in response.data['results']], [str(p.uuid) for p in patients])
+        self.assertEqual(PredictionTask.objects.filter(task_type='COMPLICATION').count(), 2)
+        pneumonia = ComplicationPrediction.objects.filter(complication_type='pneumonia')
+        self.assertEqual(
+            sorted(pneumonia.values_list('task__patient__display_name', 'probability')), [('a', 0.7), ('b', 0.4)]
+        )
+
+
+class FeatureSchemaTests(SimpleTestCase):
+    """선언형 규칙 → float32 피처 행렬"""
+
+    RULES = (
+        FeatureRule(('age',), ('AGE',)),
+        FeatureRule(('gender',), ('GENDER',), transform=lambda g: 1 if g == 'M' else 0, default='F'),
+        FeatureRule(('vital_signs', 'heart_rate'), ('heart_rate_mean', 'heart_rate_last'),
+                    constants={'heart_rate_count': 1, 'not_in_schema': 9}),
+        FeatureRule(('diabetes',), ('diabetes',), transform=flag),
+        FeatureRule(('unused',), ('not_in_schema',)),
+    )
+
+    def setUp(self):
+        self.schema = FeatureSchema(
+            ['GENDER', 'AGE', 'heart_rate_mean', 'heart_rate_last', 'heart_rate_count', 'diabetes', 'other']
+        )
+
+    def test_build_fills_columns_from_rules(self):
+        features = self.schema.build([
+            {'age': 71, 'gender': 'M', 'vital_signs': {'heart_rate': 88}, 'diabetes': True},
+            {'age': 50, 'vital_signs': {}},
+        ], self.RULES)
+
+        self.assertEqual(features.dtype, np.float32)
+        np.testing.assert_array_equal(features, [
+            [1, 71, 88, 88, 1, 1, 0],
+            # 없는 값은 0, default 가 있으면 default 에 transform 적용, constants 는 값이 있을 때만
+            [0, 50, 0, 0, 0, 0, 0],
+        ])
+
+    def test_compiled_once_per_rule_list(self):
+        first = self.schema.compile(self.RULES)
+        self.assertIs(self.schema.compile(self.RULES), first)
+        # 스키마에 없는 컬럼만 쓰는 규칙은 빠짐
+        self.assertEqual(len(first), 4)
+
+    def test_frame_keeps_column_names(self):
+        row = self.schema.build_row({'age': 30}, self.RULES)
+        frame = self.schema.frame(row)
+        self.assertEqual(list(frame.columns), self.schema.columns)
+        self.assertEqual(frame.shape, (1, 7))
+        self.assertEqual(frame.loc[0, 'AGE'], 30)
+
+
+class ModelRegistryTests(SimpleTestCase):
+    """지연 로드 / 버전 교체 / mmap 사본 관리"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.model_dir = os.path.join(tmp.name, 'models')
+        self.source_dir = os.path.join(tmp.name, 'source')
+        self.mmap_dir = os.path.join(tmp.name, 'mmap')
+        os.makedirs(self.model_dir)
+        os.makedirs(self.source_dir)
+        self.store = ArtifactStore(self.model_dir)
+
+    def write_pickle(self, directory, filename, value):
+        path = os.path.join(directory, filename)
+        with open(path, 'wb') as f:
+            pickle.dump(value, f)
+        return path
+
+    def publish(self, name, version, weights):
+        """model 과 metadata 에 같은 버전 표시를 넣어 게시"""
+        sources = {
+            'model': self.write_pickle(self.source_dir, f'{name}-{version}-model.pkl',
+                                       {'weights': np.asarray(weights, dtype=np.float64), 'version': version}),
+            'metadata': self.write_pickle(self.source_dir, f'{name}-{version}-metadata.pkl', {'version': version}),
+        }
+        return self.store.publish(name, sources, version=version)
+
+    def registry(self, use_mmap=True):
+        return ModelRegistry(store=self.store, mmap_dir=self.mmap_dir, use_mmap=use_mmap)
+
+    def mmap_copies(self):
+        return sorted(os.listdir(self.mmap_dir)) if os.path.isdir(self.mmap_dir) else []
+
+    def test_loads_lazily_and_remembers_missing(self):
+        self.write_pickle(self.model_dir, 'pneumonia_final_model.pkl', {'weights': [1, 2]})
+        registry = self.registry(use_mmap=False)
+
+        self.assertEqual(registry.stats(), {})
+        self.assertIn('pneumonia', registry.models)
+        self.assertNotIn('heart_failure', registry.models)
+        self.assertEqual(list(registry.models), ['pneumonia'])
+        self.assertIs(registry.get('pneumonia'), registry.models['pneumonia'])
+        self.assertIsNone(registry.get('pneumonia', 'metadata'))
+        self.assertTrue(registry.version('pneumonia').startswith('legacy-'))
+        self.assertEqual(list(registry.stats()), ['pneumonia'])
+
+    def test_model_is_memory_mapped_from_joblib_copy(self):
+        self.publish('pneumonia', 'v1', [1, 2, 3])
+
+        model = self.registry().get('pneumonia')
+
+        self.assertIsInstance(model['weights'], np.memmap)
+        np.testing.assert_array_equal(model['weights'], [1, 2, 3])
+        self.assertEqual(len(self.mmap_copies()), 1)
+        self.assertTrue(self.mmap_copies()[0].startswith('pneumonia_final_model.pkl.'))
+
+    def test_stale_copy_removed_after_version_swap(self):
+        self.publish('pneumonia', 'v1', [1, 2, 3])
+        self.publish('heart_failure', 'v1', [7])
+        registry = self.registry()
+        registry.warm(['pneumonia', 'heart_failure'])
+        before = self.mmap_copies()
+        self.assertEqual(len(before), 2)
+
+        self.publish('pneumonia', 'v2', [4, 5, 6])
+        self.assertEqual(registry.reload(), {'pneumonia': 'v2'})
+
+        np.testing.assert_array_equal(registry.get('pneumonia')['weights'], [4, 5, 6])
+        after = self.mmap_copies()
+        # 다른 모델의 사본은 그대로 두고 이전 버전 사본만 삭제
+        heart_failure = [entry for entry in before if entry.startswith('heart_failure')]
+        self.assertEqual([entry for entry in after if entry.startswith('heart_failure')], heart_failure)
+        pneumonia = [entry for entry in after if entry.startswith('pneumonia')]
+        self.assertEqual(len(pneumonia), 1)
+        self.assertNotIn(pneumonia[0], before)
+
+    def test_held_bundle_stays_consistent_during_swap(self):
+        self.publish('pneumonia', 'v1', [1])
+        self.publish('pneumonia', 'v2', [2])
+        self.store.activate('pneumonia', 'v1')
+        registry = self.registry(use_mmap=False)
+        held = registry.bundle('pneumonia')
+
+        stop = threading.Event()
+
+        def swap_repeatedly():
+            for i in range(20):
+                self.store.activate('pneumonia', 'v2' if i % 2 == 0 else 'v1')
+                registry.reload()
+            stop.set()
+
+        swapper = threading.Thread(target=swap_repeatedly)
+        swapper.start()
+        seen = set()
+        while True:
+            finished = stop.is_set()
+            bundle = registry.bundle('pneumonia')
+            # 예측 한 번이 잡은 묶음 안에서는 모델 / 메타데이터 버전이 섞이지 않음
+            self.assertEqual({bundle.version, bundle.model['version'], bundle.metadata['version']}, {bundle.version})
+            seen.add(bundle.version)
+            if finished:
+                break
+        swapper.join()
+
+        self.assertEqual((held.version, held.model['version'], held.metadata['version']), ('v1', 'v1', 'v1'))
+        self.assertEqual(registry.version('pneumonia'), 'v1')
+        self.assertTrue(seen)
+
+    def test_failed_reload_keeps_current_bundle(self):
+        self.publish('pneumonia', 'v1', [1])
+        registry = self.registry(use_mmap=False)
+        current = registry.bundle('pneumonia')
+
+        self.publish('pneumonia', 'v2', [2])
+        with open(os.path.join(self.store.version_dir('pneumonia', 'v2'), 'pneumonia_final_model.pkl'), 'ab') as f:
+            f.write(b'tampered')
+
+        self.assertEqual(registry.reload(), {})
+        self.assertIs(registry.bundle('pneumonia'), current)
+
+    @override_settings(ML_MODEL_RELOAD_INTERVAL=0)
+    def test_manifest_change_triggers_background_reload(self):
+        self.publish('pneumonia', 'v1', [1])
+        registry = self.registry(use_mmap=False)
+        self.assertEqual(registry.version('pneumonia'), 'v1')
+
+        self.publish('pneumonia', 'v2', [2])
+        deadline = time.monotonic() + 5
+        while registry.version('pneumonia') != 'v2' and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(registry.bundle('pneumonia').model['version'], 'v2')
+
+
+class PredictionCacheTests(SimpleTestCase):
+    """(작업, 모델 버전, 피처 벡터 해시) 키의 예측 결과 캐시"""
+
+    def make_cache(self, max_entries=8, ttl=60):
+        cache = PredictionCache(backend='memory')
+        cache._store = InProcessPredictionStore(max_entries=max_entries, ttl=ttl)
+        return cache
+
+    def test_same_features_and_version_hit(self):
+        cache = self.make_cache()
+        features = np.array([[1.0, 0.0, 2.5], [3.0, 4.0, 5.0]], dtype=np.float32)
+        keys = cache.keys('complication', 'v1', features)
+        cache.set_many({keys[0]: {'probability': 0.7}})
+
+        # -0.0 / float64 입력도 같은 벡터로 취급
+        again = cache.keys('complication', 'v1', np.array([1.0, -0.0, 2.5]))
+        self.assertEqual(again, keys[:1])
+        self.assertEqual(cache.get_many('complication', keys), [{'probability': 0.7}, None])
+
+        # 꺼낸 결과를 수정해도 캐시에는 영향 없음
+        cache.get_many('complication', again)[0]['probability'] = 0
+        self.assertEqual(cache.get_many('complication', again), [{'probability': 0.7}])
+
+    def test_model_version_change_misses(self):
+        cache = self.make_cache()
+        features = np.array([1.0, 2.0], dtype=np.float32)
+        cache.set_many({cache.keys('complication', 'v1', features)[0]: {'probability': 0.7}})
+
+        self.assertEqual(cache.get_many('complication', cache.keys('complication', 'v2', features)), [None])
+        self.assertEqual(cache.get_many('mortality', cache.keys('mortality', 'v1', features)), [None])
+
+    def test_entries_expire_after_ttl(self):
+        cache = self.make_cache(ttl=10)
+        key = cache.keys('complication', 'v1', np.array([1.0]))[0]
+        with mock.patch('ml_models.prediction_cache.time.monotonic', return_value=100.0):
+            cache.set_many({key: {'probability': 0.1}})
+        with mock.patch('ml_models.prediction_cache.time.monotonic', return_value=109.0):
+            self.assertEqual(cache.get_many('complication', [key]), [{'probability': 0.1}])
+        with mock.patch('ml_models.prediction_cache.time.monotonic', return_value=111.0):
+            self.assertEqual(cache.get_many('complication', [key]), [None])
+        self.assertEqual(len(cache.store._entries), 0)
+
+    def test_least_recently_used_evicted_at_capacity(self):
+        cache = self.make_cache(max_entries=2)
+        a, b, c = cache.keys('complication', 'v1', np.array([[1.0], [2.0], [3.0]]))
+        cache.set_many({a: {'v': 'a'}, b: {'v': 'b'}})
+        cache.get_many('complication', [a])  # a 를 최근 사용으로
+
+        cache.set_many({c: {'v': 'c'}})
+
+        self.assertEqual(cache.get_many('complication', [a, b, c]), [{'v': 'a'}, None, {'v': 'c'}])
+
+    @override_settings(ML_PREDICTION_CACHE_TTL=0)
+    def test_disabled_when_ttl_is_zero(self):
+        cache = self.make_cache()
+        key = cache.keys('complication', 'v1', np.array([1.0]))[0]
+        cache.set_many({key: {'probability': 0.1}})
+        self.assertEqual(cache.get_many('complication', [key]), [None])
+        self.assertEqual(len(cache.store._entries), 0)
+
+    def test_store_errors_are_misses(self):
+        cache = self.make_cache()
+        cache._store = mock.Mock(**{'get_many.side_effect': ConnectionError('redis down')})
+        key = cache.keys('complication', 'v1', np.array([1.0]))[0]
+        self.assertEqual(cache.get_many('complication', [key]), [None])
+
+
+class RiskSnapshotTests(TestCase):
+
+    def setUp(self):
+        self.patient = make_patient()
+
+    def snapshot(self, patient=None):
+        return LatestRiskSnapshot.objects.get(patient=patient or self.patient, model_name='pneumonia')
+
+    def test_older_prediction_does_not_overwrite(self):
+        newer = complication_task(self.patient, 0.9, minutes_ago=1)
+        older = complication_task(self.patient, 0.1, minutes_ago=10)
+        self.assertEqual(record_predictions([newer]), 1)
+        self.assertEqual(record_predictions([older]), 0)
+        self.assertEqual(self.snapshot().task_id, newer.pk)
+
+    def test_latest_prediction_wins_within_batch(self):
+        newer = complication_task(self.patient, 0.9, minutes_ago=1)
+        older = complication_task(self.patient, 0.1, minutes_ago=10)
+        record_predictions([newer, older])
+        self.assertEqual(self.snapshot().probability, 0.9)
+
+    def test_registration_task_ignored(self):
+        task = PredictionTask.objects.create(
+            patient=self.patient, task_type='COMPLICATION', status='COMPLETED', input_data={},
+            predictions={'data_registered': True},
+        )
+        self.assertEqual(record_predictions([task]), 0)
+        self.assertFalse(LatestRiskSnapshot.objects.exists())
+
+    def test_rebuild_matches_incremental(self):
+        other = make_patient('q')
+        tasks = [complication_task(self.patient, 0.2, 5), complication_task(other, 0.7, 3)]
+        record_predictions(tasks)
+        before = set(LatestRiskSnapshot.objects.values_list('patient_id', 'model_name', 'task_id', 'probability'))
+        result = rebuild_snapshots(chunk_size=1)
+        after = set(LatestRiskSnapshot.objects.values_list('patient_id', 'model_name', 'task_id', 'probability'))
+        self.assertEqual(before, after)
+        self.assertEqual(result['removed'], 0)
+
+    def test_rebuild_falls_back_when_latest_task_deleted(self):
+        older = complication_task(self.patient, 0.1, minutes_ago=10)
+        newer = complication_task(self.patient, 0.9, minutes_ago=1)
+        record_predictions([older, newer])
+        newer.delete()
+        rebuild_snapshots()
+        self.assertEqual(self.snapshot().task_id, older.pk)
+
+    def test_latest_risks_backfills_missing_patients(self):
+        complication_task(self.patient, 0.4, minutes_ago=1)
+        self.assertFalse(LatestRiskSnapshot.objects.exists())
+        risks = latest_risks([self.patient.uuid])
+        self.assertEqual(risks[str(self.patient.uuid)]['pneumonia'].probability, 0.4)
+        self.assertTrue(LatestRiskSnapshot.objects.filter(patient=self.patient).exists())
+
+
+class CohortScoringTests(TestCase):
+
+    def setUp(self):
+        now = timezone.now()
+        self.patients = [make_patient(f'p{i}') for i in range(5)]
+        for i, patient in enumerate(self.patients):
+            # 마지막 환자만 최근 바이탈이 없음 (재원 환자 아님)
+            session = VitalSession.objects.create(patient=patient, recorded_at=now - timedelta(hours=200 if i == 4 else 1))
+            VitalMeasurement.objects.create(session=session, bp='120/80', hr=80, rr=16, temp='36.5', spo2=97)
+
+    @mock.patch('ml_models.cohort.ml_service.predict_complications_batch', side_effect=fake_batch_results)
+    def test_scores_all_patients_in_chunks(self, predict):
+        progress = []
+        status = score_cohort(chunk_size=2, progress=progress.append)
+        self.assertEqual((status['total'], status['processed'], status['saved']), (5, 5, 5))
+        self.assertEqual(predict.call_count, 3)
+        self.assertEqual([p['processed'] for p in progress], [0, 2, 4, 5])
+        self.assertEqual(PredictionTask.objects.filter(task_type='COMPLICATION').count(), 5)
+        self.assertEqual(ComplicationPrediction.objects.count(), 15)
+        self.assertEqual(LatestRiskSnapshot.objects.count(), 15)
+        sent = predict.call_args_list[0].args[0][0]
+        self.assertEqual(sent['vital_signs']['systolic_bp'], 120)
+
+    @mock.patch('ml_models.cohort.ml_service.predict_complications_batch', side_effect=fake_batch_results)
+    def test_active_hours_and_ward_filters(self, predict):
+        self.assertEqual(score_cohort(active_hours=72)['total'], 4)
+        ward = [str(p.uuid) for p in self.patients[:2]]
+        self.assertEqual(score_cohort(patient_uuids=ward)['total'], 2)
+
+    @mock.patch('ml_models.cohort.ml_service.predict_complications_batch', side_effect=RuntimeError('model down'))
+    def test_prediction_failure_propagates(self, predict):
+        with self.assertRaises(RuntimeError):
+            score_cohort(chunk_size=2)
+        self.assertFalse(PredictionTask.objects.exists())
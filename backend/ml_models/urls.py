@@ -7,6 +7,9 @@ urlpatterns = [
     # 합병증 예측
     path('predict/complications/', views.predict_complications, name='predict_complications'),
     path('predict_complications/', views.predict_complications, name='predict_complications_legacy'),  # 기존 호환성
+    path('predict/complications/batch/', views.predict_complications_batch, name='predict_complications_batch'),  # 여러 환자 일괄
+    path('predict/complications/cohort/', views.score_cohort, name='score_cohort'),  # 병동/재원 환자 전체 (비동기)
+    path('predict/complications/cohort/<str:job_id>/', views.score_cohort_status, name='score_cohort_status'),
     
     # 사망률 예측
     path('predict/mortality/', views.predict_mortality, name='predict_mortality'),
@@ -35,6 +38,7 @@ urlpatterns = [
     path('patient/<str:patient_uuid>/info/', views.get_patient_info, name='patient_info'),
     path('patient/<str:patient_uuid>/predictions/', views.save_predictions_data, name='save_predictions'),
     path('patient/<str:patient_uuid>/results/', views.get_prediction_results, name='get_prediction_results'),
+    path('latest-risks/', views.get_latest_risks, name='get_latest_risks'),  # 대시보드용 여러 환자 최신 위험도
     
     # ============= SOD2 관련 API (기존 유지) =============
     path('patient/<str:patient_uuid>/sod2/', views.sod2_analysis, name='sod2_analysis'),
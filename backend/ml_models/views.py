@@ -1,8 +1,11 @@
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.views import APIView
+from celery.result import AsyncResult
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from io import StringIO
@@ -20,6 +23,9 @@ import pandas as pd
 import uuid
 from datetime import datetime
 from .ml_service import ml_service
+from .risk_snapshot import COMPLICATION_MODELS, MORTALITY_MODEL, latest_risks, record_predictions
+from .tasks import score_cohort_task
+from .batching import complication_batcher
 from .sod2_service import sod2_service
 
 # 사망률 예측을 위한 추가 import
@@ -78,6 +84,8 @@ def save_predictions_data(request, patient_uuid):
             predictions=prediction_results,
             # created_by=created_by_user # ⭐ created_by 인자 제거
         )
+        # COMPLICATION / MORTALITY 결과면 최신 위험도 스냅샷에도 반영 (다른 유형은 snapshot_rows 에서 무시)
+        record_predictions([prediction_task])
         
         logger.info(f"예측 데이터 저장 완료 - 환자: {patient.display_name}, 예측 유형: {prediction_type}, Task ID: {prediction_task.task_id}")
 
@@ -709,68 +717,18 @@ def lis_lab_results(request, patient_uuid):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_prediction_results(request, patient_uuid):
-    """환자의 모든 최신 예측 결과를 통합하여 조회 (수정된 최종 버전)"""
+    """환자의 모든 최신 예측 결과를 통합하여 조회 (최신 위험도 스냅샷 한 번 조회)"""
     try:
-        patient = get_object_or_404(OpenMRSPatient, uuid=patient_uuid)
-        
-        # -----------------------------------------------------------------
-        # 1. 최신 합병증 예측 결과 조회
-        # -----------------------------------------------------------------
-        # 가장 최근의 'COMPLICATION' 타입 Task를 찾습니다.
-        latest_complication_task = PredictionTask.objects.filter(
-            patient=patient,
-            task_type='COMPLICATION'
-        ).order_by('-created_at').first()
-
-        complications_data = {}
-        # Task가 존재하고, 그 안에 예측 결과(JSON)가 있으면 데이터를 추출합니다.
-        if latest_complication_task and latest_complication_task.predictions:
-            predictions = latest_complication_task.predictions
-            complications_data = {
-                # 프론트엔드 컴포넌트가 전체 result 객체를 원하므로 그대로 전달합니다.
-                'pneumonia': predictions.get('pneumonia', {}),
-                'acute_kidney_injury': predictions.get('acute_kidney_injury', {}),
-                'heart_failure': predictions.get('heart_failure', {})
-            }
-        
-        # -----------------------------------------------------------------
-        # 2. 최신 사망률 예측 결과 조회
-        # -----------------------------------------------------------------
-        # 가장 최근의 'MORTALITY' 타입 Task에 연결된 StrokeMortalityPrediction 객체를 찾습니다.
-        latest_mortality_prediction = StrokeMortalityPrediction.objects.filter(
-            task__patient=patient,
-            task__task_type='MORTALITY'
-        ).order_by('-task__created_at').first()
-
-        mortality_data = {}
-        if latest_mortality_prediction:
-            # 프론트엔드 컴포넌트가 필요로 하는 모든 필드를 담아줍니다.
-            mortality_data = {
-                'mortality_30_day': latest_mortality_prediction.mortality_30_day,
-                'mortality_30_day_risk_level': latest_mortality_prediction.mortality_30_day_risk_level,
-                'model_confidence': latest_mortality_prediction.model_confidence,
-                'model_auc': latest_mortality_prediction.model_auc,
-                'risk_factors': latest_mortality_prediction.risk_factors,
-                'clinical_recommendations': latest_mortality_prediction.clinical_recommendations,
-                'predicted_at': latest_mortality_prediction.task.created_at.isoformat()
-            }
-
-        # -----------------------------------------------------------------
-        # 3. 최종 응답 데이터 구성
-        # -----------------------------------------------------------------
-        # 프론트엔드 요약 컴포넌트가 데이터를 쉽게 찾을 수 있도록 키 이름을 명확히 합니다.
-        response_data = {
-            'complication_prediction': complications_data,
-            'mortality_prediction': mortality_data,
-        }
-        
-        all_tasks = PredictionTask.objects.filter(patient=patient, task_type__in=['COMPLICATION', 'MORTALITY']).order_by('-created_at')
-        last_updated = all_tasks.first().created_at.isoformat() if all_tasks.exists() else None
+        snapshots = latest_risks([patient_uuid]).get(str(patient_uuid))
+        if not snapshots:
+            # 예측이 하나도 없는 환자와 없는 환자를 구분 (기존처럼 없는 환자는 404)
+            get_object_or_404(OpenMRSPatient, uuid=patient_uuid)
+            snapshots = {}
         
         return Response({
-            'patient_uuid': str(patient.uuid),
-            'latest_predictions': response_data,
-            'last_updated': last_updated
+            'patient_uuid': str(patient_uuid),
+            'latest_predictions': _latest_predictions(snapshots),
+            'last_updated': _last_updated(snapshots)
         })
         
     except Exception as e:
@@ -779,6 +737,62 @@ def get_prediction_results(request, patient_uuid):
             {'error': f'최신 예측 결과를 조회할 수 없습니다: {str(e)}'}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+
+def _latest_predictions(snapshots):
+    """모델별 스냅샷 → 프론트엔드 요약 컴포넌트 형태 (합병증은 결과 객체 그대로, 없으면 빈 dict)"""
+    complications = {comp: snapshots[comp].result if comp in snapshots else {} for comp in COMPLICATION_MODELS}
+    return {
+        'complication_prediction': complications if any(complications.values()) else {},
+        'mortality_prediction': snapshots[MORTALITY_MODEL].result if MORTALITY_MODEL in snapshots else {},
+    }
+
+
+def _last_updated(snapshots):
+    return max(snapshot.predicted_at for snapshot in snapshots.values()).isoformat() if snapshots else None
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([AllowAny])
+def get_latest_risks(request):
+    """
+    대시보드용 여러 환자 최신 위험도 일괄 조회 (스냅샷 테이블 인덱스 쿼리 한 번)
+    GET ?patient_uuids=uuid1,uuid2 또는 POST {"patient_uuids": [...]}
+    """
+    if request.method == 'POST':
+        patient_uuids = request.data.get('patient_uuids')
+    else:
+        patient_uuids = [u for u in request.query_params.get('patient_uuids', '').split(',') if u]
+    if not isinstance(patient_uuids, list) or not patient_uuids:
+        return Response({'error': 'patient_uuids 목록이 필요합니다.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(patient_uuids) > settings.ML_BATCH_MAX_PATIENTS:
+        return Response(
+            {'error': f'한 번에 최대 {settings.ML_BATCH_MAX_PATIENTS}명까지 조회할 수 있습니다.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        risks = latest_risks([str(u) for u in patient_uuids])
+    except Exception as e:
+        logger.error(f"최신 위험도 일괄 조회 실패: {e}", exc_info=True)
+        return Response(
+            {'error': f'최신 위험도를 조회할 수 없습니다: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    
+    results = {}
+    for patient_uuid in map(str, patient_uuids):
+        snapshots = risks.get(patient_uuid, {})
+        results[patient_uuid] = {
+            'latest_predictions': _latest_predictions(snapshots),
+            'risk_levels': {
+                name: {'probability': snapshot.probability, 'risk_level': snapshot.risk_level}
+                for name, snapshot in snapshots.items()
+            },
+            'last_updated': _last_updated(snapshots),
+        }
+    return Response({'results': results}, status=status.HTTP_200_OK)
+
 # @api_view(['GET'])
 # @permission_classes([AllowAny])
 # def get_prediction_results(request, patient_uuid):
@@ -858,8 +872,8 @@ def predict_complications(request):
         
         logger.info(f"합병증 예측 시작 - 환자: {patient.display_name}")
         
-        # ML 서비스를 통한 예측 실행
-        prediction_results = ml_service.predict_complications(data)
+        # ML 서비스를 통한 예측 실행 (동시에 들어온 단건 요청은 마이크로 배처가 묶어서 실행)
+        prediction_results = complication_batcher.predict(data)
         
         # PredictionTask 생성
         task = PredictionTask.objects.create(
@@ -868,34 +882,15 @@ def predict_complications(request):
             status='COMPLETED',
             input_data=data,
             predictions=prediction_results,
+            model_version=prediction_results.get('model_version', ''),
+            cache_hit=prediction_results.get('cache_hit', False),
             processing_time=prediction_results.get('processing_time', 0),
             requested_by=request.user if request.user.is_authenticated else None
         )
         
         # 각 합병증별로 ComplicationPrediction 레코드 생성
-        complications = ['pneumonia', 'acute_kidney_injury', 'heart_failure']
-        created_predictions = []
-        
-        for comp in complications:
-            if comp in prediction_results:
-                comp_result = prediction_results[comp]
-                
-                # ComplicationPrediction 생성
-                comp_prediction = ComplicationPrediction.objects.create(
-                    task=task,
-                    complication_type=comp,
-                    probability=comp_result.get('probability', 0),
-                    risk_level=comp_result.get('risk_level', 'LOW'),
-                    threshold=comp_result.get('threshold', 0.5),
-                    model_auc=comp_result.get('model_performance', {}).get('auc', 0),
-                    model_precision=comp_result.get('model_performance', {}).get('precision', 0),
-                    model_recall=comp_result.get('model_performance', {}).get('recall', 0),
-                    model_f1=comp_result.get('model_performance', {}).get('f1', 0),
-                    model_type=comp_result.get('model_performance', {}).get('type', 'ensemble'),
-                    model_strategy=comp_result.get('model_performance', {}).get('strategy', 'supervised'),
-                    important_features={}  # 추후 기능 중요도 추가 가능
-                )
-                created_predictions.append(comp_prediction)
+        ComplicationPrediction.objects.bulk_create(ComplicationPrediction.from_prediction_results(task, prediction_results))
+        record_predictions([task])
         
         logger.info(f"합병증 예측 완료 - Task ID: {task.task_id}")
         
@@ -917,6 +912,123 @@ def predict_complications(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def predict_complications_batch(request):
+    """
+    합병증 배치 예측 API - 병동 전체 위험도 갱신 등 여러 환자를 한 번에 예측
+    요청: {"patients": [{"patient_uuid": ..., "age": ..., "vital_signs": {...}, ...}, ...]}
+    """
+    patients_data = request.data.get('patients')
+    if not isinstance(patients_data, list) or not patients_data:
+        return Response({'error': 'patients 목록이 필요합니다.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(patients_data) > settings.ML_BATCH_MAX_PATIENTS:
+        return Response(
+            {'error': f'한 번에 최대 {settings.ML_BATCH_MAX_PATIENTS}명까지 예측할 수 있습니다.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not all(isinstance(item, dict) for item in patients_data):
+        return Response({'error': 'patients 목록의 각 항목은 객체여야 합니다.'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    uuids = [item.get('patient_uuid') for item in patients_data]
+    if not all(uuids):
+        return Response({'error': '모든 항목에 환자 UUID가 필요합니다.'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        # 환자는 한 번의 쿼리로 조회
+        patients = {str(p.uuid): p for p in OpenMRSPatient.objects.filter(uuid__in=uuids)}
+        missing = sorted({str(u) for u in uuids} - set(patients))
+        if missing:
+            return Response({'error': '환자를 찾을 수 없습니다.', 'missing': missing}, status=status.HTTP_404_NOT_FOUND)
+        
+        logger.info(f"합병증 배치 예측 시작 - {len(patients_data)}명")
+        batch_results = ml_service.predict_complications_batch(patients_data)
+        
+        requested_by = request.user if request.user.is_authenticated else None
+        with transaction.atomic():
+            tasks = PredictionTask.objects.bulk_create([
+                PredictionTask(
+                    patient=patients[str(item['patient_uuid'])],
+                    task_type='COMPLICATION',
+                    status='COMPLETED',
+                    input_data=item,
+                    predictions=results,
+                    model_version=results.get('model_version', ''),
+                    cache_hit=results.get('cache_hit', False),
+                    processing_time=results.get('processing_time', 0),
+                    requested_by=requested_by
+                )
+                for item, results in zip(patients_data, batch_results)
+            ])
+            ComplicationPrediction.objects.bulk_create([
+                row for task, results in zip(tasks, batch_results)
+                for row in ComplicationPrediction.from_prediction_results(task, results)
+            ])
+            record_predictions(tasks)
+        
+        logger.info(f"합병증 배치 예측 완료 - {len(tasks)}명")
+        return Response({
+            'count': len(tasks),
+            'results': [
+                {
+                    'task_id': str(task.task_id),
+                    'patient_uuid': str(item['patient_uuid']),
+                    'predictions': results,
+                }
+                for task, item, results in zip(tasks, patients_data, batch_results)
+            ]
+        }, status=status.HTTP_200_OK)
+        
+    except Exception as e:
+        logger.error(f"합병증 배치 예측 중 오류: {e}", exc_info=True)
+        return Response(
+            {'error': f'합병증 배치 예측 중 오류가 발생했습니다: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def score_cohort(request):
+    """
+    코호트 위험도 일괄 갱신 시작 API (Celery 태스크)
+    요청: {"patient_uuids": [...]} (병동 명단) 또는 {"active_only": true, "active_hours": 72} (재원 환자), 비우면 전체
+    응답의 job_id 로 score_cohort_status 에서 진행 상황을 조회합니다. 전체 환자를 다시 계산하므로 스태프만 호출할 수 있습니다.
+    """
+    patient_uuids = request.data.get('patient_uuids')
+    if patient_uuids is not None and (not isinstance(patient_uuids, list) or not patient_uuids):
+        return Response({'error': 'patient_uuids 는 비어 있지 않은 목록이어야 합니다.'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    active_hours = None
+    if request.data.get('active_only'):
+        try:
+            active_hours = float(request.data.get('active_hours') or settings.ML_COHORT_ACTIVE_HOURS)
+        except (TypeError, ValueError):
+            return Response({'error': 'active_hours 는 숫자여야 합니다.'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    job = score_cohort_task.delay(
+        patient_uuids=[str(u) for u in patient_uuids] if patient_uuids else None,
+        active_hours=active_hours,
+        requested_by_id=request.user.pk
+    )
+    logger.info(f"코호트 위험도 갱신 요청 - job: {job.id}")
+    return Response({'job_id': job.id, 'status': 'PENDING'}, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def score_cohort_status(request, job_id):
+    """코호트 위험도 갱신 진행 상황 조회 (PENDING / PROGRESS / SUCCESS / FAILURE)"""
+    job = AsyncResult(job_id)
+    if job.state == 'PROGRESS':
+        progress = job.info or {}
+    elif job.successful():
+        progress = job.result or {}
+    elif job.failed():
+        progress = {'error': str(job.result)}
+    else:
+        progress = {}
+    return Response({'job_id': job_id, 'status': job.state, **progress}, status=status.HTTP_200_OK)
+
 # ============= 사망률 예측 API (수정된 버전) =============
 
 @api_view(['POST'])
@@ -948,6 +1060,8 @@ def predict_mortality(request):
             status='COMPLETED',
             input_data=data,
             predictions=mortality_results,
+            model_version=mortality_results.get('model_version', ''),
+            cache_hit=mortality_results.get('cache_hit', False),
             processing_time=mortality_results.get('processing_time', 0),
             requested_by=request.user if request.user.is_authenticated else None
         )
@@ -971,6 +1085,7 @@ def predict_mortality(request):
             clinical_recommendations='; '.join(mortality_results.get('clinical_recommendations', [])),
             monitoring_priority=mortality_results.get('risk_level', 'LOW')
         )
+        record_predictions([task])
         
         logger.info(f"사망률 예측 완료 - Task ID: {task.task_id}, 확률: {mortality_results.get('mortality_30_day', 0):.3f}")
         
@@ -1,6 +1,28 @@
-from prometheus_client import Gauge
+from prometheus_client import Counter, Gauge, Histogram
 
 my_custom_gauge = Gauge('my_custom_metric', '설명')
 
 def set_metric(value):
-    my_custom_gauge.set(value)
\ No newline at end of file
+    my_custom_gauge.set(value)
+
+# PACS DICOM 인스턴스 디스크 캐시
+pacs_instance_cache_hits = Counter('pacs_instance_cache_hits_total', 'DICOM 인스턴스 디스크 캐시 적중 수')
+pacs_instance_cache_misses = Counter('pacs_instance_cache_misses_total', 'DICOM 인스턴스 디스크 캐시 미스 수')
+pacs_instance_cache_evictions = Counter('pacs_instance_cache_evictions_total', 'DICOM 인스턴스 디스크 캐시 제거(LRU) 수')
+pacs_instance_cache_bytes = Gauge('pacs_instance_cache_bytes', 'DICOM 인스턴스 디스크 캐시 사용량(bytes)')
+
+# Orthanc REST 호출
+orthanc_request_seconds = Histogram(
+    'orthanc_request_duration_seconds', 'Orthanc 요청 지연 시간(초)', ['endpoint', 'method', 'outcome'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+orthanc_request_retries = Counter('orthanc_request_retries_total', 'Orthanc 요청 재시도 수', ['endpoint'])
+orthanc_circuit_open = Gauge('orthanc_circuit_open', 'Orthanc 회로 차단기 열림 여부 (1 = 요청 차단 중)')
+orthanc_circuit_rejections = Counter('orthanc_circuit_rejections_total', '회로 차단으로 보내지 않은 Orthanc 요청 수', ['endpoint'])
+
+# ML 모델 레지스트리
+ml_model_load_seconds = Gauge('ml_model_load_seconds', 'ML 아티팩트 로드 시간(초)', ['model', 'artifact'])
+ml_model_resident_bytes = Gauge('ml_model_resident_bytes', 'ML 아티팩트 로드로 늘어난 상주 메모리(bytes)', ['model', 'artifact'])
+ml_prediction_cache_hits = Counter('ml_prediction_cache_hits_total', 'ML 예측 결과 캐시 적중 수 (환자 단위)', ['task'])
+ml_prediction_cache_misses = Counter('ml_prediction_cache_misses_total', 'ML 예측 결과 캐시 미스 수 (환자 단위)', ['task'])
+ml_prediction_cache_entries = Gauge('ml_prediction_cache_entries', '프로세스 내 ML 예측 결과 캐시 항목 수')
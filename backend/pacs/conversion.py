@@ -0,0 +1,145 @@
+# pacs/conversion.py
+# 저장소의 NIfTI 를 DICOM 시리즈로 변환해 Orthanc 에 올리는 로직
+# 뷰(DicomConverterMixin)에서 바로 호출하거나, 백그라운드 작업(run_dicom_conversion)으로 실행합니다.
+# 작업으로 실행하면 이미지 종류(FLAIR, SEG 등)별로 download / encode / pacs 단계 진행률이 기록됩니다.
+
+import logging
+import os
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pydicom
+from django.conf import settings
+from pydicom.dataset import Dataset
+from pydicom.uid import generate_uid
+
+from .jobs import JobCancelled
+from .nifti_encoder import iter_slice_major, iter_volume_slices, rescale_volume
+from .nifti_volume import NiftiVolume
+from .object_storage import get_object_storage
+from .orthanc_client import orthanc_client, summarize_batch_stats
+from .previews import preview_store
+
+logger = logging.getLogger(__name__)
+
+CONVERSION_STAGES = ('download', 'encode', 'pacs')
+
+
+def instance_base_url(request):
+    """뷰어가 인스턴스를 받아 갈 URL 의 앞부분 (작업 스레드에는 request 가 없으므로 미리 계산)"""
+    return request.build_absolute_uri('/api/pacs/dicom-instance-data/')
+
+
+def convert_nifti_series(gcs_path, patient_identifier, patient_name, study_uid, image_type, instance_url,
+                         progress=None):
+    """
+    NIfTI 1개 → DICOM 시리즈 변환 + Orthanc 업로드.
+    실패하면 None 을 반환합니다 (작업 취소는 그대로 전달).
+    """
+    logger.info(f"DICOM 변환 시작 ({image_type}): {gcs_path}")
+    safe_temp_dir = os.path.join(settings.BASE_DIR, 'temp_files')
+    os.makedirs(safe_temp_dir, exist_ok=True)
+    suffix = '.nii.gz' if gcs_path.endswith('.gz') else '.nii'
+    temp_nifti_path = os.path.join(safe_temp_dir, f"{uuid.uuid4()}{suffix}")
+
+    try:
+        if progress:
+            progress.update(image_type, 'download', 0, total=1)
+        get_object_storage().download_file(gcs_path, temp_nifti_path)
+        if progress:
+            progress.update(image_type, 'download', 1)
+
+        # 전체 볼륨을 float64 로 올리지 않고 슬라이스 묶음 단위로 읽음
+        volume = NiftiVolume(temp_nifti_path)
+        slabs = volume.iter_slabs()
+
+        if image_type.upper() == 'SEG':
+            # 마스크는 0/1 or 0/255로 강제 변환 (픽셀 오버레이 선명하게!)
+                slabs = ((slab <= 0.5).astype(np.uint8) * 255 for slab in slabs)   # ★★★ 반전!
+                window_center, window_width = 128, 255
+                real_min, real_max = 0, 255
+                int_max, int_min = 255, 0
+                rescale_slope = 1
+                rescale_intercept = 0
+                bits_allocated = 8
+                bits_stored = 8
+                high_bit = 7
+        else:
+            window_center, window_width = 115.0, 4186.0
+            real_min, real_max = volume.min_max()
+            int_max, int_min = np.iinfo(np.int16).max, np.iinfo(np.int16).min
+            rescale_slope = (real_max - real_min) / (int_max - int_min) if real_max != real_min else 1.0
+            rescale_intercept = real_min
+
+        series_uid = generate_uid()
+
+        # 슬라이스 묶음 단위로 스케일링/회전하고, 슬라이스마다 바뀌지 않는 태그는 템플릿으로 한 번만 직렬화
+        slices = iter_slice_major(
+            (rescale_volume(slab, rescale_intercept, rescale_slope, int_min) for slab in slabs), rotate_k=3
+        )
+        now = datetime.now()
+        pix_zooms = volume.zooms[:2]
+        common = Dataset()
+        common.PatientID, common.PatientName = patient_identifier, patient_name.replace(' ', '^')
+        common.StudyInstanceUID, common.SeriesInstanceUID = study_uid, series_uid
+        common.Modality, common.ImageType = "MR", ["DERIVED", "PRIMARY"]
+        common.StudyDate, common.StudyTime = now.strftime('%Y%m%d'), now.strftime('%H%M%S')
+        common.PixelSpacing = [f"{z:.8f}" for z in reversed(pix_zooms)]
+        common.SamplesPerPixel = 1
+        common.PhotometricInterpretation = "MONOCHROME2"
+        common.BitsAllocated, common.BitsStored, common.HighBit = 16, 16, 15
+        common.PixelRepresentation = 1
+        common.RescaleIntercept, common.RescaleSlope = f"{rescale_intercept:.8f}", f"{rescale_slope:.8f}"
+        common.WindowCenter, common.WindowWidth = f"{window_center:.8f}", f"{window_width:.8f}"
+
+        buffers = iter_volume_slices(slices, common, pydicom.uid.MRImageStorage)
+        on_batch = None
+        if progress:
+            progress.update(image_type, 'encode', 0, total=volume.num_slices)
+            progress.update(image_type, 'pacs', 0, total=volume.num_slices)
+            buffers = progress.track(buffers, image_type, 'encode')
+            on_batch = lambda uploaded: progress.update(image_type, 'pacs', uploaded)
+
+        # keep-alive 세션 + 배치 병렬 업로드
+        orthanc_ids, batch_stats = orthanc_client.upload_instances(buffers, on_batch=on_batch)
+        upload_stats = summarize_batch_stats(batch_stats)
+        logger.info(f"DICOM 업로드 완료 ({image_type}): {upload_stats['instances']}개, {upload_stats['seconds']}s")
+        preview_store.schedule(upload_stats['series'])
+
+        image_ids = [f"wadouri:{instance_url}{_id}/" for _id in orthanc_ids]
+        return {"seriesInstanceUID": series_uid, "imageIds": image_ids, "uploadStats": upload_stats}
+
+    except JobCancelled:
+        raise
+    except Exception as e:
+        logger.error(f"DICOM 변환 중 오류 ({gcs_path}): {e}", exc_info=True)
+        return None
+    finally:
+        if os.path.exists(temp_nifti_path): os.remove(temp_nifti_path)
+
+
+def run_dicom_conversion(progress, patient_identifier, patient_name, study_uid, images, instance_url):
+    """
+    JobRunner 에서 실행되는 변환 작업 본체 (NiftiToDicomBundleView 의 백그라운드 버전).
+    images: [{'type': 'FLAIR' | 'SEG' | ..., 'gcs_path': ...}, ...]
+    결과는 번들 응답과 같은 {이미지 종류: 시리즈 정보} 입니다.
+    """
+    images = [req for req in images if req.get('type') and req.get('gcs_path')]
+    for req in images:
+        progress.init_unit(req['type'], CONVERSION_STAGES)
+
+    results = {}
+    for req in images:
+        image_type = req['type']
+        progress.set_status(image_type, 'running')
+        series_result = convert_nifti_series(
+            req['gcs_path'], patient_identifier, patient_name, study_uid, image_type, instance_url,
+            progress=progress,
+        )
+        if series_result:
+            results[image_type] = series_result
+            progress.set_status(image_type, 'completed')
+        else:
+            progress.set_status(image_type, 'error')
+    return results
@@ -0,0 +1,165 @@
+# pacs/dicom_batch.py
+# DICOM 일괄 업로드 (ZIP 또는 여러 파일)
+# - 픽셀 데이터 해시로 같은 환자에게 이미 올라간 영상 / 배치 안의 중복을 건너뜀
+# - 환자 태그(PatientID, PatientName)만 바꾸고 나머지 UID/태그는 원본 유지
+# - 바꾼 인스턴스를 ZIP 하나로 묶어 Orthanc 에 한 번에 전송하고, 확인 조회도 배치당 한 번만 함
+
+import hashlib
+import logging
+import tempfile
+import time
+import zipfile
+
+import pydicom
+from django.conf import settings
+from pydicom.errors import InvalidDicomError
+from pydicom.filebase import DicomBytesIO
+from pydicom.uid import generate_uid
+
+from .models import DicomPixelHash
+from .orthanc_client import orthanc_client
+from .previews import preview_store
+
+logger = logging.getLogger(__name__)
+
+MAX_UID_LENGTH = 64
+PIXEL_DATA_KEYWORDS = ('PixelData', 'FloatPixelData', 'DoubleFloatPixelData')
+SKIPPED_MEMBER_NAMES = ('DICOMDIR',)
+
+
+def iter_upload_members(uploaded_files):
+    """업로드된 파일들 → (이름, 바이트) (ZIP 은 안의 파일을 하나씩 풀어서)"""
+    for uploaded in uploaded_files:
+        if zipfile.is_zipfile(uploaded):
+            uploaded.seek(0)
+            with zipfile.ZipFile(uploaded) as archive:
+                for info in archive.infolist():
+                    name = info.filename
+                    if info.is_dir() or name.startswith('__MACOSX/') or name.rsplit('/', 1)[-1] in SKIPPED_MEMBER_NAMES:
+                        continue
+                    yield f"{uploaded.name}:{name}", archive.read(info)
+        else:
+            uploaded.seek(0)
+            yield uploaded.name, uploaded.read()
+
+
+def pixel_hash(dataset, raw_bytes):
+    """픽셀 데이터 SHA-256 (픽셀이 없는 객체는 파일 전체)"""
+    for keyword in PIXEL_DATA_KEYWORDS:
+        if keyword in dataset:
+            return hashlib.sha256(dataset[keyword].value).hexdigest()
+    return hashlib.sha256(raw_bytes).hexdigest()
+
+
+class DicomBatchImporter:
+    """
+    한 환자의 DICOM 묶음을 Orthanc 에 올립니다.
+    UID 가 없거나 64자를 넘는 경우에만 새로 만들되, 배치 안에서는 같은 원본 UID 를 같은 새 UID 로 바꿔 시리즈가 쪼개지지 않게 합니다.
+    """
+
+    def __init__(self, patient_id, patient_name):
+        self.patient_id = patient_id
+        self.patient_name = patient_name
+        self._uid_map = {}
+
+    def run(self, uploaded_files):
+        started = time.perf_counter()
+        summary = {'received': 0, 'uploaded': 0, 'already_stored': 0, 'duplicates': [], 'invalid': []}
+        known_hashes = self._stored_hashes()
+
+        pending = []  # (이름, 해시, SOPInstanceUID)
+        # 큰 배치도 메모리에 다 올리지 않도록 일정 크기를 넘으면 디스크로 넘어가는 임시 파일에 ZIP 작성
+        with tempfile.SpooledTemporaryFile(max_size=settings.PACS_BATCH_SPOOL_SIZE) as spool:
+            with zipfile.ZipFile(spool, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+                for name, raw_bytes in iter_upload_members(uploaded_files):
+                    summary['received'] += 1
+                    try:
+                        dataset = pydicom.dcmread(DicomBytesIO(raw_bytes))
+                    except (InvalidDicomError, ValueError, EOFError) as e:
+                        # DICOM 이 아닌 파일 (README, 썸네일 등) 은 건너뛰고 결과에 표시
+                        summary['invalid'].append({'name': name, 'error': str(e)})
+                        continue
+
+                    digest = pixel_hash(dataset, raw_bytes)
+                    if digest in known_hashes:
+                        summary['duplicates'].append(name)
+                        continue
+                    known_hashes.add(digest)
+
+                    self._rewrite(dataset)
+                    encoded = DicomBytesIO()
+                    # 원본 전송 구문 유지, 파일 메타만 Part 10 형식으로 보장
+                    pydicom.dcmwrite(encoded, dataset, enforce_file_format=True)
+                    archive.writestr(f"{len(pending):06d}.dcm", encoded.getvalue())
+                    pending.append((name, digest, str(dataset.SOPInstanceUID)))
+
+            results = []
+            if pending:
+                spool.seek(0)
+                # ZIP 하나를 한 번의 요청으로 스트리밍 전송
+                results = orthanc_client.upload_archive(spool)
+
+        summary['uploaded'] = sum(1 for r in results if r.get('Status') == 'Success')
+        summary['already_stored'] = sum(1 for r in results if r.get('Status') == 'AlreadyStored')
+        self._record_hashes(pending, results)
+        preview_store.schedule(sorted({r['ParentSeries'] for r in results if r.get('ParentSeries')}))
+        summary['instances'] = [
+            {'name': name, 'sop_instance_uid': sop_uid, 'orthanc_id': result.get('ID'), 'status': result.get('Status')}
+            for (name, _, sop_uid), result in zip(pending, results)
+        ]
+        summary['seconds'] = round(time.perf_counter() - started, 3)
+        logger.info(
+            f"DICOM 일괄 업로드 ({self.patient_id}): 수신 {summary['received']}, 전송 {len(pending)}, "
+            f"중복 {len(summary['duplicates'])}, 오류 {len(summary['invalid'])}, {summary['seconds']}s"
+        )
+        return summary
+
+    def verify(self):
+        """배치당 한 번 Orthanc 에 환자가 생겼는지 확인"""
+        return bool(orthanc_client.post_json('/tools/find', {"Level": "Patient", "Query": {"PatientID": self.patient_id}}))
+
+    def _stored_hashes(self):
+        """
+        이 환자에게 이미 올라간 픽셀 해시 중 Orthanc 에 인스턴스가 아직 남아 있는 것만 반환합니다.
+        Orthanc 에서 직접 삭제된 인스턴스의 해시는 지워서, 같은 영상을 다시 올릴 때 중복으로 건너뛰지 않게 합니다.
+        """
+        recorded = list(
+            DicomPixelHash.objects.filter(patient_id=self.patient_id).values_list('pk', 'pixel_hash', 'orthanc_id')
+        )
+        if not recorded:
+            return set()
+        # 환자 인스턴스 ID 목록은 배치당 한 번만 조회
+        existing = set(orthanc_client.post_json(
+            '/tools/find', {"Level": "Instance", "Query": {"PatientID": self.patient_id}}
+        ))
+        stale = [pk for pk, _, orthanc_id in recorded if orthanc_id not in existing]
+        if stale:
+            DicomPixelHash.objects.filter(pk__in=stale).delete()
+            logger.info(f"Orthanc 에서 삭제된 인스턴스의 픽셀 해시 {len(stale)}건 정리 ({self.patient_id})")
+        return {digest for _, digest, orthanc_id in recorded if orthanc_id in existing}
+
+    def _rewrite(self, dataset):
+        dataset.PatientID = self.patient_id
+        dataset.PatientName = self.patient_name
+        for keyword in ('StudyInstanceUID', 'SeriesInstanceUID', 'SOPInstanceUID'):
+            value = str(getattr(dataset, keyword, '') or '')
+            if value and len(value) <= MAX_UID_LENGTH:
+                continue
+            if not value:
+                new_uid = generate_uid()
+            else:
+                new_uid = self._uid_map.setdefault((keyword, value), generate_uid())
+            setattr(dataset, keyword, new_uid)
+            if keyword == 'SOPInstanceUID' and getattr(dataset, 'file_meta', None) is not None:
+                dataset.file_meta.MediaStorageSOPInstanceUID = new_uid
+
+    def _record_hashes(self, pending, results):
+        stored = [
+            DicomPixelHash(
+                patient_id=self.patient_id, pixel_hash=digest, sop_instance_uid=sop_uid,
+                orthanc_id=result.get('ID', ''),
+            )
+            for (_, digest, sop_uid), result in zip(pending, results)
+            if result.get('Status') in ('Success', 'AlreadyStored')
+        ]
+        DicomPixelHash.objects.bulk_create(stored, ignore_conflicts=True)
@@ -6,7 +6,6 @@ import nibabel as nib
 import highdicom as hd
 from datetime import datetime
 import logging
-import requests
 import pydicom
 
 from pydicom.dataset import Dataset, FileMetaDataset
@@ -17,52 +16,25 @@ from highdicom.sr.coding import Code
 from highdicom.seg.content import AlgorithmIdentificationSequence
 # from highdicom.seg.content import SourceImageForSegmentation
 
+from .dicom_templates import dicom_templates
+from .nifti_volume import NiftiVolume
+from .object_storage import get_object_storage
+from .orthanc_client import orthanc_client
 
 logger = logging.getLogger(__name__)
 
 
-ref_dicom_path = '/home/shared/medical_cdss/backend/pacs/a374402b-874d1007-1566e6fa-388eda0f-8945e79a.dcm'
-ref_dicom = pydicom.dcmread(ref_dicom_path)
-if not hasattr(ref_dicom, "PatientBirthDate"): ref_dicom.PatientBirthDate = "19000101" 
-if not hasattr(ref_dicom, "PatientSex"): ref_dicom.PatientSex = "O"
-if not hasattr(ref_dicom, "PatientID"): ref_dicom.PatientID = "DUMMYID"
-if not hasattr(ref_dicom, "PatientName"): ref_dicom.PatientName = "Anonymous"
-if not hasattr(ref_dicom, "AccessionNumber"): ref_dicom.AccessionNumber = "00000000"
-if not hasattr(ref_dicom, "StudyID"): ref_dicom.StudyID = "1"
-if not hasattr(ref_dicom, 'FrameOfReferenceUID'): ref_dicom.FrameOfReferenceUID = generate_uid()
-
-
-import os
-import tempfile
-import uuid
-import numpy as np
-import nibabel as nib
-import highdicom as hd
-from datetime import datetime
-import logging
-import requests
-import pydicom
-
-from pydicom.dataset import Dataset, FileMetaDataset
-from pydicom.sequence import Sequence
-from pydicom.uid import generate_uid
-from django.conf import settings
-from highdicom.sr.coding import Code
-from highdicom.seg.content import AlgorithmIdentificationSequence
-
-logger = logging.getLogger(__name__)
-
-
-def create_enhanced_dicom_from_nifti(nifti_path: str, template_dicom_path: str, patient, study_uid: str) -> pydicom.Dataset:
+def create_enhanced_dicom_from_nifti(nifti_path: str, patient, study_uid: str, modality: str = 'MR') -> pydicom.Dataset:
     """
-    NIfTI 파일, 클래식 DICOM 템플릿, patient/study 정보로 '가짜' 인핸스드 DICOM을 생성합니다.
+    NIfTI 파일, 모달리티별 클래식 DICOM 템플릿, patient/study 정보로 '가짜' 인핸스드 DICOM을 생성합니다.
     """
     # 1단계, 2단계는 이전과 동일
-    nifti_img = nib.load(nifti_path)
-    template_ds = pydicom.dcmread(template_dicom_path)
-    pixel_data_for_shape = np.transpose(nifti_img.get_fdata(), (2, 1, 0))
-    num_frames = pixel_data_for_shape.shape[0]
-    affine = nifti_img.affine
+    # 프레임 수와 affine 은 헤더만으로 알 수 있으므로 복셀 데이터는 읽지 않음
+    volume = NiftiVolume(nifti_path)
+    # 템플릿은 처음 한 번만 읽고, 여기서는 메모리에 있는 것의 사본만 받음
+    template_ds = dicom_templates.get(modality)
+    num_frames = volume.num_slices
+    affine = volume.affine
     pixel_spacing = [np.linalg.norm(affine[:3, 1]), np.linalg.norm(affine[:3, 0])]
     slice_thickness = np.linalg.norm(affine[:3, 2])
     row_vec = affine[:3, 1] / pixel_spacing[0]
@@ -91,21 +63,12 @@ def create_enhanced_dicom_from_nifti(nifti_path: str, template_dicom_path: str,
     shared_fg_sequence.append(shared_ds)
 
     # 3-2. 각 프레임별로 다른 정보 (Per-Frame)
-    per_frame_fg_sequence = Sequence()
-    for i in range(num_frames):
-        position = affine[:3, 3] + affine[:3, 2] * i
-        frame_ds = Dataset()
-        
-        # Plane Position (각 슬라이스 위치)
-        plane_pos_sequence = Sequence([Dataset()])
-        plane_pos_sequence[0].ImagePositionPatient = [round(p, 8) for p in position]
-        frame_ds.PlanePositionSequence = plane_pos_sequence
-        
-        # --- ▼▼▼ 여기서 PlaneOrientationSequence 생성 코드 삭제 ▼▼▼ ---
-        per_frame_fg_sequence.append(frame_ds)
+    # 슬라이스 위치는 한 번에 계산하고, 프레임마다 위치 항목 하나만 만듦
+    positions = np.round(affine[:3, 3] + np.outer(np.arange(num_frames), affine[:3, 2]), 8).tolist()
+    per_frame_fg_sequence = Sequence([_plane_position_item(position) for position in positions])
 
     # --- 4단계: 템플릿 DICOM에 모든 정보 주입 (이전과 동일) ---
-    ds = template_ds.copy()
+    ds = template_ds  # 이미 호출마다 새로 만든 사본
     
     # 필수 태그 채워 넣기
     ds.PatientID = getattr(patient, 'identifier', 'DUMMY_ID')
@@ -123,6 +86,7 @@ def create_enhanced_dicom_from_nifti(nifti_path: str, template_dicom_path: str,
     ds.SOPClassUID = '1.2.840.10008.5.1.4.1.1.4.1'
     ds.SOPInstanceUID = generate_uid()
     ds.NumberOfFrames = num_frames
+    ds.Rows, ds.Columns = volume.shape[0], volume.shape[1]
     
     if 'PixelData' in ds:
         del ds.PixelData
@@ -143,80 +107,134 @@ def create_enhanced_dicom_from_nifti(nifti_path: str, template_dicom_path: str,
     return ds
 
 
+def _plane_position_item(position):
+    # Plane Position (각 슬라이스 위치)
+    plane_position = Dataset()
+    plane_position.ImagePositionPatient = position
+    frame_ds = Dataset()
+    frame_ds.PlanePositionSequence = Sequence([plane_position])
+    return frame_ds
+
+
+# 인코딩 방식 → (SEG 유형, 전송 구문)
+# binary: 1비트로 묶어 저장 (비압축), fractional: 8비트 프레임을 RLE 무손실 압축
+SEG_ENCODINGS = {
+    'binary': (hd.seg.SegmentationTypeValues.BINARY, pydicom.uid.ExplicitVRLittleEndian),
+    'fractional': (hd.seg.SegmentationTypeValues.FRACTIONAL, pydicom.uid.RLELossless),
+}
+
+
+def renumber_labels(label_map):
+    """
+    라벨 값 → 1..K 연속 세그먼트 번호로 바꾼 맵과 [(세그먼트 번호, 원래 라벨 값), ...] 반환.
+    highdicom 라벨맵 입력은 1부터 최댓값까지 모든 번호에 설명이 있어야 하므로 실제 있는 라벨만 남김.
+    """
+    values = np.unique(label_map)
+    values = values[values != 0]
+    lookup = np.zeros(int(label_map.max()) + 1, dtype=np.uint8 if len(values) < 256 else np.uint16)
+    lookup[values] = np.arange(1, len(values) + 1)
+    return lookup[label_map], [(number, int(value)) for number, value in enumerate(values, 1)]
+
+
+def build_segment_descriptions(segments, segment_labels=None):
+    """segments: [(세그먼트 번호, 원래 라벨 값)], segment_labels: {라벨 값: 이름} (없으면 settings.PACS_SEG_LABELS)"""
+    names = {int(k): v for k, v in (segment_labels or settings.PACS_SEG_LABELS).items()}
+    algorithm = AlgorithmIdentificationSequence(
+        name='nnUNet',
+        version='1.0',
+        family=Code("111023", "DCM", "Deep Learning")
+    )
+    return [
+        hd.seg.SegmentDescription(
+            segment_number=number,
+            segment_label=names.get(value, f"Label {value}"),
+            segmented_property_category=Code('T-D0050', 'SRT', 'Tissue'),
+            segmented_property_type=Code('M-01010', 'SRT', 'Lesion'),
+            algorithm_type=hd.seg.SegmentAlgorithmTypeValues.AUTOMATIC,
+            algorithm_identification=algorithm,
+        )
+        for number, value in segments
+    ]
+
+
+def build_segmentation(source_image, label_map, series_instance_uid, segment_labels=None, encoding='binary'):
+    """
+    (z, x, y) 라벨맵의 모든 라벨을 세그먼트로 갖는 DICOM SEG 1개를 만듭니다.
+    반환: (hd.seg.Segmentation, [{'segmentNumber', 'labelValue', 'label'}, ...])
+    """
+    if encoding not in SEG_ENCODINGS:
+        raise ValueError(f"지원하지 않는 SEG 인코딩: {encoding} (가능: {', '.join(SEG_ENCODINGS)})")
+    segmentation_type, transfer_syntax_uid = SEG_ENCODINGS[encoding]
+
+    pixel_array, segments = renumber_labels(label_map)
+    if not segments:
+        raise ValueError("마스크에 라벨이 없습니다")
+    descriptions = build_segment_descriptions(segments, segment_labels)
+
+    seg = hd.seg.Segmentation(
+        source_images=[source_image],
+        pixel_array=pixel_array,
+        segmentation_type=segmentation_type,
+        segment_descriptions=descriptions,
+        series_instance_uid=series_instance_uid,
+        sop_instance_uid=hd.UID(),
+        series_number=999,
+        instance_number=1,
+        manufacturer="Your-Company-Name",
+        manufacturer_model_name='NIfTI-to-DICOM-SEG-Converter',
+        software_versions='1.0.0',
+        device_serial_number='NotApplicable',
+        transfer_syntax_uid=transfer_syntax_uid,
+    )
+    summary = [
+        {'segmentNumber': number, 'labelValue': value, 'label': description.SegmentLabel}
+        for (number, value), description in zip(segments, descriptions)
+    ]
+    return seg, summary
+
+
 class SegDicomConverterMixin:
-    def convert_nifti_to_dicom_seg(self, gcs_path, patient, study_uid, request, referenced_series_uid=None):
+    def convert_nifti_to_dicom_seg(self, gcs_path, patient, study_uid, request, referenced_series_uid=None,
+                                   segment_labels=None, encoding='binary'):
+        """
+        NIfTI 라벨맵 (nnU-Net 다중 클래스 출력 포함) → 모든 라벨을 세그먼트로 갖는 DICOM SEG 1개.
+        segment_labels: {라벨 값: 세그먼트 이름}, encoding: 'binary' (1비트) | 'fractional' (8비트 RLE)
+        """
         logger.info(f"SEG DICOM 변환 시작: {gcs_path}")
         safe_temp_dir = os.path.join(settings.BASE_DIR, 'temp_files')
         os.makedirs(safe_temp_dir, exist_ok=True)
-        temp_nifti_path = os.path.join(safe_temp_dir, f"{uuid.uuid4()}.nii.gz")
+        suffix = '.nii.gz' if gcs_path.endswith('.gz') else '.nii'
+        temp_nifti_path = os.path.join(safe_temp_dir, f"{uuid.uuid4()}{suffix}")
         temp_seg_path = os.path.join(safe_temp_dir, f"{uuid.uuid4()}_seg.dcm")
 
         try:
-            from google.cloud import storage
-            storage_client = storage.Client()
-            bucket_name, blob_name = gcs_path.replace("gs://", "").split("/", 1)
-            bucket = storage_client.bucket(bucket_name)
-            bucket.blob(blob_name).download_to_filename(temp_nifti_path)
-
-            template_dicom_path = '/home/shared/medical_cdss/backend/pacs/a374402b-874d1007-1566e6fa-388eda0f-8945e79a.dcm'
+            get_object_storage().download_file(gcs_path, temp_nifti_path)
 
             fake_enhanced_dicom = create_enhanced_dicom_from_nifti(
                 nifti_path=temp_nifti_path,
-                template_dicom_path=template_dicom_path,
                 patient=patient,
                 study_uid=study_uid
             )
 
-            nifti_img = nib.load(temp_nifti_path)
-            mask_data = (nifti_img.get_fdata(dtype=np.float32) > 0.5).astype(np.uint8)
-            pixel_array = np.transpose(mask_data, (2, 0, 1))
-            
+            # float 볼륨 대신 슬라이스 묶음 단위로 정수 라벨맵 (z, x, y) 만 만들고, 모든 라벨을 SEG 1개에 담음
+            label_map = NiftiVolume(temp_nifti_path).label_map()
+
             if referenced_series_uid is None:
                 referenced_series_uid = hd.UID()
 
-            seg = hd.seg.Segmentation(
-                source_images=[fake_enhanced_dicom],
-                pixel_array=pixel_array,
-                segmentation_type=hd.seg.SegmentationTypeValues.BINARY,
-                segment_descriptions=[
-                    hd.seg.SegmentDescription(
-                        segment_number=1,
-                        segment_label="Lesion",
-                        segmented_property_category=Code('T-D0050', 'SRT', 'Tissue'),
-                        segmented_property_type=Code('M-01010', 'SRT', 'Lesion'),
-                        algorithm_type=hd.seg.SegmentAlgorithmTypeValues.AUTOMATIC,
-                        algorithm_identification=AlgorithmIdentificationSequence(
-                            name='nnUNet',
-                            version='1.0',
-                            family=Code("111023", "DCM", "Deep Learning")
-                        )
-                    )
-                ],
-                series_instance_uid=referenced_series_uid,
-                sop_instance_uid=hd.UID(),
-                series_number=999,
-                instance_number=1,
-                manufacturer="Your-Company-Name",
-                manufacturer_model_name='NIfTI-to-DICOM-SEG-Converter',
-                software_versions='1.0.0',
-                device_serial_number='NotApplicable',
+            seg, segments = build_segmentation(
+                fake_enhanced_dicom, label_map, referenced_series_uid,
+                segment_labels=segment_labels, encoding=encoding,
             )
 
             seg.save_as(temp_seg_path)
-            logger.info(f"DICOM SEG 저장 완료: {temp_seg_path}")
+            logger.info(f"DICOM SEG 저장 완료: {temp_seg_path} (세그먼트 {len(segments)}개, {encoding})")
 
             with open(temp_seg_path, "rb") as f:
-                resp = requests.post(
-                    f"{settings.ORTHANC_URL}/instances",
-                    data=f.read(),
-                    auth=(settings.ORTHANC_USERNAME, settings.ORTHANC_PASSWORD),
-                    headers={'Content-Type': 'application/dicom'}
-                )
-                resp.raise_for_status()
-                instance_id = resp.json().get("ID")
+                instance_id = orthanc_client.upload_instance(f.read()).get("ID")
 
             image_ids = [f"wadouri:{request.build_absolute_uri(f'/api/pacs/dicom-instance-data/{instance_id}/')}"]
-            return {"seriesInstanceUID": referenced_series_uid, "imageIds": image_ids}
+            return {"seriesInstanceUID": referenced_series_uid, "imageIds": image_ids, "segments": segments}
 
         except Exception as e:
             logger.error(f"DICOM SEG 변환 실패: {e}", exc_info=True)
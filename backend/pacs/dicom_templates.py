@@ -0,0 +1,79 @@
+# pacs/dicom_templates.py
+# 참조 DICOM 템플릿 레지스트리
+# settings.PACS_DICOM_TEMPLATES ({모달리티: 파일 경로, 'default': 경로}) 의 템플릿을 처음 쓸 때 한 번만 읽어 두고,
+# 호출하는 쪽에는 수정해도 되는 사본을 넘깁니다. (Dataset.copy() 는 얕은 복사라 원본 요소가 같이 바뀜)
+
+import copy
+import logging
+import threading
+
+import pydicom
+from django.conf import settings
+from pydicom.uid import generate_uid
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATE = 'default'
+
+# 템플릿에 없으면 채워 두는 기본값 (SEG 생성 시 필수 태그)
+TEMPLATE_DEFAULTS = {
+    'PatientBirthDate': "19000101",
+    'PatientSex': "O",
+    'PatientID': "DUMMYID",
+    'PatientName': "Anonymous",
+    'AccessionNumber': "00000000",
+    'StudyID': "1",
+}
+
+
+class DicomTemplateRegistry:
+    """모달리티별 참조 DICOM 을 지연 로딩하고 메모리에 보관"""
+
+    def __init__(self, templates=None):
+        self._templates = templates
+        self._datasets = {}
+        self._lock = threading.Lock()
+
+    @property
+    def templates(self):
+        return self._templates or settings.PACS_DICOM_TEMPLATES
+
+    def resolve(self, modality=None):
+        """모달리티 → 설정 키 (해당 모달리티 템플릿이 없으면 default)"""
+        key = (modality or DEFAULT_TEMPLATE).upper()
+        if key in self.templates:
+            return key
+        if DEFAULT_TEMPLATE in self.templates:
+            return DEFAULT_TEMPLATE
+        raise ValueError(f"DICOM 템플릿이 설정되지 않았습니다: {modality}")
+
+    def get(self, modality=None):
+        """템플릿 사본 (픽셀 데이터 없이 헤더만)"""
+        return copy.deepcopy(self._load(self.resolve(modality)))
+
+    def _load(self, key):
+        dataset = self._datasets.get(key)
+        if dataset is None:
+            with self._lock:
+                dataset = self._datasets.get(key)
+                if dataset is None:
+                    path = self.templates[key]
+                    # 템플릿의 픽셀은 쓰지 않으므로 읽지 않음
+                    dataset = pydicom.dcmread(path, stop_before_pixels=True)
+                    for keyword, value in TEMPLATE_DEFAULTS.items():
+                        if keyword not in dataset:
+                            setattr(dataset, keyword, value)
+                    if 'FrameOfReferenceUID' not in dataset:
+                        dataset.FrameOfReferenceUID = generate_uid()
+                    self._datasets[key] = dataset
+                    logger.info(f"DICOM 템플릿 로드 ({key}): {path}")
+        return dataset
+
+    def clear(self):
+        """설정을 바꾼 뒤 다시 읽도록 캐시 비움"""
+        with self._lock:
+            self._datasets.clear()
+
+
+# 싱글톤 인스턴스 생성
+dicom_templates = DicomTemplateRegistry()
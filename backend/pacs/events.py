@@ -0,0 +1,150 @@
+# pacs/events.py
+# PACS 작업 진행 이벤트 pub/sub
+# 작업 실행 쪽(JobProgress / JobRunner)이 발행하고, SSE 스트림이 작업별 채널을 구독합니다.
+# - redis : 여러 프로세스/노드 사이에 이벤트 전달 (운영)
+# - memory: 같은 프로세스 안에서만 전달 (개발 / 단일 프로세스용 대체 구현)
+# 이벤트는 진행 상황 알림일 뿐이고 최종 상태는 항상 ProcessingJob 에 있으므로, 유실돼도 DB 로 복구됩니다.
+
+import json
+import logging
+import queue
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'pacs:job:'
+
+
+def job_channel(job_id):
+    return f"{CHANNEL_PREFIX}{job_id}"
+
+
+class InProcessEventBroker:
+    """프로세스 내 구독자 큐로 전달 (느린 구독자는 오래된 이벤트부터 버림)"""
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for pending in subscribers:
+            while True:
+                try:
+                    pending.put_nowait(message)
+                    break
+                except queue.Full:
+                    try:
+                        pending.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def subscribe(self, channel):
+        pending = queue.Queue(maxsize=self.max_pending)
+        with self._lock:
+            self._subscribers[channel].add(pending)
+        return _QueueSubscription(self, channel, pending)
+
+    def _unsubscribe(self, channel, pending):
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(pending)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+
+class _QueueSubscription:
+    def __init__(self, broker, channel, pending):
+        self._broker = broker
+        self._channel = channel
+        self._pending = pending
+
+    def get(self, timeout):
+        """다음 이벤트 (timeout 초 안에 없으면 None)"""
+        try:
+            return self._pending.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._broker._unsubscribe(self._channel, self._pending)
+
+
+class RedisEventBroker:
+    """Redis PUBLISH / SUBSCRIBE (클라이언트는 최초 사용 시 한 번만 생성)"""
+
+    def __init__(self, url=None):
+        self._url = url
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import redis
+
+                    self._client = redis.Redis.from_url(self._url or settings.PACS_EVENT_REDIS_URL)
+        return self._client
+
+    def publish(self, channel, message):
+        self.client.publish(channel, json.dumps(message, default=str))
+
+    def subscribe(self, channel):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(channel)
+        return _RedisSubscription(pubsub)
+
+
+class _RedisSubscription:
+    def __init__(self, pubsub):
+        self._pubsub = pubsub
+
+    def get(self, timeout):
+        message = self._pubsub.get_message(timeout=timeout)
+        if message is None:
+            return None
+        return json.loads(message['data'])
+
+    def close(self):
+        self._pubsub.close()
+
+
+EVENT_BROKERS = {
+    'memory': InProcessEventBroker,
+    'redis': RedisEventBroker,
+}
+
+_brokers = {}
+_brokers_lock = threading.Lock()
+
+
+def get_event_broker(backend=None):
+    """settings.PACS_EVENT_BACKEND 에 맞는 브로커 (백엔드별로 프로세스당 1개)"""
+    backend = backend or settings.PACS_EVENT_BACKEND
+    if backend not in _brokers:
+        with _brokers_lock:
+            if backend not in _brokers:
+                if backend not in EVENT_BROKERS:
+                    raise ValueError(f"알 수 없는 이벤트 백엔드: {backend}")
+                _brokers[backend] = EVENT_BROKERS[backend]()
+    return _brokers[backend]
+
+
+def publish_job_event(job_id, **fields):
+    """작업 이벤트 발행. 브로커 오류가 작업을 실패시키지 않도록 로그만 남김"""
+    try:
+        get_event_broker().publish(job_channel(job_id), {'job_id': str(job_id), **fields})
+    except Exception as e:
+        logger.warning(f"작업 이벤트 발행 실패 ({job_id}): {e}")
+
+
+def subscribe_job_events(job_id):
+    return get_event_broker().subscribe(job_channel(job_id))
@@ -0,0 +1,145 @@
+# pacs/ingest.py
+# 다중 모달리티 NIfTI 업로드 파이프라인
+# 모달리티마다 '저장소 업로드'와 'DICOM 인코딩 → Orthanc 전송'을 별도 작업으로 동시에 실행하고,
+# 인코딩과 Orthanc 전송도 배치 단위로 겹쳐서 진행합니다.
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pydicom
+from django.conf import settings
+from django.db import close_old_connections
+from pydicom.dataset import Dataset
+
+from .jobs import JobCancelled
+from .nifti_encoder import iter_slice_major, iter_volume_slices
+from .nifti_index import record_nifti_metadata
+from .nifti_volume import NiftiVolume
+from .object_storage import get_object_storage
+from .orthanc_client import orthanc_client, summarize_batch_stats
+from .previews import preview_store
+
+logger = logging.getLogger(__name__)
+
+INGEST_STAGES = ('storage', 'encode', 'pacs')
+CT_IMAGE_STORAGE = '1.2.840.10008.5.1.4.1.1.2'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def ingest_executor():
+    """저장소 업로드 / 인코딩+전송 작업용 공유 풀 (말단 작업만 넣어 교착을 피함)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.PACS_INGEST_WORKERS, thread_name_prefix='pacs-ingest')
+    return _executor
+
+
+def run_nifti_ingest(progress, patient_uuid, patient_identifier, patient_name, session_folder, items):
+    """
+    JobRunner 에서 실행되는 업로드 작업 본체.
+    items: [{'modality': 'FLAIR', 'path': 임시 파일 경로 또는 None, 'name': 원본 파일명}, ...]
+    """
+    futures = {}
+    for item in items:
+        modality = item['modality']
+        if item['path'] is None:
+            # 파일이 없는 모달리티는 업로드/변환 없이 건너뜀 (응답 상태값은 기존 API 의 'dummy_generated' 유지)
+            progress.set_status(modality, 'skipped')
+            continue
+        progress.init_unit(modality, INGEST_STAGES)
+        blob_name = f"nifti/{patient_uuid}/{session_folder}/{modality}/{item['name']}"
+        futures[modality] = (
+            ingest_executor().submit(_upload_to_storage, progress, modality, item['path'], blob_name),
+            ingest_executor().submit(_encode_and_send, progress, modality, item['path'], patient_identifier, patient_name),
+        )
+
+    result = []
+    uploaded_blobs = {}
+    try:
+        for item in items:
+            modality = item['modality']
+            if modality not in futures:
+                result.append({'modality': modality, 'status': 'dummy_generated'})
+                continue
+            storage_future, pacs_future = futures[modality]
+            try:
+                gcs_path = storage_future.result()
+                upload_stats = pacs_future.result()
+                uploaded_blobs[modality.lower()] = gcs_path
+                progress.set_status(modality, 'uploaded')
+                result.append({
+                    'modality': modality, 'status': 'uploaded',
+                    'gcs_path': gcs_path, 'upload_stats': upload_stats,
+                })
+            except JobCancelled:
+                progress.set_status(modality, 'cancelled')
+                result.append({'modality': modality, 'status': 'cancelled'})
+            except Exception as e:
+                logger.error(f"NIfTI 업로드 실패 ({modality}): {e}", exc_info=True)
+                progress.set_status(modality, 'error', error=str(e))
+                result.append({'modality': modality, 'status': 'error', 'error': str(e)})
+    finally:
+        for storage_future, pacs_future in futures.values():
+            storage_future.exception()
+            pacs_future.exception()
+        for item in items:
+            if item['path'] and os.path.exists(item['path']):
+                os.remove(item['path'])
+
+    progress.raise_if_cancelled()
+    return {'results': result, 'uploaded_blobs': uploaded_blobs}
+
+
+def _upload_to_storage(progress, modality, path, blob_name):
+    close_old_connections()
+    progress.set_status(modality, 'running')
+    progress.update(modality, 'storage', 0, total=1)
+    gcs_path = get_object_storage().upload_file(path, blob_name)
+    try:
+        # 세션 목록 조회용 헤더 요약 인덱스 (목록 조회 시 파일을 다시 받지 않도록)
+        record_nifti_metadata(gcs_path, NiftiVolume(path).metadata(), size=os.path.getsize(path))
+    except Exception as e:
+        logger.warning(f"NIfTI 메타데이터 인덱스 저장 실패 ({blob_name}): {e}")
+    progress.update(modality, 'storage', 1)
+    return gcs_path
+
+
+def _encode_and_send(progress, modality, path, patient_identifier, patient_name):
+    close_old_connections()
+    progress.set_status(modality, 'running')
+    volume = NiftiVolume(path)
+    total = volume.num_slices
+    progress.update(modality, 'encode', 0, total=total)
+    progress.update(modality, 'pacs', 0, total=total)
+
+    # 슬라이스 묶음 단위로 읽어 변환하고 공통 태그는 템플릿으로 한 번만 직렬화
+    slices = iter_slice_major((slab * 255 for slab in volume.iter_slabs()), dtype=np.uint16)
+    common = Dataset()
+    common.PatientID                 = patient_identifier
+    common.PatientName               = patient_name
+    common.Modality                  = modality
+    common.StudyInstanceUID          = pydicom.uid.generate_uid()
+    common.SeriesInstanceUID         = pydicom.uid.generate_uid()
+    common.SamplesPerPixel           = 1
+    common.PhotometricInterpretation = "MONOCHROME2"
+    common.PixelRepresentation       = 0
+    common.BitsAllocated             = 16
+    common.BitsStored                = 16
+    common.HighBit                   = 15
+
+    # 인코딩과 Orthanc 배치 전송을 겹쳐서 진행
+    _, batch_stats = orthanc_client.upload_instances(
+        progress.track(iter_volume_slices(slices, common, CT_IMAGE_STORAGE), modality, 'encode'),
+        on_batch=lambda uploaded: progress.update(modality, 'pacs', uploaded),
+    )
+    upload_stats = summarize_batch_stats(batch_stats)
+    # 시리즈 목록용 미리보기는 작업 완료를 기다리지 않고 따로 생성
+    preview_store.schedule(upload_stats['series'])
+    return upload_stats
@@ -0,0 +1,183 @@
+# pacs/instance_cache.py
+
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+
+from monitoring.prometheus_metrics import (
+    pacs_instance_cache_bytes,
+    pacs_instance_cache_evictions,
+    pacs_instance_cache_hits,
+    pacs_instance_cache_misses,
+)
+from .orthanc_client import orthanc_client
+from .streaming import STREAM_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class DiskInstanceCache:
+    """
+    DICOM 인스턴스 디스크 캐시.
+    인스턴스는 저장 후 바뀌지 않으므로 Orthanc 인스턴스 ID(UID 해시)를 주소로 사용하고,
+    전체 용량이 max_bytes 를 넘으면 가장 오래 사용하지 않은 파일부터 지웁니다.
+    """
+
+    def __init__(self, directory=None, max_bytes=None, client=None):
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self.client = client or orthanc_client
+        self._index = None  # path -> size (오래된 순)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self):
+        return str(self._directory or settings.PACS_INSTANCE_CACHE_DIR)
+
+    @property
+    def max_bytes(self):
+        return self._max_bytes if self._max_bytes is not None else settings.PACS_INSTANCE_CACHE_MAX_BYTES
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def path_for(self, instance_id):
+        digest = hashlib.sha256(instance_id.encode()).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest[2:4], f"{digest}.dcm")
+
+    def get(self, instance_id):
+        """캐시된 파일 경로를 반환 (없으면 None)"""
+        path = self.path_for(instance_id)
+        with self._lock:
+            self._ensure_index()
+            if not os.path.exists(path):
+                # 다른 프로세스가 지웠을 수 있으므로 인덱스에서도 정리
+                self._total_bytes -= self._index.pop(path, 0)
+                pacs_instance_cache_misses.inc()
+                return None
+            if path in self._index:
+                self._index.move_to_end(path)
+            else:
+                # 다른 워커 프로세스가 저장한 파일
+                size = os.path.getsize(path)
+                self._index[path] = size
+                self._total_bytes += size
+            pacs_instance_cache_hits.inc()
+        try:
+            # 다른 워커 프로세스가 재시작 후 인덱스를 만들 때도 LRU 순서가 유지되도록 mtime 갱신
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def fetch(self, instance_id):
+        """Orthanc에서 인스턴스를 받아 캐시에 원자적으로 저장하고 경로를 반환"""
+        path = self.path_for(instance_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        upstream = self.client.stream(f"/instances/{instance_id}/file")
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in upstream.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    f.write(chunk)
+            os.replace(tmp_path, path)
+        finally:
+            upstream.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._add(path, os.path.getsize(path))
+        return path
+
+    def iter_fill(self, instance_id, chunks):
+        """
+        Orthanc 본문 청크를 그대로 내보내면서 같은 내용을 캐시 파일로 기록합니다 (미스 때 전체를 받을 때까지 기다리지 않음).
+        끝까지 전송된 경우에만 캐시에 넣고, 클라이언트가 중간에 끊거나 디스크 오류가 나면 임시 파일만 지웁니다.
+        """
+        path = self.path_for(instance_id)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            f = open(tmp_path, 'wb')
+        except OSError as e:
+            logger.warning(f"DICOM 인스턴스 캐시 기록 불가, 캐시 없이 스트리밍 - {e}")
+            yield from chunks
+            return
+
+        completed = False
+        try:
+            with f:
+                writable = True
+                for chunk in chunks:
+                    if writable:
+                        try:
+                            f.write(chunk)
+                        except OSError as e:
+                            logger.warning(f"DICOM 인스턴스 캐시 기록 중단 - {e}")
+                            writable = False
+                    yield chunk
+            completed = writable
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+            try:
+                if completed:
+                    os.replace(tmp_path, path)
+                    self._add(path, os.path.getsize(path))
+                elif os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            except OSError as e:
+                logger.warning(f"DICOM 인스턴스 캐시 저장 실패 - {e}")
+
+    def get_or_fetch(self, instance_id):
+        return self.get(instance_id) or self.fetch(instance_id)
+
+    def _add(self, path, size):
+        with self._lock:
+            self._ensure_index()
+            self._total_bytes += size - self._index.pop(path, 0)
+            self._index[path] = size
+            self._evict()
+            pacs_instance_cache_bytes.set(self._total_bytes)
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            path, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            pacs_instance_cache_evictions.inc()
+
+    def _ensure_index(self):
+        """최초 사용 시 디스크를 훑어 mtime 순으로 인덱스를 구성"""
+        if self._index is not None:
+            return
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.dcm'):
+                    continue
+                full_path = os.path.join(root, name)
+                try:
+                    stat = os.stat(full_path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, full_path, stat.st_size))
+        entries.sort()
+        self._index = OrderedDict((path, size) for _, path, size in entries)
+        self._total_bytes = sum(size for _, _, size in entries)
+        logger.info(f"DICOM 인스턴스 캐시 인덱스 구성: {len(self._index)}개, {self._total_bytes / 1024 / 1024:.1f}MB")
+        self._evict()
+        pacs_instance_cache_bytes.set(self._total_bytes)
+
+
+# 싱글톤 인스턴스 생성
+instance_cache = DiskInstanceCache()
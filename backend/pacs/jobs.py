@@ -0,0 +1,230 @@
+# pacs/jobs.py
+# PACS 백그라운드 작업 실행기
+# 작업 상태는 ProcessingJob 에 저장하므로 어느 워커/노드에서든 조회/취소할 수 있고,
+# 실행은 작업 종류별로 프로세스당 크기가 제한된 스레드 풀에서 합니다.
+# 대기열이 가득 차면 작업을 만들지 않고 JobQueueFull 로 거절합니다.
+# 진행률/상태가 바뀔 때마다 pacs.events 로 이벤트를 발행해 SSE 구독자에게 바로 전달합니다.
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .events import publish_job_event
+from .models import ProcessingJob
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """실행 중 + 대기 중인 작업 수가 한도에 도달함"""
+
+
+class JobCancelled(Exception):
+    """실행 중인 작업이 취소 요청을 확인하고 중단함"""
+
+
+class JobProgress:
+    """
+    작업 1건의 단계별 진행 상황을 메모리에 모아 두고 DB 에는 일정 간격으로만 반영합니다.
+    여러 스레드가 같은 작업의 다른 단계를 갱신해도 마지막 쓰기가 앞선 갱신을 덮어쓰지 않도록 한 곳에서 씁니다.
+    stages 구조: {단위(예: 모달리티): {"status": ..., 단계: {"done": n, "total": m}}}
+    """
+
+    def __init__(self, job_id, flush_interval=0.5, cancel_check_interval=1.0):
+        self.job_id = job_id
+        self.flush_interval = flush_interval
+        self.cancel_check_interval = cancel_check_interval
+        self.stages = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # 오래된 스냅샷이 나중에 쓰이지 않도록 DB 반영을 직렬화
+        self._last_flush = 0.0
+        self._last_cancel_check = 0.0
+        self._cancelled = False
+
+    def init_unit(self, unit, stage_names, status='queued'):
+        with self._lock:
+            self.stages[unit] = {'status': status, **{name: {'done': 0, 'total': 0} for name in stage_names}}
+        self.flush(force=True)
+
+    def set_status(self, unit, status, **extra):
+        with self._lock:
+            self.stages.setdefault(unit, {}).update(status=status, **extra)
+        self.flush(force=True)
+
+    def update(self, unit, stage, done, total=None):
+        with self._lock:
+            entry = self.stages.setdefault(unit, {}).setdefault(stage, {'done': 0, 'total': 0})
+            entry['done'] = done
+            if total is not None:
+                entry['total'] = total
+            finished = bool(entry['total']) and done >= entry['total']
+        # 단계가 끝났을 때는 바로, 진행 중에는 flush_interval 마다 반영
+        self.flush(force=finished)
+
+    def overall_progress(self):
+        """모든 단위/단계의 완료 비율 평균 (0~100)"""
+        fractions = []
+        for unit in self.stages.values():
+            if unit.get('status') == 'skipped':
+                continue
+            for value in unit.values():
+                if isinstance(value, dict) and value.get('total'):
+                    fractions.append(min(value['done'] / value['total'], 1.0))
+                elif isinstance(value, dict):
+                    fractions.append(0.0)
+        return int(100 * sum(fractions) / len(fractions)) if fractions else 0
+
+    def track(self, iterable, unit, stage):
+        """iterable 을 그대로 넘기면서 넘긴 개수를 stage 진행률로 기록 (항목마다 취소 지점)"""
+        for index, item in enumerate(iterable, 1):
+            self.raise_if_cancelled()
+            yield item
+            self.update(unit, stage, index)
+
+    def is_cancelled(self):
+        """다른 노드에서 요청한 취소도 보이도록 DB 의 취소 플래그를 cancel_check_interval 마다 확인"""
+        now = time.monotonic()
+        if not self._cancelled and now - self._last_cancel_check >= self.cancel_check_interval:
+            self._last_cancel_check = now
+            self._cancelled = ProcessingJob.objects.filter(pk=self.job_id, cancel_requested=True).exists()
+        return self._cancelled
+
+    def raise_if_cancelled(self):
+        """작업 함수가 단계 사이사이에 호출하는 취소 지점"""
+        if self.is_cancelled():
+            raise JobCancelled()
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        with self._flush_lock:
+            with self._lock:
+                self._last_flush = now
+                snapshot = {unit: {k: (dict(v) if isinstance(v, dict) else v) for k, v in stage.items()}
+                            for unit, stage in self.stages.items()}
+                progress = self.overall_progress()
+            ProcessingJob.objects.filter(pk=self.job_id).update(
+                stages=snapshot, progress=progress, updated_at=timezone.now()
+            )
+            publish_job_event(self.job_id, stages=snapshot, progress=progress)
+
+
+class JobRunner:
+    """
+    ProcessingJob 을 제한된 스레드 풀에서 실행하고 상태를 기록.
+    워커 수와 대기열 한도는 settings 이름으로 받아 첫 사용 시 읽습니다.
+    """
+
+    def __init__(self, name, workers_setting, queue_limit_setting):
+        self.name = name
+        self.workers_setting = workers_setting
+        self.queue_limit_setting = queue_limit_setting
+        self._executor = None
+        self._active = 0  # 이 프로세스에서 실행 중 + 대기 중인 작업 수
+        self._lock = threading.Lock()
+
+    @property
+    def max_workers(self):
+        return getattr(settings, self.workers_setting)
+
+    @property
+    def queue_limit(self):
+        return getattr(settings, self.queue_limit_setting)
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix=self.name,
+                    )
+        return self._executor
+
+    @property
+    def queue_depth(self):
+        return self._active
+
+    def enqueue(self, job_type, func, args=(), kwargs=None, patient_uuid='', payload=None):
+        """
+        자리가 있으면 작업을 기록하고 실행 대기열에 넣습니다. 없으면 JobQueueFull.
+        func(progress, *args, **kwargs) 의 반환값이 작업 결과(result)로 저장됩니다.
+        """
+        with self._lock:
+            if self._active >= self.queue_limit:
+                raise JobQueueFull(f"{self.name} 대기열이 가득 찼습니다 ({self._active}/{self.queue_limit})")
+            self._active += 1
+        try:
+            job = ProcessingJob.objects.create(job_type=job_type, patient_uuid=patient_uuid, payload=payload or {})
+            future = self.executor.submit(self._run, job.pk, func, args, kwargs or {})
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return job
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+
+    def _run(self, job_id, func, args, kwargs):
+        close_old_connections()
+        progress = JobProgress(job_id)
+        try:
+            # 대기 중에 취소된 작업은 시작하지 않음
+            started = ProcessingJob.objects.filter(pk=job_id, status='queued').update(
+                status='running', started_at=timezone.now()
+            )
+            if not started:
+                logger.info(f"PACS 작업 시작 전 취소됨: {job_id}")
+                return
+            publish_job_event(job_id, status='running')
+            result = func(progress, *args, **kwargs)
+            progress.flush(force=True)
+            ProcessingJob.objects.filter(pk=job_id).update(
+                status='completed', progress=100, result=result, finished_at=timezone.now()
+            )
+            publish_job_event(job_id, status='completed', progress=100, result=result)
+            logger.info(f"PACS 작업 완료: {job_id}")
+        except JobCancelled:
+            logger.info(f"PACS 작업 취소: {job_id}")
+            progress.flush(force=True)
+            ProcessingJob.objects.filter(pk=job_id).update(status='cancelled', finished_at=timezone.now())
+            publish_job_event(job_id, status='cancelled')
+        except Exception as e:
+            logger.error(f"PACS 작업 실패 ({job_id}): {e}", exc_info=True)
+            progress.flush(force=True)
+            ProcessingJob.objects.filter(pk=job_id).update(
+                status='failed', error=str(e), finished_at=timezone.now()
+            )
+            publish_job_event(job_id, status='failed', error=str(e))
+        finally:
+            # 풀 스레드는 요청 사이클 밖이므로 DB 연결을 직접 정리
+            close_old_connections()
+
+
+def cancel_job(job_id):
+    """
+    대기 중인 작업은 바로 취소하고, 실행 중인 작업은 취소 플래그를 세워 다음 취소 지점에서 멈추게 합니다.
+    어느 노드에서 호출해도 되며, 갱신된 작업을 반환합니다.
+    """
+    now = timezone.now()
+    ProcessingJob.objects.filter(pk=job_id, status='queued').update(
+        status='cancelled', cancel_requested=True, finished_at=now, updated_at=now
+    )
+    ProcessingJob.objects.filter(pk=job_id, status='running').update(cancel_requested=True, updated_at=now)
+    job = ProcessingJob.objects.get(pk=job_id)
+    publish_job_event(job_id, status=job.status, cancel_requested=True)
+    return job
+
+
+# 싱글톤 인스턴스 생성 (작업 종류별로 풀을 나눠 긴 분할 작업이 업로드를 막지 않도록 함)
+job_runner = JobRunner('pacs-job', 'PACS_JOB_WORKERS', 'PACS_JOB_QUEUE_LIMIT')
+segmentation_runner = JobRunner('pacs-segmentation', 'PACS_SEGMENTATION_WORKERS', 'PACS_SEGMENTATION_QUEUE_LIMIT')
@@ -0,0 +1,117 @@
+# pacs/management/commands/_mock_orthanc.py
+# 벤치마크용 가짜 Orthanc 서버 (요청마다 고정 지연을 흉내냄)
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockOrthanc:
+    """studies x series_per_study 구조의 환자 1명을 가진 가짜 Orthanc"""
+
+    def __init__(self, patient_id='BENCH0001', studies=50, series_per_study=10, latency=0.01):
+        self.patient_id = patient_id
+        self.latency = latency
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self.patient_orthanc_id = 'patient-0000'
+        self.studies = {}
+        self.series = {}
+        for s in range(studies):
+            study_id = f'study-{s:04d}'
+            series_ids = []
+            for r in range(series_per_study):
+                series_id = f'{study_id}-series-{r:03d}'
+                series_ids.append(series_id)
+                self.series[series_id] = {
+                    'ID': series_id,
+                    'Type': 'Series',
+                    'ParentStudy': study_id,
+                    'Instances': [f'{series_id}-instance-{i:03d}' for i in range(3)],
+                    'MainDicomTags': {'SeriesInstanceUID': f'1.2.826.0.1.{s}.{r}', 'Modality': 'MR', 'SeriesNumber': str(r + 1)},
+                }
+            self.studies[study_id] = {
+                'ID': study_id,
+                'Type': 'Study',
+                'ParentPatient': self.patient_orthanc_id,
+                'Series': series_ids,
+                'MainDicomTags': {'StudyInstanceUID': f'1.2.826.0.1.{s}', 'StudyDate': '20250101'},
+                'PatientMainDicomTags': {'PatientID': patient_id},
+            }
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, payload, status=200):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                mock._tick()
+                path = self.path.split('?', 1)[0].rstrip('/')
+                parts = path.strip('/').split('/')
+                if parts[0] == 'changes':
+                    return self._reply({'Changes': [], 'Done': True, 'Last': 0})
+                if parts[0] == 'studies' and len(parts) == 2 and parts[1] in mock.studies:
+                    return self._reply(mock.studies[parts[1]])
+                if parts[0] == 'studies' and len(parts) == 3 and parts[2] == 'series' and parts[1] in mock.studies:
+                    return self._reply([mock.series[i] for i in mock.studies[parts[1]]['Series']])
+                if parts[0] == 'series' and len(parts) == 2 and parts[1] in mock.series:
+                    return self._reply(mock.series[parts[1]])
+                return self._reply({'error': 'not found'}, status=404)
+
+            def do_POST(self):
+                mock._tick()
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                if self.path.rstrip('/') != '/tools/find':
+                    return self._reply({'error': 'not found'}, status=404)
+                if payload.get('Query', {}).get('PatientID') != mock.patient_id:
+                    return self._reply([])
+                level, expand = payload.get('Level'), payload.get('Expand', False)
+                if level == 'Patient':
+                    return self._reply([mock.patient_orthanc_id])
+                if level == 'Study':
+                    return self._reply(list(mock.studies.values()) if expand else list(mock.studies))
+                if level == 'Series':
+                    return self._reply(list(mock.series.values()) if expand else list(mock.series))
+                return self._reply([])
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def reset_count(self):
+        with self._lock:
+            self.request_count = 0
+
+    def _tick(self):
+        with self._lock:
+            self.request_count += 1
+        if self.latency:
+            time.sleep(self.latency)
@@ -0,0 +1,114 @@
+import io
+import statistics
+import time
+from datetime import datetime
+
+import numpy as np
+import pydicom
+from django.core.management.base import BaseCommand
+from pydicom.dataset import Dataset, FileDataset, FileMetaDataset
+from pydicom.uid import generate_uid
+
+from pacs.nifti_encoder import iter_volume_slices, rescale_volume, slice_major
+
+PIXEL_SPACING = (0.9375, 0.9375)
+
+
+class Command(BaseCommand):
+    help = '합성 NIfTI 볼륨으로 슬라이스별 DICOM 인코딩(기존 방식)과 볼륨 인코더의 CPU 시간을 비교합니다'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shape', type=int, nargs=3, default=[256, 256, 180], help='볼륨 크기 (기본값: 256 256 180)')
+        parser.add_argument('--repeat', type=int, default=3, help='반복 횟수 (기본값: 3)')
+
+    def handle(self, *args, **options):
+        shape = tuple(options['shape'])
+        # nibabel get_fdata() 결과와 같은 float64 / Fortran 순서 배열
+        img_data = np.asfortranarray(np.random.default_rng(0).normal(500.0, 200.0, size=shape))
+        self.stdout.write(f"합성 볼륨: {shape[0]}x{shape[1]}x{shape[2]} float64")
+
+        legacy = self._report('기존 슬라이스별 인코딩', options['repeat'], lambda: self._legacy(img_data))
+        vectorized = self._report('볼륨 인코더', options['repeat'], lambda: self._vectorized(img_data))
+        self._verify(img_data)
+        self.stdout.write(self.style.SUCCESS(f"CPU 시간 {legacy / vectorized:.1f}배 감소"))
+
+    def _scaling(self, img_data):
+        real_min, real_max = np.min(img_data), np.max(img_data)
+        int_max, int_min = np.iinfo(np.int16).max, np.iinfo(np.int16).min
+        rescale_slope = (real_max - real_min) / (int_max - int_min) if real_max != real_min else 1.0
+        return real_min, rescale_slope, int_min
+
+    def _legacy(self, img_data):
+        """변경 전 DicomConverterMixin.convert_nifti_to_dicom 의 슬라이스 루프"""
+        rescale_intercept, rescale_slope, int_min = self._scaling(img_data)
+        study_uid, series_uid = generate_uid(), generate_uid()
+        buffers = []
+        for i in range(img_data.shape[2]):
+            slice_float = img_data[:, :, i]
+            scaled_slice = ((slice_float - rescale_intercept) / rescale_slope) + int_min
+            rotated_data = np.rot90(scaled_slice.astype(np.int16), k=3)
+            ds = FileDataset(None, {}, file_meta=FileMetaDataset(), preamble=b"\0" * 128)
+            ds.file_meta.MediaStorageSOPClassUID = pydicom.uid.MRImageStorage
+            ds.file_meta.MediaStorageSOPInstanceUID = generate_uid()
+            ds.file_meta.TransferSyntaxUID = pydicom.uid.ExplicitVRLittleEndian
+            ds.PatientID, ds.PatientName = 'BENCH0001', 'Bench^Patient'
+            ds.StudyInstanceUID, ds.SeriesInstanceUID = study_uid, series_uid
+            ds.SOPInstanceUID, ds.SOPClassUID = ds.file_meta.MediaStorageSOPInstanceUID, ds.file_meta.MediaStorageSOPClassUID
+            ds.Modality, ds.InstanceNumber, ds.ImageType = "MR", str(i + 1), ["DERIVED", "PRIMARY"]
+            ds.StudyDate, ds.StudyTime = datetime.now().strftime('%Y%m%d'), datetime.now().strftime('%H%M%S')
+            ds.PixelSpacing = [f"{z:.8f}" for z in reversed(PIXEL_SPACING)]
+            ds.Rows, ds.Columns = rotated_data.shape
+            ds.SamplesPerPixel = 1
+            ds.PhotometricInterpretation = "MONOCHROME2"
+            ds.BitsAllocated, ds.BitsStored, ds.HighBit = 16, 16, 15
+            ds.PixelRepresentation = 1
+            ds.PixelData = rotated_data.tobytes()
+            ds.RescaleIntercept, ds.RescaleSlope = f"{rescale_intercept:.8f}", f"{rescale_slope:.8f}"
+            buffer = io.BytesIO()
+            ds.save_as(buffer, write_like_original=False)
+            buffers.append(buffer.getvalue())
+        return buffers
+
+    def _vectorized(self, img_data):
+        rescale_intercept, rescale_slope, int_min = self._scaling(img_data)
+        slices = slice_major(rescale_volume(img_data, rescale_intercept, rescale_slope, int_min), rotate_k=3)
+        now = datetime.now()
+        common = Dataset()
+        common.PatientID, common.PatientName = 'BENCH0001', 'Bench^Patient'
+        common.StudyInstanceUID, common.SeriesInstanceUID = generate_uid(), generate_uid()
+        common.Modality, common.ImageType = "MR", ["DERIVED", "PRIMARY"]
+        common.StudyDate, common.StudyTime = now.strftime('%Y%m%d'), now.strftime('%H%M%S')
+        common.PixelSpacing = [f"{z:.8f}" for z in reversed(PIXEL_SPACING)]
+        common.SamplesPerPixel = 1
+        common.PhotometricInterpretation = "MONOCHROME2"
+        common.BitsAllocated, common.BitsStored, common.HighBit = 16, 16, 15
+        common.PixelRepresentation = 1
+        common.RescaleIntercept, common.RescaleSlope = f"{rescale_intercept:.8f}", f"{rescale_slope:.8f}"
+        return list(iter_volume_slices(slices, common, pydicom.uid.MRImageStorage))
+
+    def _verify(self, img_data):
+        """두 방식의 슬라이스가 같은 픽셀/태그로 읽히는지 확인"""
+        legacy = self._legacy(img_data)
+        vectorized = self._vectorized(img_data)
+        assert len(legacy) == len(vectorized)
+        for index in (0, len(legacy) // 2, len(legacy) - 1):
+            old = pydicom.dcmread(io.BytesIO(legacy[index]))
+            new = pydicom.dcmread(io.BytesIO(vectorized[index]))
+            assert np.array_equal(old.pixel_array, new.pixel_array), f"슬라이스 {index} 픽셀 불일치"
+            assert (old.Rows, old.Columns, old.InstanceNumber) == (new.Rows, new.Columns, new.InstanceNumber)
+            assert new.SOPInstanceUID == new.file_meta.MediaStorageSOPInstanceUID
+        self.stdout.write('결과 검증: 픽셀 데이터와 슬라이스별 태그 일치')
+
+    def _report(self, label, repeat, func):
+        cpu_times, wall_times = [], []
+        for _ in range(repeat):
+            cpu_started, wall_started = time.process_time(), time.perf_counter()
+            buffers = func()
+            cpu_times.append((time.process_time() - cpu_started) * 1000)
+            wall_times.append((time.perf_counter() - wall_started) * 1000)
+        median_cpu = statistics.median(cpu_times)
+        self.stdout.write(
+            f"{label}: CPU 중앙값 {median_cpu:.1f}ms, 경과 {statistics.median(wall_times):.1f}ms "
+            f"({len(buffers)}장, {sum(len(b) for b in buffers) / 1024 / 1024:.1f}MB)"
+        )
+        return median_cpu
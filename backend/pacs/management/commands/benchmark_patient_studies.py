@@ -0,0 +1,79 @@
+# pacs/management/commands/benchmark_patient_studies.py
+# 가짜 Orthanc 로 환자 스터디 조회(순차 N+1 / 동시 확장 / 캐시 적중) 지연 비교 벤치마크
+
+import statistics
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from pacs.metadata_cache import metadata_cache
+from pacs.views import PatientStudiesView
+from ._mock_orthanc import MockOrthanc
+
+
+class Command(BaseCommand):
+    help = '가짜 Orthanc를 띄워 PatientStudiesView 의 스터디/시리즈 확장 지연을 측정합니다'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--studies', type=int, default=50, help='스터디 수 (기본값: 50)')
+        parser.add_argument('--series', type=int, default=10, help='스터디당 시리즈 수 (기본값: 10)')
+        parser.add_argument('--latency-ms', type=float, default=10.0, help='가짜 Orthanc 요청당 지연 (기본값: 10ms)')
+        parser.add_argument('--repeat', type=int, default=5, help='반복 횟수 (기본값: 5)')
+        parser.add_argument('--skip-baseline', action='store_true', help='순차 조회(기존 방식) 측정을 건너뜁니다')
+
+    def handle(self, *args, **options):
+        mock = MockOrthanc(
+            studies=options['studies'],
+            series_per_study=options['series'],
+            latency=options['latency_ms'] / 1000.0,
+        ).start()
+        self.stdout.write(
+            f"가짜 Orthanc: {mock.url} ({options['studies']} studies x {options['series']} series, "
+            f"요청당 {options['latency_ms']}ms)"
+        )
+        try:
+            with override_settings(ORTHANC_URL=mock.url, PACS_CHANGES_POLL_INTERVAL=0):
+                if not options['skip_baseline']:
+                    self._report('기존 순차 조회 (N+1)', mock, options['repeat'], lambda: self._sequential_baseline(mock))
+                self._report('동시 확장 + 캐시 미스', mock, options['repeat'], lambda: self._call_view(mock, cold=True))
+                self._call_view(mock, cold=True)
+                self._report('캐시 적중 (재오픈)', mock, options['repeat'], lambda: self._call_view(mock, cold=False))
+        finally:
+            mock.stop()
+            metadata_cache.clear()
+
+    def _call_view(self, mock, cold):
+        if cold:
+            metadata_cache.clear()
+        request = APIRequestFactory().get(f'/api/pacs/patients/{mock.patient_id}/studies/')
+        response = PatientStudiesView.as_view()(request, patient_pacs_id=mock.patient_id)
+        assert response.status_code == 200, response.data
+        return len(response.data['studies'])
+
+    def _sequential_baseline(self, mock):
+        """변경 전 PatientStudiesView 와 같은 순서로 하나씩 조회"""
+        find_url = f"{mock.url}/tools/find"
+        query = {"PatientID": mock.patient_id}
+        requests.post(find_url, json={"Level": "Patient", "Query": query}, timeout=10).json()
+        study_ids = requests.post(find_url, json={"Level": "Study", "Query": query}, timeout=10).json()
+        for study_id in study_ids:
+            requests.get(f"{mock.url}/studies/{study_id}", timeout=10).json()
+            for series in requests.get(f"{mock.url}/studies/{study_id}/series", timeout=10).json():
+                requests.get(f"{mock.url}/series/{series['ID']}", timeout=10).json()
+        return len(study_ids)
+
+    def _report(self, label, mock, repeat, func):
+        timings, counts = [], []
+        for _ in range(repeat):
+            mock.reset_count()
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+            counts.append(mock.request_count)
+        self.stdout.write(self.style.SUCCESS(
+            f"{label}: 중앙값 {statistics.median(timings):.1f}ms "
+            f"(최소 {min(timings):.1f}ms), Orthanc 요청 {max(counts)}회"
+        ))
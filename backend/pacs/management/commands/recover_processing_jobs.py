@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from pacs.models import ProcessingJob
+
+
+class Command(BaseCommand):
+    help = '서버 재시작 등으로 중단된 PACS 작업(대기/실행 중인데 갱신이 멈춘 작업)을 실패로 정리합니다'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-minutes', type=int, default=30,
+                            help='마지막 진행률 갱신 후 이 시간(분)이 지나면 중단된 것으로 봄 (기본값: 30)')
+        parser.add_argument('--dry-run', action='store_true', help='정리 대상만 출력합니다')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options['stale_minutes'])
+        stale = ProcessingJob.objects.filter(status__in=ProcessingJob.ACTIVE_STATUSES, updated_at__lt=cutoff)
+
+        for job in stale:
+            self.stdout.write(f"  {job} (마지막 갱신: {job.updated_at:%Y-%m-%d %H:%M:%S})")
+        if options['dry_run']:
+            self.stdout.write(f"정리 대상 {stale.count()}건 (dry-run)")
+            return
+
+        now = timezone.now()
+        count = stale.update(
+            status='failed', error='작업이 중단되었습니다 (서버 재시작 등). 다시 요청해주세요.',
+            finished_at=now, updated_at=now,
+        )
+        self.stdout.write(self.style.SUCCESS(f"중단된 작업 {count}건을 실패로 정리했습니다"))
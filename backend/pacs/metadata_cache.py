@@ -0,0 +1,207 @@
+# pacs/metadata_cache.py
+
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+
+from .orthanc_client import orthanc_client
+
+logger = logging.getLogger(__name__)
+
+# 상위 리소스를 조회해서 무효화해야 하는 변경 유형 → 상위 리소스 ID 필드
+PARENT_LOOKUP_CHANGES = {
+    'NewStudy': ('studies', 'ParentPatient'),
+    'NewSeries': ('series', 'ParentStudy'),
+}
+
+
+class OrthancMetadataCache:
+    """
+    Orthanc 리소스 ID 기준 메타데이터 캐시 (TTL + LRU).
+    캐시 항목은 상위 리소스와 연결(link)해 두고, 하위 리소스가 바뀌면 상위 항목까지 함께 무효화합니다.
+    """
+
+    def __init__(self, max_entries=None, ttl=None, client=None):
+        self.max_entries = max_entries or settings.PACS_METADATA_CACHE_SIZE
+        self.ttl = ttl if ttl is not None else settings.PACS_METADATA_CACHE_TTL
+        self.client = client or orthanc_client
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._parents = defaultdict(set)  # 하위 리소스 ID -> 상위 캐시 키 집합
+        self._children = defaultdict(set)  # 상위 캐시 키 -> 하위 리소스 ID 집합 (항목이 빠질 때 연결 정리용)
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._unlink(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self._unlink(evicted_key)
+            if len(self._children) > 2 * self.max_entries:
+                # 연결만 하고 끝내 캐시되지 않은 상위 키 정리
+                for parent_key in [k for k in self._children if k not in self._entries]:
+                    self._unlink(parent_key)
+
+    def get_or_load(self, key, loader):
+        """캐시에 없으면 loader()로 채웁니다. None/빈 결과는 캐시하지 않습니다."""
+        value = self.get(key)
+        if value is not None:
+            return value
+        value = loader()
+        if value:
+            self.set(key, value)
+        return value
+
+    def link(self, child_id, parent_key):
+        """child_id 가 변경되면 parent_key 항목도 무효화되도록 연결"""
+        with self._lock:
+            self._parents[child_id].add(parent_key)
+            self._children[parent_key].add(child_id)
+
+    def _unlink(self, parent_key):
+        """캐시에서 빠진 상위 항목으로 향하는 연결 제거"""
+        for child_id in self._children.pop(parent_key, ()):
+            parents = self._parents.get(child_id)
+            if parents is not None:
+                parents.discard(parent_key)
+                if not parents:
+                    del self._parents[child_id]
+
+    def invalidate(self, key):
+        with self._lock:
+            self._invalidate(key, set())
+
+    def _invalidate(self, key, seen):
+        if key in seen:
+            return
+        seen.add(key)
+        self._entries.pop(key, None)
+        self._unlink(key)
+        for parent_key in self._parents.pop(key, ()):
+            children = self._children.get(parent_key)
+            if children is not None:
+                children.discard(key)
+            self._invalidate(parent_key, seen)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._parents.clear()
+            self._children.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'links': len(self._parents), 'hits': self.hits, 'misses': self.misses}
+
+
+class OrthancChangeFeedPoller:
+    """
+    Orthanc /changes 피드를 주기적으로 읽어 캐시를 증분 무효화합니다.
+    client 는 get_json(path, params=None) 을 제공하면 되므로 테스트에서는 가짜 Orthanc로 대체할 수 있습니다.
+    """
+
+    def __init__(self, cache, client=None, interval=None, limit=100):
+        self.cache = cache
+        self.client = client or cache.client
+        self._interval = interval
+        self.limit = limit
+        self.last_seq = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+
+    @property
+    def interval(self):
+        return self._interval if self._interval is not None else settings.PACS_CHANGES_POLL_INTERVAL
+
+    def poll_once(self):
+        """누적된 변경 사항을 모두 처리하고 처리한 변경 건수를 반환"""
+        if self.last_seq is None:
+            # 최초 실행 시점 이전의 변경은 캐시에 영향이 없으므로 마지막 시퀀스부터 시작
+            self.last_seq = self.client.get_json('/changes', params={'last': ''}).get('Last', 0)
+            return 0
+
+        processed = 0
+        while True:
+            page = self.client.get_json('/changes', params={'since': self.last_seq, 'limit': self.limit})
+            for change in page.get('Changes', []):
+                self._apply(change)
+                processed += 1
+            self.last_seq = page.get('Last', self.last_seq)
+            if page.get('Done', True):
+                break
+        return processed
+
+    def _apply(self, change):
+        change_type = change.get('ChangeType')
+        resource_id = change.get('ID')
+        if not resource_id:
+            return
+
+        self.cache.invalidate(resource_id)
+
+        lookup = PARENT_LOOKUP_CHANGES.get(change_type)
+        if lookup:
+            # 새로 생긴 리소스는 캐시에 없으므로 상위 리소스를 찾아 목록을 무효화
+            resource_path, parent_field = lookup
+            try:
+                parent_id = self.client.get_json(f'/{resource_path}/{resource_id}').get(parent_field)
+            except Exception as e:
+                logger.warning(f"변경 피드 상위 리소스 조회 실패 ({change_type} {resource_id}): {e}")
+                return
+            if parent_id:
+                self.cache.invalidate(parent_id)
+
+    def ensure_started(self):
+        """백그라운드 폴링 스레드를 (최초 1회) 시작"""
+        if self.interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='orthanc-change-feed', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        logger.info(f"Orthanc 변경 피드 폴링 시작 (주기 {self.interval}s)")
+        while not self._stop.is_set():
+            try:
+                processed = self.poll_once()
+                if processed:
+                    logger.debug(f"Orthanc 변경 {processed}건 처리, 마지막 시퀀스 {self.last_seq}")
+            except Exception as e:
+                # 피드를 읽지 못한 동안에는 변경을 놓쳤을 수 있으므로 캐시를 비움
+                logger.warning(f"Orthanc 변경 피드 폴링 실패, 메타데이터 캐시 초기화: {e}")
+                self.cache.clear()
+                self.last_seq = None
+            self._stop.wait(max(self.interval, 1))
+
+
+# 싱글톤 인스턴스 생성
+metadata_cache = OrthancMetadataCache()
+change_feed_poller = OrthancChangeFeedPoller(metadata_cache)
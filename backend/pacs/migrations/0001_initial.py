@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NiftiMetadata',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gcs_path', models.CharField(max_length=512, unique=True, verbose_name='GCS 경로')),
+                ('patient_uuid', models.CharField(db_index=True, max_length=64, verbose_name='환자 UUID')),
+                ('session_id', models.CharField(max_length=64, verbose_name='세션')),
+                ('modality', models.CharField(max_length=32, verbose_name='모달리티')),
+                ('file_name', models.CharField(max_length=255, verbose_name='파일명')),
+                ('size', models.BigIntegerField(blank=True, null=True, verbose_name='파일 크기')),
+                ('shape', models.JSONField(default=list, verbose_name='볼륨 크기')),
+                ('zooms', models.JSONField(default=list, verbose_name='복셀 간격')),
+                ('resolution', models.CharField(max_length=32, verbose_name='해상도')),
+                ('slice_thickness', models.FloatField(verbose_name='슬라이스 두께')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'NIfTI 메타데이터',
+                'verbose_name_plural': 'NIfTI 메타데이터',
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-18 10:00
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pacs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessingJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('job_type', models.CharField(choices=[('nifti_ingest', 'NIfTI 업로드')], max_length=32, verbose_name='작업 유형')),
+                ('status', models.CharField(choices=[('queued', '대기'), ('running', '실행 중'), ('completed', '완료'), ('failed', '실패')], default='queued', max_length=16, verbose_name='상태')),
+                ('patient_uuid', models.CharField(blank=True, db_index=True, max_length=64, verbose_name='환자 UUID')),
+                ('progress', models.PositiveSmallIntegerField(default=0, verbose_name='진행률')),
+                ('stages', models.JSONField(default=dict, verbose_name='단계별 진행 상황')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='결과')),
+                ('error', models.TextField(blank=True, verbose_name='오류')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'PACS 작업',
+                'verbose_name_plural': 'PACS 작업',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
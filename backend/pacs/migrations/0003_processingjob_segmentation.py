@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pacs', '0002_processingjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processingjob',
+            name='cancel_requested',
+            field=models.BooleanField(default=False, verbose_name='취소 요청'),
+        ),
+        migrations.AddField(
+            model_name='processingjob',
+            name='payload',
+            field=models.JSONField(blank=True, default=dict, verbose_name='요청 내용'),
+        ),
+        migrations.AlterField(
+            model_name='processingjob',
+            name='job_type',
+            field=models.CharField(choices=[('nifti_ingest', 'NIfTI 업로드'), ('segmentation', '병변 분할')], max_length=32, verbose_name='작업 유형'),
+        ),
+        migrations.AlterField(
+            model_name='processingjob',
+            name='status',
+            field=models.CharField(choices=[('queued', '대기'), ('running', '실행 중'), ('completed', '완료'), ('failed', '실패'), ('cancelled', '취소')], default='queued', max_length=16, verbose_name='상태'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pacs', '0003_processingjob_segmentation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='processingjob',
+            name='job_type',
+            field=models.CharField(choices=[('nifti_ingest', 'NIfTI 업로드'), ('segmentation', '병변 분할'), ('dicom_conversion', 'NIfTI→DICOM 변환')], max_length=32, verbose_name='작업 유형'),
+        ),
+    ]
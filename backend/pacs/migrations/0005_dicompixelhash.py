@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pacs', '0004_processingjob_dicom_conversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DicomPixelHash',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('patient_id', models.CharField(max_length=64, verbose_name='DICOM PatientID')),
+                ('pixel_hash', models.CharField(max_length=64, verbose_name='픽셀 데이터 SHA-256')),
+                ('sop_instance_uid', models.CharField(max_length=64, verbose_name='SOP Instance UID')),
+                ('orthanc_id', models.CharField(blank=True, max_length=64, verbose_name='Orthanc 인스턴스 ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'DICOM 픽셀 해시',
+                'verbose_name_plural': 'DICOM 픽셀 해시',
+                'constraints': [models.UniqueConstraint(fields=('patient_id', 'pixel_hash'), name='unique_patient_pixel_hash')],
+            },
+        ),
+    ]
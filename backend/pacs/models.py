@@ -1,3 +1,112 @@
+import uuid
+
 from django.db import models
 
-# Create your models here.
+
+class NiftiMetadata(models.Model):
+    """GCS 에 업로드된 NIfTI 파일의 헤더 요약 (세션 목록 조회용 인덱스)"""
+    gcs_path = models.CharField(max_length=512, unique=True, verbose_name="GCS 경로")
+    patient_uuid = models.CharField(max_length=64, db_index=True, verbose_name="환자 UUID")
+    session_id = models.CharField(max_length=64, verbose_name="세션")
+    modality = models.CharField(max_length=32, verbose_name="모달리티")
+    file_name = models.CharField(max_length=255, verbose_name="파일명")
+    size = models.BigIntegerField(null=True, blank=True, verbose_name="파일 크기")
+
+    shape = models.JSONField(default=list, verbose_name="볼륨 크기")
+    zooms = models.JSONField(default=list, verbose_name="복셀 간격")
+    resolution = models.CharField(max_length=32, verbose_name="해상도")
+    slice_thickness = models.FloatField(verbose_name="슬라이스 두께")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "NIfTI 메타데이터"
+        verbose_name_plural = "NIfTI 메타데이터"
+
+    def __str__(self):
+        return self.gcs_path
+
+    def to_summary(self):
+        """세션 목록 응답에 들어가는 메타데이터"""
+        return {
+            "resolution": self.resolution,
+            "sliceThickness": float(f"{self.slice_thickness:.2f}"),
+        }
+
+
+class ProcessingJob(models.Model):
+    """PACS 백그라운드 작업 (NIfTI 업로드, 병변 분할, DICOM 변환 등) 상태와 단계별 진행률"""
+    JOB_TYPE_CHOICES = [
+        ('nifti_ingest', 'NIfTI 업로드'),
+        ('segmentation', '병변 분할'),
+        ('dicom_conversion', 'NIfTI→DICOM 변환'),
+    ]
+    STATUS_CHOICES = [
+        ('queued', '대기'),
+        ('running', '실행 중'),
+        ('completed', '완료'),
+        ('failed', '실패'),
+        ('cancelled', '취소'),
+    ]
+    ACTIVE_STATUSES = ('queued', 'running')
+    FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    job_type = models.CharField(max_length=32, choices=JOB_TYPE_CHOICES, verbose_name="작업 유형")
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default='queued', verbose_name="상태")
+    patient_uuid = models.CharField(max_length=64, blank=True, db_index=True, verbose_name="환자 UUID")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="요청 내용")
+    cancel_requested = models.BooleanField(default=False, verbose_name="취소 요청")
+
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name="진행률")
+    stages = models.JSONField(default=dict, verbose_name="단계별 진행 상황")
+    result = models.JSONField(null=True, blank=True, verbose_name="결과")
+    error = models.TextField(blank=True, verbose_name="오류")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "PACS 작업"
+        verbose_name_plural = "PACS 작업"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_job_type_display()} {self.id} ({self.status})"
+
+    def to_dict(self):
+        return {
+            "job_id": str(self.id),
+            "job_type": self.job_type,
+            "status": self.status,
+            "progress": self.progress,
+            "stages": self.stages,
+            "result": self.result,
+            "error": self.error or None,
+            "cancel_requested": self.cancel_requested,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class DicomPixelHash(models.Model):
+    """업로드된 DICOM 인스턴스의 픽셀 데이터 해시 (같은 환자에게 같은 영상을 다시 올리지 않도록)"""
+    patient_id = models.CharField(max_length=64, verbose_name="DICOM PatientID")
+    pixel_hash = models.CharField(max_length=64, verbose_name="픽셀 데이터 SHA-256")
+    sop_instance_uid = models.CharField(max_length=64, verbose_name="SOP Instance UID")
+    orthanc_id = models.CharField(max_length=64, blank=True, verbose_name="Orthanc 인스턴스 ID")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "DICOM 픽셀 해시"
+        verbose_name_plural = "DICOM 픽셀 해시"
+        constraints = [
+            models.UniqueConstraint(fields=['patient_id', 'pixel_hash'], name='unique_patient_pixel_hash'),
+        ]
+
+    def __str__(self):
+        return f"{self.patient_id} {self.pixel_hash[:12]}"
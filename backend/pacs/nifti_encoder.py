@@ -0,0 +1,146 @@
+# pacs/nifti_encoder.py
+# NIfTI 볼륨 → DICOM 슬라이스 인코더
+# 볼륨 전체를 NumPy로 한 번에 변환하고, 공통 태그는 미리 직렬화해 둔 뒤
+# 슬라이스마다 SOPInstanceUID / InstanceNumber / PixelData 만 바꿔 이어 붙입니다.
+
+import io
+import struct
+
+import numpy as np
+from pydicom import __version__ as PYDICOM_VERSION, dcmwrite
+from pydicom.dataset import Dataset
+from pydicom.uid import PYDICOM_IMPLEMENTATION_UID, ExplicitVRLittleEndian, generate_uid
+
+SOP_INSTANCE_UID_TAG = 0x00080018
+INSTANCE_NUMBER_TAG = 0x00200013
+PIXEL_DATA_TAG = 0x7FE00010
+
+DICOM_PREAMBLE = b"\0" * 128 + b"DICM"
+
+
+def _short_element(tag, vr, value, pad=b"\0"):
+    """Explicit VR Little Endian, 2바이트 길이 필드를 쓰는 요소 (UI, IS, UL 등)"""
+    if len(value) % 2:
+        value += pad
+    return struct.pack('<HH', tag >> 16, tag & 0xFFFF) + vr + struct.pack('<H', len(value)) + value
+
+
+def _long_element_header(tag, vr, length):
+    """Explicit VR Little Endian, 4바이트 길이 필드를 쓰는 요소 헤더 (OB, OW 등)"""
+    return struct.pack('<HH', tag >> 16, tag & 0xFFFF) + vr + b"\0\0" + struct.pack('<I', length)
+
+
+def _encode_dataset(elements):
+    part = Dataset()
+    for elem in elements:
+        part.add(elem)
+    buffer = io.BytesIO()
+    dcmwrite(buffer, part, implicit_vr=False, little_endian=True)
+    return buffer.getvalue()
+
+
+class DicomSliceTemplate:
+    """
+    슬라이스 공통 태그를 한 번만 직렬화해 두고, 슬라이스별 태그만 바꿔 DICOM 파일 바이트를 만듭니다.
+    dataset 에는 SOPInstanceUID / InstanceNumber / PixelData 를 제외한 공통 태그만 넣어야 합니다.
+    """
+
+    def __init__(self, dataset, sop_class_uid):
+        self.sop_class_uid = str(sop_class_uid)
+        dataset.SOPClassUID = self.sop_class_uid
+
+        elements = sorted(dataset, key=lambda elem: elem.tag)
+        per_slice = [elem.tag for elem in elements if elem.tag in (SOP_INSTANCE_UID_TAG, INSTANCE_NUMBER_TAG, PIXEL_DATA_TAG)]
+        if per_slice:
+            raise ValueError(f"템플릿에 슬라이스별 태그가 포함되어 있습니다: {per_slice}")
+
+        # 슬라이스별 태그 사이사이에 들어가는 공통 태그 구간을 미리 직렬화 (태그 오름차순 유지)
+        self._before_sop_uid = _encode_dataset(e for e in elements if e.tag < SOP_INSTANCE_UID_TAG)
+        self._before_instance_number = _encode_dataset(
+            e for e in elements if SOP_INSTANCE_UID_TAG < e.tag < INSTANCE_NUMBER_TAG
+        )
+        self._before_pixel_data = _encode_dataset(
+            e for e in elements if INSTANCE_NUMBER_TAG < e.tag < PIXEL_DATA_TAG
+        )
+        self._after_pixel_data = _encode_dataset(e for e in elements if e.tag > PIXEL_DATA_TAG)
+
+        self._meta_head = (
+            _long_element_header(0x00020001, b'OB', 2) + b"\0\1"
+            + _short_element(0x00020002, b'UI', self.sop_class_uid.encode())
+        )
+        self._meta_tail = (
+            _short_element(0x00020010, b'UI', str(ExplicitVRLittleEndian).encode())
+            + _short_element(0x00020012, b'UI', str(PYDICOM_IMPLEMENTATION_UID).encode())
+            + _short_element(0x00020013, b'SH', f"PYDICOM {PYDICOM_VERSION}".encode(), pad=b" ")
+        )
+
+    def encode_slice(self, pixel_bytes, instance_number, sop_instance_uid=None):
+        """슬라이스 1장을 DICOM Part 10 파일 바이트로 반환"""
+        uid = (sop_instance_uid or generate_uid()).encode()
+        meta = self._meta_head + _short_element(0x00020003, b'UI', uid) + self._meta_tail
+        pad = b"\0" if len(pixel_bytes) % 2 else b""
+        return b"".join((
+            DICOM_PREAMBLE,
+            _short_element(0x00020000, b'UL', struct.pack('<I', len(meta))),
+            meta,
+            self._before_sop_uid,
+            _short_element(SOP_INSTANCE_UID_TAG, b'UI', uid),
+            self._before_instance_number,
+            _short_element(INSTANCE_NUMBER_TAG, b'IS', str(instance_number).encode(), pad=b" "),
+            self._before_pixel_data,
+            _long_element_header(PIXEL_DATA_TAG, b'OW', len(pixel_bytes) + len(pad)),
+            pixel_bytes,
+            pad,
+            self._after_pixel_data,
+        ))
+
+
+def rescale_volume(img_data, rescale_intercept, rescale_slope, int_min, dtype=np.int16, slab=4):
+    """
+    볼륨 전체를 정수 픽셀값으로 변환 (슬라이스별 변환과 같은 결과).
+    임시 float 배열이 CPU 캐시에 머물도록 slab 장씩 나눠 계산하고 결과 배열에 바로 씁니다.
+    """
+    out = np.empty(img_data.shape, dtype=dtype, order='F' if np.isfortran(img_data) else 'C')
+    if rescale_slope == 0:
+        out.fill(0)
+        return out
+    buffer = None
+    for start in range(0, img_data.shape[2], slab):
+        src = img_data[:, :, start:start + slab]
+        if buffer is None or buffer.shape != src.shape:
+            buffer = np.empty_like(src, dtype=np.float64)
+        np.subtract(src, rescale_intercept, out=buffer)
+        buffer /= rescale_slope
+        buffer += int_min
+        out[:, :, start:start + slab] = buffer
+    return out
+
+
+def slice_major(volume, rotate_k=0, dtype=None):
+    """
+    (x, y, z) 볼륨을 회전한 뒤 (z, rows, cols) 연속 배열로 바꿔 슬라이스별 tobytes() 가 단순 메모리 복사로 끝나도록 합니다.
+    dtype 은 리틀 엔디언으로 고정합니다.
+    """
+    if rotate_k:
+        volume = np.rot90(volume, k=rotate_k, axes=(0, 1))
+    dtype = np.dtype(dtype or volume.dtype).newbyteorder('<')
+    return np.ascontiguousarray(np.moveaxis(volume, 2, 0), dtype=dtype)
+
+
+def iter_slice_major(slabs, rotate_k=0, dtype=None):
+    """(x, y, k) 슬라이스 묶음 iterable 을 slice_major() 레이아웃의 2D 슬라이스로 풀어 반환"""
+    for slab in slabs:
+        yield from slice_major(slab, rotate_k=rotate_k, dtype=dtype)
+
+
+def iter_volume_slices(slices, dataset, sop_class_uid):
+    """
+    slice_major() 결과(또는 같은 크기의 2D 슬라이스 iterable)와 공통 태그 dataset 으로
+    슬라이스별 DICOM 바이트를 순서대로 생성합니다. Rows / Columns 는 첫 슬라이스 크기로 채웁니다.
+    """
+    template = None
+    for index, pixels in enumerate(slices):
+        if template is None:
+            dataset.Rows, dataset.Columns = pixels.shape
+            template = DicomSliceTemplate(dataset, sop_class_uid)
+        yield template.encode_slice(pixels.tobytes(), index + 1)
@@ -0,0 +1,90 @@
+# pacs/nifti_index.py
+# 환자별 NIfTI 세션 목록 조회
+# 업로드 시점에 헤더 요약을 NiftiMetadata 에 저장해 두고, 목록 조회는 blob 목록 + DB 조회 1회로 끝냅니다.
+# 인덱스에 없는 파일(이전에 올라간 파일 등)만 헤더 앞부분을 구간 읽기로 가져와 채웁니다.
+
+import logging
+from collections import defaultdict
+
+from .models import NiftiMetadata
+from .nifti_volume import read_header_metadata
+
+logger = logging.getLogger(__name__)
+
+
+def parse_blob_name(blob_name):
+    """'nifti/{patient_uuid}/{session_id}/{modality}/{file_name}' → 각 부분 (형식이 다르면 None)"""
+    parts = blob_name.split('/')
+    if len(parts) < 5 or not parts[-1]:
+        return None
+    return {
+        'patient_uuid': parts[1],
+        'session_id': parts[2],
+        'modality': parts[3],
+        'file_name': parts[4],
+    }
+
+
+def record_nifti_metadata(gcs_path, metadata, size=None):
+    """NIfTI 헤더 요약을 인덱스에 저장 (같은 경로면 갱신)"""
+    blob_name = gcs_path.split("://", 1)[-1].split("/", 1)[1]
+    parsed = parse_blob_name(blob_name)
+    if parsed is None:
+        raise ValueError(f"세션 경로 형식이 아닙니다: {gcs_path}")
+    entry, _ = NiftiMetadata.objects.update_or_create(
+        gcs_path=gcs_path,
+        defaults={
+            **parsed,
+            'size': size,
+            'shape': metadata['shape'],
+            'zooms': metadata['zooms'],
+            'resolution': metadata['resolution'],
+            'slice_thickness': metadata['slice_thickness'],
+        },
+    )
+    return entry
+
+
+def list_patient_sessions(object_storage, patient_uuid):
+    """
+    환자의 세션 목록을 최신순으로 반환합니다.
+    object_storage 는 pacs.object_storage 의 저장소 (오프라인 테스트는 LocalObjectStorage) 입니다.
+    """
+    blobs = object_storage.list(f"nifti/{patient_uuid}/")
+    if not blobs:
+        return []
+
+    indexed = {entry.gcs_path: entry for entry in NiftiMetadata.objects.filter(patient_uuid=patient_uuid)}
+
+    sessions_data = defaultdict(lambda: defaultdict(list))
+    for blob in blobs:
+        parsed = parse_blob_name(blob.name)
+        if parsed is None:
+            continue
+        gcs_path = object_storage.uri(blob.name)
+        size = blob.size
+        entry = indexed.get(gcs_path)
+        if entry is None or (size is not None and entry.size is not None and entry.size != size):
+            # 인덱스가 없거나 파일이 덮어써진 경우에만 헤더를 읽음
+            entry = _index_from_header(object_storage, blob, gcs_path, size)
+
+        sessions_data[parsed['session_id']][parsed['modality'].lower()].append({
+            "name": parsed['file_name'],
+            "gcs_path": gcs_path,
+            "metadata": entry.to_summary() if entry else {},
+        })
+
+    formatted_sessions = [{"sessionId": sid, "modalities": mods} for sid, mods in sessions_data.items()]
+    return sorted(formatted_sessions, key=lambda s: s['sessionId'], reverse=True)
+
+
+def _index_from_header(object_storage, blob, gcs_path, size):
+    try:
+        metadata = read_header_metadata(
+            lambda start, end: object_storage.read_range(blob.name, start, end),
+            compressed=blob.name.endswith('.gz'),
+        )
+        return record_nifti_metadata(gcs_path, metadata, size=size)
+    except Exception as e:
+        logger.warning(f"메타데이터 추출 실패 ({blob.name}): {e}")
+        return None
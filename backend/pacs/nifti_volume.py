@@ -0,0 +1,182 @@
+# pacs/nifti_volume.py
+# NIfTI 볼륨 접근 계층
+# get_fdata() 로 전체 볼륨을 float64 로 올리지 않고, 헤더만 읽거나 슬라이스 묶음(slab) 단위로 읽습니다.
+# - 비압축 .nii : nibabel 이 mmap 한 dataobj 를 슬라이싱 (필요한 페이지만 읽음)
+# - 압축 .nii.gz : 압축 해제 스트림을 앞에서부터 순서대로 읽음 (되감기 없음)
+
+import io
+import struct
+import zlib
+
+import numpy as np
+import nibabel as nib
+from nibabel.openers import ImageOpener
+
+DEFAULT_SLAB = 8
+
+# 헤더 크기 (sizeof_hdr) → 헤더 클래스
+HEADER_CLASSES = {348: nib.Nifti1Header, 540: nib.Nifti2Header}
+HEADER_READ_CHUNK = 1024
+HEADER_READ_LIMIT = 64 * 1024
+
+
+def header_metadata(header):
+    """세션 목록 등에서 쓰는 요약 정보 (복셀 데이터는 읽지 않음)"""
+    shape = tuple(int(n) for n in header.get_data_shape()[:3])
+    zooms = tuple(float(z) for z in header.get_zooms()[:3])
+    return {
+        'shape': list(shape),
+        'zooms': list(zooms),
+        'resolution': f"{shape[0]}x{shape[1]}",
+        'slice_thickness': round(zooms[2], 4),
+        'num_slices': shape[2],
+        'dtype': str(header.get_data_dtype()),
+    }
+
+
+def read_header_metadata(read_range, compressed):
+    """
+    파일 앞부분만 구간 읽기로 가져와 헤더 요약 정보를 반환합니다.
+    read_range(start, end) 는 [start, end] (end 포함) 바이트를 반환해야 합니다 (GCS download_as_bytes 와 같은 규칙).
+    압축 파일은 헤더 크기만큼 풀릴 때까지 조금씩 더 읽습니다.
+    """
+    decompressor = zlib.decompressobj(wbits=31) if compressed else None
+    raw, offset, header_size = b"", 0, None
+    while offset < HEADER_READ_LIMIT:
+        chunk = read_range(offset, offset + HEADER_READ_CHUNK - 1)
+        if not chunk:
+            break
+        offset += len(chunk)
+        raw += decompressor.decompress(chunk) if decompressor else chunk
+        if header_size is None and len(raw) >= 4:
+            header_size = _header_size(raw)
+        if header_size is not None and len(raw) >= header_size:
+            header = HEADER_CLASSES[header_size].from_fileobj(io.BytesIO(raw[:header_size]))
+            return header_metadata(header)
+        if len(chunk) < HEADER_READ_CHUNK:
+            break
+    raise ValueError("NIfTI 헤더를 읽을 수 없습니다")
+
+
+def _header_size(raw):
+    for byte_order in ('<', '>'):
+        size = struct.unpack(f'{byte_order}i', raw[:4])[0]
+        if size in HEADER_CLASSES:
+            return size
+    raise ValueError("NIfTI 파일이 아닙니다")
+
+
+class NiftiVolume:
+    """
+    NIfTI 파일 하나에 대한 헤더/슬라이스 접근 도우미.
+    슬라이스 축은 세 번째 축(z)이며, 4D 파일은 첫 번째 볼륨만 다룹니다.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        # 헤더만 읽고 픽셀은 건드리지 않음 (비압축 파일은 mmap)
+        self.image = nib.load(self.path, mmap=True)
+        self.header = self.image.header
+
+    # ---- 헤더 전용 메타데이터 ----
+
+    @property
+    def compressed(self):
+        return self.path.endswith(tuple(ext for ext in ImageOpener.compress_ext_map if ext))
+
+    @property
+    def shape(self):
+        return tuple(int(n) for n in self.header.get_data_shape()[:3])
+
+    @property
+    def num_slices(self):
+        return self.shape[2]
+
+    @property
+    def zooms(self):
+        return tuple(float(z) for z in self.header.get_zooms()[:3])
+
+    @property
+    def affine(self):
+        return self.image.affine
+
+    def metadata(self):
+        return header_metadata(self.header)
+
+    # ---- 슬라이스 스트리밍 ----
+
+    def iter_slabs(self, slab=DEFAULT_SLAB, dtype=np.float64):
+        """
+        (x, y, k) 모양의 슬라이스 묶음을 z 순서대로 반환합니다.
+        값은 get_fdata() 와 같이 scl_slope / scl_inter 가 적용된 dtype 배열입니다.
+        """
+        if self.compressed:
+            yield from self._iter_compressed_slabs(slab, dtype)
+            return
+        extra = (0,) * (len(self.image.dataobj.shape) - 3)
+        for start in range(0, self.num_slices, slab):
+            raw = self.image.dataobj[(slice(None), slice(None), slice(start, start + slab)) + extra]
+            yield np.asarray(raw, dtype=dtype)
+
+    def _iter_compressed_slabs(self, slab, dtype):
+        proxy = self.image.dataobj
+        nx, ny, nz = self.shape
+        raw_dtype = proxy.dtype
+        slice_bytes = nx * ny * raw_dtype.itemsize
+        slope, inter = self._scaling()
+
+        with ImageOpener(self.path, 'rb') as fileobj:
+            # 압축 스트림에서 앞으로 건너뛰기는 읽으면서 버리는 것과 같으므로 순서대로만 읽음
+            fileobj.seek(proxy.offset)
+            for start in range(0, nz, slab):
+                count = min(slab, nz - start)
+                buffer = fileobj.read(slice_bytes * count)
+                if len(buffer) < slice_bytes * count:
+                    raise ValueError(f"NIfTI 데이터가 헤더보다 짧습니다: {self.path}")
+                data = np.frombuffer(buffer, dtype=raw_dtype).reshape((nx, ny, count), order='F')
+                data = data.astype(dtype)
+                if slope != 1:
+                    data *= slope
+                if inter != 0:
+                    data += inter
+                yield data
+
+    def _scaling(self):
+        slope, inter = self.image.dataobj.slope, self.image.dataobj.inter
+        return (1.0 if slope is None else slope), (0.0 if inter is None else inter)
+
+    def iter_slices(self, dtype=np.float64, slab=DEFAULT_SLAB):
+        """2D (x, y) 슬라이스를 z 순서대로 반환"""
+        for data in self.iter_slabs(slab=slab, dtype=dtype):
+            for index in range(data.shape[2]):
+                yield data[:, :, index]
+
+    def min_max(self, slab=DEFAULT_SLAB):
+        """볼륨 전체를 올리지 않고 최솟값/최댓값 계산"""
+        real_min, real_max = np.inf, -np.inf
+        for data in self.iter_slabs(slab=slab):
+            real_min = min(real_min, float(data.min()))
+            real_max = max(real_max, float(data.max()))
+        return real_min, real_max
+
+    def threshold_mask(self, threshold=0.5, slab=DEFAULT_SLAB):
+        """(z, x, y) uint8 마스크 (threshold 초과 = 1) 를 슬라이스 묶음 단위로 채워 반환"""
+        nx, ny, nz = self.shape
+        mask = np.empty((nz, nx, ny), dtype=np.uint8)
+        start = 0
+        for data in self.iter_slabs(slab=slab, dtype=np.float32):
+            count = data.shape[2]
+            mask[start:start + count] = np.moveaxis(data > threshold, 2, 0)
+            start += count
+        return mask
+
+    def label_map(self, slab=DEFAULT_SLAB):
+        """(z, x, y) uint16 정수 라벨맵 (다중 클래스 분할 결과용, 값은 반올림) 을 슬라이스 묶음 단위로 채워 반환"""
+        nx, ny, nz = self.shape
+        labels = np.empty((nz, nx, ny), dtype=np.uint16)
+        start = 0
+        for data in self.iter_slabs(slab=slab, dtype=np.float32):
+            count = data.shape[2]
+            labels[start:start + count] = np.moveaxis(np.clip(np.rint(data), 0, np.iinfo(np.uint16).max), 2, 0)
+            start += count
+        return labels
@@ -0,0 +1,306 @@
+# pacs/object_storage.py
+# NIfTI 등 영상 파일 저장소 추상화
+# - GCS: 프로세스 전체에서 클라이언트/커넥션 풀을 재사용하고, 큰 파일은 청크 단위로 병렬 전송
+# - 로컬 디스크: 온프레미스 / 오프라인 테스트용 (같은 인터페이스)
+# 경로는 버킷 기준 key 또는 '<scheme>://<bucket>/<key>' URI 둘 다 받습니다.
+
+import logging
+import os
+import shutil
+import threading
+import uuid
+from dataclasses import dataclass
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StoredObject:
+    name: str
+    size: int = None
+
+
+class ObjectStorage:
+    """저장소 공통 인터페이스"""
+    scheme = None
+
+    def __init__(self, bucket_name=None):
+        self._bucket_name = bucket_name
+
+    @property
+    def bucket_name(self):
+        return self._bucket_name or settings.GCS_BUCKET_NAME
+
+    @property
+    def chunk_size(self):
+        return settings.PACS_STORAGE_CHUNK_SIZE
+
+    @property
+    def parallel_threshold(self):
+        return settings.PACS_STORAGE_PARALLEL_THRESHOLD
+
+    @property
+    def max_workers(self):
+        return settings.PACS_STORAGE_TRANSFER_WORKERS
+
+    def uri(self, key, bucket_name=None):
+        return f"{self.scheme}://{bucket_name or self.bucket_name}/{key}"
+
+    def resolve(self, path):
+        """key 또는 URI → (bucket_name, key)"""
+        if "://" not in path:
+            return self.bucket_name, path.lstrip('/')
+        bucket_name, _, key = path.split("://", 1)[1].partition("/")
+        if not bucket_name or not key:
+            raise ValueError(f"올바르지 않은 저장소 경로입니다: {path}")
+        return bucket_name, key
+
+    def list(self, prefix):
+        raise NotImplementedError
+
+    def exists(self, path):
+        raise NotImplementedError
+
+    def read_range(self, path, start, end):
+        """[start, end] (end 포함) 바이트"""
+        raise NotImplementedError
+
+    def iter_chunks(self, path, chunk_size=None):
+        raise NotImplementedError
+
+    def upload_file(self, local_path, path, content_type=None):
+        """로컬 파일을 업로드하고 URI 를 반환"""
+        raise NotImplementedError
+
+    def upload_fileobj(self, fileobj, path, content_type=None):
+        raise NotImplementedError
+
+    def download_file(self, path, local_path):
+        raise NotImplementedError
+
+    def delete(self, path):
+        raise NotImplementedError
+
+    def delete_prefix(self, prefix):
+        """prefix 아래 객체를 모두 지우고 지운 이름 목록을 반환"""
+        names = [obj.name for obj in self.list(prefix)]
+        for name in names:
+            self.delete(name)
+        return names
+
+
+class GCSObjectStorage(ObjectStorage):
+    scheme = "gs"
+
+    def __init__(self, bucket_name=None):
+        super().__init__(bucket_name)
+        self._client = None
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """최초 사용 시 한 번만 생성하고 요청 간에 재사용"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import google.auth
+                    from google.auth.transport.requests import AuthorizedSession
+                    from google.cloud import storage
+                    from requests.adapters import HTTPAdapter
+
+                    # 병렬 청크 전송 시 커넥션을 새로 맺지 않도록 풀 크기를 워커 수에 맞춘 세션을 생성자에 넘김
+                    credentials, project = google.auth.default(scopes=storage.Client.SCOPE)
+                    session = AuthorizedSession(credentials)
+                    pool_size = max(self.max_workers, 10)
+                    session.mount("https://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+                    self._client = storage.Client(project=project, credentials=credentials, _http=session)
+        return self._client
+
+    def bucket(self, bucket_name=None):
+        bucket_name = bucket_name or self.bucket_name
+        bucket = self._buckets.get(bucket_name)
+        if bucket is None:
+            bucket = self._buckets[bucket_name] = self.client.bucket(bucket_name)
+        return bucket
+
+    def blob(self, path):
+        bucket_name, key = self.resolve(path)
+        return self.bucket(bucket_name).blob(key, chunk_size=self.chunk_size)
+
+    def list(self, prefix):
+        bucket_name, key_prefix = self.resolve(prefix)
+        return [
+            StoredObject(name=blob.name, size=blob.size)
+            for blob in self.client.list_blobs(bucket_name, prefix=key_prefix)
+        ]
+
+    def exists(self, path):
+        return self.blob(path).exists()
+
+    def read_range(self, path, start, end):
+        return self.blob(path).download_as_bytes(start=start, end=end)
+
+    def iter_chunks(self, path, chunk_size=None):
+        with self.blob(path).open('rb', chunk_size=chunk_size or self.chunk_size) as f:
+            while True:
+                chunk = f.read(chunk_size or self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def upload_file(self, local_path, path, content_type=None):
+        blob = self.blob(path)
+        size = os.path.getsize(local_path)
+        if size >= self.parallel_threshold:
+            from google.cloud.storage import transfer_manager
+
+            # XML 멀티파트 업로드: 청크를 스레드로 동시에 올린 뒤 하나로 합침
+            transfer_manager.upload_chunks_concurrently(
+                local_path, blob,
+                content_type=content_type,
+                chunk_size=self.chunk_size,
+                max_workers=self.max_workers,
+                worker_type=transfer_manager.THREAD,
+            )
+        else:
+            blob.upload_from_filename(local_path, content_type=content_type)
+        logger.debug(f"업로드 완료: {blob.name} ({size / 1024 / 1024:.1f}MB)")
+        return self.uri(blob.name, blob.bucket.name)
+
+    def upload_fileobj(self, fileobj, path, content_type=None):
+        # chunk_size 가 지정된 blob 은 resumable 업로드로 청크씩 스트리밍
+        blob = self.blob(path)
+        blob.upload_from_file(fileobj, content_type=content_type)
+        return self.uri(blob.name, blob.bucket.name)
+
+    def download_file(self, path, local_path):
+        blob = self.blob(path)
+        blob.reload()
+        if blob.size and blob.size >= self.parallel_threshold:
+            from google.cloud.storage import transfer_manager
+
+            # 구간 읽기를 스레드로 동시에 받아 파일의 각 위치에 기록
+            transfer_manager.download_chunks_concurrently(
+                blob, local_path,
+                chunk_size=self.chunk_size,
+                max_workers=self.max_workers,
+                worker_type=transfer_manager.THREAD,
+            )
+        else:
+            blob.download_to_filename(local_path)
+        return local_path
+
+    def delete(self, path):
+        self.blob(path).delete()
+
+    def delete_prefix(self, prefix):
+        bucket_name, key_prefix = self.resolve(prefix)
+        blobs = list(self.client.list_blobs(bucket_name, prefix=key_prefix))
+        # 100개 단위 배치 요청으로 삭제
+        for start in range(0, len(blobs), 100):
+            with self.client.batch():
+                for blob in blobs[start:start + 100]:
+                    blob.delete()
+        return [blob.name for blob in blobs]
+
+
+class LocalObjectStorage(ObjectStorage):
+    """<root>/<bucket>/<key> 에 저장하는 로컬 디스크 저장소"""
+    scheme = "local"
+
+    def __init__(self, root=None, bucket_name=None):
+        super().__init__(bucket_name)
+        self._root = root
+
+    @property
+    def root(self):
+        return str(self._root or settings.PACS_LOCAL_STORAGE_DIR)
+
+    def local_path(self, path):
+        bucket_name, key = self.resolve(path)
+        bucket_root = os.path.abspath(os.path.join(self.root, bucket_name))
+        full_path = os.path.abspath(os.path.join(bucket_root, key))
+        if not full_path.startswith(bucket_root + os.sep):
+            raise ValueError(f"저장소 밖의 경로입니다: {path}")
+        return full_path
+
+    def list(self, prefix):
+        bucket_name, key_prefix = self.resolve(prefix)
+        bucket_root = os.path.join(self.root, bucket_name)
+        # prefix 가 가리키는 디렉터리부터만 훑음
+        walk_root = os.path.join(bucket_root, os.path.dirname(key_prefix))
+        objects = []
+        for root, _, files in os.walk(walk_root):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                full_path = os.path.join(root, name)
+                key = os.path.relpath(full_path, bucket_root).replace(os.sep, '/')
+                if key.startswith(key_prefix):
+                    objects.append(StoredObject(name=key, size=os.path.getsize(full_path)))
+        return sorted(objects, key=lambda obj: obj.name)
+
+    def exists(self, path):
+        return os.path.isfile(self.local_path(path))
+
+    def read_range(self, path, start, end):
+        with open(self.local_path(path), 'rb') as f:
+            f.seek(start)
+            return f.read(end - start + 1)
+
+    def iter_chunks(self, path, chunk_size=None):
+        with open(self.local_path(path), 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size or self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def upload_file(self, local_path, path, content_type=None):
+        with open(local_path, 'rb') as f:
+            return self.upload_fileobj(f, path, content_type=content_type)
+
+    def upload_fileobj(self, fileobj, path, content_type=None):
+        target = self.local_path(path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, 'wb') as out:
+                shutil.copyfileobj(fileobj, out, self.chunk_size)
+            os.replace(tmp_path, target)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        bucket_name, key = self.resolve(path)
+        return self.uri(key, bucket_name)
+
+    def download_file(self, path, local_path):
+        shutil.copyfile(self.local_path(path), local_path)
+        return local_path
+
+    def delete(self, path):
+        os.remove(self.local_path(path))
+
+
+STORAGE_BACKENDS = {
+    'gcs': GCSObjectStorage,
+    'local': LocalObjectStorage,
+}
+
+_storages = {}
+_storages_lock = threading.Lock()
+
+
+def get_object_storage(backend=None):
+    """settings.PACS_STORAGE_BACKEND 에 맞는 저장소 (백엔드별로 프로세스당 1개)"""
+    backend = backend or settings.PACS_STORAGE_BACKEND
+    if backend not in _storages:
+        with _storages_lock:
+            if backend not in _storages:
+                if backend not in STORAGE_BACKENDS:
+                    raise ValueError(f"알 수 없는 저장소 백엔드: {backend}")
+                _storages[backend] = STORAGE_BACKENDS[backend]()
+    return _storages[backend]
@@ -0,0 +1,363 @@
+# pacs/orthanc_client.py
+# 모든 Orthanc REST 호출은 이 클라이언트를 거칩니다.
+# - keep-alive 세션 재사용, 엔드포인트별 (연결, 읽기) 타임아웃
+# - 멱등 호출(GET, /tools/find)만 지터를 준 지수 백오프로 재시도
+# - 연속 실패 시 회로를 열어 느린/죽은 Orthanc 때문에 Django 워커가 모두 묶이지 않도록 즉시 실패시킴
+
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+from monitoring.prometheus_metrics import (
+    orthanc_circuit_open,
+    orthanc_circuit_rejections,
+    orthanc_request_retries,
+    orthanc_request_seconds,
+)
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = (502, 503, 504)
+# POST 이지만 조회만 하는 엔드포인트 (재시도 가능)
+READ_ONLY_POST_ENDPOINTS = ('tools/find', 'tools/lookup')
+# Orthanc ID(8-8-8-8-8) 또는 DICOM UID 처럼 보이는 경로 조각 → 지표 라벨에서 {id} 로 묶음
+_ID_SEGMENT = re.compile(r'^(?:[0-9a-f]{8}(?:-[0-9a-f]{8}){4}|[0-9.]{8,})$')
+
+
+def endpoint_name(path):
+    """경로 → 지표/타임아웃용 엔드포인트 이름 (예: /instances/<id>/file → instances/{id}/file)"""
+    segments = path.split('?', 1)[0].strip('/').split('/')
+    return '/'.join('{id}' if _ID_SEGMENT.match(seg) else seg for seg in segments)
+
+
+class OrthancUnavailable(requests.exceptions.ConnectionError):
+    """회로가 열려 있어 Orthanc 에 요청을 보내지 않음 (기존 RequestException 처리에 그대로 걸림)"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Orthanc 회로 차단 중 ({retry_after:.0f}초 후 재시도)")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    연속 실패가 failure_threshold 번이면 열림(open) → reset_timeout 동안 요청을 바로 거절.
+    그 뒤 반열림(half-open) 상태에서 시험 요청 1개만 통과시켜 성공하면 닫고, 실패하면 다시 엽니다.
+    """
+
+    def __init__(self, failure_threshold=None, reset_timeout=None):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def failure_threshold(self):
+        return self._failure_threshold or settings.ORTHANC_CIRCUIT_FAILURES
+
+    @property
+    def reset_timeout(self):
+        return self._reset_timeout or settings.ORTHANC_CIRCUIT_RESET
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return 'open'
+            return 'half-open'
+
+    def allow(self):
+        """요청을 보내도 되면 None, 아니면 남은 차단 시간(초)"""
+        with self._lock:
+            if self._opened_at is None:
+                return None
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            if remaining > 0:
+                return remaining
+            if self._probing:
+                # 시험 요청이 진행 중이면 나머지는 계속 거절
+                return 1.0
+            self._probing = True
+            return None
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("Orthanc 회로 닫힘 (시험 요청 성공)")
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+        orthanc_circuit_open.set(0)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    logger.warning(f"Orthanc 회로 열림 (연속 실패 {self._failures}회, {self.reset_timeout}초 차단)")
+                self._opened_at = time.monotonic()
+                self._probing = False
+                opened = True
+            else:
+                opened = False
+        if opened:
+            orthanc_circuit_open.set(1)
+
+    def reset(self):
+        self.record_success()
+
+
+class OrthancClient:
+    """Orthanc REST API 클라이언트 - keep-alive 세션을 프로세스 전체에서 재사용"""
+
+    def __init__(self, base_url=None, auth=None, pool_size=None, max_concurrency=None, breaker=None):
+        self._base_url = base_url
+        self._auth = auth
+        self.pool_size = pool_size or settings.ORTHANC_POOL_SIZE
+        self.max_concurrency = max_concurrency or settings.ORTHANC_MAX_CONCURRENCY
+        self.breaker = breaker or CircuitBreaker()
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def base_url(self):
+        # 명시하지 않으면 settings 값을 매번 읽음 (override_settings 로 대상 서버 교체 가능)
+        return (self._base_url or settings.ORTHANC_URL).rstrip('/')
+
+    @property
+    def auth(self):
+        return self._auth or (settings.ORTHANC_USERNAME, settings.ORTHANC_PASSWORD)
+
+    @property
+    def session(self):
+        """커넥션 풀이 설정된 requests.Session (최초 사용 시 생성)"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._session = session
+        return self._session
+
+    def url(self, path):
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def timeout_for(self, endpoint):
+        """settings.ORTHANC_TIMEOUTS 에서 엔드포인트별 (연결, 읽기) 타임아웃"""
+        timeouts = settings.ORTHANC_TIMEOUTS
+        return tuple(timeouts.get(endpoint) or timeouts['default'])
+
+    def request(self, method, path, idempotent=None, timeout=None, **kwargs):
+        """
+        Orthanc 요청 1건 (raise_for_status 까지).
+        멱등 호출은 연결 오류 / 타임아웃 / 502·503·504 에 대해 ORTHANC_RETRIES 번까지 재시도하고,
+        멱등이 아니면 요청이 서버에 닿기 전인 연결 타임아웃만 재시도합니다.
+        회로가 열려 있으면 OrthancUnavailable 을 바로 올립니다.
+        """
+        method = method.upper()
+        endpoint = endpoint_name(path)
+        if idempotent is None:
+            idempotent = method in ('GET', 'HEAD') or endpoint in READ_ONLY_POST_ENDPOINTS
+        timeout = timeout or self.timeout_for(endpoint)
+        body = kwargs.get('data')
+        body_start = body.tell() if hasattr(body, 'tell') else None
+        retries = settings.ORTHANC_RETRIES
+
+        attempt = 0
+        while True:
+            # 회로는 호출 단위로 확인 (반열림 시험 요청의 재시도가 자기 자신에게 거절되지 않도록)
+            retry_after = self.breaker.allow() if attempt == 0 else None
+            if retry_after is not None:
+                orthanc_circuit_rejections.labels(endpoint=endpoint).inc()
+                raise OrthancUnavailable(retry_after)
+
+            started = time.perf_counter()
+            error = resp = None
+            try:
+                resp = self.session.request(method, self.url(path), auth=self.auth, timeout=timeout, **kwargs)
+                outcome = str(resp.status_code)
+            except requests.exceptions.RequestException as e:
+                error = e
+                outcome = 'timeout' if isinstance(e, requests.exceptions.Timeout) else 'error'
+            orthanc_request_seconds.labels(endpoint=endpoint, method=method, outcome=outcome).observe(
+                time.perf_counter() - started
+            )
+
+            if isinstance(error, requests.exceptions.ConnectTimeout):
+                retryable = True
+            elif error is not None:
+                retryable = idempotent and isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+            else:
+                retryable = idempotent and resp.status_code in RETRY_STATUS_CODES
+
+            if not retryable or attempt >= retries:
+                # 재시도까지 끝난 호출 한 건을 회로 상태에 한 번만 반영 (4xx 는 Orthanc 가 정상 응답한 것이므로 성공)
+                if error is not None or resp.status_code >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                if error is not None:
+                    raise error
+                if kwargs.get('stream') and resp.status_code >= 400:
+                    # 본문을 읽지 않을 오류 응답은 연결을 바로 풀로 반환 (헤더는 HTTPError.response 에 그대로 남음)
+                    resp.close()
+                resp.raise_for_status()
+                return resp
+
+            attempt += 1
+            delay = self._backoff(attempt)
+            orthanc_request_retries.labels(endpoint=endpoint).inc()
+            logger.warning(f"Orthanc {method} {endpoint} 재시도 {attempt}/{retries} ({outcome}, {delay:.2f}s 후)")
+            if resp is not None:
+                resp.close()
+            if body_start is not None:
+                body.seek(body_start)
+            time.sleep(delay)
+
+    @staticmethod
+    def _backoff(attempt):
+        """full jitter: 0 ~ min(상한, 기본값 * 2^(시도-1)) 사이 임의 대기"""
+        base = settings.ORTHANC_RETRY_BACKOFF
+        return random.uniform(0, min(base * 8, base * 2 ** (attempt - 1)))
+
+    def get_json(self, path, params=None, timeout=None):
+        return self.request('GET', path, params=params, timeout=timeout).json()
+
+    def post_json(self, path, payload, timeout=None):
+        return self.request('POST', path, json=payload, timeout=timeout).json()
+
+    def stream(self, path, headers=None, timeout=None):
+        """스트리밍 GET - 호출한 쪽에서 응답을 끝까지 읽거나 close() 해야 연결이 풀로 돌아갑니다"""
+        return self.request('GET', path, headers=headers, stream=True, timeout=timeout)
+
+    @property
+    def executor(self):
+        """요청 간에 공유하는 동시 호출용 스레드 풀 (동시 호출 수 상한 = max_concurrency)"""
+        if self._executor is None:
+            with self._session_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_concurrency, thread_name_prefix='orthanc'
+                    )
+        return self._executor
+
+    def run_concurrently(self, calls):
+        """
+        인자 없는 호출(callable) 목록을 공유 풀에서 동시에 실행하고 입력 순서대로 결과를 반환합니다.
+        실패한 호출은 예외 객체가 결과 자리에 들어갑니다.
+        주의: 풀 안에서 실행되는 호출이 다시 run_concurrently 를 기다리면 교착될 수 있으므로 말단 HTTP 호출만 넘겨야 합니다.
+        """
+        futures = [self.executor.submit(call) for call in calls]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def upload_instance(self, dicom_bytes, timeout=None):
+        """DICOM 인스턴스 1개를 업로드하고 Orthanc 응답(JSON)을 반환"""
+        resp = self.request(
+            'POST', '/instances', data=dicom_bytes, headers={'Content-Type': 'application/dicom'}, timeout=timeout,
+        )
+        return resp.json()
+
+    def upload_archive(self, fileobj, timeout=None):
+        """
+        DICOM 파일들을 담은 ZIP 을 한 번의 요청으로 업로드 (Orthanc 1.8.2+).
+        파일 객체는 그대로 스트리밍 전송되며, 반환값은 ZIP 안의 순서대로 된 인스턴스별 결과 목록입니다.
+        """
+        resp = self.request(
+            'POST', '/instances', data=fileobj, headers={'Content-Type': 'application/zip'},
+            timeout=timeout or self.timeout_for('instances:archive'),
+        )
+        result = resp.json()
+        return result if isinstance(result, list) else [result]
+
+    def upload_instances(self, dicom_buffers, batch_size=None, max_workers=None, on_batch=None):
+        """
+        여러 DICOM 인스턴스를 배치 단위로 병렬 업로드합니다.
+        dicom_buffers 는 bytes 의 iterable(제너레이터 가능)이며, 반환되는 Orthanc ID 순서는 입력 순서와 같습니다.
+        한 배치가 전송되는 동안 다음 배치를 생성(인코딩)하도록 최대 1개 배치만 먼저 보내 둡니다.
+        on_batch(uploaded_count) 는 배치 전송이 끝날 때마다 호출됩니다.
+        반환값: (orthanc_ids, batch_stats)
+        """
+        batch_size = batch_size or settings.ORTHANC_UPLOAD_BATCH_SIZE
+        max_workers = max_workers or settings.ORTHANC_UPLOAD_WORKERS
+
+        orthanc_ids = []
+        batch_stats = []
+
+        def submit(executor, items):
+            futures = [executor.submit(self.upload_instance, item) for item in items]
+            return items, futures, time.perf_counter()
+
+        def collect(pending):
+            items, futures, started = pending
+            results = [future.result() for future in futures]
+            elapsed = time.perf_counter() - started
+            total_bytes = sum(len(b) for b in items)
+            batch_index = len(batch_stats) + 1
+            batch_stats.append({
+                'batch': batch_index,
+                'instances': len(items),
+                'bytes': total_bytes,
+                'seconds': round(elapsed, 4),
+                'series': sorted({r['ParentSeries'] for r in results if r.get('ParentSeries')}),
+            })
+            logger.info(
+                f"Orthanc 배치 업로드 #{batch_index}: {len(items)}개 인스턴스, "
+                f"{total_bytes / 1024:.1f}KB, {elapsed * 1000:.1f}ms"
+            )
+            orthanc_ids.extend(r['ID'] for r in results)
+            if on_batch:
+                on_batch(len(orthanc_ids))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = None
+            batch = []
+            for buf in dicom_buffers:
+                batch.append(buf)
+                if len(batch) >= batch_size:
+                    if pending:
+                        collect(pending)
+                    pending = submit(executor, batch)
+                    batch = []
+            if batch:
+                if pending:
+                    collect(pending)
+                pending = submit(executor, batch)
+            if pending:
+                collect(pending)
+
+        return orthanc_ids, batch_stats
+
+
+def summarize_batch_stats(batch_stats):
+    """배치 업로드 통계를 응답에 담기 좋은 형태로 요약"""
+    total_seconds = sum(s['seconds'] for s in batch_stats)
+    return {
+        'batches': batch_stats,
+        'instances': sum(s['instances'] for s in batch_stats),
+        'bytes': sum(s['bytes'] for s in batch_stats),
+        'seconds': round(total_seconds, 4),
+        'series': sorted({series_id for s in batch_stats for series_id in s.get('series', ())}),
+    }
+
+
+# 싱글톤 인스턴스 생성
+orthanc_client = OrthancClient()
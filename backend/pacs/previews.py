@@ -0,0 +1,186 @@
+# pacs/previews.py
+# 시리즈 목록용 미리보기(썸네일) 렌더링 + 디스크 캐시
+# 시리즈의 가운데 슬라이스 1장을 작은 PNG/WebP 로 만들어 두어, 목록에서 시리즈를 고를 때 전체 인스턴스를 받지 않게 합니다.
+# - orthanc: Orthanc /instances/{id}/preview (Orthanc 가 렌더링, 윈도잉 없이 전체 범위)
+# - local  : 인스턴스 디스크 캐시의 원본 픽셀에 모달리티 LUT + 윈도우(VOI LUT)를 적용해 직접 렌더링
+# 업로드가 끝나면 schedule() 로 백그라운드에서 (다시) 만들어 두고, 캐시에 없으면 요청 시 동기로 만듭니다.
+
+import io
+import logging
+import os
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pydicom
+import requests
+from django.conf import settings
+from PIL import Image, features
+from pydicom.pixels import apply_modality_lut, apply_voi_lut
+
+from .instance_cache import instance_cache
+from .orthanc_client import orthanc_client
+
+logger = logging.getLogger(__name__)
+
+# 형식 → (Pillow 형식 이름, Content-Type)
+PREVIEW_FORMATS = {
+    'png': ('PNG', 'image/png'),
+    'webp': ('WEBP', 'image/webp'),
+}
+PREVIEW_SOURCES = ('orthanc', 'local')
+
+# Orthanc 리소스 ID (SHA-1 40자리를 8자리씩 하이픈으로 구분) - 캐시 파일 경로에 쓰기 전에 검사
+ORTHANC_ID_RE = re.compile(r'^[0-9a-f]{8}(-[0-9a-f]{8}){4}$')
+
+
+def validate_orthanc_id(resource_id):
+    if not isinstance(resource_id, str) or not ORTHANC_ID_RE.fullmatch(resource_id):
+        raise ValueError(f"올바르지 않은 Orthanc 시리즈 ID: {resource_id!r}")
+    return resource_id
+
+
+def middle_instance_id(series_id, client=None):
+    """시리즈의 가운데 슬라이스 인스턴스 ID (위치 순으로 정렬된 목록 기준, 실패하면 Orthanc 기본 순서)"""
+    client = client or orthanc_client
+    try:
+        # ['/instances/<id>/file', ...] (멀티프레임은 프레임 수만큼 반복됨)
+        paths = client.get_json(f'/series/{series_id}/ordered-slices')['Dicom']
+        instance_ids = [path.strip('/').split('/')[1] for path in paths]
+    except (requests.exceptions.HTTPError, KeyError):
+        instance_ids = client.get_json(f'/series/{series_id}')['Instances']
+    if not instance_ids:
+        raise ValueError(f"시리즈에 인스턴스가 없습니다: {series_id}")
+    return instance_ids[len(instance_ids) // 2]
+
+
+def render_dataset(dataset):
+    """DICOM → 8비트 흑백 PIL 이미지 (모달리티 LUT, 윈도우 적용. 멀티프레임은 가운데 프레임)"""
+    pixels = dataset.pixel_array
+    if getattr(dataset, 'SamplesPerPixel', 1) == 1 and int(getattr(dataset, 'NumberOfFrames', 1) or 1) > 1:
+        pixels = pixels[len(pixels) // 2]
+    if getattr(dataset, 'SamplesPerPixel', 1) != 1:
+        # 컬러 영상은 그대로 축소만
+        return Image.fromarray(pixels.astype(np.uint8))
+
+    pixels = apply_modality_lut(pixels, dataset)
+    if 'WindowCenter' in dataset or 'VOILUTSequence' in dataset:
+        pixels = apply_voi_lut(pixels, dataset)
+    pixels = pixels.astype(np.float32)
+    low, high = float(pixels.min()), float(pixels.max())
+    scaled = (pixels - low) / (high - low) * 255.0 if high > low else np.zeros_like(pixels)
+    if getattr(dataset, 'PhotometricInterpretation', '') == 'MONOCHROME1':
+        scaled = 255.0 - scaled
+    return Image.fromarray(np.clip(scaled, 0, 255).astype(np.uint8), mode='L')
+
+
+class SeriesPreviewStore:
+    """시리즈 미리보기 렌더링 + 디스크 캐시 (Orthanc 시리즈 ID 기준)"""
+
+    def __init__(self, directory=None, size=None, source=None, client=None):
+        self._directory = directory
+        self._size = size
+        self._source = source
+        self.client = client or orthanc_client
+        self._executor = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self):
+        return str(self._directory or settings.PACS_PREVIEW_DIR)
+
+    @property
+    def size(self):
+        return self._size or settings.PACS_PREVIEW_SIZE
+
+    @property
+    def source(self):
+        source = self._source or settings.PACS_PREVIEW_SOURCE
+        if source not in PREVIEW_SOURCES:
+            raise ValueError(f"알 수 없는 미리보기 소스: {source}")
+        return source
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=settings.PACS_PREVIEW_WORKERS, thread_name_prefix='pacs-preview'
+                    )
+        return self._executor
+
+    def resolve_format(self, fmt=None):
+        """요청 형식 → 실제 형식 (Pillow 에 WebP 지원이 없으면 PNG)"""
+        fmt = (fmt or settings.PACS_PREVIEW_FORMAT).lower()
+        if fmt not in PREVIEW_FORMATS:
+            raise ValueError(f"지원하지 않는 미리보기 형식: {fmt}")
+        if fmt == 'webp' and not features.check('webp'):
+            return 'png'
+        return fmt
+
+    def path_for(self, series_id, fmt):
+        validate_orthanc_id(series_id)
+        return os.path.join(self.directory, series_id[:2], f"{series_id}-{self.size}.{fmt}")
+
+    def get(self, series_id, fmt=None):
+        """캐시된 미리보기 경로 (없으면 None)"""
+        path = self.path_for(series_id, self.resolve_format(fmt))
+        return path if os.path.exists(path) else None
+
+    def get_or_render(self, series_id, fmt=None):
+        return self.get(series_id, fmt) or self.render(series_id, fmt)
+
+    def render(self, series_id, fmt=None):
+        """가운데 슬라이스를 렌더링해 캐시에 원자적으로 저장하고 경로를 반환"""
+        fmt = self.resolve_format(fmt)
+        instance_id = middle_instance_id(series_id, self.client)
+        if self.source == 'orthanc':
+            resp = self.client.request('GET', f'/instances/{instance_id}/preview', headers={'Accept': 'image/png'})
+            image = Image.open(io.BytesIO(resp.content))
+        else:
+            image = render_dataset(self._read_instance(instance_id))
+
+        image.thumbnail((self.size, self.size))
+        path = self.path_for(series_id, fmt)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            image.save(tmp_path, format=PREVIEW_FORMATS[fmt][0])
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        logger.info(f"시리즈 미리보기 생성 ({series_id}, {self.source}): {os.path.getsize(path) / 1024:.1f}KB")
+        return path
+
+    def _read_instance(self, instance_id):
+        if instance_cache.enabled:
+            return pydicom.dcmread(instance_cache.get_or_fetch(instance_id))
+        resp = self.client.request('GET', f'/instances/{instance_id}/file')
+        return pydicom.dcmread(io.BytesIO(resp.content))
+
+    def schedule(self, series_ids, fmt=None):
+        """업로드 직후 미리보기를 백그라운드에서 생성 (같은 시리즈는 한 번만, 실패는 로그만 남김)"""
+        for series_id in series_ids:
+            with self._lock:
+                if series_id in self._pending:
+                    continue
+                self._pending.add(series_id)
+            self.executor.submit(self._render_quietly, series_id, fmt)
+
+    def _render_quietly(self, series_id, fmt):
+        try:
+            self.render(series_id, fmt)
+        except Exception as e:
+            logger.warning(f"시리즈 미리보기 생성 실패 ({series_id}): {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(series_id)
+
+
+# 싱글톤 인스턴스 생성
+preview_store = SeriesPreviewStore()
@@ -0,0 +1,45 @@
+# pacs/segmentation.py
+# 병변 분할 작업 본체 (pacs.jobs.segmentation_runner 에서 실행)
+# 실제 모델 호출은 settings.PACS_SEGMENTER 로 지정한 분할기(segmenter)가 하고,
+# 여기서는 진행률 기록과 취소 지점만 담당합니다.
+
+import logging
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+SEGMENTATION_UNIT = 'segmentation'
+SEGMENTATION_STAGES = ('predict',)
+
+
+class SegmenterNotConfigured(Exception):
+    """PACS_SEGMENTER 가 비어 있음"""
+
+
+def get_segmenter():
+    """
+    settings.PACS_SEGMENTER (점 경로) 의 분할기를 불러옵니다.
+    분할기 규칙: segmenter(payload, report) → 결과 dict (TaskStatusAPIView 는 'result' 키를 결과 경로로 보여줌)
+    report(done, total) 로 진행 단계를 알리면 그 시점에 취소 요청도 확인합니다.
+    """
+    if not settings.PACS_SEGMENTER:
+        raise SegmenterNotConfigured("분할 모델이 설정되지 않았습니다 (PACS_SEGMENTER)")
+    return import_string(settings.PACS_SEGMENTER)
+
+
+def run_segmentation(progress, payload, segmenter=None):
+    logger.info(f"분할 작업 시작: {progress.job_id}")
+    segmenter = segmenter or get_segmenter()
+    progress.init_unit(SEGMENTATION_UNIT, SEGMENTATION_STAGES, status='running')
+
+    def report(done, total):
+        progress.raise_if_cancelled()
+        progress.update(SEGMENTATION_UNIT, 'predict', done, total=total)
+
+    progress.raise_if_cancelled()
+    result = segmenter(payload, report)
+
+    progress.set_status(SEGMENTATION_UNIT, 'completed')
+    return result
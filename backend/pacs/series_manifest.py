@@ -0,0 +1,163 @@
+# pacs/series_manifest.py
+# Cornerstone 이미지 로딩용 시리즈 매니페스트 + 일괄 전송
+# - 매니페스트: 슬라이스 위치(ImagePositionPatient 를 법선에 투영) 또는 InstanceNumber 순 인스턴스 목록과
+#   크기 / ETag / 가운데부터 바깥으로 퍼지는 프리페치 순서. metadata_cache 에 시리즈 단위로 저장되어
+#   Orthanc 변경 피드(StableSeries 등)로 무효화됩니다.
+# - 일괄 전송: 인스턴스 N개를 multipart/related 응답 하나로 보내 뷰어가 수백 번 대신 몇 번의 요청으로 캐시를 채움
+
+import io
+import logging
+
+import numpy as np
+
+from .instance_cache import instance_cache
+from .metadata_cache import metadata_cache
+from .orthanc_client import orthanc_client
+from .streaming import STREAM_CHUNK_SIZE, instance_etag, iter_multipart_related
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_numbers(value, count):
+    try:
+        numbers = [float(v) for v in str(value).split('\\')]
+    except ValueError:
+        return None
+    return numbers if len(numbers) == count else None
+
+
+def slice_position(tags):
+    """ImagePositionPatient 를 슬라이스 법선(ImageOrientationPatient 행 × 열)에 투영한 값 (없으면 None)"""
+    position = _parse_numbers(tags.get('ImagePositionPatient', ''), 3)
+    orientation = _parse_numbers(tags.get('ImageOrientationPatient', ''), 6)
+    if position is None or orientation is None:
+        return None
+    normal = np.cross(orientation[:3], orientation[3:])
+    return float(np.dot(normal, position))
+
+
+def _instance_number(instance):
+    try:
+        return int(instance.get('MainDicomTags', {}).get('InstanceNumber', ''))
+    except ValueError:
+        return None
+
+
+def sort_instances(instances):
+    """
+    모든 인스턴스에 위치 정보가 있으면 슬라이스 위치 순, 아니면 InstanceNumber 순 (둘 다 없으면 Orthanc 순서).
+    반환값: (정렬된 목록, 정렬 기준)
+    """
+    positions = [slice_position(instance.get('MainDicomTags', {})) for instance in instances]
+    if instances and all(p is not None for p in positions):
+        ordered = sorted(zip(positions, range(len(instances)), instances), key=lambda item: item[:2])
+        return [instance for _, _, instance in ordered], 'position'
+    numbers = [_instance_number(instance) for instance in instances]
+    if instances and all(n is not None for n in numbers):
+        ordered = sorted(zip(numbers, range(len(instances)), instances), key=lambda item: item[:2])
+        return [instance for _, _, instance in ordered], 'instance_number'
+    return list(instances), 'orthanc'
+
+
+def prefetch_order(count):
+    """가운데 슬라이스부터 양쪽으로 번갈아 퍼지는 인덱스 순서 (처음 보이는 화면을 먼저 채움)"""
+    middle = count // 2
+    order = [middle] if count else []
+    for offset in range(1, count):
+        for index in (middle + offset, middle - offset):
+            if 0 <= index < count:
+                order.append(index)
+    return order
+
+
+def build_series_manifest(series_id, client=None):
+    client = client or orthanc_client
+    instances, sorted_by = sort_instances(client.get_json(f'/series/{series_id}/instances'))
+    entries = []
+    for index, instance in enumerate(instances):
+        tags = instance.get('MainDicomTags', {})
+        entries.append({
+            'index': index,
+            'id': instance['ID'],
+            'sop_instance_uid': tags.get('SOPInstanceUID'),
+            'instance_number': _instance_number(instance),
+            'position': slice_position(tags),
+            'size': instance.get('FileSize'),
+            'etag': instance_etag(instance['ID']),
+        })
+    return {
+        'series_id': series_id,
+        'instance_count': len(entries),
+        'total_bytes': sum(entry['size'] or 0 for entry in entries),
+        'sorted_by': sorted_by,
+        'instances': entries,
+        'prefetch_order': prefetch_order(len(entries)),
+    }
+
+
+def get_series_manifest(series_id):
+    """시리즈 매니페스트 (캐시에 없으면 Orthanc 에서 1회 조회)"""
+    key = f"manifest:{series_id}"
+    manifest = metadata_cache.get_or_load(key, lambda: build_series_manifest(series_id))
+    metadata_cache.link(series_id, key)
+    return manifest
+
+
+def open_instances(instance_ids, client=None):
+    """
+    인스턴스들을 공유 풀에서 동시에 준비해 입력 순서대로 읽기용 파일 객체를 반환합니다.
+    디스크 캐시가 켜져 있으면 캐시 파일을 바로 열어 두어 전송 중 LRU 로 지워져도 읽을 수 있게 하고,
+    꺼져 있으면 메모리로 받습니다. 하나라도 실패하면 예외를 올립니다.
+    """
+    client = client or orthanc_client
+    if instance_cache.enabled:
+        results = client.run_concurrently([
+            lambda instance_id=instance_id: instance_cache.get_or_fetch(instance_id) for instance_id in instance_ids
+        ])
+    else:
+        results = client.run_concurrently([
+            lambda instance_id=instance_id: client.request('GET', f'/instances/{instance_id}/file').content
+            for instance_id in instance_ids
+        ])
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+    if instance_cache.enabled:
+        files = []
+        try:
+            for path in results:
+                files.append(open(path, 'rb'))
+        except OSError:
+            for f in files:
+                f.close()
+            raise
+        return files
+    return [io.BytesIO(content) for content in results]
+
+
+def iter_bulk_instances(instance_ids, files, boundary, url_for):
+    """open_instances 결과를 multipart/related 본문으로 내보내고 파일을 모두 닫음"""
+    def chunks(f):
+        while True:
+            chunk = f.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+    def parts():
+        for instance_id, f in zip(instance_ids, files):
+            f.seek(0, io.SEEK_END)
+            size = f.tell()
+            f.seek(0)
+            yield {
+                'Content-Type': 'application/dicom',
+                'Content-Length': size,
+                'Content-Location': url_for(instance_id),
+                'ETag': instance_etag(instance_id),
+            }, chunks(f)
+
+    try:
+        yield from iter_multipart_related(parts(), boundary)
+    finally:
+        for f in files:
+            f.close()
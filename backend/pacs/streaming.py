@@ -0,0 +1,124 @@
+# pacs/streaming.py
+# DICOM 인스턴스 프록시용 HTTP 조건부 요청 / Range 처리 도우미
+
+import re
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# DICOM 인스턴스는 저장 후 바뀌지 않으므로 브라우저가 오래 보관해도 됨
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def instance_etag(instance_id):
+    """Orthanc 인스턴스 ID는 DICOM UID 들의 해시라서 내용이 바뀌지 않으므로 그대로 강한 ETag로 사용"""
+    return f'"{instance_id}"'
+
+
+def etag_matches(request, etag):
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+
+def parse_range_header(range_header):
+    """
+    'bytes=start-end' 형식의 단일 구간만 해석합니다.
+    반환값: (start, end, suffix_length) 또는 해석할 수 없으면 None (전체 응답으로 처리)
+    """
+    if not range_header:
+        return None
+    match = _RANGE_RE.match(range_header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        return (None, None, int(end))
+    start = int(start)
+    end = int(end) if end else None
+    if end is not None and end < start:
+        return None
+    return (start, end, None)
+
+
+def resolve_range(byte_range, total_length):
+    """
+    parse_range_header 결과를 실제 길이에 맞춰 (start, end) 로 바꿉니다 (end 포함).
+    만족할 수 없는 구간이면 None 을 반환합니다.
+    """
+    start, end, suffix_length = byte_range
+    if suffix_length is not None:
+        if suffix_length == 0:
+            return None
+        return (max(total_length - suffix_length, 0), total_length - 1)
+    if start >= total_length:
+        return None
+    if end is None or end >= total_length:
+        end = total_length - 1
+    return (start, end)
+
+
+def iter_byte_range(chunks, start, end):
+    """청크 스트림에서 [start, end] 구간만 잘라서 내보냄"""
+    position = 0
+    for chunk in chunks:
+        chunk_end = position + len(chunk)
+        if chunk_end <= start:
+            position = chunk_end
+            continue
+        if position > end:
+            break
+        yield chunk[max(start - position, 0):end - position + 1]
+        position = chunk_end
+
+
+def upstream_content_length(upstream):
+    """
+    그대로 전달해도 되는 Content-Length (없으면 None).
+    Orthanc가 gzip 등으로 인코딩해 보내면 requests 가 풀어서 내보내므로 업스트림 길이와 실제 본문 길이가 달라짐
+    """
+    encoding = upstream.headers.get('Content-Encoding', 'identity').strip().lower()
+    if encoding not in ('', 'identity'):
+        return None
+    return upstream.headers.get('Content-Length')
+
+
+def iter_upstream(upstream, chunk_size=STREAM_CHUNK_SIZE):
+    """requests 스트리밍 응답을 청크 단위로 내보내고, 끝나면 연결을 풀로 반환"""
+    try:
+        for chunk in upstream.iter_content(chunk_size=chunk_size):
+            if chunk:
+                yield chunk
+    finally:
+        upstream.close()
+
+
+def iter_file_range(f, start, end, chunk_size=STREAM_CHUNK_SIZE):
+    """열린 파일의 [start, end] 구간을 청크 단위로 읽어 내보내고 닫음 (파일은 호출한 쪽에서 미리 열어 둠)"""
+    with f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def iter_multipart_related(parts, boundary):
+    """
+    (헤더 dict, 청크 iterable) 목록 → multipart/related 본문 (DICOMweb WADO-RS 응답과 같은 형식).
+    Content-Type 은 호출한 쪽에서 'multipart/related; type="application/dicom"; boundary=...' 로 지정합니다.
+    """
+    for headers, chunks in parts:
+        head = f"--{boundary}\r\n" + ''.join(f"{name}: {value}\r\n" for name, value in headers.items()) + "\r\n"
+        yield head.encode('ascii')
+        yield from chunks
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode('ascii')
@@ -1,3 +1,1395 @@
-from django.test import TestCase
+import io
+import itertools
+import json
+import os
+import tempfile
+import zipfile
+from concurrent.futures import Future
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pydicom
+import requests
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import get_resolver, resolve, reverse
+
+from . import ingest
+from .dicom_batch import DicomBatchImporter
+from .dicom_templates import DicomTemplateRegistry
+from .events import get_event_broker, publish_job_event
+from .instance_cache import DiskInstanceCache
+from .jobs import JobProgress, JobQueueFull, JobRunner, cancel_job
+from .metadata_cache import OrthancChangeFeedPoller, OrthancMetadataCache
+from .models import DicomPixelHash, NiftiMetadata, ProcessingJob
+from .nifti_encoder import DicomSliceTemplate, iter_volume_slices, rescale_volume, slice_major
+from .nifti_index import list_patient_sessions
+from .nifti_volume import NiftiVolume
+from .object_storage import LocalObjectStorage
+from .orthanc_client import CircuitBreaker, OrthancClient, OrthancUnavailable
+from .previews import SeriesPreviewStore, middle_instance_id, validate_orthanc_id
+from .segmentation import run_segmentation
+from .series_manifest import build_series_manifest, prefetch_order, slice_position, sort_instances
+from .streaming import iter_byte_range, parse_range_header, resolve_range
+
+INSTANCE_ID = '3f2a1b4c-5d6e7f80-91a2b3c4-d5e6f708-192a3b4c'
+
+
+class FakeOrthanc:
+    """get_json(path, params) 만 흉내 내는 가짜 Orthanc (경로 → 응답, /changes 는 페이지 목록을 차례로)"""
+
+    def __init__(self, resources=None, change_pages=None):
+        self.resources = resources or {}
+        self.change_pages = list(change_pages or [])
+        self.calls = []
+
+    def get_json(self, path, params=None):
+        self.calls.append((path, params))
+        if path == '/changes':
+            if params and 'last' in params:
+                return {'Last': 10}
+            return self.change_pages.pop(0)
+        return self.resources[path]
+
+
+class MetadataCacheTests(SimpleTestCase):
+
+    def make_cache(self, max_entries=4, ttl=60):
+        return OrthancMetadataCache(max_entries=max_entries, ttl=ttl, client=FakeOrthanc())
+
+    def test_get_or_load_caches_non_empty_results(self):
+        cache = self.make_cache()
+        loads = []
+        for _ in range(2):
+            cache.get_or_load('study', lambda: loads.append(1) or {'Series': ['s1']})
+        self.assertEqual(len(loads), 1)
+        cache.get_or_load('empty', lambda: loads.append(1) or [])
+        cache.get_or_load('empty', lambda: loads.append(1) or [])
+        self.assertEqual(len(loads), 3)
+
+    def test_child_change_invalidates_parent(self):
+        cache = self.make_cache()
+        cache.set('patient', ['study'])
+        cache.set('study', {'Series': ['s1']})
+        cache.link('study', 'patient')
+        cache.link('s1', 'study')
+        cache.invalidate('s1')
+        self.assertIsNone(cache.get('study'))
+        self.assertIsNone(cache.get('patient'))
+        self.assertEqual(cache.stats()['links'], 0)
+
+    def test_lru_eviction_prunes_links(self):
+        cache = self.make_cache(max_entries=4)
+        for i in range(100):
+            cache.set(f'study-{i}', {'Series': [f'series-{i}']})
+            cache.link(f'series-{i}', f'study-{i}')
+        self.assertEqual(cache.stats()['entries'], 4)
+        self.assertLessEqual(cache.stats()['links'], 4)
+        self.assertIsNotNone(cache.get('study-99'))
+        self.assertIsNone(cache.get('study-0'))
+
+    def test_expired_entry_is_unlinked(self):
+        cache = self.make_cache(ttl=-1)
+        cache.set('study', {})
+        cache.link('s1', 'study')
+        self.assertIsNone(cache.get('study'))
+        self.assertEqual(cache.stats()['links'], 0)
+
+
+class ChangeFeedPollerTests(SimpleTestCase):
+
+    def test_first_poll_starts_from_last_sequence(self):
+        cache = OrthancMetadataCache(max_entries=4, ttl=60, client=FakeOrthanc())
+        poller = OrthancChangeFeedPoller(cache, interval=0)
+        self.assertEqual(poller.poll_once(), 0)
+        self.assertEqual(poller.last_seq, 10)
+
+    def test_changes_invalidate_resource_and_new_series_parent(self):
+        client = FakeOrthanc(
+            resources={'/series/s2': {'ParentStudy': 'study'}},
+            change_pages=[
+                {'Changes': [{'ChangeType': 'StableSeries', 'ID': 's1'}], 'Last': 11, 'Done': False},
+                {'Changes': [{'ChangeType': 'NewSeries', 'ID': 's2'}], 'Last': 12, 'Done': True},
+            ],
+        )
+        cache = OrthancMetadataCache(max_entries=4, ttl=60, client=client)
+        cache.set('s1', {'Instances': []})
+        cache.set('study', {'Series': ['s1']})
+        cache.set('other', {'Series': []})
+        poller = OrthancChangeFeedPoller(cache, interval=0)
+        poller.last_seq = 10
+        self.assertEqual(poller.poll_once(), 2)
+        self.assertEqual(poller.last_seq, 12)
+        self.assertIsNone(cache.get('s1'))
+        self.assertIsNone(cache.get('study'))
+        self.assertIsNotNone(cache.get('other'))
+
+
+class RangeParsingTests(SimpleTestCase):
+
+    def test_closed_range(self):
+        self.assertEqual(parse_range_header('bytes=0-99'), (0, 99, None))
+        self.assertEqual(resolve_range((0, 99, None), 1000), (0, 99))
+
+    def test_end_clamped_to_length(self):
+        self.assertEqual(resolve_range(parse_range_header('bytes=900-5000'), 1000), (900, 999))
+
+    def test_open_ended_range(self):
+        self.assertEqual(parse_range_header('bytes=500-'), (500, None, None))
+        self.assertEqual(resolve_range((500, None, None), 1000), (500, 999))
+
+    def test_suffix_range(self):
+        self.assertEqual(parse_range_header('bytes=-100'), (None, None, 100))
+        self.assertEqual(resolve_range((None, None, 100), 1000), (900, 999))
+        # 전체보다 긴 suffix 는 파일 전체
+        self.assertEqual(resolve_range((None, None, 5000), 1000), (0, 999))
+        self.assertIsNone(resolve_range((None, None, 0), 1000))
+
+    def test_start_past_end_of_file_is_unsatisfiable(self):
+        self.assertIsNone(resolve_range(parse_range_header('bytes=1000-'), 1000))
+
+    def test_unsupported_headers_fall_back_to_full_response(self):
+        for header in (None, '', 'bytes=0-10,20-30', 'bytes=-', 'bytes=10-5', 'items=0-10', 'bytes=a-b'):
+            self.assertIsNone(parse_range_header(header), header)
+
+    def test_slice_across_chunk_boundaries(self):
+        chunks = [b'abcd', b'efgh', b'ijkl']
+        self.assertEqual(b''.join(iter_byte_range(iter(chunks), 2, 9)), b'cdefghij')
+        self.assertEqual(b''.join(iter_byte_range(iter(chunks), 4, 7)), b'efgh')
+        self.assertEqual(b''.join(iter_byte_range(iter(chunks), 11, 11)), b'l')
+
+    def test_slice_stops_reading_after_end(self):
+        consumed = []
+
+        def chunks():
+            for chunk in (b'abcd', b'efgh', b'ijkl'):
+                consumed.append(chunk)
+                yield chunk
+
+        self.assertEqual(b''.join(iter_byte_range(chunks(), 0, 3)), b'abcd')
+        self.assertLess(len(consumed), 3)
+
+
+class FakeUpstream:
+    """requests 스트리밍 응답 대용"""
+
+    def __init__(self, body, status_code=200, headers=None):
+        self.body = body
+        self.status_code = status_code
+        self.headers = {'Content-Length': str(len(body)), **(headers or {})}
+        self.closed = False
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.body), 4):
+            yield self.body[i:i + 4]
+
+    def close(self):
+        self.closed = True
+
+
+@override_settings(PACS_INSTANCE_CACHE_MAX_BYTES=0)
+class DicomInstanceProxyTests(SimpleTestCase):
+    """get_dicom_instance_data: ETag / Range 처리 (Orthanc 는 가짜 클라이언트, 디스크 캐시 끔)"""
+
+    body = bytes(range(40))
+
+    def get(self, client, **headers):
+        from . import views
+
+        request = RequestFactory().get(f'/api/pacs/dicom-instance-data/{INSTANCE_ID}/', headers=headers)
+        with mock.patch.object(views, 'orthanc_client', client):
+            return views.get_dicom_instance_data(request, INSTANCE_ID)
+
+    def test_etag_match_returns_304_without_orthanc(self):
+        client = mock.Mock()
+        response = self.get(client, if_none_match=f'"{INSTANCE_ID}"')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], f'"{INSTANCE_ID}"')
+        client.stream.assert_not_called()
+
+    def test_full_response_streams_body(self):
+        client = mock.Mock()
+        client.stream.return_value = FakeUpstream(self.body)
+        response = self.get(client)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.body)
+        self.assertEqual(response['Content-Length'], '40')
+
+    def test_range_sliced_when_orthanc_sends_full_body(self):
+        client = mock.Mock()
+        client.stream.return_value = FakeUpstream(self.body)
+        response = self.get(client, range='bytes=-10')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 30-39/40')
+        self.assertEqual(b''.join(response.streaming_content), self.body[30:])
+
+    def test_range_past_end_of_file_returns_416(self):
+        client = mock.Mock()
+        upstream = FakeUpstream(self.body)
+        client.stream.return_value = upstream
+        response = self.get(client, range='bytes=40-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */40')
+        self.assertTrue(upstream.closed)
+
+    def test_multi_range_falls_back_to_full_response(self):
+        client = mock.Mock()
+        client.stream.return_value = FakeUpstream(self.body)
+        response = self.get(client, range='bytes=0-1,5-6')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Range', client.stream.call_args.kwargs['headers'])
+        self.assertEqual(b''.join(response.streaming_content), self.body)
+
+
+class InstanceCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+        self.client = mock.Mock()
+        self.cache = DiskInstanceCache(directory=self.directory, max_bytes=10, client=self.client)
+
+    def files(self):
+        return sorted(name for _, _, names in os.walk(self.directory) for name in names)
+
+    def test_fetch_stores_file_atomically(self):
+        self.client.stream.return_value = FakeUpstream(b'abcdef')
+        path = self.cache.fetch('i1')
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'abcdef')
+        self.assertEqual(self.cache.get('i1'), path)
+        self.assertEqual(len(self.files()), 1)
+
+    def test_iter_fill_caches_complete_stream(self):
+        self.assertEqual(b''.join(self.cache.iter_fill('i1', iter([b'abc', b'def']))), b'abcdef')
+        with open(self.cache.get('i1'), 'rb') as f:
+            self.assertEqual(f.read(), b'abcdef')
+
+    def test_iter_fill_discards_interrupted_stream(self):
+        stream = self.cache.iter_fill('i1', iter([b'abc', b'def']))
+        next(stream)
+        stream.close()
+        self.assertIsNone(self.cache.get('i1'))
+        self.assertEqual(self.files(), [])
+
+    def test_evicts_least_recently_used(self):
+        for instance_id in ('i1', 'i2'):
+            b''.join(self.cache.iter_fill(instance_id, iter([b'abcd'])))
+        self.cache.get('i1')
+        b''.join(self.cache.iter_fill('i3', iter([b'abcd'])))
+        self.assertIsNone(self.cache.get('i2'))
+        self.assertIsNotNone(self.cache.get('i1'))
+        self.assertEqual(len(self.files()), 2)
+
+    def test_index_rebuilt_from_disk(self):
+        b''.join(self.cache.iter_fill('i1', iter([b'abcd'])))
+        other_process = DiskInstanceCache(directory=self.directory, max_bytes=10, client=self.client)
+        self.assertEqual(other_process.get('i1'), self.cache.path_for('i1'))
+
+
+class CachedInstanceProxyTests(SimpleTestCase):
+    """get_dicom_instance_data: 디스크 캐시 적중 / 미스 / 제거된 캐시 파일"""
+
+    body = bytes(range(40))
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.client = mock.Mock()
+        self.cache = DiskInstanceCache(directory=tmp.name, max_bytes=1024, client=self.client)
+
+    def get(self, **headers):
+        from . import views
+
+        request = RequestFactory().get(f'/api/pacs/dicom-instance-data/{INSTANCE_ID}/', headers=headers)
+        with mock.patch.object(views, 'orthanc_client', self.client), mock.patch.object(views, 'instance_cache', self.cache):
+            response = views.get_dicom_instance_data(request, INSTANCE_ID)
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, content
+
+    def test_miss_streams_and_fills_cache(self):
+        self.client.stream.return_value = FakeUpstream(self.body)
+        response, content = self.get()
+        self.assertEqual((response.status_code, content), (200, self.body))
+        self.assertIsNotNone(self.cache.get(INSTANCE_ID))
+
+        self.client.stream.reset_mock()
+        response, content = self.get(range='bytes=10-19')
+        self.assertEqual((response.status_code, content), (206, self.body[10:20]))
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/40')
+        self.client.stream.assert_not_called()
+
+    def test_range_miss_fetches_whole_instance_first(self):
+        self.client.stream.return_value = FakeUpstream(self.body)
+        response, content = self.get(range='bytes=-5')
+        self.assertEqual((response.status_code, content), (206, self.body[35:]))
+        self.assertNotIn('headers', self.client.stream.call_args.kwargs)
+
+    def test_evicted_file_is_refetched(self):
+        b''.join(self.cache.iter_fill(INSTANCE_ID, iter([self.body])))
+        self.client.stream.return_value = FakeUpstream(self.body)
+        real_open = open
+
+        def evicting_open(path, *args, **kwargs):
+            if path == self.cache.path_for(INSTANCE_ID):
+                raise FileNotFoundError(path)
+            return real_open(path, *args, **kwargs)
+
+        with mock.patch('pacs.views.open', evicting_open, create=True):
+            response, content = self.get()
+        self.assertEqual((response.status_code, content), (200, self.body))
+        self.client.stream.assert_called_once()
+
+
+class NiftiEncoderTests(SimpleTestCase):
+    """템플릿 이어 붙이기 결과가 pydicom 으로 직접 만든 슬라이스와 같은지"""
+
+    def common_dataset(self):
+        ds = pydicom.Dataset()
+        ds.PatientID, ds.PatientName = 'TEST0001', 'Test^Patient'
+        ds.StudyInstanceUID, ds.SeriesInstanceUID = '1.2.3.4', '1.2.3.4.5'
+        ds.Modality, ds.ImageType = 'MR', ['DERIVED', 'PRIMARY']
+        ds.PixelSpacing = ['0.93750000', '0.93750000']
+        ds.SamplesPerPixel = 1
+        ds.PhotometricInterpretation = 'MONOCHROME2'
+        ds.BitsAllocated, ds.BitsStored, ds.HighBit = 16, 16, 15
+        ds.PixelRepresentation = 1
+        ds.RescaleIntercept, ds.RescaleSlope = '-12.50000000', '0.25000000'
+        return ds
+
+    def baseline_slice(self, pixels, instance_number, sop_instance_uid):
+        """기존 방식: 슬라이스마다 pydicom Dataset 을 만들어 저장"""
+        ds = self.common_dataset()
+        ds.Rows, ds.Columns = pixels.shape
+        ds.SOPClassUID = pydicom.uid.MRImageStorage
+        ds.SOPInstanceUID = sop_instance_uid
+        ds.InstanceNumber = str(instance_number)
+        ds.PixelData = pixels.astype('<i2').tobytes()
+        ds.file_meta = pydicom.dataset.FileMetaDataset()
+        ds.file_meta.MediaStorageSOPClassUID = ds.SOPClassUID
+        ds.file_meta.MediaStorageSOPInstanceUID = sop_instance_uid
+        ds.file_meta.TransferSyntaxUID = pydicom.uid.ExplicitVRLittleEndian
+        buffer = io.BytesIO()
+        pydicom.dcmwrite(buffer, ds, enforce_file_format=True)
+        return buffer.getvalue()
+
+    def test_spliced_slice_matches_pydicom_output(self):
+        pixels = np.arange(-60, 60, dtype=np.int16).reshape(10, 12)
+        ds = self.common_dataset()
+        ds.Rows, ds.Columns = pixels.shape
+        template = DicomSliceTemplate(ds, pydicom.uid.MRImageStorage)
+        encoded = template.encode_slice(pixels.astype('<i2').tobytes(), 7, sop_instance_uid='1.2.3.4.5.7')
+        baseline = self.baseline_slice(pixels, 7, '1.2.3.4.5.7')
+
+        new = pydicom.dcmread(io.BytesIO(encoded))
+        old = pydicom.dcmread(io.BytesIO(baseline))
+        self.assertEqual(new.SOPInstanceUID, old.SOPInstanceUID)
+        self.assertEqual(new.file_meta.MediaStorageSOPInstanceUID, '1.2.3.4.5.7')
+        self.assertEqual(new.InstanceNumber, old.InstanceNumber)
+        self.assertEqual(new.PixelData, old.PixelData)
+        np.testing.assert_array_equal(new.pixel_array, pixels)
+        self.assertEqual(encoded, baseline)
+
+    def test_template_rejects_per_slice_tags(self):
+        ds = self.common_dataset()
+        ds.InstanceNumber = '1'
+        with self.assertRaises(ValueError):
+            DicomSliceTemplate(ds, pydicom.uid.MRImageStorage)
+
+    def test_volume_matches_per_slice_conversion(self):
+        img_data = np.asfortranarray(np.random.default_rng(0).normal(500.0, 200.0, size=(8, 6, 5)))
+        intercept, slope, int_min = img_data.min(), (img_data.max() - img_data.min()) / 65535, -32768
+        slices = slice_major(rescale_volume(img_data, intercept, slope, int_min, slab=2), rotate_k=3)
+        encoded = list(iter_volume_slices(slices, self.common_dataset(), pydicom.uid.MRImageStorage))
+        self.assertEqual(len(encoded), 5)
+        for index, data in enumerate(encoded):
+            expected = np.rot90((((img_data[:, :, index] - intercept) / slope) + int_min).astype(np.int16), k=3)
+            decoded = pydicom.dcmread(io.BytesIO(data))
+            self.assertEqual(decoded.InstanceNumber, index + 1)
+            self.assertEqual((decoded.Rows, decoded.Columns), expected.shape)
+            np.testing.assert_array_equal(decoded.pixel_array, expected)
+
+
+class NiftiVolumeTests(SimpleTestCase):
+    """슬라이스 묶음 단위 읽기가 get_fdata() 와 같은 값을 내는지 (.nii mmap / .nii.gz 순차 읽기)"""
+
+    def write_volume(self, suffix):
+        import nibabel as nib
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        data = np.random.default_rng(0).integers(0, 1000, size=(6, 5, 7)).astype(np.int16)
+        image = nib.Nifti1Image(data, np.diag([0.9, 0.9, 3.0, 1.0]))
+        image.header.set_slope_inter(0.5, 10)
+        path = os.path.join(tmp.name, f'volume{suffix}')
+        nib.save(image, path)
+        return path, nib.load(path).get_fdata()
+
+    def test_slabs_match_get_fdata(self):
+        for suffix in ('.nii', '.nii.gz'):
+            path, expected = self.write_volume(suffix)
+            volume = NiftiVolume(path)
+            self.assertEqual(volume.compressed, suffix == '.nii.gz')
+            slices = list(volume.iter_slices(slab=3))
+            self.assertEqual(len(slices), 7)
+            np.testing.assert_allclose(np.stack(slices, axis=2), expected)
+            self.assertEqual(volume.min_max(slab=3), (expected.min(), expected.max()))
+
+    def test_metadata_reads_header_only(self):
+        path, _ = self.write_volume('.nii.gz')
+        metadata = NiftiVolume(path).metadata()
+        self.assertEqual(metadata['shape'], [6, 5, 7])
+        self.assertEqual((metadata['resolution'], metadata['num_slices'], metadata['slice_thickness']), ('6x5', 7, 3.0))
+
+    def test_label_map_keeps_every_label(self):
+        import nibabel as nib
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        labels = np.zeros((4, 3, 5), dtype=np.float32)
+        labels[0, 0, :] = 1
+        labels[1, 1, 2:] = 2
+        labels[3, 2, 4] = 7
+        labels[2, 0, 0] = 0.9999  # 리샘플링 오차가 있는 저장값도 정수 라벨로
+        path = os.path.join(tmp.name, 'seg.nii.gz')
+        nib.save(nib.Nifti1Image(labels, np.eye(4)), path)
+
+        label_map = NiftiVolume(path).label_map(slab=2)
+
+        self.assertEqual(label_map.dtype, np.uint16)
+        self.assertEqual(label_map.shape, (5, 4, 3))
+        np.testing.assert_array_equal(label_map, np.moveaxis(np.rint(labels), 2, 0))
+        self.assertEqual(sorted(np.unique(label_map)), [0, 1, 2, 7])
+
+
+class NiftiSessionIndexTests(TestCase):
+    """세션 목록은 인덱스에 없는(또는 덮어써진) 파일만 헤더 1KB 를 구간 읽기하는지"""
+
+    patient = 'patient-1'
+    keys = ('nifti/patient-1/s1/t1/a.nii', 'nifti/patient-1/s2/flair/b.nii.gz')
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.storage = LocalObjectStorage(root=os.path.join(self.tmp, 'storage'), bucket_name='bucket')
+        self.put(self.keys[0], self.nifti_bytes('.nii'))
+        self.put(self.keys[1], self.nifti_bytes('.nii.gz'))
+        # 구간 읽기만 기록 (실제 읽기는 로컬 저장소가 수행)
+        self.reads = []
+        read_range = self.storage.read_range
+
+        def recording_read_range(path, start, end):
+            self.reads.append((path, start, end))
+            return read_range(path, start, end)
+
+        self.storage.read_range = recording_read_range
+
+    def nifti_bytes(self, suffix, shape=(32, 32, 8)):
+        import nibabel as nib
+
+        data = np.random.default_rng(0).integers(0, 1000, size=shape).astype(np.int16)
+        path = os.path.join(self.tmp, f'volume{suffix}')
+        nib.save(nib.Nifti1Image(data, np.diag([0.9, 0.9, 3.0, 1.0])), path)
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def put(self, key, data):
+        self.assertGreater(len(data), 1024)
+        self.storage.upload_fileobj(io.BytesIO(data), key)
+
+    def test_first_call_reads_one_header_chunk_per_blob(self):
+        sessions = list_patient_sessions(self.storage, self.patient)
+
+        self.assertEqual(sorted(self.reads), [(key, 0, 1023) for key in self.keys])
+        self.assertEqual(NiftiMetadata.objects.filter(patient_uuid=self.patient).count(), 2)
+        self.assertEqual([s['sessionId'] for s in sessions], ['s2', 's1'])
+        self.assertEqual(sessions[1]['modalities']['t1'][0]['metadata'], {'resolution': '32x32', 'sliceThickness': 3.0})
+
+    def test_second_call_reads_nothing(self):
+        list_patient_sessions(self.storage, self.patient)
+        self.reads.clear()
+
+        sessions = list_patient_sessions(self.storage, self.patient)
+
+        self.assertEqual(self.reads, [])
+        self.assertEqual(sessions[0]['modalities']['flair'][0]['metadata']['sliceThickness'], 3.0)
+
+    def test_resized_blob_is_reread_and_backfilled(self):
+        list_patient_sessions(self.storage, self.patient)
+        data = self.nifti_bytes('.nii', shape=(16, 16, 4))
+        self.put(self.keys[0], data)
+        self.reads.clear()
+
+        sessions = list_patient_sessions(self.storage, self.patient)
+
+        self.assertEqual(self.reads, [(self.keys[0], 0, 1023)])
+        entry = NiftiMetadata.objects.get(gcs_path=self.storage.uri(self.keys[0]))
+        self.assertEqual(entry.size, len(data))
+        self.assertEqual(sessions[1]['modalities']['t1'][0]['metadata']['resolution'], '16x16')
+
+
+class PacsUrlsTests(SimpleTestCase):
+    """pacs URL 이름이 뷰 클래스로 연결되는지"""
+
+    def test_all_named_routes_resolve(self):
+        resolver = get_resolver('pacs.urls')
+        for pattern in resolver.url_patterns:
+            self.assertTrue(callable(pattern.callback), pattern.name)
+
+    def test_patient_sessions_route(self):
+        from . import views
+
+        path = reverse('list-patient-sessions', urlconf='pacs.urls', kwargs={'patient_uuid': 'abc'})
+        match = resolve(path, urlconf='pacs.urls')
+        self.assertIs(match.func.view_class, views.ListPatientSessionsView)
+        self.assertEqual(match.kwargs, {'patient_uuid': 'abc'})
+
+
+@override_settings(PACS_STORAGE_CHUNK_SIZE=4)
+class LocalObjectStorageTests(TestCase):
+    """로컬 디스크 저장소가 GCS 백엔드와 같은 규칙(key/URI, [start, end] 구간)으로 동작하는지"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        self.storage = LocalObjectStorage(root=self.root, bucket_name='bucket')
+
+    def put(self, key, data):
+        return self.storage.upload_fileobj(io.BytesIO(data), key)
+
+    def test_upload_returns_uri_and_lists_by_prefix(self):
+        uri = self.put('nifti/p1/s1/t1/a.nii', b'0123456789')
+        self.put('nifti/p1/s2/t2/b.nii', b'abc')
+        self.put('nifti/p2/s1/t1/c.nii', b'zz')
+
+        self.assertEqual(uri, 'local://bucket/nifti/p1/s1/t1/a.nii')
+        listed = self.storage.list('nifti/p1/')
+        self.assertEqual([(obj.name, obj.size) for obj in listed],
+                         [('nifti/p1/s1/t1/a.nii', 10), ('nifti/p1/s2/t2/b.nii', 3)])
+        # 업로드 중간 파일(.tmp)은 남지 않음
+        self.assertEqual(self.storage.list('local://bucket/nifti/p1/s1/'), listed[:1])
+
+    def test_upload_file_and_download_file(self):
+        source = os.path.join(self.root, 'source.nii')
+        with open(source, 'wb') as f:
+            f.write(b'x' * 10)
+        self.storage.upload_file(source, 'nifti/p1/s1/t1/a.nii')
+
+        target = os.path.join(self.root, 'copy.nii')
+        self.storage.download_file('local://bucket/nifti/p1/s1/t1/a.nii', target)
+        with open(target, 'rb') as f:
+            self.assertEqual(f.read(), b'x' * 10)
+
+    def test_range_read_includes_end_and_chunks_cover_file(self):
+        self.put('nifti/p1/s1/t1/a.nii', b'0123456789')
+
+        self.assertEqual(self.storage.read_range('nifti/p1/s1/t1/a.nii', 2, 5), b'2345')
+        self.assertEqual(self.storage.read_range('nifti/p1/s1/t1/a.nii', 8, 100), b'89')
+        self.assertEqual(list(self.storage.iter_chunks('nifti/p1/s1/t1/a.nii')), [b'0123', b'4567', b'89'])
+
+    def test_delete_and_delete_prefix(self):
+        self.put('nifti/p1/s1/t1/a.nii', b'a')
+        self.put('nifti/p1/s1/t2/b.nii', b'b')
+        self.put('nifti/p1/s2/t1/c.nii', b'c')
+
+        self.storage.delete('local://bucket/nifti/p1/s2/t1/c.nii')
+        self.assertFalse(self.storage.exists('nifti/p1/s2/t1/c.nii'))
+        self.assertEqual(sorted(self.storage.delete_prefix('nifti/p1/s1/')),
+                         ['nifti/p1/s1/t1/a.nii', 'nifti/p1/s1/t2/b.nii'])
+        self.assertEqual(self.storage.list('nifti/'), [])
+
+    def test_rejects_paths_outside_bucket(self):
+        with self.assertRaises(ValueError):
+            self.storage.local_path('../other/secret')
+        with self.assertRaises(ValueError):
+            self.storage.resolve('local://bucket-only')
+
+
+class DeleteViewTests(TestCase):
+    """삭제 뷰가 저장소 파일과 NiftiMetadata 인덱스를 함께 지우는지"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.storage = LocalObjectStorage(root=tmp.name, bucket_name='bucket')
+        for key in ('nifti/p1/s1/t1/a.nii', 'nifti/p1/s1/t2/b.nii'):
+            uri = self.storage.upload_fileobj(io.BytesIO(b'data'), key)
+            NiftiMetadata.objects.create(
+                gcs_path=uri, patient_uuid='p1', session_id='s1', modality=key.split('/')[3],
+                file_name=key.rsplit('/', 1)[1], size=4, shape=[1, 1, 1], zooms=[1, 1, 1],
+                resolution='1x1', slice_thickness=1.0,
+            )
+
+    def call(self, view_class, data):
+        from rest_framework.test import APIRequestFactory
+
+        from . import views
+
+        request = APIRequestFactory().delete('/', data, format='json')
+        with mock.patch.object(views, 'get_object_storage', return_value=self.storage):
+            return view_class.as_view()(request)
+
+    def test_file_delete(self):
+        from . import views
+
+        with self.assertLogs('pacs.views', level='INFO') as logs:
+            response = self.call(views.FileDeleteAPIView, {'gcs_path': 'local://bucket/nifti/p1/s1/t1/a.nii'})
+
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(self.storage.exists('nifti/p1/s1/t1/a.nii'))
+        self.assertEqual(list(NiftiMetadata.objects.values_list('file_name', flat=True)), ['b.nii'])
+        self.assertIn('파일 삭제 성공', logs.output[0])
+
+        missing = self.call(views.FileDeleteAPIView, {'gcs_path': 'local://bucket/nifti/p1/s1/t1/a.nii'})
+        self.assertEqual(missing.status_code, 404)
+
+    def test_session_delete(self):
+        from . import views
+
+        response = self.call(views.SessionDeleteAPIView, {'patient_id': 'p1', 'session_id': 's1'})
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.storage.list('nifti/p1/'), [])
+        self.assertFalse(NiftiMetadata.objects.exists())
+
+    def test_storage_error_is_logged(self):
+        from . import views
+
+        self.storage.delete_prefix = mock.Mock(side_effect=OSError('disk'))
+        with self.assertLogs('pacs.views', level='ERROR'):
+            response = self.call(views.SessionDeleteAPIView, {'patient_id': 'p1', 'session_id': 's1'})
+        self.assertEqual(response.status_code, 500)
+
+
+class JobRunnerTests(TestCase):
+    """작업 상태가 queued → running → completed/failed 로 기록되는지"""
+
+    def run_job(self, func):
+        job = ProcessingJob.objects.create(job_type='nifti_ingest', patient_uuid='p1')
+        self.assertEqual(job.status, 'queued')
+        # 풀 대신 현재 스레드에서 실행 (같은 테스트 트랜잭션 안에서 상태 확인)
+        JobRunner('test-job', 'PACS_JOB_WORKERS', 'PACS_JOB_QUEUE_LIMIT')._run(job.pk, func, (), {})
+        job.refresh_from_db()
+        return job
+
+    def test_completed_job_records_result(self):
+        seen = {}
+
+        def work(progress):
+            seen['status'] = ProcessingJob.objects.get(pk=progress.job_id).status
+            progress.init_unit('FLAIR', ('storage',))
+            progress.update('FLAIR', 'storage', 1, total=2)
+            return {'ok': True}
+
+        job = self.run_job(work)
+
+        self.assertEqual(seen['status'], 'running')
+        self.assertEqual((job.status, job.progress, job.result), ('completed', 100, {'ok': True}))
+        self.assertEqual(job.stages['FLAIR']['storage'], {'done': 1, 'total': 2})
+        self.assertIsNotNone(job.started_at)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failed_job_records_error(self):
+        def work(progress):
+            progress.init_unit('DWI', ('encode',))
+            raise RuntimeError('encode failed')
+
+        job = self.run_job(work)
+
+        self.assertEqual((job.status, job.error, job.result), ('failed', 'encode failed', None))
+        self.assertIn('DWI', job.stages)
+
+    def test_progress_ignores_skipped_units(self):
+        job = ProcessingJob.objects.create(job_type='nifti_ingest')
+        progress = JobProgress(job.pk)
+        progress.init_unit('FLAIR', ('storage', 'encode'))
+        progress.set_status('ADC', 'skipped')
+        progress.update('FLAIR', 'storage', 1, total=1)
+        progress.update('FLAIR', 'encode', 5, total=10)
+
+        self.assertEqual(progress.overall_progress(), 75)
+        progress.flush(force=True)
+        job.refresh_from_db()
+        self.assertEqual(job.progress, 75)
+
+
+class NiftiIngestTests(SimpleTestCase):
+    """업로드 작업 본체: 모달리티별 결과, 빠진 모달리티, 실패 시 임시 파일 정리"""
+
+    def make_items(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        items = []
+        for modality in ('FLAIR', 'DWI'):
+            path = os.path.join(tmp.name, f'{modality}.nii')
+            with open(path, 'wb') as f:
+                f.write(b'nifti')
+            items.append({'modality': modality, 'path': path, 'name': f'{modality}.nii'})
+        items.append({'modality': 'ADC', 'path': None, 'name': None})
+        return items
+
+    def run_ingest(self, items, upload):
+        progress = mock.Mock()
+        with mock.patch.object(ingest, '_upload_to_storage', side_effect=upload), \
+                mock.patch.object(ingest, '_encode_and_send', return_value={'sent': 3}):
+            result = ingest.run_nifti_ingest(progress, 'p1', 'P-001', 'Kim', 'session_1', items)
+        return result, progress
+
+    def test_missing_modality_is_dummy_generated(self):
+        items = self.make_items()
+
+        result, progress = self.run_ingest(items, lambda progress, modality, path, blob_name: f'gs://bucket/{blob_name}')
+
+        self.assertEqual([(r['modality'], r['status']) for r in result['results']],
+                         [('FLAIR', 'uploaded'), ('DWI', 'uploaded'), ('ADC', 'dummy_generated')])
+        self.assertEqual(result['uploaded_blobs']['flair'], 'gs://bucket/nifti/p1/session_1/FLAIR/FLAIR.nii')
+        progress.set_status.assert_any_call('ADC', 'skipped')
+        self.assertFalse(any(os.path.exists(item['path']) for item in items if item['path']))
+
+    def test_failed_task_still_removes_temp_files(self):
+        items = self.make_items()
+
+        def upload(progress, modality, path, blob_name):
+            if modality == 'DWI':
+                raise OSError('upload failed')
+            return f'gs://bucket/{blob_name}'
+
+        result, progress = self.run_ingest(items, upload)
+
+        statuses = {r['modality']: r['status'] for r in result['results']}
+        self.assertEqual(statuses, {'FLAIR': 'uploaded', 'DWI': 'error', 'ADC': 'dummy_generated'})
+        self.assertNotIn('dwi', result['uploaded_blobs'])
+        progress.set_status.assert_any_call('DWI', 'error', error='upload failed')
+        self.assertFalse(any(os.path.exists(item['path']) for item in items if item['path']))
+
+
+class FakeExecutor:
+    """submit 된 작업을 실행하지 않고 Future 만 돌려주는 풀 (테스트가 완료 시점을 정함)"""
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.futures.append(future)
+        return future
+
+
+class StubSegmenter:
+    """분할기 규칙(segmenter(payload, report))만 따르는 가짜 모델. on_step 으로 단계 사이 동작을 끼워 넣음"""
+
+    def __init__(self, steps=3, on_step=None):
+        self.steps = steps
+        self.on_step = on_step
+        self.done = []
+
+    def __call__(self, payload, report):
+        for step in range(1, self.steps + 1):
+            report(step - 1, self.steps)
+            if self.on_step:
+                self.on_step(step)
+            self.done.append(step)
+        report(self.steps, self.steps)
+        return {'result': f"seg/{payload['patient_id']}.nii.gz"}
+
+
+# 취소 플래그 / 진행률 반영 간격을 건너뛰도록 시계를 매번 크게 진행
+@mock.patch('pacs.jobs.time.monotonic', side_effect=itertools.count(0, 10))
+class SegmentationJobTests(TestCase):
+    """분할 작업: 대기열 한도, 취소, 분할기 주입"""
+
+    def make_runner(self):
+        runner = JobRunner('test-segmentation', 'PACS_SEGMENTATION_WORKERS', 'PACS_SEGMENTATION_QUEUE_LIMIT')
+        runner._executor = FakeExecutor()
+        return runner
+
+    def run_now(self, job, func, *args):
+        JobRunner('test-segmentation', 'PACS_SEGMENTATION_WORKERS', 'PACS_SEGMENTATION_QUEUE_LIMIT')._run(job.pk, func, args, {})
+        job.refresh_from_db()
+        return job
+
+    @override_settings(PACS_SEGMENTATION_QUEUE_LIMIT=2)
+    def test_rejects_over_capacity_without_creating_job(self, _):
+        runner = self.make_runner()
+        runner.enqueue('segmentation', run_segmentation, args=({},))
+        runner.enqueue('segmentation', run_segmentation, args=({},))
+
+        with self.assertRaises(JobQueueFull):
+            runner.enqueue('segmentation', run_segmentation, args=({},))
+        self.assertEqual(ProcessingJob.objects.count(), 2)
+
+        # 끝난 작업만큼 자리가 생김
+        runner.executor.futures[0].set_result(None)
+        self.assertEqual(runner.queue_depth, 1)
+        runner.enqueue('segmentation', run_segmentation, args=({},))
+        self.assertEqual(ProcessingJob.objects.count(), 3)
+
+    def test_completed_with_stub_segmenter(self, _):
+        job = ProcessingJob.objects.create(job_type='segmentation')
+        segmenter = StubSegmenter()
+
+        job = self.run_now(job, run_segmentation, {'patient_id': 'p1'}, segmenter)
+
+        self.assertEqual((job.status, job.progress), ('completed', 100))
+        self.assertEqual(job.result, {'result': 'seg/p1.nii.gz'})
+        self.assertEqual(job.stages['segmentation']['predict'], {'done': 3, 'total': 3})
+        self.assertEqual(job.stages['segmentation']['status'], 'completed')
+
+    def test_running_job_stops_at_next_report_after_cancel(self, _):
+        job = ProcessingJob.objects.create(job_type='segmentation')
+        segmenter = StubSegmenter(steps=5, on_step=lambda step: step == 2 and cancel_job(job.pk))
+
+        job = self.run_now(job, run_segmentation, {'patient_id': 'p1'}, segmenter)
+
+        self.assertEqual(segmenter.done, [1, 2])
+        self.assertEqual(job.status, 'cancelled')
+        self.assertTrue(job.cancel_requested)
+        self.assertEqual(job.stages['segmentation']['predict'], {'done': 1, 'total': 5})
+
+    def test_queued_job_cancelled_before_start(self, _):
+        job = ProcessingJob.objects.create(job_type='segmentation')
+        segmenter = StubSegmenter()
+
+        self.assertEqual(cancel_job(job.pk).status, 'cancelled')
+        job = self.run_now(job, run_segmentation, {'patient_id': 'p1'}, segmenter)
+
+        self.assertEqual(segmenter.done, [])
+        self.assertEqual(job.status, 'cancelled')
+        self.assertIsNone(job.started_at)
+
+    @override_settings(PACS_SEGMENTER='')
+    def test_missing_segmenter_fails_job(self, _):
+        job = ProcessingJob.objects.create(job_type='segmentation')
+
+        job = self.run_now(job, run_segmentation, {'patient_id': 'p1'})
+
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('PACS_SEGMENTER', job.error)
+
+    @override_settings(PACS_SEGMENTER='pacs.tests.StubSegmenter')
+    def test_segmenter_loaded_from_settings(self, _):
+        job = ProcessingJob.objects.create(job_type='segmentation')
+
+        with mock.patch('pacs.segmentation.import_string', return_value=StubSegmenter(steps=1)) as loader:
+            job = self.run_now(job, run_segmentation, {'patient_id': 'p2'})
+
+        loader.assert_called_once_with('pacs.tests.StubSegmenter')
+        self.assertEqual(job.result, {'result': 'seg/p2.nii.gz'})
+
+
+class SegmentationViewTests(TestCase):
+    """분할 API: 202 + 작업 기록, 대기열 초과 시 429, 상태 조회/취소"""
+
+    def setUp(self):
+        from . import jobs
+
+        self.runner = jobs.JobRunner('test-segmentation', 'PACS_SEGMENTATION_WORKERS', 'PACS_SEGMENTATION_QUEUE_LIMIT')
+        self.runner._executor = FakeExecutor()
+        patcher = mock.patch('pacs.views.segmentation_runner', self.runner)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, method, view_class, data=None, **kwargs):
+        from rest_framework.test import APIRequestFactory
+
+        request = getattr(APIRequestFactory(), method)('/', data, format='json')
+        return view_class.as_view()(request, **kwargs)
+
+    @override_settings(PACS_SEGMENTATION_QUEUE_LIMIT=1)
+    def test_start_status_cancel_and_queue_full(self):
+        from . import views
+
+        started = self.request('post', views.SegmentationAPIView, {'patient_id': 'p1'})
+        self.assertEqual(started.status_code, 202)
+        task_id = started.data['task_id']
+        self.assertEqual(ProcessingJob.objects.get(pk=task_id).payload, {'patient_id': 'p1'})
+
+        rejected = self.request('post', views.SegmentationAPIView, {'patient_id': 'p2'})
+        self.assertEqual(rejected.status_code, 429)
+        self.assertIn('Retry-After', rejected)
+        self.assertEqual(ProcessingJob.objects.count(), 1)
+
+        state = self.request('get', views.TaskStatusAPIView, task_id=task_id)
+        self.assertEqual((state.data['status'], state.data['progress']), ('processing', 0))
+
+        cancelled = self.request('delete', views.TaskStatusAPIView, task_id=task_id)
+        self.assertEqual(cancelled.status_code, 202)
+        self.assertEqual(cancelled.data['status'], 'cancelled')
+
+        missing = self.request('get', views.TaskStatusAPIView, task_id='not-a-uuid')
+        self.assertEqual(missing.status_code, 404)
+
+
+@override_settings(PACS_EVENT_BACKEND='memory', PACS_EVENT_RETRY=1500, PACS_EVENT_KEEPALIVE=0.01)
+class JobEventStreamTests(TestCase):
+    """SSE 스트림: retry 필드, 작업 갱신마다 이벤트 1개, 종료 이벤트, PACS_EVENT_STREAM_TIMEOUT 에서 닫힘"""
+
+    def open_stream(self, job):
+        from rest_framework.test import APIRequestFactory
+
+        from . import views
+
+        response = views.ProcessingJobEventsView.as_view()(APIRequestFactory().get('/'), job_id=job.pk)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return iter(response.streaming_content)
+
+    @staticmethod
+    def parse(chunk):
+        text = chunk.decode() if isinstance(chunk, bytes) else chunk
+        fields = dict(line.split(': ', 1) for line in text.strip().splitlines() if not line.startswith(':'))
+        return fields.get('event'), json.loads(fields['data']) if 'data' in fields else None
+
+    def test_one_event_per_job_update_then_end(self):
+        job = ProcessingJob.objects.create(job_type='nifti_ingest', patient_uuid='p1')
+        stream = self.open_stream(job)
+
+        # 첫 청크를 읽는 시점에 구독이 열림
+        self.assertEqual(next(stream), b'retry: 1500\n\n')
+        self.assertEqual(self.parse(next(stream)), ('progress', job.to_dict()))
+
+        publish_job_event(job.pk, status='running')
+        publish_job_event(job.pk, stages={'FLAIR': {'storage': {'done': 1, 'total': 2}}}, progress=50)
+        publish_job_event(job.pk, status='completed', progress=100, result={'ok': True})
+
+        events = [self.parse(chunk) for chunk in stream]
+
+        self.assertEqual([event for event, _ in events], ['progress', 'progress', 'progress', 'end'])
+        self.assertEqual(events[0][1]['status'], 'running')
+        self.assertEqual((events[1][1]['status'], events[1][1]['progress']), ('running', 50))
+        self.assertEqual(events[1][1]['stages']['FLAIR']['storage'], {'done': 1, 'total': 2})
+        self.assertEqual((events[2][1]['status'], events[2][1]['result']), ('completed', {'ok': True}))
+        self.assertEqual(events[3][1], {'job_id': str(job.pk), 'status': 'completed'})
+        self.assertFalse(get_event_broker('memory')._subscribers)
+
+    def test_finished_job_ends_immediately(self):
+        job = ProcessingJob.objects.create(job_type='nifti_ingest', status='failed', error='boom')
+
+        chunks = list(self.open_stream(job))
+
+        self.assertEqual(chunks[0], b'retry: 1500\n\n')
+        self.assertEqual([self.parse(chunk)[0] for chunk in chunks[1:]], ['progress', 'end'])
+
+    def test_cancel_is_published(self):
+        job = ProcessingJob.objects.create(job_type='segmentation')
+        stream = self.open_stream(job)
+        next(stream), next(stream)
+
+        cancel_job(job.pk)
+
+        self.assertEqual([event for event, _ in map(self.parse, stream)], ['progress', 'end'])
+
+    @override_settings(PACS_EVENT_STREAM_TIMEOUT=30)
+    @mock.patch('pacs.views.time.monotonic', side_effect=itertools.count(0, 10))
+    def test_stream_closes_at_timeout_without_end(self, monotonic):
+        job = ProcessingJob.objects.create(job_type='nifti_ingest', status='running')
+
+        chunks = list(self.open_stream(job))
+
+        # 시작(0) → 마감 30초, 10·20초에 이벤트 없이 keep-alive, 30초에 닫힘 (EventSource 가 retry 후 재연결)
+        self.assertEqual(chunks[2:], [b': keep-alive\n\n', b': keep-alive\n\n'])
+        self.assertNotIn(b'event: end', b''.join(chunks))
+        self.assertFalse(get_event_broker('memory')._subscribers)
+
+
+class DicomTemplateRegistryTests(SimpleTestCase):
+    """참조 DICOM 템플릿: 모달리티 → default 대체, 한 번만 읽기, 수정해도 되는 사본"""
+
+    def write_template(self, modality, **tags):
+        from pydicom.dataset import FileDataset, FileMetaDataset
+        from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        meta = FileMetaDataset()
+        meta.MediaStorageSOPClassUID = '1.2.840.10008.5.1.4.1.1.4'
+        meta.MediaStorageSOPInstanceUID = generate_uid()
+        meta.TransferSyntaxUID = ExplicitVRLittleEndian
+        path = os.path.join(tmp.name, f'{modality}.dcm')
+        dataset = FileDataset(path, {}, file_meta=meta, preamble=b'\0' * 128)
+        dataset.Modality = modality
+        for keyword, value in tags.items():
+            setattr(dataset, keyword, value)
+        dataset.Rows, dataset.Columns = 2, 2
+        dataset.BitsAllocated, dataset.BitsStored, dataset.HighBit = 16, 16, 15
+        dataset.SamplesPerPixel, dataset.PixelRepresentation = 1, 0
+        dataset.PhotometricInterpretation = 'MONOCHROME2'
+        dataset.PixelData = np.zeros((2, 2), dtype=np.uint16).tobytes()
+        dataset.save_as(path, write_like_original=False)
+        return path
+
+    def test_modality_falls_back_to_default(self):
+        registry = DicomTemplateRegistry({
+            'default': self.write_template('OT'),
+            'MR': self.write_template('MR', PatientID='MR-1'),
+        })
+
+        self.assertEqual(registry.resolve('mr'), 'MR')
+        self.assertEqual(registry.resolve('CT'), 'default')
+        self.assertEqual(registry.get('CT').Modality, 'OT')
+        self.assertEqual(registry.get('MR').PatientID, 'MR-1')
+        with self.assertRaises(ValueError):
+            DicomTemplateRegistry({'MR': self.write_template('MR')}).resolve('CT')
+
+    def test_reads_once_without_pixels_and_returns_copies(self):
+        registry = DicomTemplateRegistry({'default': self.write_template('OT')})
+
+        with mock.patch('pacs.dicom_templates.pydicom.dcmread', wraps=pydicom.dcmread) as dcmread:
+            first = registry.get()
+            first.PatientName = 'Changed'
+            first.ReferencedSeriesSequence = [pydicom.Dataset()]
+            second = registry.get()
+
+        dcmread.assert_called_once()
+        self.assertNotIn('PixelData', second)
+        self.assertEqual((second.PatientName, second.PatientID), ('Anonymous', 'DUMMYID'))
+        self.assertNotIn('ReferencedSeriesSequence', second)
+        self.assertEqual(first.FrameOfReferenceUID, second.FrameOfReferenceUID)
+
+
+def make_dicom_bytes(pixels, **tags):
+    """2x2 MR 인스턴스 하나를 Part 10 바이트로"""
+    from pydicom.dataset import FileDataset, FileMetaDataset
+    from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = '1.2.840.10008.5.1.4.1.1.4'
+    meta.MediaStorageSOPInstanceUID = tags.pop('SOPInstanceUID', generate_uid())
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    dataset = FileDataset('', {}, file_meta=meta, preamble=b'\0' * 128)
+    dataset.SOPClassUID = meta.MediaStorageSOPClassUID
+    dataset.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    dataset.StudyInstanceUID = tags.pop('StudyInstanceUID', '1.2.3')
+    dataset.SeriesInstanceUID = tags.pop('SeriesInstanceUID', '1.2.3.4')
+    dataset.Modality = 'MR'
+    dataset.PatientID = 'ORIGINAL'
+    for keyword, value in tags.items():
+        setattr(dataset, keyword, value)
+    dataset.Rows, dataset.Columns = 2, 2
+    dataset.BitsAllocated, dataset.BitsStored, dataset.HighBit = 16, 16, 15
+    dataset.SamplesPerPixel, dataset.PixelRepresentation = 1, 0
+    dataset.PhotometricInterpretation = 'MONOCHROME2'
+    dataset.PixelData = np.asarray(pixels, dtype=np.uint16).reshape(2, 2).tobytes()
+    buffer = io.BytesIO()
+    dataset.save_as(buffer, write_like_original=False)
+    return buffer.getvalue()
+
+
+class NamedBytesIO(io.BytesIO):
+    """업로드 파일(UploadedFile) 대용: name 속성만 추가"""
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+class StoredHashesTests(TestCase):
+    """Orthanc 에서 지워진 인스턴스의 픽셀 해시는 중복 판정에서 빠지고 DB 에서도 정리됨"""
+
+    def setUp(self):
+        DicomPixelHash.objects.create(patient_id='P1', pixel_hash='a' * 64, sop_instance_uid='1.1', orthanc_id='kept')
+        DicomPixelHash.objects.create(patient_id='P1', pixel_hash='b' * 64, sop_instance_uid='1.2', orthanc_id='gone')
+        DicomPixelHash.objects.create(patient_id='P2', pixel_hash='c' * 64, sop_instance_uid='1.3', orthanc_id='other')
+
+    def test_stale_hashes_removed(self):
+        with mock.patch('pacs.dicom_batch.orthanc_client') as client:
+            client.post_json.return_value = ['kept']
+            hashes = DicomBatchImporter('P1', 'Test^Patient')._stored_hashes()
+        self.assertEqual(hashes, {'a' * 64})
+        client.post_json.assert_called_once_with('/tools/find', {"Level": "Instance", "Query": {"PatientID": 'P1'}})
+        self.assertEqual(
+            set(DicomPixelHash.objects.values_list('orthanc_id', flat=True)), {'kept', 'other'}
+        )
+
+    def test_no_lookup_without_recorded_hashes(self):
+        with mock.patch('pacs.dicom_batch.orthanc_client') as client:
+            self.assertEqual(DicomBatchImporter('P3', 'Test^Patient')._stored_hashes(), set())
+        client.post_json.assert_not_called()
+
+
+class DicomBatchImportTests(TestCase):
+    """일괄 업로드: 배치 안/이전 업로드 중복 건너뛰기, 환자 태그만 변경, ZIP 한 번 전송"""
+
+    def upload(self, importer, files):
+        sent = {}
+
+        def upload_archive(fileobj):
+            with zipfile.ZipFile(fileobj) as archive:
+                sent['datasets'] = [pydicom.dcmread(io.BytesIO(archive.read(name))) for name in archive.namelist()]
+            return [{'Status': 'Success', 'ID': f'orthanc-{i}'} for i in range(len(sent['datasets']))]
+
+        with mock.patch('pacs.dicom_batch.orthanc_client') as client:
+            client.post_json.return_value = ['orthanc-old']
+            client.upload_archive.side_effect = upload_archive
+            summary = importer.run(files)
+        return summary, sent.get('datasets', []), client
+
+    def test_batch_dedup_and_patient_rewrite(self):
+        archive_bytes = io.BytesIO()
+        with zipfile.ZipFile(archive_bytes, 'w') as archive:
+            archive.writestr('a.dcm', make_dicom_bytes([1, 2, 3, 4], SOPInstanceUID='1.2.3.4.1'))
+            archive.writestr('same_pixels.dcm', make_dicom_bytes([1, 2, 3, 4]))
+            archive.writestr('DICOMDIR', b'skip')
+            archive.writestr('README.txt', b'not dicom')
+        files = [
+            NamedBytesIO(archive_bytes.getvalue(), 'study.zip'),
+            NamedBytesIO(make_dicom_bytes([5, 6, 7, 8], SeriesInstanceUID='9' * 70), 'long_uid.dcm'),
+        ]
+
+        summary, sent, client = self.upload(DicomBatchImporter('P1', 'Kim^Test'), files)
+
+        self.assertEqual((summary['received'], summary['uploaded']), (4, 2))
+        self.assertEqual(summary['duplicates'], ['study.zip:same_pixels.dcm'])
+        self.assertEqual([item['name'] for item in summary['invalid']], ['study.zip:README.txt'])
+        client.upload_archive.assert_called_once()
+        self.assertEqual({(str(ds.PatientID), str(ds.PatientName)) for ds in sent}, {('P1', 'Kim^Test')})
+        self.assertEqual(str(sent[0].SOPInstanceUID), '1.2.3.4.1')
+        self.assertLessEqual(len(str(sent[1].SeriesInstanceUID)), 64)
+        self.assertEqual(DicomPixelHash.objects.filter(patient_id='P1').count(), 2)
+
+    def test_previously_uploaded_pixels_are_skipped(self):
+        data = make_dicom_bytes([1, 2, 3, 4])
+        self.upload(DicomBatchImporter('P1', 'Kim^Test'), [NamedBytesIO(data, 'a.dcm')])
+        DicomPixelHash.objects.update(orthanc_id='orthanc-old')
+
+        summary, sent, client = self.upload(DicomBatchImporter('P1', 'Kim^Test'), [NamedBytesIO(data, 'again.dcm')])
+
+        self.assertEqual(summary['duplicates'], ['again.dcm'])
+        self.assertEqual(sent, [])
+        client.upload_archive.assert_not_called()
+
+
+class FakeResponse:
+    """requests.Response 대용 (status_code / raise_for_status / close 만 사용)"""
+
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.closed = False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code}", response=self)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    """미리 정한 응답/예외를 순서대로 돌려주는 가짜 세션"""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@override_settings(ORTHANC_CIRCUIT_FAILURES=2, ORTHANC_CIRCUIT_RESET=30, ORTHANC_RETRIES=2, ORTHANC_RETRY_BACKOFF=0)
+class CircuitBreakerTests(SimpleTestCase):
+
+    def make_client(self, outcomes):
+        client = OrthancClient(base_url='http://orthanc:8042', auth=('u', 'p'), breaker=CircuitBreaker())
+        client._session = FakeSession(outcomes)
+        return client
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'closed')
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        self.assertIsNotNone(breaker.allow())
+
+    def test_half_open_allows_single_probe(self):
+        breaker = CircuitBreaker()
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker._opened_at -= 31
+        self.assertEqual(breaker.state, 'half-open')
+        self.assertIsNone(breaker.allow())
+        self.assertIsNotNone(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_retried_call_counts_as_one_failure(self):
+        error = requests.exceptions.ConnectionError('down')
+        client = self.make_client([error, error, error])
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            client.request('GET', '/system')
+        self.assertEqual(client.session.calls, 3)
+        self.assertEqual(client.breaker._failures, 1)
+        self.assertEqual(client.breaker.state, 'closed')
+
+    def test_rejects_while_open(self):
+        client = self.make_client([FakeResponse(503)] * 6)
+        for _ in range(2):
+            with self.assertRaises(requests.exceptions.HTTPError):
+                client.request('GET', '/system')
+        with self.assertRaises(OrthancUnavailable):
+            client.request('GET', '/system')
+        self.assertEqual(client.session.calls, 6)
+
+    def test_probe_retries_are_not_rejected(self):
+        client = self.make_client([FakeResponse(503), FakeResponse(200)])
+        client.breaker.record_failure()
+        client.breaker.record_failure()
+        client.breaker._opened_at -= 31
+        response = client.request('GET', '/system')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.breaker.state, 'closed')
+
+    def test_streamed_error_response_is_closed(self):
+        response = FakeResponse(404)
+        client = self.make_client([response])
+        with self.assertRaises(requests.exceptions.HTTPError):
+            client.request('GET', f'/instances/{INSTANCE_ID}/file', stream=True)
+        self.assertTrue(response.closed)
+        self.assertEqual(client.breaker._failures, 0)
+
+
+class OrthancIdValidationTests(SimpleTestCase):
+
+    def test_accepts_orthanc_id(self):
+        self.assertEqual(validate_orthanc_id(INSTANCE_ID), INSTANCE_ID)
+
+    def test_rejects_path_like_ids(self):
+        for value in ('../etc/passwd', INSTANCE_ID + '\n', INSTANCE_ID.upper(), '', None):
+            with self.assertRaises(ValueError):
+                validate_orthanc_id(value)
+
+
+class FakePreviewOrthanc:
+    """ordered-slices / 시리즈 / 인스턴스 파일 요청만 흉내 내는 가짜 Orthanc"""
+
+    def __init__(self, instance_ids, dicom_bytes, ordered=True):
+        self.instance_ids = instance_ids
+        self.dicom_bytes = dicom_bytes
+        self.ordered = ordered
+        self.calls = []
+
+    def get_json(self, path, params=None):
+        self.calls.append(path)
+        if path.endswith('/ordered-slices'):
+            if not self.ordered:
+                raise requests.exceptions.HTTPError('404')
+            return {'Dicom': [f'/instances/{i}/file' for i in self.instance_ids]}
+        return {'Instances': list(reversed(self.instance_ids))}
+
+    def request(self, method, path, **kwargs):
+        self.calls.append(path)
+        return mock.Mock(content=self.dicom_bytes)
+
+
+@override_settings(PACS_INSTANCE_CACHE_MAX_BYTES=0)
+class SeriesPreviewTests(SimpleTestCase):
+    """가운데 슬라이스 선택과 미리보기 디스크 캐시"""
+
+    def test_middle_instance_prefers_ordered_slices(self):
+        client = FakePreviewOrthanc(['a', 'b', 'c', 'd'], b'')
+        self.assertEqual(middle_instance_id(INSTANCE_ID, client), 'c')
+
+        # ordered-slices 가 안 되면 Orthanc 기본 순서
+        client = FakePreviewOrthanc(['a', 'b', 'c', 'd'], b'', ordered=False)
+        self.assertEqual(middle_instance_id(INSTANCE_ID, client), 'b')
+
+    def test_local_render_is_cached(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        client = FakePreviewOrthanc(['a', 'b', 'c'], make_dicom_bytes([0, 100, 200, 300]))
+        store = SeriesPreviewStore(directory=tmp.name, size=16, source='local', client=client)
+
+        path = store.get_or_render(INSTANCE_ID, 'png')
+        calls = len(client.calls)
+        self.assertEqual(store.get_or_render(INSTANCE_ID, 'png'), path)
+
+        self.assertEqual(len(client.calls), calls)
+        self.assertIn('/instances/b/file', client.calls)
+        self.assertTrue(path.endswith(f'{INSTANCE_ID}-16.png'))
+        from PIL import Image
+        with Image.open(path) as image:
+            self.assertEqual((image.mode, image.size), ('L', (2, 2)))
+            self.assertEqual(sorted(image.getdata()), [0, 85, 170, 255])
+        self.assertEqual([name for name in os.listdir(os.path.dirname(path)) if name.endswith('.tmp')], [])
+
+    def test_invalid_series_id_never_touches_disk(self):
+        store = SeriesPreviewStore(directory='/nonexistent', source='local', client=FakePreviewOrthanc([], b''))
+        with self.assertRaises(ValueError):
+            store.get('../../etc/passwd', 'png')
+
+
+def orthanc_instance(instance_id, position=None, orientation=None, number=None):
+    tags = {'SOPInstanceUID': f'1.2.{instance_id}'}
+    if position is not None:
+        tags['ImagePositionPatient'] = '\\'.join(f'{v:.4f}' for v in position)
+    if orientation is not None:
+        tags['ImageOrientationPatient'] = '\\'.join(f'{v:.6f}' for v in orientation)
+    if number is not None:
+        tags['InstanceNumber'] = str(number)
+    return {'ID': instance_id, 'MainDicomTags': tags, 'FileSize': 100}
+
+
+class SeriesManifestTests(SimpleTestCase):
+    """슬라이스 정렬(법선 투영 → InstanceNumber → Orthanc 순서)과 프리페치 순서"""
+
+    def test_sorts_by_projection_on_oblique_normal(self):
+        angle = np.radians(30)
+        row, col = np.array([1.0, 0, 0]), np.array([0, np.cos(angle), np.sin(angle)])
+        normal = np.cross(row, col)
+        orientation = [*row, *col]
+        # 평면 안쪽 이동(col 방향)이 커서 z 좌표 순서는 실제 슬라이스 순서와 다름
+        offsets = {'s0': (0, 0), 's1': (1, -40), 's2': (2, 40), 's3': (3, 0)}
+        instances = [
+            orthanc_instance(name, position=k * 3 * normal + shift * col, orientation=orientation, number=10 - k)
+            for name, (k, shift) in offsets.items()
+        ]
+        by_z = sorted(instances, key=lambda i: float(i['MainDicomTags']['ImagePositionPatient'].split('\\')[2]))
+        self.assertNotEqual([i['ID'] for i in by_z], ['s0', 's1', 's2', 's3'])
+
+        ordered, sorted_by = sort_instances(list(reversed(instances)))
+
+        self.assertEqual(sorted_by, 'position')
+        self.assertEqual([i['ID'] for i in ordered], ['s0', 's1', 's2', 's3'])
+        np.testing.assert_allclose(
+            [slice_position(i['MainDicomTags']) for i in ordered], [0, 3, 6, 9], atol=1e-3
+        )
+
+    def test_falls_back_to_instance_number_then_orthanc_order(self):
+        axial = [1, 0, 0, 0, 1, 0]
+        mixed = [
+            orthanc_instance('a', position=(0, 0, 5), orientation=axial, number=3),
+            orthanc_instance('b', number=1),
+            orthanc_instance('c', position=(0, 0, 1), orientation=axial, number=2),
+        ]
+        ordered, sorted_by = sort_instances(mixed)
+        self.assertEqual((sorted_by, [i['ID'] for i in ordered]), ('instance_number', ['b', 'c', 'a']))
+
+        bare = [orthanc_instance('x'), orthanc_instance('y', number=1), orthanc_instance('z')]
+        ordered, sorted_by = sort_instances(bare)
+        self.assertEqual((sorted_by, [i['ID'] for i in ordered]), ('orthanc', ['x', 'y', 'z']))
+        self.assertEqual(sort_instances([]), ([], 'orthanc'))
+
+    def test_prefetch_order_starts_in_the_middle(self):
+        self.assertEqual(prefetch_order(0), [])
+        self.assertEqual(prefetch_order(1), [0])
+        self.assertEqual(prefetch_order(4), [2, 3, 1, 0])
+        self.assertEqual(prefetch_order(5), [2, 3, 1, 4, 0])
+        for count in range(12):
+            self.assertEqual(sorted(prefetch_order(count)), list(range(count)))
+
+    def test_manifest_entries(self):
+        client = FakeOrthanc({f'/series/{INSTANCE_ID}/instances': [
+            orthanc_instance('b', number=2), orthanc_instance('a', number=1), orthanc_instance('c', number=3),
+        ]})
+
+        manifest = build_series_manifest(INSTANCE_ID, client)
+
+        self.assertEqual([e['id'] for e in manifest['instances']], ['a', 'b', 'c'])
+        self.assertEqual((manifest['instance_count'], manifest['total_bytes']), (3, 300))
+        self.assertEqual(manifest['prefetch_order'], [1, 2, 0])
+        self.assertEqual(manifest['instances'][0]['sop_instance_uid'], '1.2.a')
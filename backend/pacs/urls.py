@@ -3,11 +3,17 @@
 from django.urls import path, include
 from .views import (
     DicomUploadView,
+    DicomBatchUploadView,
     PatientStudiesView,
     VerifyPacsIdView,
     SeriesInstancesView,
+    SeriesPreviewView,
+    SeriesManifestView,
+    SeriesBulkInstancesView,
     get_dicom_instance_data,  # <-- 새로운 뷰 함수 import
     NiftiUploadView, # 유정우넌할수있어
+    ProcessingJobStatusView,
+    ProcessingJobEventsView,
     ListPatientSessionsView, # 유정우넌할수있어
     NiftiToDicomView, # 유정우넌할수있어
     NiftiToDicomBundleView, # 유정우가추가함 seg 2x2
@@ -20,6 +26,8 @@ from .views import (
 urlpatterns = [
     # 기존 DICOM 업로드 API
     path('upload/', DicomUploadView.as_view(), name='dicom_upload'),
+    # 여러 DICOM / ZIP 일괄 업로드 (중복 제외, Orthanc 전송 1회)
+    path('upload/batch/', DicomBatchUploadView.as_view(), name='dicom_batch_upload'),
     
     # 환자 스터디 조회 API (메타데이터)
     path('patients/<str:patient_pacs_id>/studies/', PatientStudiesView.as_view(), name='patient_studies'),
@@ -36,8 +44,18 @@ urlpatterns = [
     # Cornerstone.js가 실제로 DICOM 파일의 바이너리 데이터를 가져올 엔드포인트입니다.
     # instance_id는 Orthanc 내부의 Instance UUID여야 합니다.
     path('dicom-instance-data/<str:instance_id>/', get_dicom_instance_data, name='dicom_instance_data'),
+    # 시리즈 가운데 슬라이스 미리보기 (PNG/WebP, 디스크 캐시)
+    path('series/<str:series_id>/preview/', SeriesPreviewView.as_view(), name='series_preview'),
+    # 시리즈 프리페치 매니페스트 (정렬된 인스턴스 / 크기 / ETag / 프리페치 순서)
+    path('series/<str:series_id>/manifest/', SeriesManifestView.as_view(), name='series_manifest'),
+    # 인스턴스 N개 일괄 전송 (multipart/related)
+    path('series/<str:series_id>/bulk/', SeriesBulkInstancesView.as_view(), name='series_bulk_instances'),
     # 유정우넌할수있어 
     path('upload-nifti/', NiftiUploadView.as_view(), name='upload-nifti'),
+    # NIfTI 업로드 등 백그라운드 작업 상태 / 단계별 진행률 (DELETE: 취소)
+    path('jobs/<uuid:job_id>/', ProcessingJobStatusView.as_view(), name='pacs-job-status'),
+    # 작업 진행률 Server-Sent Events (폴링 대신 구독)
+    path('jobs/<uuid:job_id>/events/', ProcessingJobEventsView.as_view(), name='pacs-job-events'),
     # 유정우넌할수있어 nnunet성공이후 추가
     path('patient-sessions/<str:patient_uuid>/', ListPatientSessionsView.as_view(), name='list-patient-sessions'),
     # 유정우넌할수있어 nnunet성공이후 추가
@@ -53,5 +71,6 @@ urlpatterns = [
     
     # [새로운 길] task_id를 주소로 받는 상태 보고 경로
     path('segment/status/<str:task_id>/', TaskStatusAPIView.as_view(), name='task-status'),
+    path('segment/events/<uuid:job_id>/', ProcessingJobEventsView.as_view(), name='task-events'),
 ]   
 
@@ -14,14 +14,13 @@ from openmrs_integration.models import OpenMRSPatient
 from django.http import HttpResponse, JsonResponse # HttpResponse, JsonResponse import 추가
 
 from django.shortcuts import get_object_or_404 # 유정우넌할수있어
-from google.cloud import storage # 유정우넌할수있어
 from openmrs_integration.models import OpenMRSPatient # 유정우넌할수있어
 from django.http import Http404 # 유정우넌할수있어
 import tempfile # 유정우넌할수있어
 import os # 유정우넌할수있어
 import nibabel as nib # 유정우넌할수있어
 from rest_framework.parsers import MultiPartParser, FormParser # 유정우넌할수있어
-from pydicom.dataset import FileDataset, FileMetaDataset # 유정우넌할수있어
+from pydicom.dataset import Dataset, FileDataset, FileMetaDataset # 유정우넌할수있어
 from pydicom.uid import ExplicitVRLittleEndian, generate_uid # 유정우넌할수있어
 from datetime import datetime # 유정우넌할수있어
 from ai_segmentation_service.segmentation_flow import process_nifti_segmentation # 유정우넌할수있어
@@ -29,18 +28,46 @@ from collections import defaultdict # 유정우넌할수있어 nnunet성공이
 import shutil # 유정우넌할수있어 nnunet성공이후추가
 import numpy as np # 유정우넌할수있어 nnunet성공이후추가
 
-import threading
+import json
+import math
 import time
-from django.core.cache import cache
+from django.db import close_old_connections
 from django.shortcuts import render
-from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.http import FileResponse, StreamingHttpResponse
 from .dicom_seg_converter import SegDicomConverterMixin
+from .orthanc_client import OrthancUnavailable, orthanc_client
+from .metadata_cache import metadata_cache, change_feed_poller
+from .instance_cache import instance_cache
+from .nifti_index import list_patient_sessions
+from .object_storage import get_object_storage
+from .models import NiftiMetadata, ProcessingJob
+from .jobs import JobQueueFull, cancel_job, job_runner, segmentation_runner
+from .events import subscribe_job_events
+from .conversion import convert_nifti_series, instance_base_url, run_dicom_conversion
+from .segmentation import run_segmentation
+from .ingest import run_nifti_ingest
+from .dicom_batch import DicomBatchImporter
+from .previews import PREVIEW_FORMATS, preview_store, validate_orthanc_id
+from .series_manifest import get_series_manifest, iter_bulk_instances, open_instances
+from .streaming import (
+    IMMUTABLE_CACHE_CONTROL, etag_matches, instance_etag, iter_byte_range, iter_file_range, iter_upstream,
+    parse_range_header, resolve_range, upstream_content_length,
+)
 
 # from highdicom.seg.content import SegmentDescription, AlgorithmIdentificationSequence
 # from highdicom.seg.sop import Segmentation
 
 logger = logging.getLogger(__name__)
-ORTHANC_AUTH = (settings.ORTHANC_USERNAME, settings.ORTHANC_PASSWORD)
+
+
+def _orthanc_unavailable_response(error, response_class=Response):
+    """Orthanc 회로가 열려 있으면 워커를 붙잡지 않고 바로 503 (Retry-After 후 재시도)"""
+    response = response_class(
+        {'error': 'ORTHANC_UNAVAILABLE', 'detail': str(error)}, status=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+    response['Retry-After'] = str(max(1, math.ceil(error.retry_after)))
+    return response
 
 
 class DicomUploadView(APIView):
@@ -134,21 +161,20 @@ class DicomUploadView(APIView):
             pydicom.dcmwrite(modified_dicom_stream, dataset, write_like_original=False)
             modified_dicom_bytes = modified_dicom_stream.getvalue()
 
-            orthanc_url = f"{settings.ORTHANC_URL}/instances"
-            response = requests.post(orthanc_url, data=modified_dicom_bytes, headers={'Content-Type': 'application/dicom'}, auth=ORTHANC_AUTH)
-            response.raise_for_status()
+            upload_result = orthanc_client.upload_instance(modified_dicom_bytes)
+            if upload_result.get('ParentSeries'):
+                preview_store.schedule([upload_result['ParentSeries']])
             
             orthanc_patient_id = dataset.PatientID
-            verify_url = f"{settings.ORTHANC_URL}/tools/find"
             verify_payload = {"Level": "Patient", "Query": {"PatientID": orthanc_patient_id}}
-            verify_response = requests.post(verify_url, json=verify_payload, auth=ORTHANC_AUTH)
+            found_patients = orthanc_client.post_json('/tools/find', verify_payload)
             
-            if verify_response.status_code != 200 or not verify_response.json():
+            if not found_patients:
                 logger.error(f"[FATAL] Orthanc에 PatientID '{orthanc_patient_id}' 저장 실패")
                 return Response({
                     'error': 'PACS_ID_SAVE_FAILED',
                     'detail': 'DICOM 파일은 업로드되었지만 PatientID가 Orthanc에 저장되지 않았습니다.',
-                    'orthanc_response': verify_response.text
+                    'orthanc_response': found_patients
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
             try:
@@ -159,8 +185,11 @@ class DicomUploadView(APIView):
             except Exception as update_error:
                 logger.exception(f"DicomUploadView: 환자 정보 업데이트 실패")
 
-            return Response(response.json(), status=status.HTTP_201_CREATED)
+            return Response(upload_result, status=status.HTTP_201_CREATED)
 
+        except OrthancUnavailable as e:
+            logger.warning(f"DicomUploadView: {e}")
+            return _orthanc_unavailable_response(e)
         except Exception as e:
             logger.exception("DicomUploadView: 업로드 중 치명적 오류")
             return Response({
@@ -169,6 +198,62 @@ class DicomUploadView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class DicomBatchUploadView(APIView):
+    """
+    DICOM 일괄 업로드 (files: .dcm 여러 개 또는 ZIP).
+    픽셀 해시로 중복을 건너뛰고, 환자 태그만 바꿔 Orthanc 에 ZIP 하나로 전송한 뒤 배치당 한 번만 확인합니다.
+    """
+    parser_classes = (MultiPartParser, FormParser)
+
+    def post(self, request, format=None):
+        files = request.FILES.getlist('files')
+        patient_identifier = request.data.get('patient_identifier')
+        patient_uuid = request.data.get('patient_uuid')
+        if not files:
+            return Response({'error': "업로드할 파일('files')이 없습니다"}, status=status.HTTP_400_BAD_REQUEST)
+        if not patient_identifier and not patient_uuid:
+            return Response({'error': 'DICOM 연관을 위해 환자 식별자가 필요합니다'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if patient_identifier:
+            patient_instance = OpenMRSPatient.objects.filter(identifier=patient_identifier).first()
+            patient_id = patient_identifier
+        else:
+            patient_instance = get_object_or_404(OpenMRSPatient, uuid=patient_uuid)
+            patient_id = patient_instance.identifier or str(patient_instance.uuid).replace('-', '')
+        if patient_instance and patient_instance.display_name:
+            patient_name = patient_instance.display_name.replace(' ', '^')
+        else:
+            patient_name = f"UNKNOWN^PATIENT ({patient_id})"
+
+        importer = DicomBatchImporter(patient_id, patient_name)
+        try:
+            summary = importer.run(files)
+        except OrthancUnavailable as e:
+            logger.warning(f"DicomBatchUploadView: {e}")
+            return _orthanc_unavailable_response(e)
+        except requests.exceptions.RequestException as e:
+            logger.exception("DicomBatchUploadView: Orthanc 전송 실패")
+            return Response({'error': 'UPLOAD_FAILED', 'detail': str(e)}, status=status.HTTP_502_BAD_GATEWAY)
+
+        if not summary['instances']:
+            # 모두 중복이거나 DICOM 이 아님 - Orthanc 요청 없이 종료
+            return Response(summary, status=status.HTTP_200_OK)
+
+        if not importer.verify():
+            logger.error(f"[FATAL] Orthanc에 PatientID '{patient_id}' 저장 실패")
+            return Response({
+                'error': 'PACS_ID_SAVE_FAILED',
+                'detail': 'DICOM 파일은 업로드되었지만 PatientID가 Orthanc에 저장되지 않았습니다.',
+                **summary,
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        if patient_instance:
+            # 바뀐 경우에만 한 번 갱신
+            OpenMRSPatient.objects.filter(pk=patient_instance.pk).exclude(pacs_id=patient_id).update(pacs_id=patient_id)
+
+        return Response(summary, status=status.HTTP_201_CREATED)
+
+
 class PatientStudiesView(APIView):
     """
     특정 환자의 DICOM studies 조회 API - 기존 로직을 유지하며 Series 정보 조회를 추가합니다.
@@ -180,64 +265,49 @@ class PatientStudiesView(APIView):
             return Response({'error': '환자 PACS ID가 필요합니다'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            orthanc_find_url = f"{settings.ORTHANC_URL}/tools/find"
-            find_patient_payload = {
-                "Level": "Patient",
-                "Query": {"PatientID": patient_pacs_id}
-            }
-            find_patient_response = requests.post(orthanc_find_url, json=find_patient_payload, auth=ORTHANC_AUTH, timeout=10)
-            find_patient_response.raise_for_status()
-            patient_orthanc_ids = find_patient_response.json()
+            change_feed_poller.ensure_started()
 
-            if not patient_orthanc_ids:
+            patient_entry = metadata_cache.get_or_load(
+                f"patient:{patient_pacs_id}", lambda: self._find_patient_studies(patient_pacs_id)
+            )
+            if not patient_entry or not patient_entry['patient_ids']:
                 logger.warning(f"PACS에서 환자 ID '{patient_pacs_id}'를 찾을 수 없습니다.")
                 return Response({'studies': [], 'message': '환자를 PACS에서 찾을 수 없습니다'}, status=status.HTTP_200_OK)
 
-            find_studies_payload = {
-                "Level": "Study",
-                "Query": {"PatientID": patient_pacs_id}
-            }
-            find_studies_response = requests.post(orthanc_find_url, json=find_studies_payload, auth=ORTHANC_AUTH, timeout=10)
-            find_studies_response.raise_for_status()
-            study_orthanc_ids = find_studies_response.json()
-
+            study_orthanc_ids = patient_entry['study_ids']
             if not study_orthanc_ids:
                 logger.info(f'환자 "{patient_pacs_id}"의 영상 데이터가 없습니다.')
                 return Response({'studies': [], 'message': f'환자 "{patient_pacs_id}"의 영상 데이터가 없습니다'}, status=status.HTTP_200_OK)
 
+            # 캐시에서 빠진 스터디만 공유 풀에서 동시에 다시 조회
+            missing_ids = [study_id for study_id in study_orthanc_ids if metadata_cache.get(study_id) is None]
+            if missing_ids:
+                self._load_studies(missing_ids)
+
             studies_data_to_return = []
             for study_id in study_orthanc_ids:
-                try:
-                    study_url = f"{settings.ORTHANC_URL}/studies/{study_id}"
-                    study_response = requests.get(study_url, auth=ORTHANC_AUTH, timeout=10)
-                    study_response.raise_for_status()
-                    study_data = study_response.json()
-
-                    series_list = []
-                    series_url = f"{settings.ORTHANC_URL}/studies/{study_id}/series"
-                    series_response = requests.get(series_url, auth=ORTHANC_AUTH, timeout=10)
-                    if series_response.status_code == 200:
-                        series_list = series_response.json()
-                        for series in series_list:
-                            series_detail_url = f"{settings.ORTHANC_URL}/series/{series['ID']}"
-                            series_detail_response = requests.get(series_detail_url, auth=ORTHANC_AUTH, timeout=10)
-                            if series_detail_response.status_code == 200:
-                                series.update(series_detail_response.json())
-
-                    study_data['Series'] = series_list
-                    
-                    public_orthanc_url = settings.ORTHANC_PUBLIC_URL
-                    if public_orthanc_url:
-                        study_data['viewer_url'] = f"{public_orthanc_url}/app/explorer.html#study?uuid={study_id}"
-
-                    studies_data_to_return.append(study_data)
-                    
-                except Exception as study_error:
-                    logger.warning(f"PatientStudiesView: Study {study_id} 처리 중 오류 발생 - {study_error}")
+                study_data = metadata_cache.get(study_id)
+                if study_data is None:
+                    logger.warning(f"PatientStudiesView: Study {study_id} 처리 중 오류 발생 - 조회 실패")
                     continue
+                study_data = dict(study_data)
+                # 시리즈 목록에서 전체 인스턴스 대신 작은 미리보기만 받도록 URL 제공
+                study_data['Series'] = [
+                    dict(series, preview_url=request.build_absolute_uri(reverse('series_preview', args=[series['ID']])))
+                    for series in study_data.get('Series', [])
+                ]
+
+                public_orthanc_url = settings.ORTHANC_PUBLIC_URL
+                if public_orthanc_url:
+                    study_data['viewer_url'] = f"{public_orthanc_url}/app/explorer.html#study?uuid={study_id}"
+
+                studies_data_to_return.append(study_data)
 
             return Response({"studies": studies_data_to_return}, status=status.HTTP_200_OK)
 
+        except OrthancUnavailable as e:
+            logger.warning(f"PatientStudiesView: {e}")
+            return _orthanc_unavailable_response(e)
         except requests.exceptions.RequestException as e:
             logger.error(f"PatientStudiesView: Orthanc 통신 오류 - {e}")
             return Response({'error': 'ORTHANC_CONNECTION_ERROR', 'detail': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
@@ -246,6 +316,69 @@ class PatientStudiesView(APIView):
             logger.exception("PatientStudiesView: 예상치 못한 오류 발생")
             return Response({'error': 'INTERNAL_ERROR', 'detail': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def _find_patient_studies(self, patient_pacs_id):
+        """
+        PatientID로 환자/스터디/시리즈를 한 번에 조회합니다 (결과는 metadata_cache에 저장됨).
+        세 개의 /tools/find (Expand) 호출을 동시에 보내므로 스터디·시리즈 개수와 무관하게 왕복 1회 분량의 지연만 발생합니다.
+        """
+        patient_key = f"patient:{patient_pacs_id}"
+        query = {"PatientID": patient_pacs_id}
+        patient_result, studies_result, series_result = orthanc_client.run_concurrently([
+            lambda: orthanc_client.post_json('/tools/find', {"Level": "Patient", "Query": query}),
+            lambda: orthanc_client.post_json('/tools/find', {"Level": "Study", "Query": query, "Expand": True}),
+            lambda: orthanc_client.post_json('/tools/find', {"Level": "Series", "Query": query, "Expand": True}),
+        ])
+        for result in (patient_result, studies_result):
+            if isinstance(result, Exception):
+                raise result
+        if not patient_result:
+            return None
+
+        series_by_study = defaultdict(list)
+        if isinstance(series_result, Exception):
+            logger.warning(f"PatientStudiesView: 시리즈 일괄 조회 실패, 스터디별로 재조회 - {series_result}")
+        else:
+            for series in series_result:
+                series_by_study[series.get('ParentStudy')].append(series)
+
+        study_ids = []
+        for study_data in studies_result:
+            study_id = study_data['ID']
+            study_ids.append(study_id)
+            if isinstance(series_result, Exception):
+                continue
+            self._cache_study(study_data, series_by_study.get(study_id, []))
+
+        for resource_id in list(patient_result) + study_ids:
+            metadata_cache.link(resource_id, patient_key)
+        return {'patient_ids': patient_result, 'study_ids': study_ids}
+
+    def _load_studies(self, study_ids):
+        """스터디 상세 + 시리즈 목록을 스터디마다 동시에 조회해 metadata_cache에 저장"""
+        calls = []
+        for study_id in study_ids:
+            calls.append(lambda study_id=study_id: orthanc_client.get_json(f'/studies/{study_id}'))
+            calls.append(lambda study_id=study_id: orthanc_client.get_json(f'/studies/{study_id}/series'))
+        results = orthanc_client.run_concurrently(calls)
+
+        for index, study_id in enumerate(study_ids):
+            study_data, series_list = results[2 * index], results[2 * index + 1]
+            if isinstance(study_data, Exception):
+                logger.warning(f"PatientStudiesView: Study {study_id} 처리 중 오류 발생 - {study_data}")
+                continue
+            if isinstance(series_list, Exception):
+                logger.warning(f"PatientStudiesView: Study {study_id} 시리즈 목록 조회 실패 - {series_list}")
+                series_list = []
+            self._cache_study(study_data, series_list)
+
+    def _cache_study(self, study_data, series_list):
+        study_id = study_data['ID']
+        study_data = dict(study_data)
+        study_data['Series'] = series_list
+        for series in series_list:
+            metadata_cache.link(series['ID'], study_id)
+        metadata_cache.set(study_id, study_data)
+
             
 class VerifyPacsIdView(APIView):
     """PACS ID 존재 여부 확인 API (상세 디버깅 버전)"""
@@ -263,48 +396,37 @@ class VerifyPacsIdView(APIView):
         
         try:
             # 1. Orthanc 서버 연결 상태 확인
-            ping_url = f"{settings.ORTHANC_URL}/system"
-            logger.info(f"[VERIFY] Orthanc 서버 연결 확인: {ping_url}")
+            logger.info(f"[VERIFY] Orthanc 서버 연결 확인: {orthanc_client.url('/system')}")
             
-            ping_response = requests.get(ping_url, auth=ORTHANC_AUTH, timeout=10)
-            if ping_response.status_code != 200:
-                logger.error(f"[VERIFY] Orthanc 서버 연결 실패: {ping_response.status_code}")
+            try:
+                orthanc_system_info = orthanc_client.get_json('/system')
+            except requests.exceptions.HTTPError as e:
+                logger.error(f"[VERIFY] Orthanc 서버 연결 실패: {e.response.status_code}")
                 return Response({
                     'error': 'ORTHANC_CONNECTION_FAILED',
-                    'detail': f'Orthanc 서버 응답 오류: {ping_response.status_code}',
+                    'detail': f'Orthanc 서버 응답 오류: {e.response.status_code}',
                     'debug_info': debug_info
                 }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
             
-            orthanc_system_info = ping_response.json()
             debug_info['orthanc_system'] = orthanc_system_info
             logger.info(f"[VERIFY] Orthanc 시스템 정보: {orthanc_system_info}")
             
             # 2. 전체 환자 목록 확인
-            all_patients_url = f"{settings.ORTHANC_URL}/patients"
-            all_patients_response = requests.get(all_patients_url, auth=ORTHANC_AUTH, timeout=10)
-            all_patients = all_patients_response.json()
+            all_patients = orthanc_client.get_json('/patients')
             debug_info['total_patients_in_orthanc'] = len(all_patients)
             logger.info(f"[VERIFY] Orthanc 전체 환자 수: {len(all_patients)}")
             
             # 3. 정확한 PatientID 검색
-            orthanc_search_url = f"{settings.ORTHANC_URL}/tools/find"
             payload = {
                 "Level": "Patient",
                 "Query": {"PatientID": pacs_id}
             }
             
-            logger.info(f"[VERIFY] 검색 요청: {orthanc_search_url}")
+            logger.info(f"[VERIFY] 검색 요청: {orthanc_client.url('/tools/find')}")
             logger.info(f"[VERIFY] 검색 페이로드: {payload}")
             
-            search_response = requests.post(
-                orthanc_search_url, 
-                json=payload, 
-                auth=ORTHANC_AUTH,
-                timeout=10
-            )
-            search_response.raise_for_status()
-            
-            found_patients = search_response.json(); # 이 부분에서 response가 [] 일수도, [{ID: '...', Type: 'Patient'}] 일수도 있음
+            search_response = orthanc_client.request('POST', '/tools/find', json=payload)
+            found_patients = search_response.json() # 이 부분에서 response가 [] 일수도, [{ID: '...', Type: 'Patient'}] 일수도 있음
             exists = len(found_patients) > 0
             
             debug_info.update({
@@ -325,13 +447,7 @@ class VerifyPacsIdView(APIView):
                 }
                 
                 logger.info(f"[VERIFY] 하이픈 제거 후 재검색: {cleaned_pacs_id}")
-                cleaned_search_response = requests.post(
-                    orthanc_search_url, 
-                    json=cleaned_payload, 
-                    auth=ORTHANC_AUTH,
-                    timeout=10
-                )
-                cleaned_found_patients = cleaned_search_response.json()
+                cleaned_found_patients = orthanc_client.post_json('/tools/find', cleaned_payload)
                 
                 debug_info['cleaned_search'] = {
                     'cleaned_pacs_id': cleaned_pacs_id,
@@ -376,6 +492,10 @@ class VerifyPacsIdView(APIView):
                 'recommendations': self._get_recommendations(debug_info, exists)
             }, status=status.HTTP_200_OK)
             
+        except OrthancUnavailable as e:
+            logger.warning(f"[VERIFY] {e}")
+            return _orthanc_unavailable_response(e)
+            
         except requests.exceptions.ConnectionError as e:
             logger.error(f"[VERIFY] Orthanc 연결 오류: {e}")
             return Response({
@@ -437,86 +557,168 @@ class VerifyPacsIdView(APIView):
 def get_dicom_instance_data(request, instance_id):
     """
     Orthanc로부터 특정 DICOM 인스턴스 파일의 바이너리 데이터를 직접 가져와 스트리밍합니다.
+    파일 전체를 워커 메모리에 올리지 않고 청크 단위로 전달하며, ETag(If-None-Match)와 단일 Range 요청을 지원합니다.
     """
     logger.info(f"get_dicom_instance_data: 요청 수신 - instance_id: {instance_id}")
 
-    orthanc_url = settings.ORTHANC_URL
-    orthanc_auth = (settings.ORTHANC_USERNAME, settings.ORTHANC_PASSWORD)
+    etag = instance_etag(instance_id)
+    common_headers = {
+        'ETag': etag,
+        'Cache-Control': IMMUTABLE_CACHE_CONTROL,
+        'Accept-Ranges': 'bytes',
+    }
+
+    # 인스턴스는 바뀌지 않으므로 ETag가 같으면 Orthanc에 묻지 않고 바로 304
+    if etag_matches(request, etag):
+        response = HttpResponse(status=304)
+        for header, value in common_headers.items():
+            response[header] = value
+        return response
+
+    byte_range = parse_range_header(request.headers.get('Range'))
+
+    # 디스크 캐시가 켜져 있으면 캐시 파일에서 바로 응답
+    # 미스이면 전체 요청은 Orthanc 본문을 클라이언트로 보내면서 캐시를 채우고, Range 요청은 먼저 받아 저장한 뒤 구간만 응답
+    fill_cache = False
+    if instance_cache.enabled:
+        try:
+            cached_path = instance_cache.get(instance_id)
+            if cached_path is None and byte_range:
+                cached_path = instance_cache.fetch(instance_id)
+        except OrthancUnavailable as e:
+            return _orthanc_unavailable_response(e, JsonResponse)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"get_dicom_instance_data: Orthanc 통신 오류 또는 파일 가져오기 실패 - Instance ID: {instance_id}, Error: {e}")
+            return JsonResponse({"error": f"PACS에서 DICOM 파일을 가져오는 데 실패했습니다: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        except OSError as e:
+            logger.warning(f"get_dicom_instance_data: 디스크 캐시 사용 불가, Orthanc 직접 스트리밍으로 전환 - {e}")
+            cached_path = None
+        if cached_path:
+            try:
+                return _cached_instance_response(cached_path, instance_id, byte_range, common_headers)
+            except FileNotFoundError:
+                # 조회와 열기 사이에 다른 프로세스가 LRU 제거한 경우 - 다시 받아서 캐시를 채움
+                logger.info(f"get_dicom_instance_data: 캐시 파일이 제거되어 Orthanc에서 다시 가져옴 - {instance_id}")
+                fill_cache = True
+            except OSError as e:
+                logger.warning(f"get_dicom_instance_data: 캐시 파일 열기 실패, Orthanc 직접 스트리밍으로 전환 - {e}")
+        else:
+            fill_cache = True
+
+    # 압축되지 않은 원본을 요청해야 Content-Length / Range 구간이 실제 본문과 맞음
+    upstream_headers = {'Accept-Encoding': 'identity'}
+    if byte_range:
+        upstream_headers['Range'] = request.headers['Range']
 
-    # Orthanc에서 특정 인스턴스의 바이너리 데이터를 가져오는 API 엔드포인트
-    # Orthanc REST API 문서: /instances/{id}/file
-    orthanc_instance_file_url = f"{orthanc_url}/instances/{instance_id}/file"
+    try:
+        # Orthanc REST API 문서: /instances/{id}/file
+        upstream = orthanc_client.stream(f"/instances/{instance_id}/file", headers=upstream_headers)
+    except OrthancUnavailable as e:
+        return _orthanc_unavailable_response(e, JsonResponse)
+    except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code == status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE:
+            # Orthanc가 Range를 거절한 경우 500 대신 416을 그대로 전달
+            response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            if e.response.headers.get('Content-Range'):
+                response['Content-Range'] = e.response.headers['Content-Range']
+            for header, value in common_headers.items():
+                response[header] = value
+            return response
+        logger.error(f"get_dicom_instance_data: Orthanc 통신 오류 또는 파일 가져오기 실패 - Instance ID: {instance_id}, Error: {e}")
+        return JsonResponse({"error": f"PACS에서 DICOM 파일을 가져오는 데 실패했습니다: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"get_dicom_instance_data: Orthanc 통신 오류 또는 파일 가져오기 실패 - Instance ID: {instance_id}, Error: {e}")
+        return JsonResponse({"error": f"PACS에서 DICOM 파일을 가져오는 데 실패했습니다: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     try:
-        response = requests.get(orthanc_instance_file_url, auth=orthanc_auth, stream=True, timeout=30)
-        response.raise_for_status() # HTTP 오류가 발생하면 예외 발생 (4xx, 5xx)
+        content_length = upstream_content_length(upstream)
+        chunks = iter_upstream(upstream)
+        status_code = status.HTTP_200_OK
+        range_headers = {}
+
+        if upstream.status_code == status.HTTP_206_PARTIAL_CONTENT:
+            # Orthanc가 Range를 직접 처리한 경우 그대로 전달
+            status_code = status.HTTP_206_PARTIAL_CONTENT
+            range_headers['Content-Range'] = upstream.headers.get('Content-Range', '')
+        elif byte_range and content_length is not None:
+            # Orthanc가 전체 파일을 보낸 경우 프록시에서 구간만 잘라서 전달
+            total_length = int(content_length)
+            resolved = resolve_range(byte_range, total_length)
+            if resolved is None:
+                upstream.close()
+                response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+                response['Content-Range'] = f"bytes */{total_length}"
+                return response
+            start, end = resolved
+            chunks = iter_byte_range(chunks, start, end)
+            content_length = str(end - start + 1)
+            status_code = status.HTTP_206_PARTIAL_CONTENT
+            range_headers['Content-Range'] = f"bytes {start}-{end}/{total_length}"
+        elif fill_cache and upstream.status_code == status.HTTP_200_OK:
+            chunks = instance_cache.iter_fill(instance_id, chunks)
 
         # 응답 헤더 설정: CornerstoneJS가 DICOM 파일임을 인식하도록 Content-Type 설정이 중요
-        # 또한, Content-Disposition을 설정하여 파일 다운로드 시 파일 이름을 지정할 수 있음
-        response_headers = {
-            'Content-Type': 'application/dicom', # 표준 DICOM MIME 타입
-            'Content-Disposition': f'attachment; filename="{instance_id}.dcm"'
-        }
+        response = StreamingHttpResponse(chunks, status=status_code, content_type='application/dicom')
+        response['Content-Disposition'] = f'attachment; filename="{instance_id}.dcm"'
+        if content_length is not None:
+            response['Content-Length'] = content_length
+        for header, value in {**common_headers, **range_headers}.items():
+            response[header] = value
 
-        # Orthanc로부터 받은 바이너리 데이터를 클라이언트에 스트리밍
-        # chunk_size를 사용하여 대용량 파일도 효율적으로 처리
-        logger.info(f"get_dicom_instance_data: Orthanc에서 인스턴스 {instance_id} 데이터 스트리밍 시작. Status: {response.status_code}")
-        return HttpResponse(response.iter_content(chunk_size=8192), headers=response_headers, status=response.status_code)
+        logger.info(f"get_dicom_instance_data: Orthanc에서 인스턴스 {instance_id} 데이터 스트리밍 시작. Status: {status_code}")
+        return response
 
-    except requests.exceptions.RequestException as e:
-        logger.error(f"get_dicom_instance_data: Orthanc 통신 오류 또는 파일 가져오기 실패 - Instance ID: {instance_id}, Error: {e}")
-        # DRF Response 대신 Django의 JsonResponse를 사용하여 일관성 유지 (선택 사항)
-        return JsonResponse({"error": f"PACS에서 DICOM 파일을 가져오는 데 실패했습니다: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     except Exception as e:
+        upstream.close()
         logger.exception(f"get_dicom_instance_data: 예상치 못한 오류 발생 - Instance ID: {instance_id}")
         return JsonResponse({"error": f"내부 서버 오류: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _cached_instance_response(path, instance_id, byte_range, common_headers):
+    """디스크 캐시 파일 응답 - 전체 파일은 FileResponse(sendfile), Range 요청은 해당 구간만 스트리밍"""
+    total_length = os.path.getsize(path)
+    if byte_range:
+        resolved = resolve_range(byte_range, total_length)
+        if resolved is None:
+            response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            response['Content-Range'] = f"bytes */{total_length}"
+            return response
+        start, end = resolved
+        response = StreamingHttpResponse(
+            iter_file_range(open(path, 'rb'), start, end), status=status.HTTP_206_PARTIAL_CONTENT, content_type='application/dicom'
+        )
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f"bytes {start}-{end}/{total_length}"
+    else:
+        response = FileResponse(open(path, 'rb'), content_type='application/dicom')
+    response['Content-Disposition'] = f'attachment; filename="{instance_id}.dcm"'
+    for header, value in common_headers.items():
+        response[header] = value
+    return response
+
+
 class SeriesInstancesView(APIView):
     """특정 시리즈의 모든 인스턴스 정보를 조회하여 Cornerstone.js가 사용할 imageIds 목록을 반환"""
     def get(self, request, study_instance_uid, series_instance_uid, format=None):
         logger.info(f"SeriesInstancesView: GET 요청 수신 - Study: {study_instance_uid}, Series: {series_instance_uid}")
         
         try:
-            # Orthanc의 REST API를 사용하여 시리즈 내의 모든 인스턴스 ID 목록을 가져옵니다.
-            # 이 'instance_id'는 Orthanc 내부에서 사용하는 UUID입니다.
-            instances_url = f"{settings.ORTHANC_URL}/series/{series_instance_uid}/instances" 
-            instances_response = requests.get(instances_url, auth=ORTHANC_AUTH, timeout=20)
-            instances_response.raise_for_status()
-            instances_list_from_orthanc = instances_response.json() # This list contains Orthanc's internal instance UUIDs
-
-            if not instances_list_from_orthanc:
+            # 시리즈 매니페스트(캐시)에서 슬라이스 순서대로 정렬된 Orthanc 인스턴스 ID 목록을 사용합니다.
+            # 이 'instance_id'는 Orthanc 내부에서 사용하는 UUID이며 get_dicom_instance_data의 {instance_id}에 매핑됩니다.
+            manifest = get_series_manifest(series_instance_uid)
+            if not manifest['instances']:
                 return Response({"error": "해당 시리즈에 인스턴스가 없습니다."}, status=status.HTTP_404_NOT_FOUND)
 
-            image_ids = []
-            
-            # 받아온 Orthanc 인스턴스 ID 목록을 순회합니다.
-            for orthanc_instance_id in instances_list_from_orthanc:
-                # Orthanc의 /series/{series_uid}/instances API가 반환하는 것이
-                # 인스턴스 UUID 문자열들의 배열인지, 아니면 {ID: '...', Type: 'Instance'}와 같은 객체 배열인지 확인이 필요합니다.
-                # 로그에 따르면 객체 배열일 가능성이 높습니다. 따라서 orthanc_instance_id에서 'ID' 속성을 추출해야 합니다.
-                instance_uuid = orthanc_instance_id # 기본적으로는 문자열이라고 가정
-                
-                # ★★★ 이 조건문을 추가하여 orthanc_instance_id가 딕셔너리일 경우 'ID' 값을 추출합니다. ★★★
-                if isinstance(orthanc_instance_id, dict) and 'ID' in orthanc_instance_id:
-                    instance_uuid = orthanc_instance_id['ID']
-                
-                # 이 instance_uuid는 get_dicom_instance_data의 {instance_id}에 정확히 매핑되어야 합니다.
-                dicom_data_proxy_url = request.build_absolute_uri(
-                    f'/api/pacs/dicom-instance-data/{instance_uuid}/'
-                )
-                
-                # Cornerstone.js는 'wadouri:' 프리픽스를 통해 워커를 사용하여 이미지를 로드합니다.
-                wadouri_url = f"wadouri:{dicom_data_proxy_url}"
-                image_ids.append(wadouri_url)
-                logger.debug(f"SeriesInstancesView: Generated imageId: {wadouri_url}")
-
-            if not image_ids:
-                return Response({"error": "유효한 인스턴스를 찾을 수 없습니다."}, status=status.HTTP_404_NOT_FOUND)
+            # Cornerstone.js는 'wadouri:' 프리픽스를 통해 워커를 사용하여 이미지를 로드합니다.
+            instance_url = instance_base_url(request)
+            image_ids = [f"wadouri:{instance_url}{instance['id']}/" for instance in manifest['instances']]
 
             logger.info(f"SeriesInstancesView: {len(image_ids)}개의 imageIds 반환")
             return Response(image_ids, status=status.HTTP_200_OK)
 
+        except OrthancUnavailable as e:
+            logger.warning(f"SeriesInstancesView: {e}")
+            return _orthanc_unavailable_response(e)
         except requests.exceptions.HTTPError as e:
             if e.response.status_code == 404:
                 logger.warning(f"SeriesInstancesView: Orthanc에서 Study/Series '{study_instance_uid}/{series_instance_uid}'를 찾을 수 없습니다.")
@@ -528,6 +730,91 @@ class SeriesInstancesView(APIView):
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class SeriesManifestView(APIView):
+    """
+    시리즈 프리페치 매니페스트: 슬라이스 순서대로 정렬된 인스턴스(크기, ETag, imageId)와
+    가운데부터 바깥으로 퍼지는 프리페치 순서. 뷰어는 이 순서대로 일괄 전송 API 를 호출해 캐시를 채웁니다.
+    """
+    def get(self, request, series_id, format=None):
+        try:
+            manifest = get_series_manifest(series_id)
+        except OrthancUnavailable as e:
+            return _orthanc_unavailable_response(e)
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return Response({"error": "Orthanc에서 해당 시리즈를 찾을 수 없습니다."}, status=status.HTTP_404_NOT_FOUND)
+            logger.error(f"SeriesManifestView: Orthanc HTTP 오류 ({series_id}): {e}")
+            return Response({"error": "Orthanc 오류"}, status=status.HTTP_502_BAD_GATEWAY)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"SeriesManifestView: Orthanc 통신 오류 ({series_id}): {e}")
+            return Response({"error": "Orthanc 통신 오류"}, status=status.HTTP_502_BAD_GATEWAY)
+
+        # 캐시된 매니페스트는 공유 객체이므로 요청별 URL 은 사본에 추가
+        instance_url = instance_base_url(request)
+        data = dict(manifest)
+        data['instances'] = [
+            dict(instance, image_id=f"wadouri:{instance_url}{instance['id']}/") for instance in manifest['instances']
+        ]
+        data['bulk_url'] = request.build_absolute_uri(reverse('series_bulk_instances', args=[series_id]))
+        data['bulk_max_instances'] = settings.PACS_BULK_MAX_INSTANCES
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class SeriesBulkInstancesView(APIView):
+    """
+    시리즈 인스턴스 여러 개를 multipart/related (type=application/dicom) 응답 하나로 전송.
+    ?instances=id1,id2,... 로 지정하거나, ?offset=&limit= 로 매니페스트의 프리페치 순서 구간을 요청합니다.
+    각 파트의 Content-Location 은 imageId 의 인스턴스 URL 과 같아서 뷰어 캐시 키로 그대로 쓸 수 있습니다.
+    """
+    authentication_classes, permission_classes = [], []
+
+    def get(self, request, series_id, format=None):
+        max_instances = settings.PACS_BULK_MAX_INSTANCES
+        try:
+            manifest = get_series_manifest(series_id)
+            series_instance_ids = [instance['id'] for instance in manifest['instances']]
+            requested = request.query_params.get('instances')
+            if requested:
+                instance_ids = [instance_id for instance_id in requested.split(',') if instance_id]
+                unknown = set(instance_ids) - set(series_instance_ids)
+                if unknown:
+                    return Response({"error": f"시리즈에 없는 인스턴스입니다: {sorted(unknown)}"},
+                                    status=status.HTTP_400_BAD_REQUEST)
+            else:
+                offset = int(request.query_params.get('offset', 0))
+                limit = int(request.query_params.get('limit', max_instances))
+                if offset < 0 or limit <= 0:
+                    raise ValueError(offset, limit)
+                instance_ids = [series_instance_ids[index] for index in manifest['prefetch_order'][offset:offset + limit]]
+            if len(instance_ids) > max_instances:
+                return Response({"error": f"한 번에 최대 {max_instances}개까지 요청할 수 있습니다."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if not instance_ids:
+                return Response({"error": "전송할 인스턴스가 없습니다."}, status=status.HTTP_404_NOT_FOUND)
+            files = open_instances(instance_ids)
+        except ValueError:
+            return Response({"error": "offset / limit 값이 올바르지 않습니다."}, status=status.HTTP_400_BAD_REQUEST)
+        except OrthancUnavailable as e:
+            return _orthanc_unavailable_response(e)
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return Response({"error": "Orthanc에서 해당 시리즈/인스턴스를 찾을 수 없습니다."}, status=status.HTTP_404_NOT_FOUND)
+            logger.error(f"SeriesBulkInstancesView: Orthanc HTTP 오류 ({series_id}): {e}")
+            return Response({"error": "Orthanc 오류"}, status=status.HTTP_502_BAD_GATEWAY)
+        except (requests.exceptions.RequestException, OSError) as e:
+            logger.error(f"SeriesBulkInstancesView: 인스턴스 준비 실패 ({series_id}): {e}")
+            return Response({"error": "PACS에서 DICOM 파일을 가져오는 데 실패했습니다."}, status=status.HTTP_502_BAD_GATEWAY)
+
+        boundary = uuid.uuid4().hex
+        instance_url = instance_base_url(request)
+        response = StreamingHttpResponse(
+            iter_bulk_instances(instance_ids, files, boundary, lambda instance_id: f"{instance_url}{instance_id}/"),
+            content_type=f'multipart/related; type="application/dicom"; boundary={boundary}',
+        )
+        response['Cache-Control'] = 'private, no-store'
+        return response
+
+
 # 유정우넌할수있어 여러개 파일 동시에 올리는거 구현중
 class NiftiUploadView(APIView):
     parser_classes = [MultiPartParser, FormParser]
@@ -566,291 +853,170 @@ class NiftiUploadView(APIView):
             processed_modalities.append(mod)
             processed_files.append(current_modalities.get(mod)) # 해당 모달리티가 없으면 None이 추가됨
 
-        # --- 처리 결과 저장할 리스트 ---
-        result = []
-
-        # --- 각 파일/모달리티마다 처리 ---
-        for nifti_file, modality in zip(processed_files, processed_modalities):
-            # 파일이 None이면 더미 데이터로 처리
-            if nifti_file is None:
-                # TODO: 더미 NIfTI 생성 또는 스킵 로직 구현
-                result.append({'modality': modality, 'status': 'dummy_generated'})
-                continue
-
-            # --- 실제 파일 처리: 임시 저장 → GCS 업로드 → DICOM 변환 → Orthanc 업로드 ---
-            tmp_path = None # finally 블록에서 사용하기 위해 초기화
-            try:
-                # 1) 임시 파일에 NIfTI 저장
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.nii') as tmp:
-                    tmp_path = tmp.name
+        # --- 요청이 끝나면 업로드 임시 파일이 사라지므로 작업용 임시 파일로 옮겨 둠 ---
+        safe_temp_dir = os.path.join(settings.BASE_DIR, 'temp_files')
+        os.makedirs(safe_temp_dir, exist_ok=True)
+        items = []
+        try:
+            for nifti_file, modality in zip(processed_files, processed_modalities):
+                if nifti_file is None:
+                    items.append({'modality': modality, 'path': None})
+                    continue
+                # 압축 여부는 확장자로 판단하므로 원본 확장자 유지 (.nii 는 mmap 으로 읽음)
+                suffix = '.nii.gz' if nifti_file.name.endswith('.gz') else '.nii'
+                with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=safe_temp_dir) as tmp:
+                    items.append({'modality': modality, 'path': tmp.name, 'name': os.path.basename(nifti_file.name)})
                     for chunk in nifti_file.chunks():
                         tmp.write(chunk)
+        except Exception:
+            for item in items:
+                if item['path'] and os.path.exists(item['path']):
+                    os.remove(item['path'])
+            raise
 
-                # 2) Google Cloud Storage에 업로드
-                storage_client = storage.Client()
-                bucket = storage_client.bucket(settings.GCS_BUCKET_NAME)
-                # timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-                # blob_name = f"nifti/{patient_uuid}/{modality}/{timestamp}_{os.path.basename(nifti_file.name)}"
-                # ── 세션 폴더 이름 (예: "20250625_1704") ──
-                session_folder = datetime.now().strftime('%Y%m%d_%H%M')
-
-                # GCS 경로: nifti/{patient_uuid}/{session_folder}/{modality}/파일명
-                blob_name = (
-                    f"nifti/{patient_uuid}/"
-                    f"{session_folder}/"
-                    f"{modality}/"
-                    f"{os.path.basename(nifti_file.name)}"
-                )                
-                bucket.blob(blob_name).upload_from_filename(tmp_path)
-
-                uploaded_blobs[modality.lower()] = f"gs://{settings.GCS_BUCKET_NAME}/{blob_name}"
-
-                # 3) NIfTI 파일을 DICOM으로 변환 및 Orthanc 업로드
-                img = nib.load(tmp_path).get_fdata()
-                study_uid = pydicom.uid.generate_uid()
-                series_uid = pydicom.uid.generate_uid()
-
-                for i in range(img.shape[2]):
-                    slice_data = (img[:, :, i] * 255).astype('uint16')
-
-                    # File Meta 생성
-                    file_meta = FileMetaDataset()
-                    file_meta.MediaStorageSOPClassUID    = '1.2.840.10008.5.1.4.1.1.2' # CT Image Storage
-                    file_meta.MediaStorageSOPInstanceUID = generate_uid()
-                    file_meta.TransferSyntaxUID          = ExplicitVRLittleEndian
-                    file_meta.ImplementationClassUID     = generate_uid()
-
-                    # FileDataset 생성
-                    ds = FileDataset("", {}, file_meta=file_meta, preamble=b"\0" * 128)
-
-                    # 필수 DICOM 태그 채우기
-                    ds.PatientID                 = patient.identifier
-                    ds.PatientName               = patient.display_name
-                    ds.Modality                  = modality
-                    ds.StudyInstanceUID          = study_uid
-                    ds.SeriesInstanceUID         = series_uid
-                    ds.SOPClassUID               = file_meta.MediaStorageSOPClassUID
-                    ds.SOPInstanceUID            = file_meta.MediaStorageSOPInstanceUID
-                    
-                    ds.Rows, ds.Columns          = slice_data.shape
-                    ds.SamplesPerPixel           = 1
-                    ds.PhotometricInterpretation = "MONOCHROME2"
-                    ds.PixelRepresentation       = 0
-                    ds.BitsAllocated             = 16
-                    ds.BitsStored                = 16
-                    ds.HighBit                   = 15
-                    ds.PixelData                 = slice_data.tobytes()
-
-                    ds.is_little_endian          = True
-                    ds.is_implicit_VR            = False
-                    
-                    # 4) 생성된 DICOM 슬라이스를 Orthanc에 업로드
-                    with tempfile.NamedTemporaryFile(suffix='.dcm') as dcm_tmp:
-                        ds.save_as(dcm_tmp.name, write_like_original=False)
-                        with open(dcm_tmp.name, 'rb') as fp:
-                            dicom_bytes = fp.read()
-
-                    resp = requests.post(
-                        f"{settings.ORTHANC_URL}/instances",
-                        data=dicom_bytes,
-                        auth=(settings.ORTHANC_USERNAME, settings.ORTHANC_PASSWORD),
-                        headers={'Content-Type': 'application/dicom'}
-                    )
-                    resp.raise_for_status()
-
-                result.append({'modality': modality, 'status': 'uploaded'})
-
-            except Exception as e:
-                result.append({'modality': modality, 'status': 'error', 'error': str(e)})
-            
-            finally:
-                # 임시 파일 삭제
-                if tmp_path and os.path.exists(tmp_path):
-                    os.remove(tmp_path)
+        # --- 저장소 업로드 / DICOM 변환 / Orthanc 전송은 백그라운드 작업으로 모달리티별 병렬 처리 ---
+        try:
+            job = job_runner.enqueue(
+                'nifti_ingest', run_nifti_ingest,
+                kwargs={
+                    'patient_uuid': patient_uuid,
+                    'patient_identifier': patient.identifier,
+                    'patient_name': patient.display_name,
+                    # ── 세션 폴더 이름 (예: "20250625_1704") ──
+                    'session_folder': datetime.now().strftime('%Y%m%d_%H%M'),
+                    'items': items,
+                },
+                patient_uuid=patient_uuid,
+            )
+        except JobQueueFull as e:
+            for item in items:
+                if item['path'] and os.path.exists(item['path']):
+                    os.remove(item['path'])
+            logger.warning(f"NIfTI 업로드 거절: {e}")
+            return _queue_full_response(job_runner)
+        logger.info(f"NIfTI 업로드 작업 등록: {job.id} (환자 {patient_uuid})")
 
-        return Response({'results': result}, status=201)
+        return Response({
+            'job_id': str(job.id),
+            'status': job.status,
+            'status_url': request.build_absolute_uri(reverse('pacs-job-status', args=[job.id])),
+        }, status=202)
 
 
-# ####### 유정우넌할수있어 nnunet성공이후 추가 ###########
-# class ListPatientSessionsView(APIView):
-#     def get(self, request, patient_uuid, *args, **kwargs):
-#         logger.info(f"GCS 파일 목록 조회 시작. 환자 UUID: {patient_uuid}")
-#         try:
-#             storage_client = storage.Client()
-#             bucket = storage_client.bucket("final_model_data1")
-#             prefix = f"nifti/{patient_uuid}/"
-#             blobs = list(bucket.list_blobs(prefix=prefix))
-            
-#             if not blobs:
-#                 return Response({"sessions": []})
-
-#             sessions_data = defaultdict(lambda: defaultdict(list))
-#             for blob in blobs:
-#                 parts = blob.name.split('/')
-#                 if len(parts) >= 5 and parts[-1]:
-#                     session_id, modality, file_name = parts[2], parts[3], parts[4]
-#                     sessions_data[session_id][modality.lower()].append({
-#                         "name": file_name,
-#                         "gcs_path": f"gs://{bucket.name}/{blob.name}",
-#                     })
-            
-#             if not sessions_data: return Response({"sessions": []})
+def _queue_full_response(runner):
+    """대기열이 가득 찬 경우 429 (클라이언트가 잠시 후 재시도)"""
+    response = Response(
+        {"error": "처리 대기 중인 작업이 너무 많습니다. 잠시 후 다시 시도해주세요.",
+         "queue_depth": runner.queue_depth, "queue_limit": runner.queue_limit},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+    )
+    response['Retry-After'] = '30'
+    return response
+
+
+class ProcessingJobStatusView(APIView):
+    """백그라운드 PACS 작업의 상태와 단계별 진행률 조회 / 취소 (DELETE)"""
+    def get(self, request, job_id, *args, **kwargs):
+        job = get_object_or_404(ProcessingJob, pk=job_id)
+        return Response(job.to_dict())
 
-#             formatted_sessions = [{"sessionId": sid, "modalities": mods} for sid, mods in sessions_data.items()]
-#             sorted_sessions = sorted(formatted_sessions, key=lambda s: s['sessionId'], reverse=True)
-#             return Response({"sessions": sorted_sessions})
-#         except Exception as e:
-#             logger.error(f"GCS 파일 목록 조회 중 오류: {e}", exc_info=True)
-#             return Response({"error": "서버 오류"}, status=500)
+    def delete(self, request, job_id, *args, **kwargs):
+        get_object_or_404(ProcessingJob, pk=job_id)
+        return Response(cancel_job(job_id).to_dict(), status=status.HTTP_202_ACCEPTED)
 
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _job_event_stream(job_id, state):
+    """
+    구독 → DB 스냅샷 → 이벤트 순으로 보내 구독 전 변경을 놓치지 않음.
+    keep-alive 주기마다 DB 를 다시 확인하므로 다른 프로세스의 이벤트가 이 브로커에 오지 않아도 따라갑니다.
+    """
+    subscription = subscribe_job_events(job_id)
+    deadline = time.monotonic() + settings.PACS_EVENT_STREAM_TIMEOUT
+    try:
+        # 스트림이 짧게 끊기므로 브라우저가 기본값(약 3초)보다 빨리 다시 연결하도록 재연결 간격 지정
+        yield f"retry: {settings.PACS_EVENT_RETRY}\n\n"
+        yield _sse('progress', state)
+        while state['status'] not in ProcessingJob.FINISHED_STATUSES and time.monotonic() < deadline:
+            message = subscription.get(timeout=settings.PACS_EVENT_KEEPALIVE)
+            if message is None:
+                snapshot = ProcessingJob.objects.filter(pk=job_id).first()
+                if snapshot is None:
+                    break
+                snapshot = snapshot.to_dict()
+                if snapshot == state:
+                    yield ": keep-alive\n\n"
+                    continue
+                state = snapshot
+            else:
+                state = {**state, **message}
+            yield _sse('progress', state)
+        if state['status'] in ProcessingJob.FINISHED_STATUSES:
+            yield _sse('end', {'job_id': state['job_id'], 'status': state['status']})
+    finally:
+        subscription.close()
+        close_old_connections()
+
+
+class ProcessingJobEventsView(APIView):
+    """
+    PACS 작업(업로드, 분할, NIfTI→DICOM/SEG 변환) 진행률 Server-Sent Events 스트림.
+    작업이 끝나면 'end' 이벤트 후 닫힙니다. 동기 워커를 오래 점유하지 않도록 PACS_EVENT_STREAM_TIMEOUT(기본 30초)마다 닫고,
+    EventSource 는 retry: 로 받은 간격 후 다시 연결해 현재 상태 스냅샷부터 이어 받습니다.
+    """
+    def get(self, request, job_id, *args, **kwargs):
+        job = get_object_or_404(ProcessingJob, pk=job_id)
+        response = StreamingHttpResponse(_job_event_stream(job.pk, job.to_dict()), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # nginx 버퍼링 끄기
+        return response
+
+
+# ####### 유정우넌할수있어 nnunet성공이후 추가 ###########
 class ListPatientSessionsView(APIView):
     def get(self, request, patient_uuid, *args, **kwargs):
         logger.info(f"GCS 파일 목록 조회 시작. 환자 UUID: {patient_uuid}")
         try:
-            storage_client = storage.Client()
-            # 💡 버킷 이름을 settings에서 가져오거나 하드코딩된 값으로 수정하세요.
-            bucket = storage_client.bucket("final_model_data1") 
-            prefix = f"nifti/{patient_uuid}/"
-            blobs = list(bucket.list_blobs(prefix=prefix))
-            
-            if not blobs:
-                return Response({"sessions": []})
-
-            sessions_data = defaultdict(lambda: defaultdict(list))
-            for blob in blobs:
-                # ✨ 임시 파일을 생성하고 삭제하기 위한 변수 초기화
-                temp_file_path = None
-                try:
-                    parts = blob.name.split('/')
-                    if len(parts) >= 5 and parts[-1]:
-                        session_id, modality, file_name = parts[2], parts[3], parts[4]
-                        
-                        metadata = {}
-                        try:
-                            # 1. 고유한 이름을 가진 임시 파일을 생성합니다.
-                            with tempfile.NamedTemporaryFile(delete=False, suffix=".nii.gz") as tmp_file:
-                                temp_file_path = tmp_file.name
-                            
-                            # 2. GCS의 파일을 이 임시 파일로 다운로드합니다.
-                            blob.download_to_filename(temp_file_path)
-                            
-                            # 3. 이제 파일 '경로'를 사용하므로 nib.load가 확실하게 동작합니다.
-                            nifti_img = nib.load(temp_file_path)
-                            
-                            shape = nifti_img.shape
-                            zooms = nifti_img.header.get_zooms()
-                            
-                            metadata = {
-                                "resolution": f"{shape[0]}x{shape[1]}",
-                                "sliceThickness": float(f"{zooms[2]:.2f}")
-                            }
-                        except Exception as meta_error:
-                            logger.warning(f"메타데이터 추출 실패 ({blob.name}): {meta_error}")
-                            metadata = {}
-
-                        sessions_data[session_id][modality.lower()].append({
-                            "name": file_name,
-                            "gcs_path": f"gs://{bucket.name}/{blob.name}",
-                            "metadata": metadata
-                        })
-                except Exception as e:
-                    logger.error(f"세션 처리 중 오류 ({blob.name}): {e}")
-                    continue
-                finally:
-                    # 4. try-except 로직이 끝나면 항상 임시 파일을 삭제하여 서버에 쓰레기 파일이 남지 않도록 합니다.
-                    if temp_file_path and os.path.exists(temp_file_path):
-                        os.remove(temp_file_path)
-
-            if not sessions_data: 
-                return Response({"sessions": []})
-
-            formatted_sessions = [{"sessionId": sid, "modalities": mods} for sid, mods in sessions_data.items()]
-            sorted_sessions = sorted(formatted_sessions, key=lambda s: s['sessionId'], reverse=True)
-            return Response({"sessions": sorted_sessions})
+            # 해상도/슬라이스 두께는 업로드 시 저장한 인덱스에서 읽고, 없을 때만 헤더 앞부분을 구간 읽기
+            return Response({"sessions": list_patient_sessions(get_object_storage(), patient_uuid)})
             
         except Exception as e:
             logger.error(f"GCS 파일 목록 조회 중 오류: {e}", exc_info=True)
             return Response({"error": "서버 오류"}, status=500)
 
+
 class DicomConverterMixin:
     def convert_nifti_to_dicom(self, gcs_path, patient, study_uid, image_type, request):
-        logger.info(f"DICOM 변환 시작 ({image_type}): {gcs_path}")
-        safe_temp_dir = os.path.join(settings.BASE_DIR, 'temp_files')
-        os.makedirs(safe_temp_dir, exist_ok=True)
-        temp_nifti_path = os.path.join(safe_temp_dir, f"{uuid.uuid4()}.nii.gz")
-        temp_dicom_dir = tempfile.mkdtemp(dir=safe_temp_dir)
-        
-        try:
-            storage_client = storage.Client()
-            bucket_name, blob_name = gcs_path.replace("gs://", "").split("/", 1)
-            bucket = storage_client.bucket(bucket_name)
-            bucket.blob(blob_name).download_to_filename(temp_nifti_path)
-            
-            nifti_img = nib.load(temp_nifti_path)
-            img_data = nifti_img.get_fdata()
-
-            if image_type.upper() == 'SEG':
-                # 마스크는 0/1 or 0/255로 강제 변환 (픽셀 오버레이 선명하게!)
-                    img_data = (img_data <= 0.5).astype(np.uint8) * 255   # ★★★ 반전!
-                    window_center, window_width = 128, 255
-                    real_min, real_max = 0, 255
-                    int_max, int_min = 255, 0
-                    rescale_slope = 1
-                    rescale_intercept = 0
-                    bits_allocated = 8
-                    bits_stored = 8
-                    high_bit = 7
-            else:
-                window_center, window_width = 115.0, 4186.0
-                real_min, real_max = np.min(img_data), np.max(img_data)
-                int_max, int_min = np.iinfo(np.int16).max, np.iinfo(np.int16).min
-                rescale_slope = (real_max - real_min) / (int_max - int_min) if real_max != real_min else 1.0
-                rescale_intercept = real_min
-
-            series_uid = generate_uid()
-            orthanc_ids = []
-
-            for i in range(img_data.shape[2]):
-                slice_float = img_data[:, :, i]
-                scaled_slice = ((slice_float - rescale_intercept) / rescale_slope) + int_min if rescale_slope != 0 else np.zeros_like(slice_float)
-                pixel_data, pixel_repr = scaled_slice.astype(np.int16), 1
-
-                rotated_data = np.rot90(pixel_data, k=3)
-                ds = FileDataset(None, {}, file_meta=FileMetaDataset(), preamble=b"\0" * 128)
-                ds.file_meta.MediaStorageSOPClassUID = pydicom.uid.MRImageStorage
-                ds.file_meta.MediaStorageSOPInstanceUID = generate_uid()
-                ds.file_meta.TransferSyntaxUID = pydicom.uid.ExplicitVRLittleEndian
-                ds.PatientID, ds.PatientName = patient.identifier, patient.display_name.replace(' ', '^')
-                ds.StudyInstanceUID, ds.SeriesInstanceUID = study_uid, series_uid
-                ds.SOPInstanceUID, ds.SOPClassUID = ds.file_meta.MediaStorageSOPInstanceUID, ds.file_meta.MediaStorageSOPClassUID
-                ds.Modality, ds.InstanceNumber, ds.ImageType = "MR", str(i + 1), ["DERIVED", "PRIMARY"]
-                ds.StudyDate, ds.StudyTime = datetime.now().strftime('%Y%m%d'), datetime.now().strftime('%H%M%S')
-                pix_zooms = nifti_img.header.get_zooms()[:2]
-                ds.PixelSpacing = [f"{z:.8f}" for z in reversed(pix_zooms)]
-                ds.Rows, ds.Columns = rotated_data.shape
-                ds.SamplesPerPixel = 1
-                ds.PhotometricInterpretation = "MONOCHROME2"
-                ds.BitsAllocated, ds.BitsStored, ds.HighBit = 16, 16, 15
-                ds.PixelRepresentation = pixel_repr
-                ds.PixelData = rotated_data.tobytes()
-                ds.RescaleIntercept, ds.RescaleSlope = f"{rescale_intercept:.8f}", f"{rescale_slope:.8f}"
-                ds.WindowCenter, ds.WindowWidth = f"{window_center:.8f}", f"{window_width:.8f}"
-                temp_dcm_path = os.path.join(temp_dicom_dir, f"slice_{i}.dcm")
-                ds.save_as(temp_dcm_path, write_like_original=False)
-                with open(temp_dcm_path, 'rb') as f:
-                    resp = requests.post(f"{settings.ORTHANC_URL}/instances", data=f.read(), auth=ORTHANC_AUTH)
-                    resp.raise_for_status()
-                    orthanc_ids.append(resp.json()['ID'])
-            
-            image_ids = [f"wadouri:{request.build_absolute_uri(f'/api/pacs/dicom-instance-data/{_id}/')}" for _id in orthanc_ids]
-            return {"seriesInstanceUID": series_uid, "imageIds": image_ids}
+        return convert_nifti_series(
+            gcs_path, patient.identifier, patient.display_name, study_uid, image_type, instance_base_url(request)
+        )
 
-        except Exception as e:
-            logger.error(f"DICOM 변환 중 오류 ({gcs_path}): {e}", exc_info=True)
-            return None
-        finally:
-            if 'temp_nifti_path' in locals() and os.path.exists(temp_nifti_path): os.remove(temp_nifti_path)
-            if 'temp_dicom_dir' in locals() and os.path.exists(temp_dicom_dir): shutil.rmtree(temp_dicom_dir)
+    def enqueue_conversion(self, request, patient, study_uid, images):
+        """'async': true 요청은 변환을 백그라운드 작업으로 돌리고 진행률 이벤트 스트림 주소를 반환"""
+        try:
+            job = job_runner.enqueue(
+                'dicom_conversion', run_dicom_conversion,
+                kwargs={
+                    'patient_identifier': patient.identifier,
+                    'patient_name': patient.display_name,
+                    'study_uid': study_uid,
+                    'images': images,
+                    'instance_url': instance_base_url(request),
+                },
+                patient_uuid=patient.identifier, payload={'images': images},
+            )
+        except JobQueueFull as e:
+            logger.warning(f"DICOM 변환 작업 거절: {e}")
+            return _queue_full_response(job_runner)
+        return Response({
+            'job_id': str(job.id),
+            'status': job.status,
+            'status_url': request.build_absolute_uri(reverse('pacs-job-status', args=[job.id])),
+            'events_url': request.build_absolute_uri(reverse('pacs-job-events', args=[job.id])),
+        }, status=status.HTTP_202_ACCEPTED)
 
 
 class NiftiToDicomView(APIView, DicomConverterMixin):
@@ -867,6 +1033,9 @@ class NiftiToDicomView(APIView, DicomConverterMixin):
             class TempPatient: identifier = patient_uuid; display_name = "Unknown^Patient"
             patient = TempPatient()
 
+        if request.data.get('async'):
+            return self.enqueue_conversion(request, patient, generate_uid(), [{'type': image_type, 'gcs_path': gcs_path}])
+
         result = self.convert_nifti_to_dicom(gcs_path, patient, generate_uid(), image_type, request)
         if result: return Response(result)
         return Response({"error": "DICOM 변환 서버 오류"}, status=500)
@@ -887,6 +1056,9 @@ class NiftiToDicomBundleView(APIView, DicomConverterMixin, SegDicomConverterMixi
             patient = TempPatient()
 
         results, study_uid = {}, generate_uid()
+        if request.data.get('async'):
+            return self.enqueue_conversion(request, patient, study_uid, image_requests)
+
         for req in image_requests:
             image_type, gcs_path = req.get('type'), req.get('gcs_path')
             if image_type and gcs_path:
@@ -913,14 +1085,58 @@ class NiftiToDicomBundleView(APIView, DicomConverterMixin, SegDicomConverterMixi
         return Response(results)
 
 
+class SeriesPreviewView(APIView):
+    """
+    시리즈 가운데 슬라이스 미리보기 (?format=png|webp, 없으면 Accept 헤더 → 설정값).
+    <img> 태그로 바로 불러오도록 인스턴스 데이터 API 와 같이 인증 없이 제공합니다.
+    """
+    authentication_classes, permission_classes = [], []
+
+    def get(self, request, series_id, format=None):
+        requested = request.query_params.get('format')
+        if not requested and 'image/webp' in request.headers.get('Accept', ''):
+            requested = 'webp'
+        try:
+            validate_orthanc_id(series_id)
+            fmt = preview_store.resolve_format(requested)
+            path = preview_store.get_or_render(series_id, fmt)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except OrthancUnavailable as e:
+            return _orthanc_unavailable_response(e)
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return Response({'error': '시리즈를 찾을 수 없습니다.'}, status=status.HTTP_404_NOT_FOUND)
+            logger.error(f"SeriesPreviewView: Orthanc 오류 ({series_id}): {e}")
+            return Response({'error': 'Orthanc 오류'}, status=status.HTTP_502_BAD_GATEWAY)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"SeriesPreviewView: Orthanc 통신 오류 ({series_id}): {e}")
+            return Response({'error': 'Orthanc 통신 오류'}, status=status.HTTP_502_BAD_GATEWAY)
+        except Exception as e:
+            # 압축 전송 구문 등 픽셀을 디코딩할 수 없는 경우
+            logger.exception(f"SeriesPreviewView: 미리보기 생성 실패 ({series_id})")
+            return Response({'error': f'미리보기를 만들 수 없습니다: {e}'}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        # 업로드 후 다시 렌더링되면 파일 mtime 이 바뀌므로 ETag 도 바뀜
+        etag = f'"{series_id}-{fmt}-{int(os.path.getmtime(path))}"'
+        if etag_matches(request, etag):
+            response = HttpResponse(status=304)
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=PREVIEW_FORMATS[fmt][1])
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, max-age=3600'
+        response['Vary'] = 'Accept'
+        return response
+
+
 class DicomInstanceDataView(APIView):
     authentication_classes, permission_classes = [], []
     def get(self, request, instance_id, *args, **kwargs):
-        orthanc_url = f"{settings.ORTHANC_URL}/instances/{instance_id}/file"
         try:
-            response = requests.get(orthanc_url, auth=ORTHANC_AUTH, stream=True)
-            response.raise_for_status()
+            response = orthanc_client.stream(f"/instances/{instance_id}/file")
             return HttpResponse(response.content, content_type=response.headers['Content-Type'])
+        except OrthancUnavailable as e:
+            return _orthanc_unavailable_response(e)
         except requests.exceptions.RequestException as e:
             logger.error(f"Orthanc 인스턴스({instance_id}) GET 오류: {e}")
             return Response({"error": "Orthanc 서버 데이터 GET 실패"}, status=502)
@@ -941,30 +1157,22 @@ class FileDeleteAPIView(APIView):
             )
 
         try:
-            # 2. GCS 경로를 '버킷 이름'과 '파일 이름(blob_name)'으로 분리합니다.
-            if not gcs_path.startswith("gs://"):
-                raise ValueError("올바르지 않은 GCS 경로 형식입니다.")
-            
-            parts = gcs_path.replace("gs://", "").split("/", 1)
-            bucket_name = parts[0]
-            blob_name = parts[1]
-
-            # 3. [핵심] GCS에 접속하여 실제 파일을 삭제하는 로직
-            # TODO: 이 부분은 실제 GCS 프로젝트 설정에 맞는 인증 과정이 필요할 수 있습니다.
-            storage_client = storage.Client()
-            bucket = storage_client.bucket(bucket_name)
-            blob = bucket.blob(blob_name)
+            # 2. 저장소 경로를 '버킷 이름'과 '파일 이름(blob_name)'으로 분리합니다.
+            object_storage = get_object_storage()
+            _, blob_name = object_storage.resolve(gcs_path)
 
-            if not blob.exists():
+            # 3. [핵심] 저장소에서 실제 파일을 삭제하는 로직
+            if not object_storage.exists(gcs_path):
                 return Response(
                     {"error": "GCS에서 해당 파일을 찾을 수 없습니다."},
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            # 실제 파일 삭제 명령
-            blob.delete()
+            # 실제 파일 삭제 명령 (세션 목록 인덱스도 함께 정리)
+            object_storage.delete(gcs_path)
+            NiftiMetadata.objects.filter(gcs_path=gcs_path).delete()
 
-            print(f"파일 삭제 성공: {gcs_path}")
+            logger.info(f"파일 삭제 성공: {gcs_path}")
 
             # 4. 성공적으로 임무를 마쳤음을 알립니다.
             return Response(
@@ -974,7 +1182,7 @@ class FileDeleteAPIView(APIView):
 
         except Exception as e:
             # 5. 임무 수행 중 문제가 생기면 오류를 보고합니다.
-            print(f"GCS 파일 삭제 중 오류 발생: {e}")
+            logger.error(f"GCS 파일 삭제 중 오류 발생: {e}", exc_info=True)
             return Response(
                 {"error": "서버에서 파일 삭제 중 오류가 발생했습니다."},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -1001,29 +1209,23 @@ class SessionDeleteAPIView(APIView):
             # 예시에서는 'nifti/' 로 시작한다고 가정합니다.
             folder_prefix = f"nifti/{patient_id}/{session_id}/"
 
-            # 3. [핵심] GCS에 접속하여 해당 폴더 안의 모든 파일을 찾아냅니다.
-            # TODO: bucket_name은 실제 사용하는 버킷 이름으로 변경해야 합니다.
-            bucket_name = "final_model_data1" 
-            storage_client = storage.Client()
-            bucket = storage_client.bucket(bucket_name)
-            
-            # folder_prefix로 시작하는 모든 파일을 리스트로 만듭니다.
-            blobs_to_delete = list(bucket.list_blobs(prefix=folder_prefix))
+            # 3. [핵심] 저장소에서 해당 폴더 안의 모든 파일을 찾아 배치로 삭제합니다.
+            deleted_names = get_object_storage().delete_prefix(folder_prefix)
+            NiftiMetadata.objects.filter(patient_uuid=patient_id, session_id=session_id).delete()
 
-            if not blobs_to_delete:
-                print(f"세션 폴더에 삭제할 파일이 없습니다: {folder_prefix}")
+            if not deleted_names:
+                logger.info(f"세션 폴더에 삭제할 파일이 없습니다: {folder_prefix}")
                 # 파일이 없어도 성공으로 처리할 수 있습니다.
                 return Response(
                     {"message": "삭제할 파일이 없지만, 세션 삭제 처리 완료."},
                     status=status.HTTP_204_NO_CONTENT
                 )
 
-            # 4. [권능 행사] 찾아낸 모든 파일을 하나씩 소멸시킵니다.
-            for blob in blobs_to_delete:
-                blob.delete()
-                print(f"파일 삭제 성공: {blob.name}")
+            # 4. [권능 행사] 소멸시킨 파일들을 보고합니다.
+            for name in deleted_names:
+                logger.debug(f"파일 삭제 성공: {name}")
 
-            print(f"세션 폴더 전체 삭제 성공: {folder_prefix}")
+            logger.info(f"세션 폴더 전체 삭제 성공: {folder_prefix} ({len(deleted_names)}개 파일)")
             
             # 5. 임무 완수를 보고합니다.
             return Response(
@@ -1032,53 +1234,66 @@ class SessionDeleteAPIView(APIView):
             )
 
         except Exception as e:
-            print(f"GCS 세션 폴더 삭제 중 오류 발생: {e}")
+            logger.error(f"GCS 세션 폴더 삭제 중 오류 발생: {e}", exc_info=True)
             return Response(
                 {"error": "서버에서 세션 삭제 중 오류가 발생했습니다."},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-# [가상 모델 실행 함수] - 이 부분은 실제 모델 실행 로직에 맞게 수정되어야 합니다.
-def run_actual_segmentation_model(task_id, payload):
-    total_steps = 10 # 예시: 총 10단계의 작업
-    print(f"백그라운드 작업 시작: Task {task_id}")
-    try:
-        # TODO: 여기에 실제 segmentation 로직을 호출하십시오.
-        # 예: from your_ml_app.tasks import process_segmentation
-        # process_segmentation(payload) 
-        
-        # 지금은 진행률을 시뮬레이션합니다.
-        for i in range(total_steps + 1):
-            progress = int((i / total_steps) * 100)
-            cache.set(task_id, {'status': 'processing', 'progress': progress}, timeout=3600)
-            print(f"Task {task_id}: 진행률 {progress}%")
-            time.sleep(3) # 3초 딜레이로 실제 작업 시간 시뮬레이션
-        
-        # 작업 완료 후 최종 상태를 저장합니다.
-        cache.set(task_id, {'status': 'completed', 'progress': 100, 'result': 'some_result_path'}, timeout=3600)
-        print(f"Task {task_id}: 완료")
-    except Exception as e:
-        print(f"Task {task_id}: 실패 - {e}")
-        cache.set(task_id, {'status': 'failed', 'error': str(e)}, timeout=3600)
-
 # 분할 작업을 시작하는 View
 class SegmentationAPIView(APIView):
     def post(self, request, *args, **kwargs):
-        payload = request.data
-        task_id = str(uuid.uuid4())
-        thread = threading.Thread(target=run_actual_segmentation_model, args=(task_id, payload))
-        thread.start()
+        payload = request.data.dict() if hasattr(request.data, 'dict') else dict(request.data)
+        try:
+            job = segmentation_runner.enqueue(
+                'segmentation', run_segmentation, args=(payload,),
+                patient_uuid=str(payload.get('patient_id', '')), payload=payload,
+            )
+        except JobQueueFull as e:
+            logger.warning(f"분할 작업 거절: {e}")
+            return _queue_full_response(segmentation_runner)
         return Response(
-            {"message": "분할 작업이 성공적으로 시작되었습니다.", "task_id": task_id},
+            {"message": "분할 작업이 성공적으로 시작되었습니다.", "task_id": str(job.id)},
             status=status.HTTP_202_ACCEPTED
         )
 
-# 작업 상태를 보고하는 View
+# 작업 상태를 보고하는 View (작업 기록은 DB 에 있으므로 재시작/다른 노드에서도 조회 가능)
 class TaskStatusAPIView(APIView):
+    """
+    기존 응답 형식({'status': processing|completed|failed, 'progress', 'result': 결과 경로, 'error'})을 그대로 유지하고,
+    작업 기록의 전체 내용(단계별 진행률, 취소 여부 등)은 'job' 필드에 추가로 담습니다.
+    """
+    # 작업 상태 → 기존 캐시 기반 응답의 상태값 (cancelled 는 새로 생긴 상태라 그대로 전달)
+    LEGACY_STATUSES = {'queued': 'processing', 'running': 'processing', 'completed': 'completed', 'failed': 'failed'}
+
+    def _task_info(self, job):
+        info = {
+            "task_id": str(job.id),
+            "status": self.LEGACY_STATUSES.get(job.status, job.status),
+            "progress": job.progress,
+            "job": job.to_dict(),
+        }
+        if job.status == 'completed':
+            info["result"] = job.result.get('result') if isinstance(job.result, dict) else job.result
+        if job.error:
+            info["error"] = job.error
+        return info
+
+    def _get_job(self, task_id):
+        try:
+            return ProcessingJob.objects.get(pk=uuid.UUID(task_id))
+        except (ValueError, ProcessingJob.DoesNotExist):
+            return None
+
     def get(self, request, task_id, *args, **kwargs):
-        task_info = cache.get(task_id)
-        if task_info is None:
+        job = self._get_job(task_id)
+        if job is None:
             return Response({"status": "not_found"}, status=status.HTTP_404_NOT_FOUND)
-        return Response(task_info, status=status.HTTP_200_OK)
-
+        return Response(self._task_info(job), status=status.HTTP_200_OK)
 
+    def delete(self, request, task_id, *args, **kwargs):
+        """작업 취소 (대기 중이면 바로, 실행 중이면 다음 단계에서 중단)"""
+        job = self._get_job(task_id)
+        if job is None:
+            return Response({"status": "not_found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self._task_info(cancel_job(job.id)), status=status.HTTP_202_ACCEPTED)
@@ -1,105 +1,88 @@
 # backend/ml_models/ml_service.py - 실제 모델 파일들 기반
-import os
-import pickle
 import numpy as np
-import json
 import pandas as pd
-from django.conf import settings
 from django.core.cache import cache
 import logging
 from typing import Dict, List, Tuple, Any
 import time
 from datetime import datetime, date, timedelta
 
+from ml_models.feature_schema import FeatureRule, FeatureSchema, flag, get_feature_schema
+from ml_models.model_registry import model_registry
+
 logger = logging.getLogger(__name__)
 
+# 입력 데이터 → 피처 매핑 규칙 (입력에 있는 값만 채우고, 플래그는 없으면 0)
+FEATURE_RULES = (
+    # 기본 정보
+    FeatureRule(('gender',), ('GENDER',), lambda gender: 1 if gender == 'M' else 0),
+    FeatureRule(('age',), ('AGE',)),
+    # 활력징후
+    *(FeatureRule(('vital_signs', key), (feature_name,)) for key, feature_name in (
+        ('heart_rate', 'heart_rate_mean'),
+        ('systolic_bp', 'systolic_bp_mean'),
+        ('diastolic_bp', 'diastolic_bp_mean'),
+        ('temperature', 'temperature_mean'),
+        ('respiratory_rate', 'respiratory_rate_mean'),
+        ('oxygen_saturation', 'spo2_mean'),
+    )),
+    # 검사결과
+    *(FeatureRule(('lab_results', key), (f'{key}_mean',))
+      for key in ('wbc', 'hemoglobin', 'creatinine', 'bun', 'glucose', 'sodium', 'potassium')),
+    # 합병증 플래그
+    *(FeatureRule(('complications', comp), (comp,), flag, default=False) for comp in (
+        'sepsis', 'respiratory_failure', 'deep_vein_thrombosis',
+        'pulmonary_embolism', 'urinary_tract_infection', 'gastrointestinal_bleeding',
+    )),
+    # 약물 플래그
+    *(FeatureRule(('medications', med), (med,), flag, default=False) for med in (
+        'anticoagulant_flag', 'antiplatelet_flag', 'thrombolytic_flag',
+        'antihypertensive_flag', 'statin_flag', 'antibiotic_flag', 'vasopressor_flag',
+    )),
+)
+
+# 뇌졸중 사망률 예측용 규칙 (기본 규칙 + 뇌졸중 특화 피처)
+STROKE_FEATURE_RULES = FEATURE_RULES + (
+    FeatureRule(('nihss_score',), ('nihss_score',)),
+    FeatureRule(('stroke_type',), ('stroke_type_ischemic',), lambda stroke_type: 1 if 'ischemic' in stroke_type else 0),
+    FeatureRule(('stroke_type',), ('stroke_type_hemorrhagic',), lambda stroke_type: 1 if 'hemorrhagic' in stroke_type else 0),
+    FeatureRule(('reperfusion_treatment',), ('reperfusion_treatment',), flag),
+)
+
+# feature_columns.json 과 전처리기 컬럼을 모두 못 얻었을 때의 기본 피처 (환자 서비스 기존 목록 그대로, 평균혈압·BUN 포함)
+FALLBACK_FEATURE_COLUMNS = (
+    'GENDER', 'AGE',
+    # 활력징후 관련 (심박수, 혈압, 체온 등의 통계값들)
+    *(f'{vital}_{stat}'
+      for vital in ('heart_rate', 'systolic_bp', 'diastolic_bp', 'mean_bp', 'temperature', 'respiratory_rate', 'spo2')
+      for stat in ('mean', 'std', 'min', 'max', 'count', 'first', 'last')),
+    # 검사 결과들
+    *(f'{lab}_{stat}'
+      for lab in ('wbc', 'hemoglobin', 'creatinine', 'bun')
+      for stat in ('mean', 'first', 'last', 'trend', 'count')),
+    # 합병증 플래그들
+    'sepsis', 'respiratory_failure', 'deep_vein_thrombosis', 'pulmonary_embolism',
+    'urinary_tract_infection', 'gastrointestinal_bleeding',
+    # 약물 플래그들
+    'anticoagulant_flag', 'antiplatelet_flag', 'thrombolytic_flag',
+    'antihypertensive_flag', 'statin_flag', 'antibiotic_flag', 'vasopressor_flag',
+)
+
 class MLModelService:
     """머신러닝 모델 서비스 - 실제 pkl 파일 기반"""
     
     def __init__(self):
-        self.models: Dict[str, Any] = {}
-        self.preprocessors: Dict[str, Any] = {}
-        self.metadata: Dict[str, Any] = {}
-        self.feature_columns: List[str] = []
-        self.model_path = os.path.join(settings.BASE_DIR, 'ml_models', 'saved_models')
+        # 모델/메타데이터/전처리기는 ml_models 서비스와 같은 공용 레지스트리에서 처음 쓰일 때 로드
+        self.models = model_registry.models
+        self.preprocessors = model_registry.preprocessors
+        self.metadata = model_registry.metadata
+        self.model_path = model_registry.directory
 
-        # 1) JSON 파일에서 피처 컬럼 목록 로드
-        json_path = os.path.join(
-            settings.BASE_DIR,
-            'frontend', 'src', 'data', 'feature_columns.json'
-        )
-        try:
-            with open(json_path, 'r', encoding='utf-8') as jf:
-                self.feature_columns = json.load(jf)
-            logger.info(f"Loaded {len(self.feature_columns)} feature columns from {json_path}.")
-        except Exception as e:
-            logger.error(f"feature_columns JSON 로드 실패: {e}")
-            self.feature_columns = []
-        self._load_models()
+        # 1) 피처 스키마 (feature_columns.json, ml_models 서비스와 공유)
+        self.feature_schema = get_feature_schema()
+        self.feature_columns: List[str] = self.feature_schema.columns if self.feature_schema.from_file else []
+        self._fallback_schema = None
 
-    def _load_models(self):
-        try:
-            self._load_complication_models()
-            self._load_mortality_model()
-            logger.info("모든 ML 모델이 성공적으로 로드되었습니다.")
-        except Exception as e:
-            logger.error(f"모델 로드 중 오류 발생: {e}")
-    
-    def _load_complication_models(self):
-        """합병증 예측 모델들 로드"""
-        complications = ['pneumonia', 'acute_kidney_injury', 'heart_failure']
-        
-        for comp in complications:
-            try:
-                # 메타데이터 로드
-                metadata_path = os.path.join(self.model_path, f'{comp}_metadata.pkl')
-                if os.path.exists(metadata_path):
-                    with open(metadata_path, 'rb') as f:
-                        self.metadata[comp] = pickle.load(f)
-                
-                # 전처리기 로드  
-                preprocessor_path = os.path.join(self.model_path, f'{comp}_preprocessors.pkl')
-                if os.path.exists(preprocessor_path):
-                    with open(preprocessor_path, 'rb') as f:
-                        self.preprocessors[comp] = pickle.load(f)
-                
-                # 모델 로드
-                model_path = os.path.join(self.model_path, f'{comp}_final_model.pkl')
-                if os.path.exists(model_path):
-                    with open(model_path, 'rb') as f:
-                        self.models[comp] = pickle.load(f)
-                
-                logger.info(f"{comp} 합병증 모델 로드 완료")
-                
-            except Exception as e:
-                logger.error(f"{comp} 모델 로드 실패: {str(e)}")
-    
-    def _load_mortality_model(self):
-        """사망률 예측 모델 로드"""
-        try:
-            # stroke_mortality_30day.pkl 모델 로드
-            mortality_model_path = os.path.join(self.model_path, 'stroke_mortality_30day.pkl')
-            if os.path.exists(mortality_model_path):
-                with open(mortality_model_path, 'rb') as f:
-                    self.models['stroke_mortality'] = pickle.load(f)
-                
-                # 메타데이터가 별도 파일로 있는 경우
-                mortality_metadata_path = os.path.join(self.model_path, 'stroke_mortality_metadata.pkl')
-                if os.path.exists(mortality_metadata_path):
-                    with open(mortality_metadata_path, 'rb') as f:
-                        self.metadata['stroke_mortality'] = pickle.load(f)
-                
-                # 전처리기가 별도 파일로 있는 경우
-                mortality_preprocessor_path = os.path.join(self.model_path, 'stroke_mortality_preprocessors.pkl')
-                if os.path.exists(mortality_preprocessor_path):
-                    with open(mortality_preprocessor_path, 'rb') as f:
-                        self.preprocessors['stroke_mortality'] = pickle.load(f)
-                
-                logger.info("뇌졸중 사망률 예측 모델 로드 완료")
-            
-        except Exception as e:
-            logger.error(f"사망률 모델 로드 실패: {str(e)}")
-    
     def predict_complications(self, patient_data: Dict) -> Dict[str, Any]:
         """합병증 예측 - 실제 모델 사용"""
         start_time = time.time()
@@ -109,10 +92,11 @@ class MLModelService:
             # 입력 데이터 전처리 (183개 피처)
             features_df = self._prepare_features(patient_data)
             
-            # 각 합병증 모델로 예측
+            # 각 합병증 모델로 예측 (모델마다 레지스트리 묶음을 한 번만 잡아 예측 도중 교체되어도 버전이 섞이지 않음)
             for complication in ['pneumonia', 'acute_kidney_injury', 'heart_failure']:
-                if complication in self.models:
-                    result = self._predict_single_complication(features_df, complication)
+                bundle = model_registry.bundle(complication)
+                if bundle.model is not None:
+                    result = self._predict_single_complication(features_df, complication, bundle)
                     results[complication] = result
             
             processing_time = time.time() - start_time
@@ -130,15 +114,16 @@ class MLModelService:
         start_time = time.time()
         
         try:
-            if 'stroke_mortality' not in self.models:
+            bundle = model_registry.bundle('stroke_mortality')
+            if bundle.model is None:
                 return {'error': '사망률 예측 모델이 로드되지 않았습니다.'}
             
             # 뇌졸중 특화 피처 준비
             stroke_features = self._prepare_stroke_features(patient_data)
             
-            model = self.models['stroke_mortality']
-            metadata = self.metadata.get('stroke_mortality', {})
-            preprocessors = self.preprocessors.get('stroke_mortality', {})
+            model = bundle.model
+            metadata = bundle.metadata or {}
+            preprocessors = bundle.preprocessors or {}
             
             # 전처리
             if 'imputer' in preprocessors:
@@ -447,160 +432,37 @@ class MLModelService:
     def _prepare_features(self, patient_data: Dict) -> pd.DataFrame:
         """환자 데이터를 183개 피처로 변환"""
         try:
-            # 실제 모델에서 사용되는 피처 컬럼들 가져오기
-            feature_columns = self._get_feature_columns()
-            features = pd.DataFrame(0, index=[0], columns=feature_columns)
-            
-            # 기본 정보
-            if 'gender' in patient_data:
-                features.loc[0, 'GENDER'] = 1 if patient_data['gender'] == 'M' else 0
-            if 'age' in patient_data:
-                features.loc[0, 'AGE'] = patient_data['age']
-            
-            # 활력징후 매핑
-            vital_signs = patient_data.get('vital_signs', {})
-            self._map_vital_signs(features, vital_signs)
-            
-            # 검사결과 매핑  
-            lab_results = patient_data.get('lab_results', {})
-            self._map_lab_results(features, lab_results)
-            
-            # 합병증 플래그
-            complications = patient_data.get('complications', {})
-            self._map_complications(features, complications)
-            
-            # 약물 플래그
-            medications = patient_data.get('medications', {})
-            self._map_medications(features, medications)
-            
-            return features
-            
+            schema = self._get_feature_schema()
+            return schema.frame(schema.build_row(patient_data, FEATURE_RULES))
         except Exception as e:
             logger.error(f"피처 준비 중 오류: {str(e)}")
             raise
     
     def _prepare_stroke_features(self, patient_data: Dict) -> pd.DataFrame:
-        """뇌졸중 사망률 예측용 피처 준비"""
-        # 기본 피처 준비 후 뇌졸중 특화 피처 추가
-        features = self._prepare_features(patient_data)
-        
-        # 뇌졸중 특화 피처들
-        if 'nihss_score' in patient_data:
-            if 'nihss_score' in features.columns:
-                features.loc[0, 'nihss_score'] = patient_data['nihss_score']
-        
-        if 'stroke_type' in patient_data:
-            stroke_type = patient_data['stroke_type']
-            if 'stroke_type_ischemic' in features.columns:
-                features.loc[0, 'stroke_type_ischemic'] = 1 if 'ischemic' in stroke_type else 0
-            if 'stroke_type_hemorrhagic' in features.columns:
-                features.loc[0, 'stroke_type_hemorrhagic'] = 1 if 'hemorrhagic' in stroke_type else 0
-        
-        if 'reperfusion_treatment' in patient_data:
-            if 'reperfusion_treatment' in features.columns:
-                features.loc[0, 'reperfusion_treatment'] = 1 if patient_data['reperfusion_treatment'] else 0
-        
-        return features
+        """뇌졸중 사망률 예측용 피처 준비 (기본 피처 + 뇌졸중 특화 피처)"""
+        schema = self._get_feature_schema()
+        return schema.frame(schema.build_row(patient_data, STROKE_FEATURE_RULES))
     
-    def _get_feature_columns(self) -> List[str]:
-        """모델 피처 컬럼 목록 반환"""
+    def _get_feature_schema(self) -> FeatureSchema:
+        """모델 피처 스키마 반환 (JSON 을 못 읽었으면 전처리기에 저장된 컬럼, 그것도 없으면 FALLBACK_FEATURE_COLUMNS)"""
         if self.feature_columns:
-            return self.feature_columns
-        logger.warning("feature_columns JSON이 비어있습니다. Preprocessor에서 로드된 컬럼 사용.")
-        for pre in self.preprocessors.values():
-            if isinstance(pre, dict) and 'feature_columns' in pre:
-                return pre['feature_columns']
-        
-        # 기본 183개 피처 (실제로는 업로드된 전처리기에서 가져와야 함)
-        return [
-            'GENDER', 'AGE',
-            # 활력징후 관련 (심박수, 혈압, 체온 등의 통계값들)
-            'heart_rate_mean', 'heart_rate_std', 'heart_rate_min', 'heart_rate_max', 'heart_rate_count',
-            'heart_rate_first', 'heart_rate_last',
-            'systolic_bp_mean', 'systolic_bp_std', 'systolic_bp_min', 'systolic_bp_max', 'systolic_bp_count',
-            'systolic_bp_first', 'systolic_bp_last',
-            'diastolic_bp_mean', 'diastolic_bp_std', 'diastolic_bp_min', 'diastolic_bp_max', 'diastolic_bp_count',
-            'diastolic_bp_first', 'diastolic_bp_last',
-            'mean_bp_mean', 'mean_bp_std', 'mean_bp_min', 'mean_bp_max', 'mean_bp_count',
-            'mean_bp_first', 'mean_bp_last',
-            'temperature_mean', 'temperature_std', 'temperature_min', 'temperature_max', 'temperature_count',
-            'temperature_first', 'temperature_last',
-            'respiratory_rate_mean', 'respiratory_rate_std', 'respiratory_rate_min', 'respiratory_rate_max',
-            'respiratory_rate_count', 'respiratory_rate_first', 'respiratory_rate_last',
-            'spo2_mean', 'spo2_std', 'spo2_min', 'spo2_max', 'spo2_count', 'spo2_first', 'spo2_last',
-            # ... (실제로는 183개 모든 피처)
-            # 검사 결과들
-            'wbc_mean', 'wbc_first', 'wbc_last', 'wbc_trend', 'wbc_count',
-            'hemoglobin_mean', 'hemoglobin_first', 'hemoglobin_last', 'hemoglobin_trend', 'hemoglobin_count',
-            'creatinine_mean', 'creatinine_first', 'creatinine_last', 'creatinine_trend', 'creatinine_count',
-            'bun_mean', 'bun_first', 'bun_last', 'bun_trend', 'bun_count',
-            # 합병증 플래그들
-            'sepsis', 'respiratory_failure', 'deep_vein_thrombosis', 'pulmonary_embolism',
-            'urinary_tract_infection', 'gastrointestinal_bleeding',
-            # 약물 플래그들  
-            'anticoagulant_flag', 'antiplatelet_flag', 'thrombolytic_flag',
-            'antihypertensive_flag', 'statin_flag', 'antibiotic_flag', 'vasopressor_flag'
-        ]
-    
-    def _map_vital_signs(self, features: pd.DataFrame, vital_signs: Dict):
-        """활력징후 데이터 매핑"""
-        vital_mapping = {
-            'heart_rate': 'heart_rate_mean',
-            'systolic_bp': 'systolic_bp_mean', 
-            'diastolic_bp': 'diastolic_bp_mean',
-            'temperature': 'temperature_mean',
-            'respiratory_rate': 'respiratory_rate_mean',
-            'oxygen_saturation': 'spo2_mean'
-        }
-        
-        for key, feature_name in vital_mapping.items():
-            if key in vital_signs and feature_name in features.columns:
-                features.loc[0, feature_name] = vital_signs[key]
-    
-    def _map_lab_results(self, features: pd.DataFrame, lab_results: Dict):
-        """검사결과 데이터 매핑"""
-        lab_mapping = {
-            'wbc': 'wbc_mean',
-            'hemoglobin': 'hemoglobin_mean',
-            'creatinine': 'creatinine_mean',
-            'bun': 'bun_mean',
-            'glucose': 'glucose_mean',
-            'sodium': 'sodium_mean',
-            'potassium': 'potassium_mean'
-        }
-        
-        for key, feature_name in lab_mapping.items():
-            if key in lab_results and feature_name in features.columns:
-                features.loc[0, feature_name] = lab_results[key]
-    
-    def _map_complications(self, features: pd.DataFrame, complications: Dict):
-        """합병증 플래그 매핑"""
-        complication_flags = [
-            'sepsis', 'respiratory_failure', 'deep_vein_thrombosis',
-            'pulmonary_embolism', 'urinary_tract_infection', 'gastrointestinal_bleeding'
-        ]
-        
-        for flag in complication_flags:
-            if flag in features.columns:
-                features.loc[0, flag] = 1 if complications.get(flag, False) else 0
-    
-    def _map_medications(self, features: pd.DataFrame, medications: Dict):
-        """약물 플래그 매핑"""
-        medication_flags = [
-            'anticoagulant_flag', 'antiplatelet_flag', 'thrombolytic_flag',
-            'antihypertensive_flag', 'statin_flag', 'antibiotic_flag', 'vasopressor_flag'
-        ]
-        
-        for flag in medication_flags:
-            if flag in features.columns:
-                features.loc[0, flag] = 1 if medications.get(flag, False) else 0
-    
-    def _predict_single_complication(self, features_df: pd.DataFrame, complication: str) -> Dict:
-        """단일 합병증 예측"""
+            return self.feature_schema
+        if self._fallback_schema is None:
+            logger.warning("feature_columns JSON이 비어있습니다. Preprocessor에서 로드된 컬럼 사용.")
+            self._fallback_schema = FeatureSchema(FALLBACK_FEATURE_COLUMNS)
+            for pre in self.preprocessors.values():
+                if isinstance(pre, dict) and 'feature_columns' in pre:
+                    self._fallback_schema = FeatureSchema(pre['feature_columns'])
+                    break
+        return self._fallback_schema
+    
+    def _predict_single_complication(self, features_df: pd.DataFrame, complication: str, bundle=None) -> Dict:
+        """단일 합병증 예측 (모델/전처리기/메타데이터는 같은 버전 묶음 하나에서)"""
         try:
-            model = self.models[complication]
-            preprocessors = self.preprocessors[complication]
-            metadata = self.metadata[complication]
+            bundle = bundle or model_registry.bundle(complication)
+            model, preprocessors, metadata = bundle.model, bundle.preprocessors, bundle.metadata
+            if model is None or preprocessors is None or metadata is None:
+                raise KeyError(complication)
             
             # 데이터 전처리
             X = features_df.copy()
@@ -1,7 +1,7 @@
 // /home/shared/medical_cdss/frontend/src/components/pacs/NiftiUploadManager.js
 // 유정우넌할수있어 다중 업로드 버전 구현중 
 import React, { useState } from 'react';
-import { uploadNiftiFiles } from '../../services/niftiApiService'; // 다중 업로드용 API 서비스
+import { uploadNiftiFiles, waitForPacsJob } from '../../services/niftiApiService'; // 다중 업로드용 API 서비스
 
 const MODALITIES = ['FLAIR', 'DWI', 'ADC'];
 
@@ -10,6 +10,7 @@ const NiftiUploadManager = ({ patient }) => {
   const [modalities, setModalities]   = useState([]);     // string[]
   const [uploading, setUploading]     = useState(false);
   const [result, setResult]           = useState(null);
+  const [progress, setProgress]       = useState(null);     // 백그라운드 작업 진행률
 
   // 파일 선택 핸들러
   const handleFileChange = (e) => {
@@ -48,13 +49,17 @@ const NiftiUploadManager = ({ patient }) => {
 
     setUploading(true);
     try {
-      const res = await uploadNiftiFiles(form);
-      setResult(res.data); // { results: [...] }
+      // 업로드는 job_id 만 바로 반환하고, 변환/전송은 백그라운드에서 진행
+      const { job_id } = await uploadNiftiFiles(form);
+      const job = await waitForPacsJob(job_id, j => setProgress(j.progress));
+      if (job.status === 'failed') throw new Error(job.error);
+      setResult(job.result); // { results: [...] }
     } catch (err) {
       console.error(err);
       alert(err.response?.data?.detail || err.message);
     } finally {
       setUploading(false);
+      setProgress(null);
     }
   };
 
@@ -105,7 +110,7 @@ const NiftiUploadManager = ({ patient }) => {
             borderRadius: '4px'
           }}
         >
-          {uploading ? '업로드 중...' : '업로드 시작'}
+          {uploading ? `업로드 중...${progress !== null ? ` (${progress}%)` : ''}` : '업로드 시작'}
         </button>
       </div>
 
@@ -24,3 +24,52 @@ export const uploadNiftiFiles = async (formData) => {
         throw error;
     }
 };
+
+/**
+ * 백그라운드 PACS 작업 상태 조회 (업로드는 job_id 만 바로 반환)
+ * @param {string} jobId
+ */
+export const getPacsJob = async (jobId) => {
+    const response = await api.get(`/pacs/jobs/${jobId}/`);
+    return response.data;
+};
+
+/**
+ * 작업이 끝날 때까지 주기적으로 상태를 조회 (EventSource 를 쓸 수 없을 때의 대체 경로)
+ * @param {string} jobId
+ * @param {(job: object) => void} onProgress - 조회할 때마다 호출 (진행률 표시용)
+ */
+export const pollPacsJob = async (jobId, onProgress, intervalMs = 1000) => {
+    for (;;) {
+        const job = await getPacsJob(jobId);
+        if (onProgress) onProgress(job);
+        if (['completed', 'failed', 'cancelled'].includes(job.status)) return job;
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+};
+
+/**
+ * 작업 진행률을 Server-Sent Events 로 구독하고, 끝나면 최종 작업 정보를 반환
+ * @param {string} jobId
+ * @param {(job: object) => void} onProgress - 진행 이벤트마다 호출
+ */
+export const waitForPacsJob = (jobId, onProgress) => {
+    if (typeof EventSource === 'undefined') return pollPacsJob(jobId, onProgress);
+
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(`${api.defaults.baseURL}/pacs/jobs/${jobId}/events/`);
+        source.addEventListener('progress', (e) => {
+            if (onProgress) onProgress(JSON.parse(e.data));
+        });
+        source.addEventListener('end', () => {
+            source.close();
+            getPacsJob(jobId).then(resolve, reject);
+        });
+        source.onerror = () => {
+            // 연결이 끊기면 EventSource 가 스스로 재연결, 아예 닫힌 경우에만 폴링으로 전환
+            if (source.readyState === EventSource.CLOSED) {
+                pollPacsJob(jobId, onProgress).then(resolve, reject);
+            }
+        };
+    });
+};